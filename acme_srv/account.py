@@ -6,7 +6,7 @@ import json
 from acme_srv.helper import generate_random_string, validate_email, date_to_datestr, load_config, eab_handler_load, b64decode_pad
 from acme_srv.db_handler import DBstore
 from acme_srv.message import Message
-from acme_srv.signature import Signature
+from acme_srv.signature import Signature, jwk_cache_invalidate
 
 
 class Account(object):
@@ -142,6 +142,8 @@ class Account(object):
             result = None
 
         if result:
+            # deactivated accounts must not be able to sign with a cached key
+            jwk_cache_invalidate(aname)
             code = 200
             message = None
             detail = None
@@ -370,6 +372,8 @@ class Account(object):
                             self.logger.critical('acme2certifier database error in Account._key_change(): {0}'.format(err_))
                             result = None
                         if result:
+                            # old key must not be used any longer
+                            jwk_cache_invalidate(aname)
                             code = 200
                             message = None
                             detail = None
@@ -537,58 +541,60 @@ class Account(object):
         """ generate a new account """
         self.logger.debug('Account.account_new()')
 
-        response_dic = {}
-        # check message but skip signature check as this is a new account (True)
-        (code, message, detail, protected, payload, _account_name) = self.message.check(content, True)
-        if code == 200:
-            # onlyReturnExisting check
-            if 'onlyreturnexisting' in payload:
-                (code, message, detail) = self._onlyreturnexisting(protected, payload)
-            else:
-                # tos check
-                if self.tos_url and not self.tos_check_disable:
-                    (code, message, detail) = self._tos_check(payload)
+        # all database writes of this request get committed at once
+        with self.dbstore.transaction():
+            response_dic = {}
+            # check message but skip signature check as this is a new account (True)
+            (code, message, detail, protected, payload, _account_name) = self.message.check(content, True)
+            if code == 200:
+                # onlyReturnExisting check
+                if 'onlyreturnexisting' in payload:
+                    (code, message, detail) = self._onlyreturnexisting(protected, payload)
+                else:
+                    # tos check
+                    if self.tos_url and not self.tos_check_disable:
+                        (code, message, detail) = self._tos_check(payload)
 
-                # check for external account binding
-                if code == 200 and self.eab_check:
-                    (code, message, detail) = self._eab_check(protected, payload)
+                    # check for external account binding
+                    if code == 200 and self.eab_check:
+                        (code, message, detail) = self._eab_check(protected, payload)
 
-                # contact check
-                if code == 200 and not self.contact_check_disable:
-                    (code, message, detail) = self._contact_check(payload)
+                    # contact check
+                    if code == 200 and not self.contact_check_disable:
+                        (code, message, detail) = self._contact_check(payload)
 
-                # add account to database
-                if code == 200:
+                    # add account to database
+                    if code == 200:
+                        if 'contact' in payload:
+                            contact_list = payload['contact']
+                        else:
+                            contact_list = []
+                        (code, message, detail) = self._add(protected, payload, contact_list)
+
+            if code in (200, 201):
+                response_dic['data'] = {}
+                if code == 201:
+                    response_dic['data'] = {
+                        'status': 'valid',
+                        'orders': '{0}{1}{2}/orders'.format(self.server_name, self.path_dic['acct_path'], message),
+                    }
                     if 'contact' in payload:
-                        contact_list = payload['contact']
-                    else:
-                        contact_list = []
-                    (code, message, detail) = self._add(protected, payload, contact_list)
-
-        if code in (200, 201):
-            response_dic['data'] = {}
-            if code == 201:
-                response_dic['data'] = {
-                    'status': 'valid',
-                    'orders': '{0}{1}{2}/orders'.format(self.server_name, self.path_dic['acct_path'], message),
-                }
-                if 'contact' in payload:
-                    response_dic['data']['contact'] = payload['contact']
-
-            response_dic['header'] = {}
-            response_dic['header']['Location'] = '{0}{1}{2}'.format(self.server_name, self.path_dic['acct_path'], message)
-
-            # add exernal account binding
-            if self.eab_check and 'externalaccountbinding' in payload:
-                response_dic['data']['externalaccountbinding'] = payload['externalaccountbinding']
+                        response_dic['data']['contact'] = payload['contact']
 
-        else:
-            if detail == 'tosfalse':
-                detail = 'Terms of service must be accepted'
+                response_dic['header'] = {}
+                response_dic['header']['Location'] = '{0}{1}{2}'.format(self.server_name, self.path_dic['acct_path'], message)
 
-        # prepare/enrich response
-        status_dic = {'code': code, 'message': message, 'detail': detail}
-        response_dic = self.message.prepare_response(response_dic, status_dic)
+                # add exernal account binding
+                if self.eab_check and 'externalaccountbinding' in payload:
+                    response_dic['data']['externalaccountbinding'] = payload['externalaccountbinding']
+
+            else:
+                if detail == 'tosfalse':
+                    detail = 'Terms of service must be accepted'
+
+            # prepare/enrich response
+            status_dic = {'code': code, 'message': message, 'detail': detail}
+            response_dic = self.message.prepare_response(response_dic, status_dic)
 
         self.logger.debug('Account.account_new() returns: {0}'.format(json.dumps(response_dic)))
         return response_dic
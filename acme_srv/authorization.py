@@ -8,6 +8,7 @@ from acme_srv.challenge import Challenge
 from acme_srv.helper import generate_random_string, uts_now, uts_to_date_utc, load_config
 from acme_srv.message import Message
 from acme_srv.nonce import Nonce
+from acme_srv.pollcache import poll_cache_get
 
 
 class Authorization(object):
@@ -22,6 +23,7 @@ class Authorization(object):
         self.nonce = Nonce(debug, self.logger)
         self.validity = 86400
         self.expiry_check_disable = False
+        self.poll_cache_ttl = 0
         self.path_dic = {'authz_path': '/acme/authz/'}
 
     def __enter__(self):
@@ -36,61 +38,60 @@ class Authorization(object):
         """ return authzs information """
         self.logger.debug('Authorization._authz_info({0})'.format(url))
         authz_name = url.replace('{0}{1}'.format(self.server_name, self.path_dic['authz_path']), '')
-        expires = uts_now() + self.validity
-        token = generate_random_string(self.logger, 32)
-        authz_info_dic = {}
 
-        # lookup authorization based on name
+        if self.poll_cache_ttl:
+            authz_info_dic = poll_cache_get().get('authz', authz_name, self.server_name)
+            if authz_info_dic:
+                self.logger.debug('Authorization._authz_info() - served from cache')
+                return authz_info_dic
+
+        authz_info_dic = {}
+        # lookup authorization and its challenges based on name
         try:
-            authz = self.dbstore.authorization_lookup('name', authz_name)
+            authz = self.dbstore.authorization_view(authz_name)
         except Exception as err_:
-            self.logger.critical('acme2certifier database error in Authorization._authz_info({0}) lookup1: {1}'.format(authz_name, err_))
+            self.logger.critical('acme2certifier database error in Authorization._authz_info({0}) lookup: {1}'.format(authz_name, err_))
             authz = None
 
         if authz:
-            # update authorization with expiry date and token (just to be sure)
-            try:
-                self.dbstore.authorization_update({'name': authz_name, 'token': token, 'expires': expires})
-            except Exception as err_:
-                self.logger.error('acme2certifier database error in Authorization._authz_info({0}) update: {1}'.format(authz_name, err_))
+            token = authz.get('token')
+            expires = authz.get('expires')
+            if not token:
+                # first request - set expiry date and token once, polling requests do not write
+                expires = uts_now() + self.validity
+                token = generate_random_string(self.logger, 32)
+                try:
+                    self.dbstore.authorization_update({'name': authz_name, 'token': token, 'expires': expires})
+                except Exception as err_:
+                    self.logger.error('acme2certifier database error in Authorization._authz_info({0}) update: {1}'.format(authz_name, err_))
             authz_info_dic['expires'] = uts_to_date_utc(expires)
 
-            # get authorization information from db to be inserted in message
             tnauth = None
-            try:
-                auth_info = self.dbstore.authorization_lookup('name', authz_name, ['status__name', 'type', 'value'])
-            except Exception as err_:
-                self.logger.error('acme2certifier database error in Authorization._authz_info({0}) lookup2: {1}'.format(authz_name, err_))
-                auth_info = {}
-
-            if auth_info:
-                if 'status__name' in auth_info[0]:
-                    authz_info_dic['status'] = auth_info[0]['status__name']
-                else:
-                    authz_info_dic['status'] = 'pending'
-
-                if 'type' in auth_info[0] and 'value' in auth_info[0]:
-                    authz_info_dic['identifier'] = {'type': auth_info[0]['type'], 'value': auth_info[0]['value']}
-                    if auth_info[0]['type'] == 'TNAuthList':
-                        tnauth = True
-                    # add fildcard flag into authoritzation response and modify identifier
-                    if auth_info[0]['value'].startswith('*.'):
-                        self.logger.debug('Authorization._authz_info() - adding wildcard flag')
-                        authz_info_dic['identifier']['value'] = auth_info[0]['value'][2:]
-                        authz_info_dic['wildcard'] = True
+            if authz.get('status__name'):
+                authz_info_dic['status'] = authz['status__name']
             else:
                 authz_info_dic['status'] = 'pending'
 
+            if authz.get('type') and authz.get('value'):
+                authz_info_dic['identifier'] = {'type': authz['type'], 'value': authz['value']}
+                if authz['type'] == 'TNAuthList':
+                    tnauth = True
+                # add fildcard flag into authoritzation response and modify identifier
+                if authz['value'].startswith('*.'):
+                    self.logger.debug('Authorization._authz_info() - adding wildcard flag')
+                    authz_info_dic['identifier']['value'] = authz['value'][2:]
+                    authz_info_dic['wildcard'] = True
+
             with Challenge(self.debug, self.server_name, self.logger, expires) as challenge:
                 # get challenge data (either existing or new ones)
                 if 'identifier' in authz_info_dic:
-                    if 'value' in authz_info_dic['identifier']:
-                        id_value = authz_info_dic['identifier']['value']
-                    else:
-                        id_value = None
+                    id_value = authz_info_dic['identifier']['value']
                 else:
                     id_value = None
-                authz_info_dic['challenges'] = challenge.challengeset_get(authz_name, authz_info_dic['status'], token, tnauth, id_value)
+                authz_info_dic['challenges'] = challenge.challengeset_get(authz_name, authz_info_dic['status'], token, tnauth, id_value, authz.get('challenges', []))
+
+            if self.poll_cache_ttl:
+                poll_cache_get().set('authz', authz_name, authz_info_dic, self.poll_cache_ttl, self.server_name)
 
         self.logger.debug('Authorization._authz_info() returns: {0}'.format(json.dumps(authz_info_dic)))
         return authz_info_dic
@@ -106,6 +107,11 @@ class Authorization(object):
                     self.validity = int(config_dic['Authorization']['validity'])
                 except Exception:
                     self.logger.warning('Authorization._config_load(): failed to parse validity: {0}'.format(config_dic['Authorization']['validity']))
+            if 'poll_cache_ttl' in config_dic['Authorization']:
+                try:
+                    self.poll_cache_ttl = int(config_dic['Authorization']['poll_cache_ttl'])
+                except Exception:
+                    self.logger.warning('Authorization._config_load(): failed to parse poll_cache_ttl: {0}'.format(config_dic['Authorization']['poll_cache_ttl']))
         if 'Directory' in config_dic:
             if 'url_prefix' in config_dic['Directory']:
                 self.path_dic = {k: config_dic['Directory']['url_prefix'] + v for k, v in self.path_dic.items()}
@@ -138,6 +144,7 @@ class Authorization(object):
                         self.dbstore.authorization_update(data_dic)
                     except Exception as err_:
                         self.logger.critical('acme2certifier database error in Authorization.invalidate(): {0}'.format(err_))
+                    poll_cache_get().invalidate('authz', authz['name'])
 
         self.logger.debug('Authorization.invalidate() ended: {0} authorizations identified'.format(len(output_list)))
         return (field_list, output_list)
@@ -7,6 +7,7 @@ import json
 from acme_srv.helper import b64_url_recode, generate_random_string, cert_san_get, cert_extensions_get, uts_now, uts_to_date_utc, date_to_uts_utc, load_config, csr_san_get, csr_extensions_get, cert_dates_get, ca_handler_load
 from acme_srv.db_handler import DBstore
 from acme_srv.message import Message
+from acme_srv.pollcache import poll_cache_get
 from acme_srv.threadwithreturnvalue import ThreadWithReturnValue
 
 
@@ -25,6 +26,7 @@ class Certificate(object):
         self.tnauthlist_support = False
         self.cert_reusage_timeframe = 0
         self.enrollment_timeout = 5
+        self.poll_cache_ttl = 0
 
     def __enter__(self):
         """ Makes ACMEHandler a Context Manager """
@@ -156,6 +158,11 @@ class Certificate(object):
                     self.enrollment_timeout = int(config_dic['Certificate']['enrollment_timeout'])
                 except Exception as err_:
                     self.logger.error('acme2certifier Certificate._config_load() enrollment_timeout parsing error: {0}'.format(err_))
+            if 'poll_cache_ttl' in config_dic['Certificate']:
+                try:
+                    self.poll_cache_ttl = int(config_dic['Certificate']['poll_cache_ttl'])
+                except Exception as err_:
+                    self.logger.error('acme2certifier Certificate._config_load() poll_cache_ttl parsing error: {0}'.format(err_))
 
         if 'Directory' in config_dic:
             if 'url_prefix' in config_dic['Directory']:
@@ -238,33 +245,35 @@ class Certificate(object):
             else:
                 self.logger.info('Certificate._enroll_and_store(): reuse existing certificate')
 
-            if certificate:
-                (issue_uts, expire_uts) = cert_dates_get(self.logger, certificate_raw)
-                try:
-                    result = self._store_cert(certificate_name, certificate, certificate_raw, issue_uts, expire_uts, poll_identifier)
-                    if result:
-                        self._order_update({'name': order_name, 'status': 'valid'})
-                except Exception as err_:
-                    result = None
-                    self.logger.critical('acme2certifier database error in Certificate._enroll_and_store(): {0}'.format(err_))
-            else:
-                result = None
-                self.logger.error('acme2certifier enrollment error: {0}'.format(error))
-                # store error message for later analysis
-                try:
-                    if not poll_identifier:
-                        self.logger.debug('Certificate._enroll_and_store(): invalidating order as there is no certificate and no poll_identifier: {0}/{1}'.format(error, order_name))
-                        self._order_update({'name': order_name, 'status': 'invalid'})
-                    self._store_cert_error(certificate_name, error, poll_identifier)
-                except Exception as err_:
+            # certificate and order updates get committed at once
+            with self.dbstore.transaction():
+                if certificate:
+                    (issue_uts, expire_uts) = cert_dates_get(self.logger, certificate_raw)
+                    try:
+                        result = self._store_cert(certificate_name, certificate, certificate_raw, issue_uts, expire_uts, poll_identifier)
+                        if result:
+                            self._order_update({'name': order_name, 'status': 'valid'})
+                    except Exception as err_:
+                        result = None
+                        self.logger.critical('acme2certifier database error in Certificate._enroll_and_store(): {0}'.format(err_))
+                else:
                     result = None
-                    self.logger.critical('acme2certifier database error in Certificate._enroll_and_store() _store_cert_error: {0}'.format(err_))
+                    self.logger.error('acme2certifier enrollment error: {0}'.format(error))
+                    # store error message for later analysis
+                    try:
+                        if not poll_identifier:
+                            self.logger.debug('Certificate._enroll_and_store(): invalidating order as there is no certificate and no poll_identifier: {0}/{1}'.format(error, order_name))
+                            self._order_update({'name': order_name, 'status': 'invalid'})
+                        self._store_cert_error(certificate_name, error, poll_identifier)
+                    except Exception as err_:
+                        result = None
+                        self.logger.critical('acme2certifier database error in Certificate._enroll_and_store() _store_cert_error: {0}'.format(err_))
 
-                # cover polling cases
-                if poll_identifier:
-                    detail = poll_identifier
-                else:
-                    error = 'urn:ietf:params:acme:error:serverInternal'
+                    # cover polling cases
+                    if poll_identifier:
+                        detail = poll_identifier
+                    else:
+                        error = 'urn:ietf:params:acme:error:serverInternal'
 
         self.logger.debug('Certificate._enroll_and_store() ended with: {0}:{1}'.format(result, error))
         return (result, error, detail)
@@ -404,6 +413,8 @@ class Certificate(object):
             self.dbstore.order_update(data_dic)
         except Exception as err_:
             self.logger.critical('acme2certifier database error in Certificate._order_update(): {0}'.format(err_))
+        if 'name' in data_dic:
+            poll_cache_get().invalidate('order', data_dic['name'])
 
     def _revocation_reason_check(self, reason):
         """ check reason """
@@ -607,6 +618,13 @@ class Certificate(object):
         self.logger.debug('Certificate.new_get({0})'.format(url))
         certificate_name = url.replace('{0}{1}'.format(self.server_name, self.path_dic['cert_path']), '')
 
+        if self.poll_cache_ttl:
+            # issued certificates do not change anymore
+            response_dic = poll_cache_get().get('cert', certificate_name)
+            if response_dic:
+                self.logger.debug('Certificate.new_get({0}) served from cache'.format(certificate_name))
+                return response_dic
+
         # fetch certificate dictionary from DB
         certificate_dic = self._info(certificate_name, ['name', 'csr', 'cert', 'order__name', 'order__status_id'])
         response_dic = {}
@@ -634,6 +652,9 @@ class Certificate(object):
             response_dic['code'] = 500
             response_dic['data'] = 'urn:ietf:params:acme:error:serverInternal'
 
+        if self.poll_cache_ttl and response_dic['code'] == 200:
+            poll_cache_get().set('cert', certificate_name, response_dic, self.poll_cache_ttl)
+
         self.logger.debug('Certificate.new_get({0}) ended'.format(response_dic['code']))
 
         return response_dic
@@ -725,6 +746,7 @@ class Certificate(object):
                     self.dbstore.order_update({'name': order_name, 'status': 'valid'})
                 except Exception as err_:
                     self.logger.critical('acme2certifier database error in Certificate.poll(): {0}'.format(err_))
+                poll_cache_get().invalidate('order', order_name)
             else:
                 # store error message for later analysis
                 self._store_cert_error(certificate_name, error, poll_identifier)
@@ -734,6 +756,7 @@ class Certificate(object):
                         self.dbstore.order_update({'name': order_name, 'status': 'invalid'})
                     except Exception as err_:
                         self.logger.critical('acme2certifier database error in Certificate.poll(): {0}'.format(err_))
+                    poll_cache_get().invalidate('order', order_name)
         self.logger.debug('Certificate.poll({0}: {1})'.format(certificate_name, poll_identifier))
         return _result
 
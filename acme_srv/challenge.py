@@ -3,16 +3,49 @@
 """ Challenge class """
 from __future__ import print_function
 import json
-from acme_srv.helper import generate_random_string, parse_url, load_config, jwk_thumbprint_get, url_get, sha256_hash, sha256_hash_hex, b64_encode, b64_url_encode, txt_get, fqdn_resolve, uts_now, uts_to_date_utc, servercert_get, cert_san_get, cert_extensions_get, fqdn_in_san_check, proxy_check
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from acme_srv.helper import generate_random_string, parse_url, load_config, jwk_thumbprint_get, sha256_hash, sha256_hash_hex, b64_encode, b64_url_encode, uts_now, uts_to_date_utc, fqdn_in_san_check, proxy_check
 from acme_srv.db_handler import DBstore
+from acme_srv.dnsresolver import addresses_get, fqdn_resolve, txt_get
+from acme_srv.httpclient import validation_url_get
 from acme_srv.message import Message
+from acme_srv.pollcache import poll_cache_get
+from acme_srv.tlsalpn import tls_alpn_cert_get, tls_alpn_cert_parse
+from acme_srv.validationqueue import SingleFlight, validation_queue_get
+
+
+# process wide limit of concurrent challenge validations in order validation mode
+VALIDATION_SEMAPHORE = {'lock': threading.Lock(), 'semaphore': None}
+
+
+def validation_semaphore_get(limit=50):
+    """ get process wide semaphore limiting concurrent validations """
+    with VALIDATION_SEMAPHORE['lock']:
+        if not VALIDATION_SEMAPHORE['semaphore']:
+            VALIDATION_SEMAPHORE['semaphore'] = threading.BoundedSemaphore(limit)
+    return VALIDATION_SEMAPHORE['semaphore']
+
+
+# process wide single-flight guard - validations of the same challenge do not run in parallel
+VALIDATION_FLIGHT = {'lock': threading.Lock(), 'flight': None}
+
+
+def validation_flight_get(backoff=0):
+    """ get process wide single-flight guard for challenge validations """
+    with VALIDATION_FLIGHT['lock']:
+        if not VALIDATION_FLIGHT['flight']:
+            VALIDATION_FLIGHT['flight'] = SingleFlight(backoff)
+        # back-off follows configuration reloads
+        VALIDATION_FLIGHT['flight'].backoff = backoff
+    return VALIDATION_FLIGHT['flight']
 
 
 class Challenge(object):
     """ Challenge handler """
 
     def __init__(self, debug=None, srv_name=None, logger=None, expiry=3600):
-        # self.debug = debug
+        self.debug = debug
         self.server_name = srv_name
         self.logger = logger
         self.dbstore = DBstore(debug, self.logger)
@@ -23,6 +56,19 @@ class Challenge(object):
         self.tnauthlist_support = False
         self.dns_server_list = None
         self.proxy_server_list = {}
+        # 0: validate challenges within the request
+        self.validation_workers = 0
+        self.validation_queue_size = 1000
+        # validate challenges of all authorizations of an order at once
+        self.order_validation = False
+        self.order_validation_concurrency = 10
+        self.validation_concurrency_max = 50
+        # http-01 validation: (connect timeout, read timeout) and maximum size of response body
+        self.http_timeout = (5, 10)
+        self.http_max_size = 65536
+        self.tls_alpn_timeout = 5
+        # seconds a challenge does not get validated again after a validation attempt
+        self.validation_retry_backoff = 0
 
     def __enter__(self):
         """ Makes ACMEHandler a Context Manager """
@@ -42,6 +88,12 @@ class Challenge(object):
             self.logger.critical('acme2certifier database error in Challenge._challengelist_search(): {0}'.format(err_))
             challenge_list = []
 
+        challenge_list = self._challengelist_format(challenge_list)
+        self.logger.debug('Challenge._challengelist_search() ended with: {0}'.format(challenge_list))
+        return challenge_list
+
+    def _challengelist_format(self, challenge_list):
+        """ convert challenges from database into the format used in authorization responses """
         challenge_dic = {}
         for challenge in challenge_list:
             if challenge['type'] not in challenge_dic:
@@ -58,8 +110,6 @@ class Challenge(object):
         challenge_list = []
         for challenge in challenge_dic:
             challenge_list.append(challenge_dic[challenge])
-
-        self.logger.debug('Challenge._challengelist_search() ended with: {0}'.format(challenge_list))
         return challenge_list
 
     def _check(self, challenge_name, payload):
@@ -147,6 +197,30 @@ class Challenge(object):
                     self.dns_server_list = json.loads(config_dic['Challenge']['dns_server_list'])
                 except Exception as err_:
                     self.logger.warning('Challenge._config_load() dns_server_list failed with error: {0}'.format(err_))
+            try:
+                self.validation_workers = int(config_dic.get('Challenge', 'validation_workers', fallback=0))
+                self.validation_queue_size = int(config_dic.get('Challenge', 'validation_queue_size', fallback=1000))
+            except Exception as err_:
+                self.logger.error('Challenge._config_load(): failed to parse validation_workers/validation_queue_size: {0}'.format(err_))
+            self.order_validation = config_dic.getboolean('Challenge', 'order_validation', fallback=False)
+            try:
+                self.order_validation_concurrency = int(config_dic.get('Challenge', 'order_validation_concurrency', fallback=10))
+                self.validation_concurrency_max = int(config_dic.get('Challenge', 'validation_concurrency_max', fallback=50))
+            except Exception as err_:
+                self.logger.error('Challenge._config_load(): failed to parse order_validation_concurrency/validation_concurrency_max: {0}'.format(err_))
+            try:
+                self.http_timeout = (float(config_dic.get('Challenge', 'http_connect_timeout', fallback=5)), float(config_dic.get('Challenge', 'http_read_timeout', fallback=10)))
+                self.http_max_size = int(config_dic.get('Challenge', 'http_max_size', fallback=65536))
+            except Exception as err_:
+                self.logger.error('Challenge._config_load(): failed to parse http_connect_timeout/http_read_timeout/http_max_size: {0}'.format(err_))
+            try:
+                self.tls_alpn_timeout = float(config_dic.get('Challenge', 'tls_alpn_timeout', fallback=5))
+            except Exception as err_:
+                self.logger.error('Challenge._config_load(): failed to parse tls_alpn_timeout: {0}'.format(err_))
+            try:
+                self.validation_retry_backoff = float(config_dic.get('Challenge', 'validation_retry_backoff', fallback=0))
+            except Exception as err_:
+                self.logger.error('Challenge._config_load(): failed to parse validation_retry_backoff: {0}'.format(err_))
 
         if 'Order' in config_dic:
             self.tnauthlist_support = config_dic.getboolean('Order', 'tnauthlist_support', fallback=False)
@@ -176,6 +250,20 @@ class Challenge(object):
         """ new challenge """
         self.logger.debug('Challenge._new({0}:{2}:{1})'.format(authz_name, mtype, value))
 
+        (data_dic, challenge_dic) = self._new_data_get(authz_name, mtype, token)
+
+        try:
+            chid = self.dbstore.challenge_add(value, mtype, data_dic)
+        except Exception as err_:
+            self.logger.critical('acme2certifier database error in Challenge._new(): {0}, {2}:{1}'.format(err_, mtype, value))
+            chid = None
+
+        if not chid:
+            challenge_dic = {}
+        return challenge_dic
+
+    def _new_data_get(self, authz_name, mtype, token):
+        """ database record and response of a new challenge """
         challenge_name = generate_random_string(self.logger, 12)
 
         data_dic = {
@@ -187,21 +275,67 @@ class Challenge(object):
             'status': 2
         }
 
+        challenge_dic = {}
+        challenge_dic['type'] = mtype
+        challenge_dic['url'] = '{0}{1}{2}'.format(self.server_name, self.path_dic['chall_path'], challenge_name)
+        challenge_dic['token'] = token
+        challenge_dic['status'] = 'pending'
+        if mtype == 'tkauth-01':
+            challenge_dic['tkauth-type'] = 'atc'
+        return (data_dic, challenge_dic)
+
+    def _order_challenges_get(self, challenge_name):
+        """ get pending challenges of the same type belonging to other pending authorizations of the order """
+        self.logger.debug('Challenge._order_challenges_get({0})'.format(challenge_name))
+        challenge_name_list = [challenge_name]
         try:
-            chid = self.dbstore.challenge_add(value, mtype, data_dic)
+            challenge_dic = self.dbstore.challenge_lookup('name', challenge_name, ['type', 'authorization__order__name'])
         except Exception as err_:
-            self.logger.critical('acme2certifier database error in Challenge._new(): {0}, {2}:{1}'.format(err_, mtype, value))
-            chid = None
+            self.logger.critical('acme2certifier database error in Challenge._order_challenges_get() lookup: {0}'.format(err_))
+            challenge_dic = None
 
-        challenge_dic = {}
-        if chid:
-            challenge_dic['type'] = mtype
-            challenge_dic['url'] = '{0}{1}{2}'.format(self.server_name, self.path_dic['chall_path'], challenge_name)
-            challenge_dic['token'] = token
-            challenge_dic['status'] = 'pending'
-            if mtype == 'tkauth-01':
-                challenge_dic['tkauth-type'] = 'atc'
-        return challenge_dic
+        # tkauth-01 validation depends on the payload of the request
+        if challenge_dic and challenge_dic['type'] in ('http-01', 'dns-01', 'tls-alpn-01'):
+            try:
+                challenge_list = self.dbstore.challenges_search('authorization__order__name', challenge_dic['authorization__order__name'], ('name', 'type', 'status__name', 'authorization__name'))
+            except Exception as err_:
+                self.logger.critical('acme2certifier database error in Challenge._order_challenges_get() search: {0}'.format(err_))
+                challenge_list = []
+
+            # skip authorizations having a challenge which is already valid or in validation
+            authz_done_list = [challenge['authorization__name'] for challenge in challenge_list if challenge['status__name'] != 'pending']
+            for challenge in challenge_list:
+                if challenge['type'] == challenge_dic['type'] and challenge['status__name'] == 'pending' and challenge['authorization__name'] not in authz_done_list and challenge['name'] not in challenge_name_list:
+                    challenge_name_list.append(challenge['name'])
+
+        self.logger.debug('Challenge._order_challenges_get() ended with: {0} challenges'.format(len(challenge_name_list)))
+        return challenge_name_list
+
+    def _order_validate(self, challenge_name, payload):
+        """ validate challenge together with the corresponding challenges of all other authorizations of the order """
+        self.logger.debug('Challenge._order_validate({0})'.format(challenge_name))
+        challenge_name_list = self._order_challenges_get(challenge_name)
+        flight = validation_flight_get(self.validation_retry_backoff)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.order_validation_concurrency, len(challenge_name_list)))) as executor:
+            # challenge the client responded to - runs already within its single-flight entry
+            future_list = [executor.submit(self._order_validate_job, challenge_name, payload)]
+            # challenges of the other authorizations get validated speculatively under their own single-flight key - a validation
+            # triggered by the client in the meantime must not share their result and a failed attempt must not delay it
+            future_list.extend(executor.submit(flight.run, ('speculative', name), self._order_validate_job, name, {}, True, track=False) for name in challenge_name_list[1:])
+        challenge_check = future_list[0].result()
+        self.logger.debug('Challenge._order_validate() ended with:{0}'.format(challenge_check))
+        return challenge_check
+
+    def _order_validate_job(self, challenge_name, payload, speculative=False):
+        """ validate a single challenge of an order within the global concurrency limit """
+        self.logger.debug('Challenge._order_validate_job({0})'.format(challenge_name))
+        try:
+            with validation_semaphore_get(self.validation_concurrency_max):
+                challenge_check = self._validate_job(challenge_name, payload, speculative)
+        except Exception as err_:
+            self.logger.error('Challenge._order_validate_job() failed for {0}: {1}'.format(challenge_name, err_))
+            challenge_check = False
+        return challenge_check
 
     def _update(self, data_dic):
         """ update challenge """
@@ -213,14 +347,17 @@ class Challenge(object):
         self.logger.debug('Challenge._update() ended')
 
     def _update_authz(self, challenge_name, data_dic):
-        """ update authorizsation based on challenge_name """
+        """ update authorizsation based on challenge_name - returns names of authorization and order """
         self.logger.debug('Challenge._update_authz({0})'.format(challenge_name))
         try:
-            # lookup autorization based on challenge_name
-            authz_name = self.dbstore.challenge_lookup('name', challenge_name, ['authorization__name'])['authorization']
+            # lookup autorization and order based on challenge_name
+            challenge_dic = self.dbstore.challenge_lookup('name', challenge_name, ['authorization__name', 'authorization__order__name'])
+            authz_name = challenge_dic['authorization']
+            order_name = challenge_dic.get('authorization__order__name', None)
         except Exception as err_:
             self.logger.critical('acme2certifier database error in Challenge._update_authz() lookup: {0}'.format(err_))
             authz_name = None
+            order_name = None
 
         if authz_name:
             data_dic['name'] = authz_name
@@ -231,9 +368,10 @@ class Challenge(object):
             self.logger.critical('acme2certifier database error in Challenge._update_authz() upd: {0}'.format(err_))
 
         self.logger.debug('Challenge._update_authz() ended')
+        return (authz_name, order_name)
 
-    def _validate(self, challenge_name, payload):
-        """ validate challenge"""
+    def _validate(self, challenge_name, payload, speculative=False):
+        """ validate challenge - speculative validations only store successful results """
         self.logger.debug('Challenge._validate({0}: {1})'.format(challenge_name, payload))
         if self.challenge_validation_disable:
             self.logger.debug('CHALLENGE VALIDATION DISABLED. SETTING challenge status to valid')
@@ -242,24 +380,80 @@ class Challenge(object):
         else:
             (challenge_check, invalid) = self._check(challenge_name, payload)
 
-        if invalid:
-            self._update({'name': challenge_name, 'status': 'invalid'})
-            # authorization update to valid state
-            self._update_authz(challenge_name, {'status': 'invalid'})
-        elif challenge_check:
-            self._update({'name': challenge_name, 'status': 'valid', 'validated': uts_now()})
-            # authorization update to valid state
-            self._update_authz(challenge_name, {'status': 'valid'})
-
-        if payload:
-            if 'keyAuthorization' in payload:
-                # update challenge to ready state
-                data_dic = {'name': challenge_name, 'keyauthorization': payload['keyAuthorization']}
-                self._update(data_dic)
+        if speculative and invalid:
+            # client did not respond to this challenge yet and may still be provisioning it
+            self.logger.debug('Challenge._validate(): speculative validation of {0} failed. Status remains unchanged'.format(challenge_name))
+            invalid = False
+
+        (authz_name, order_name) = (None, None)
+        # challenge and authorization updates get committed at once
+        with self.dbstore.transaction():
+            if invalid:
+                self._update({'name': challenge_name, 'status': 'invalid'})
+                # authorization update to valid state
+                (authz_name, order_name) = self._update_authz(challenge_name, {'status': 'invalid'})
+            elif challenge_check:
+                self._update({'name': challenge_name, 'status': 'valid', 'validated': uts_now()})
+                # authorization update to valid state
+                (authz_name, order_name) = self._update_authz(challenge_name, {'status': 'valid'})
+
+            if payload:
+                if 'keyAuthorization' in payload:
+                    # update challenge to ready state
+                    data_dic = {'name': challenge_name, 'keyauthorization': payload['keyAuthorization']}
+                    self._update(data_dic)
+
+        if authz_name:
+            # cached polling responses are outdated once the changes got committed
+            poll_cache_get().invalidate('authz', authz_name)
+        if order_name:
+            # order status depends on the status of its authorizations
+            poll_cache_get().invalidate('order', order_name)
 
         self.logger.debug('Challenge._validate() ended with:{0}'.format(challenge_check))
         return challenge_check
 
+    def _validate_job(self, challenge_name, payload, speculative=False):
+        """ background validation - runs in a worker thread with its own database handle """
+        self.logger.debug('Challenge._validate_job({0})'.format(challenge_name))
+        with Challenge(self.debug, self.server_name, self.logger, self.expiry) as challenge:
+            challenge_check = challenge.validate_finish(challenge_name, payload, speculative)
+        self.logger.debug('Challenge._validate_job() ended with:{0}'.format(challenge_check))
+        return challenge_check
+
+    def _validate_start(self, challenge_name, payload):
+        """ validate challenge within the request or hand it over to the validation queue """
+        self.logger.debug('Challenge._validate_start({0})'.format(challenge_name))
+        flight = validation_flight_get(self.validation_retry_backoff)
+        if flight.recent(challenge_name):
+            self.logger.debug('Challenge._validate_start(): challenge got validated within the last {0}s'.format(self.validation_retry_backoff))
+            return
+        if self.validation_workers > 0:
+            validation_queue = validation_queue_get(self.logger, 'challenge', self.validation_workers, self.validation_queue_size)
+            if validation_queue.pending(challenge_name):
+                self.logger.debug('Challenge._validate_start(): validation already in progress')
+                return
+            # status must be set before queueing as the worker could finish first
+            self._update({'name': challenge_name, 'status': 'processing'})
+            if self.order_validation:
+                job = self._order_validate
+            else:
+                job = self._validate_job
+            if validation_queue.submit(challenge_name, flight.run, challenge_name, job, challenge_name, payload):
+                return
+            # queue is full
+            if self.order_validation:
+                job = self._order_validate
+            else:
+                job = self.validate_finish
+        elif self.order_validation:
+            job = self._order_validate
+        else:
+            job = self._validate
+        # concurrent requests for the same challenge wait for the running validation
+        (_result, executed) = flight.run(challenge_name, job, challenge_name, payload)
+        self.logger.debug('Challenge._validate_start() ended with: {0}'.format(executed))
+
     def _validate_alpn_challenge(self, challenge_name, fqdn, token, jwk_thumbprint):
         """ validate dns challenge """
         self.logger.debug('Challenge._validate_alpn_challenge({0}:{1}:{2})'.format(challenge_name, fqdn, token))
@@ -268,11 +462,11 @@ class Challenge(object):
         (response, invalid) = fqdn_resolve(fqdn, self.dns_server_list)
         self.logger.debug('fqdn_resolve() ended with: {0}/{1}'.format(response, invalid))
 
-        # we are expecting a certifiate extension which is the sha256 hexdigest of token in a byte structure
-        # which is base64 encoded '0420' has been taken from acme_srv.sh sources
+        # we are expecting an acmeIdentifier extension containing the sha256 digest of the key authorization
+        # as DER encoded octet string - '0420' has been taken from acme_srv.sh sources
         sha256_digest = sha256_hash_hex(self.logger, '{0}.{1}'.format(token, jwk_thumbprint))
-        extension_value = b64_encode(self.logger, bytearray.fromhex('0420{0}'.format(sha256_digest)))
-        self.logger.debug('computed value: {0}'.format(extension_value))
+        extension_value = bytes.fromhex('0420{0}'.format(sha256_digest))
+        self.logger.debug('computed value: {0}'.format(b64_encode(self.logger, extension_value)))
 
         if not invalid:
             # check if we need to set a proxy
@@ -280,13 +474,16 @@ class Challenge(object):
                 proxy_server = proxy_check(self.logger, fqdn, self.proxy_server_list)
             else:
                 proxy_server = None
-            cert = servercert_get(self.logger, fqdn, 443, proxy_server)
+            if proxy_server:
+                address_list = None
+            else:
+                (address_list, _invalid) = addresses_get(fqdn, self.dns_server_list, 443)
+            cert = tls_alpn_cert_get(self.logger, fqdn, 443, proxy_server, address_list, self.tls_alpn_timeout)
             if cert:
-                san_list = cert_san_get(self.logger, cert, recode=False)
+                (san_list, acme_identifier) = tls_alpn_cert_parse(self.logger, cert, fqdn)
                 fqdn_in_san = fqdn_in_san_check(self.logger, san_list, fqdn)
                 if fqdn_in_san:
-                    extension_list = cert_extensions_get(self.logger, cert, recode=False)
-                    if extension_value in extension_list:
+                    if acme_identifier == extension_value:
                         self.logger.debug('alpn validation successful')
                         result = True
                     else:
@@ -343,7 +540,7 @@ class Challenge(object):
                 proxy_server = proxy_check(self.logger, fqdn, self.proxy_server_list)
             else:
                 proxy_server = None
-            req = url_get(self.logger, 'http://{0}/.well-known/acme-challenge/{1}'.format(fqdn, token), dns_server_list=self.dns_server_list, proxy_server=proxy_server, verify=False)
+            req = validation_url_get(self.logger, 'http://{0}/.well-known/acme-challenge/{1}'.format(fqdn, token), dns_server_list=self.dns_server_list, proxy_server=proxy_server, verify=False, timeout=self.http_timeout, max_size=self.http_max_size)
             if req:
                 response_got = req.splitlines()[0]
                 response_expected = '{0}.{1}'.format(token, jwk_thumbprint)
@@ -413,11 +610,14 @@ class Challenge(object):
         self.logger.debug('Challenge._wc_manipulate() ended with: {0}'.format(fqdn))
         return fqdn
 
-    def challengeset_get(self, authz_name, _auth_status, token, tnauth, value=None):
-        """ get the challengeset for an authorization """
+    def challengeset_get(self, authz_name, _auth_status, token, tnauth, value=None, challenge_list=None):
+        """ get the challengeset for an authorization - challenge_list can be handed over if already fetched from database """
         self.logger.debug('Challenge.challengeset_get() for auth: {0}:{1}'.format(authz_name, value))
-        # check database if there are exsting challenges for a particular authorization
-        challenge_list = self._challengelist_search('authorization__name', authz_name)
+        if challenge_list is None:
+            # check database if there are exsting challenges for a particular authorization
+            challenge_list = self._challengelist_search('authorization__name', authz_name)
+        else:
+            challenge_list = self._challengelist_format(challenge_list)
 
         if challenge_list:
             self.logger.debug('Challenges found.')
@@ -448,20 +648,45 @@ class Challenge(object):
     def new_set(self, authz_name, token, tnauth=False, value=None):
         """ net challenge set """
         self.logger.debug('Challenge.new_set({0}, {1})'.format(authz_name, value))
-        challenge_list = []
-        if not tnauth:
-            for challenge_type in ['http-01', 'dns-01', 'tls-alpn-01']:
-                challenge_json = self._new(authz_name, challenge_type, token, value)
-                if challenge_json:
-                    challenge_list.append(challenge_json)
-                else:
-                    self.logger.error('ERROR: Empty challenge returned for {0}'.format(challenge_type))
-        else:
-            challenge_list.append(self._new(authz_name, 'tkauth-01', token))
-
+        challenge_list = self.new_sets([(authz_name, token, tnauth)])[authz_name]
         self.logger.debug('Challenge._new_set returned ({0})'.format(challenge_list))
         return challenge_list
 
+    def new_sets(self, authz_list):
+        """ create challenge sets for a list of (authz_name, token, tnauth) tuples by using a single database operation """
+        self.logger.debug('Challenge.new_sets({0})'.format(len(authz_list)))
+
+        data_list = []
+        challenge_set_dic = {}
+        for (authz_name, token, tnauth) in authz_list:
+            challenge_set_dic[authz_name] = []
+            if tnauth:
+                type_list = ['tkauth-01']
+            else:
+                type_list = ['http-01', 'dns-01', 'tls-alpn-01']
+            for challenge_type in type_list:
+                (data_dic, challenge_dic) = self._new_data_get(authz_name, challenge_type, token)
+                data_list.append(data_dic)
+                challenge_set_dic[authz_name].append((data_dic['name'], challenge_dic))
+
+        try:
+            name_set = set(self.dbstore.challenges_add(data_list))
+        except Exception as err_:
+            self.logger.critical('acme2certifier database error in Challenge.new_sets(): {0}'.format(err_))
+            name_set = set()
+
+        result_dic = {}
+        for (authz_name, challenge_set) in challenge_set_dic.items():
+            result_dic[authz_name] = []
+            for (challenge_name, challenge_dic) in challenge_set:
+                if challenge_name in name_set:
+                    result_dic[authz_name].append(challenge_dic)
+                else:
+                    self.logger.error('ERROR: Empty challenge returned for {0}'.format(challenge_dic['type']))
+
+        self.logger.debug('Challenge.new_sets() ended')
+        return result_dic
+
     def parse(self, content):
         """ new oder request """
         self.logger.debug('Challenge.parse()')
@@ -485,12 +710,12 @@ class Challenge(object):
                             # start validation
                             if 'status' in challenge_dic:
                                 if challenge_dic['status'] != 'valid':
-                                    _validation = self._validate(challenge_name, payload)  # lgtm [py/unused-local-variable]
+                                    self._validate_start(challenge_name, payload)
                                     # query challenge again (bcs. it could get updated by self._validate)
                                     challenge_dic = self._info(challenge_name)
                             else:
                                 # rather unlikely that we run in this situation but you never know
-                                _validation = self._validate(challenge_name, payload)  # lgtm [py/unused-local-variable]
+                                self._validate_start(challenge_name, payload)
                                 # query challenge again (bcs. it could get updated by self._validate)
                                 challenge_dic = self._info(challenge_name)
 
@@ -519,3 +744,16 @@ class Challenge(object):
         response_dic = self.message.prepare_response(response_dic, status_dic)
         self.logger.debug('challenge.parse() returns: {0}'.format(json.dumps(response_dic)))
         return response_dic
+
+    def validate_finish(self, challenge_name, payload, speculative=False):
+        """ validate challenge and reset status if validation was not conclusive """
+        self.logger.debug('Challenge.validate_finish({0})'.format(challenge_name))
+        challenge_check = self._validate(challenge_name, payload, speculative)
+        if not speculative:
+            # speculative validations never set the status to processing - a validation triggered by the client may still be running
+            challenge_dic = self._info(challenge_name)
+            if 'status' in challenge_dic and challenge_dic['status'] == 'processing':
+                # client may trigger another validation
+                self._update({'name': challenge_name, 'status': 'pending'})
+        self.logger.debug('Challenge.validate_finish() ended with:{0}'.format(challenge_check))
+        return challenge_check
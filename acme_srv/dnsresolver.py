@@ -0,0 +1,245 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" caching dns resolver for challenge validation """
+from __future__ import print_function
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict
+import dns.rdatatype
+import dns.resolver
+from acme_srv.helper import load_config, address_list_sort
+
+# process wide resolvers - one per dns-server list
+DNS_RESOLVER = {'lock': threading.Lock(), 'resolvers': {}}
+
+
+class CachingResolver(object):
+    """ dns resolver caching positive and negative answers according to their ttl """
+
+    def __init__(self, dns_server_list=None, timeout=5, max_ttl=300, negative_ttl=30, max_entries=10000, txt_ttl=0):
+        # resolv.conf gets read once
+        self.resolver = dns.resolver.Resolver(configure=not dns_server_list)
+        if dns_server_list:
+            self.resolver.nameservers = dns_server_list
+        self.resolver.timeout = timeout
+        self.resolver.lifetime = timeout
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # dns-01 validation must see record changes - txt records do not get cached by default
+        self.txt_ttl = txt_ttl
+        self.lock = threading.Lock()
+        # (fqdn, rrtype) -> (expires, record_list, invalid)
+        self.cache = OrderedDict()
+        self.metrics_dic = {'hits': 0, 'misses': 0, 'upstream_queries': 0, 'upstream_errors': 0, 'upstream_time_total': 0.0, 'upstream_time_max': 0.0}
+
+    def _upstream_query(self, fqdn, rrtype):
+        """ query dns server and collect latency """
+        started = time.monotonic()
+        try:
+            if hasattr(self.resolver, 'resolve'):
+                answer = self.resolver.resolve(fqdn, rrtype)
+            else:
+                answer = self.resolver.query(fqdn, rrtype)
+        finally:
+            duration = time.monotonic() - started
+            with self.lock:
+                self.metrics_dic['upstream_queries'] += 1
+                self.metrics_dic['upstream_time_total'] += duration
+                self.metrics_dic['upstream_time_max'] = max(self.metrics_dic['upstream_time_max'], duration)
+        return answer
+
+    def _negative_ttl_get(self, err):
+        """ ttl of a negative answer - soa minimum from the authority section capped by negative_ttl (rfc2308 section 5) """
+        if isinstance(err, dns.resolver.NXDOMAIN):
+            response_list = list(err.kwargs.get('responses', {}).values())
+        else:
+            response_list = [err.kwargs['response']] if err.kwargs.get('response') is not None else []
+
+        for response in response_list:
+            for rrset in response.authority:
+                if rrset.rdtype == dns.rdatatype.SOA and len(rrset):
+                    return min(rrset.ttl, rrset[0].minimum, self.negative_ttl)
+        return self.negative_ttl
+
+    def query(self, fqdn, rrtype, cache_ttl=None):
+        """ lookup records - returns (record_list, invalid); invalid is true if the name or record does not exist """
+        key = (fqdn.lower(), rrtype)
+        now = time.monotonic()
+        if cache_ttl is None or cache_ttl > 0:
+            with self.lock:
+                entry = self.cache.get(key)
+                if entry and entry[0] > now:
+                    self.metrics_dic['hits'] += 1
+                    self.cache.move_to_end(key)
+                    return (entry[1], entry[2])
+                self.metrics_dic['misses'] += 1
+
+        try:
+            answer = self._upstream_query(fqdn, rrtype)
+            if rrtype == 'TXT':
+                record_list = [rdata.strings[0] for rdata in answer]
+            else:
+                record_list = [str(rdata) for rdata in answer]
+            invalid = False
+            ttl = min(answer.rrset.ttl, self.max_ttl)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as err:
+            record_list = []
+            invalid = True
+            ttl = self._negative_ttl_get(err)
+        except Exception:
+            # timeouts and server failures do not get cached
+            with self.lock:
+                self.metrics_dic['upstream_errors'] += 1
+            raise
+
+        if cache_ttl is not None:
+            ttl = min(ttl, cache_ttl)
+        if ttl > 0:
+            with self.lock:
+                self.cache[key] = (now + ttl, record_list, invalid)
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+        return (record_list, invalid)
+
+    def addresses_get(self, host, resolution_delay=0.05):
+        """ resolve A and AAAA records in parallel - returns (address_list, invalid) in connect order """
+        if ip_literal_check(host):
+            return ([host], False)
+        result_dic = {}
+
+        def _lookup(rrtype):
+            try:
+                result_dic[rrtype] = self.query(host, rrtype)
+            except Exception:
+                result_dic[rrtype] = None
+
+        thread = threading.Thread(target=_lookup, args=('AAAA',), daemon=True)
+        thread.start()
+        _lookup('A')
+        if result_dic['A'] and result_dic['A'][0]:
+            # do not wait for a slow AAAA lookup once ipv4 addresses are known (rfc8305 section 3)
+            thread.join(resolution_delay)
+        else:
+            thread.join()
+        # a lookup still running or failing gets treated as an empty answer
+        result_list = [result_dic.get('AAAA'), result_dic['A']]
+        address_list = address_list_sort([address for result in result_list if result for address in result[0]])
+        invalid = all(result and result[1] for result in result_list)
+        return (address_list, invalid)
+
+    def fqdn_resolve(self, host):
+        """ resolve hostname to an ip address (A records preferred) """
+        result = None
+        invalid = False
+        # hack to cover github workflows
+        if '.' in host:
+            (address_list, invalid) = self.addresses_get(host)
+            v4_list = [address for address in address_list if ':' not in address]
+            if v4_list:
+                result = v4_list[0]
+            elif address_list:
+                result = address_list[0]
+        return (result, invalid)
+
+    def txt_get(self, fqdn):
+        """ get txt records """
+        (record_list, _invalid) = self.query(fqdn, 'TXT', cache_ttl=self.txt_ttl)
+        return record_list
+
+    def stats(self):
+        """ cache hit ratio and upstream latency """
+        with self.lock:
+            stats_dic = dict(self.metrics_dic)
+            stats_dic['entries'] = len(self.cache)
+        lookups = stats_dic['hits'] + stats_dic['misses']
+        stats_dic['hit_ratio'] = stats_dic['hits'] / lookups if lookups else 0.0
+        if stats_dic['upstream_queries']:
+            stats_dic['upstream_time_avg'] = stats_dic['upstream_time_total'] / stats_dic['upstream_queries']
+        else:
+            stats_dic['upstream_time_avg'] = 0.0
+        return stats_dic
+
+
+def resolver_config_load():
+    """ load resolver settings from config file """
+    config_dic = load_config()
+    option_dic = {'timeout': 5.0, 'max_ttl': 300, 'negative_ttl': 30, 'max_entries': 10000, 'txt_ttl': 0}
+    if 'Challenge' in config_dic:
+        for (option, parameter) in (('dns_timeout', 'timeout'), ('dns_cache_max_ttl', 'max_ttl'), ('dns_cache_negative_ttl', 'negative_ttl'), ('dns_cache_size', 'max_entries'), ('dns_txt_cache_ttl', 'txt_ttl')):
+            try:
+                option_dic[parameter] = type(option_dic[parameter])(config_dic.get('Challenge', option, fallback=option_dic[parameter]))
+            except Exception:
+                pass
+    return option_dic
+
+
+def resolver_get(dns_server_list=None):
+    """ get process wide resolver for a list of dns servers """
+    key = tuple(dns_server_list) if dns_server_list else None
+    with DNS_RESOLVER['lock']:
+        if key not in DNS_RESOLVER['resolvers']:
+            DNS_RESOLVER['resolvers'][key] = CachingResolver(dns_server_list, **resolver_config_load())
+    return DNS_RESOLVER['resolvers'][key]
+
+
+def resolver_cache_clear():
+    """ drop all resolvers and cached records """
+    with DNS_RESOLVER['lock']:
+        DNS_RESOLVER['resolvers'] = {}
+
+
+def resolver_stats():
+    """ metrics of all resolvers of this process """
+    with DNS_RESOLVER['lock']:
+        resolver_dic = dict(DNS_RESOLVER['resolvers'])
+    return {key: resolver.stats() for (key, resolver) in resolver_dic.items()}
+
+
+def fqdn_resolve(host, dnssrv=None):
+    """ dns resolver - returns (first address, invalid) """
+    return resolver_get(dnssrv).fqdn_resolve(host)
+
+
+def ip_literal_check(host):
+    """ check if host is an ip address """
+    try:
+        ipaddress.ip_address(host)
+        result = True
+    except ValueError:
+        result = False
+    return result
+
+
+def addresses_get(host, dnssrv=None, port=None):
+    """ resolve host to a list of addresses in connect order - returns (address_list, invalid) """
+    if dnssrv:
+        result = resolver_get(dnssrv).addresses_get(host)
+    elif ip_literal_check(host):
+        result = ([host], False)
+    else:
+        # system resolver (hosts file included) as used by the standard library
+        try:
+            address_list = []
+            for (_family, _type, _proto, _name, sockaddr) in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+                if sockaddr[0] not in address_list:
+                    address_list.append(sockaddr[0])
+            result = (address_list_sort(address_list), False)
+        except socket.gaierror as err_:
+            result = ([], err_.errno == socket.EAI_NONAME)
+    return result
+
+
+def txt_get(logger, fqdn, dns_srv=None):
+    """ dns query to get the TXT record by using the shared resolver """
+    logger.debug('txt_get({0}: {1})'.format(fqdn, dns_srv))
+    txt_record_list = []
+    try:
+        txt_record_list = resolver_get(dns_srv).txt_get(fqdn)
+    except Exception as err_:
+        logger.error('txt_get() error: {0}'.format(err_))
+    logger.debug('txt_get() ended with: {0}'.format(txt_record_list))
+    return txt_record_list
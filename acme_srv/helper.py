@@ -19,20 +19,19 @@ import socket
 import ssl
 import logging
 import hashlib
+import threading
+import selectors
+from errno import EINPROGRESS, EWOULDBLOCK
+import time
 import socks
 try:
     from urllib.parse import urlparse
 except ImportError:
     from urlparse import urlparse
-from urllib3.util import connection
 from jwcrypto import jwk, jws
 from dateutil.parser import parse
 import pytz
-import dns.resolver
 import OpenSSL
-import requests
-import requests.packages.urllib3.util.connection as urllib3_cn
-from .version import __version__
 
 
 def b64decode_pad(logger, string):
@@ -377,11 +376,15 @@ def decode_deserialize(logger, string):
 def decode_message(logger, message):
     """ decode jwstoken and return header, payload and signature """
     logger.debug('decode_message()')
-    jwstoken = jws.JWS()
     result = False
     error = None
     try:
-        jwstoken.deserialize(message)
+        if isinstance(message, jws.JWS):
+            # message got already deserialized by jws_deserialize()
+            jwstoken = message
+        else:
+            jwstoken = jws.JWS()
+            jwstoken.deserialize(message)
         protected = json.loads(jwstoken.objects['protected'])
         if bool(jwstoken.objects['payload']):
             payload = json.loads(jwstoken.objects['payload'])
@@ -401,6 +404,19 @@ def decode_message(logger, message):
     return(result, error, protected, payload, signature)
 
 
+def jws_deserialize(logger, message):
+    """ deserialize jws once to share the token between decode_message() and signature_check() """
+    logger.debug('jws_deserialize()')
+    jwstoken = jws.JWS()
+    try:
+        jwstoken.deserialize(message)
+    except Exception as err:
+        # error will be reported by decode_message()
+        logger.debug('jws_deserialize() err: {0}'.format(err))
+        jwstoken = None
+    return jwstoken
+
+
 def dkeys_lower(tree):
     """ lower characters in payload string """
     if isinstance(tree, dict):
@@ -466,8 +482,35 @@ def get_url(environ, include_path=False):
     return result
 
 
+# process-wide cache of parsed configuration files
+CONFIG_CACHE = {'lock': threading.Lock(), 'files': {}, 'reloads': 0}
+
+
+def _config_file_signature(cfg_file):
+    """ get mtime/inode/size of a config file to detect modifications """
+    try:
+        stat = os.stat(cfg_file)
+        result = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+    except OSError:
+        result = None
+    return result
+
+
+def config_cache_clear():
+    """ drop all cached configurations (forces a reload on next access e.g. after SIGHUP) """
+    with CONFIG_CACHE['lock']:
+        CONFIG_CACHE['files'] = {}
+
+
+def config_reload_count_get():
+    """ return number of config file (re)loads since process start """
+    return CONFIG_CACHE['reloads']
+
+
 def load_config(logger=None, mfilter=None, cfg_file=None):
-    """ small configparser wrappter to load a config file """
+    """ small configparser wrappter to load a config file
+        the parsed object is cached per file and shared between all callers;
+        it gets reloaded once mtime/inode/size of the file change - do not modify it """
     if not cfg_file:
         if 'ACME_SRV_CONFIGFILE' in os.environ:
             cfg_file = os.environ['ACME_SRV_CONFIGFILE']
@@ -475,9 +518,20 @@ def load_config(logger=None, mfilter=None, cfg_file=None):
             cfg_file = os.path.dirname(__file__) + '/' + 'acme_srv.cfg'
     if logger:
         logger.debug('load_config({1}:{0})'.format(mfilter, cfg_file))
-    config = configparser.RawConfigParser()
-    config.optionxform = str
-    config.read(cfg_file)
+
+    signature = _config_file_signature(cfg_file)
+    with CONFIG_CACHE['lock']:
+        cached = CONFIG_CACHE['files'].get(cfg_file)
+        if cached and cached[0] == signature:
+            config = cached[1]
+        else:
+            config = configparser.RawConfigParser()
+            config.optionxform = str
+            config.read(cfg_file)
+            CONFIG_CACHE['files'][cfg_file] = (signature, config)
+            CONFIG_CACHE['reloads'] += 1
+            if logger:
+                logger.debug('load_config(): (re)loaded {0}'.format(cfg_file))
     return config
 
 
@@ -602,7 +656,10 @@ def signature_check(logger, message, pub_key, json_=False):
     if pub_key:
         # load key
         try:
-            if json_:
+            if isinstance(pub_key, jwk.JWK):
+                # key got already parsed (e.g. by signature cache)
+                jwkey = pub_key
+            elif json_:
                 jwkey = jwk.JWK.from_json(pub_key)
             else:
                 jwkey = jwk.JWK(**pub_key)
@@ -614,8 +671,11 @@ def signature_check(logger, message, pub_key, json_=False):
 
         # verify signature
         if jwkey:
-            jwstoken = jws.JWS()
-            jwstoken.deserialize(message)
+            if isinstance(message, jws.JWS):
+                jwstoken = message
+            else:
+                jwstoken = jws.JWS()
+                jwstoken.deserialize(message)
             try:
                 jwstoken.verify(jwkey)
                 result = True
@@ -629,67 +689,6 @@ def signature_check(logger, message, pub_key, json_=False):
     return(result, error)
 
 
-def fqdn_resolve(host, dnssrv=None):
-    """ dns resolver """
-    req = dns.resolver.Resolver()
-
-    # hack to cover github workflows
-    if '.' in host:
-        if dnssrv:
-            # add specific dns server
-            req.nameservers = dnssrv
-        for rrtype in ['A', 'AAAA']:
-            try:
-                answers = req.query(host, rrtype)
-                for rdata in answers:
-                    result = str(rdata)
-                    invalid = False
-                    break
-            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
-                result = None
-                invalid = True
-            except Exception:
-                result = None
-                invalid = False
-            # if result != None:
-            if result is not None:
-                break
-    else:
-        result = None
-        invalid = False
-
-    return (result, invalid)
-
-
-def dns_server_list_load():
-    """ load dns-server from config file """
-    config_dic = load_config()
-
-    if 'Challenge' in config_dic:
-        if 'dns_server_list' in config_dic['Challenge']:
-            try:
-                dns_server_list = json.loads(config_dic['Challenge']['dns_server_list'])
-            except Exception:
-                dns_server_list = ['9.9.9.9', '8.8.8.8']
-        else:
-            dns_server_list = ['9.9.9.9', '8.8.8.8']
-    else:
-        dns_server_list = ['9.9.9.9', '8.8.8.8']
-
-    return dns_server_list
-
-
-def patched_create_connection(address, *args, **kwargs):
-    """ Wrap urllib3's create_connection to resolve the name elsewhere"""
-    # load dns-servers from config file
-    dns_server_list = dns_server_list_load()
-    # resolve hostname to an ip address; use your own resolver
-    host, port = address
-    (hostname, _invalid) = fqdn_resolve(host, dns_server_list)
-    # pylint: disable=W0212
-    return connection._orig_create_connection((hostname, port), *args, **kwargs)
-
-
 def proxy_check(logger, fqdn, proxy_server_list):
     """ check proxy server """
     logger.debug('proxy_check({0})'.format(fqdn))
@@ -715,80 +714,81 @@ def proxy_check(logger, fqdn, proxy_server_list):
     return proxy
 
 
-def url_get_with_own_dns(logger, url, verify=True):
-    """ request by using an own dns resolver """
-    logger.debug('url_get_with_own_dns({0})'.format(url))
-    # patch an own connection handler into URL lib
-    # pylint: disable=W0212
-    connection._orig_create_connection = connection.create_connection
-    connection.create_connection = patched_create_connection
-    try:
-        req = requests.get(url, verify=verify, headers={'Connection': 'close', 'Accept-Encoding': 'gzip', 'User-Agent': 'acme2certifier/{0}'.format(__version__)})
-        result = req.text
-    except Exception as err_:
-        result = None
-        logger.error('url_get_with_own_dns error: {0}'.format(err_))
-    # cleanup
-    connection.create_connection = connection._orig_create_connection
-    return result
-
+def address_list_sort(address_list):
+    """ interleave ipv6 and ipv4 addresses starting with ipv6 (rfc8305 section 4) """
+    v6_list = [address for address in address_list if ':' in address]
+    v4_list = [address for address in address_list if ':' not in address]
+    sorted_list = []
+    for cnt in range(max(len(v6_list), len(v4_list))):
+        sorted_list.extend(v6_list[cnt:cnt + 1] + v4_list[cnt:cnt + 1])
+    return sorted_list
 
-def allowed_gai_family():
-    """ set family """
-    family = socket.AF_INET    # force IPv4
-    return family
 
-
-def url_get(logger, url, dns_server_list=None, proxy_server=None, verify=True):
-    """ http get """
-    logger.debug('url_get({0})'.format(url))
-
-    # configure proxy servers if specified
-    if proxy_server:
-        proxy_list = {'http': proxy_server, 'https': proxy_server}
-    else:
-        proxy_list = {}
-    if dns_server_list and not proxy_server:
-        result = url_get_with_own_dns(logger, url, verify)
-    else:
-        try:
-            req = requests.get(url, verify=verify, headers={'Connection': 'close', 'Accept-Encoding': 'gzip', 'User-Agent': 'acme2certifier/{0}'.format(__version__)}, proxies=proxy_list)
-            result = req.text
-        except Exception as err_:
-            logger.debug('url_get({0}): error'.format(err_))
-            # force fallback to ipv4
-            logger.debug('url_get({0}): fallback to v4'.format(url))
-            old_gai_family = urllib3_cn.allowed_gai_family
-            try:
-                urllib3_cn.allowed_gai_family = allowed_gai_family
-                req = requests.get(url, verify=verify, headers={'Connection': 'close', 'Accept-Encoding': 'gzip', 'User-Agent': 'acme2certifier/{0}'.format(__version__)}, proxies=proxy_list)
-                result = req.text
-            except Exception as err_:
-                result = None
-                logger.error('url_get error: {0}'.format(err_))
-            urllib3_cn.allowed_gai_family = old_gai_family
-    logger.debug('url_get() ended with: {0}'.format(result))
-    return result
-
-
-def txt_get(logger, fqdn, dns_srv=None):
-    """ dns query to get the TXt record """
-    logger.debug('txt_get({0}: {1})'.format(fqdn, dns_srv))
-
-    # rewrite dns resolver if configured
-    if dns_srv:
-        dns.resolver.default_resolver = dns.resolver.Resolver(configure=False)
-        dns.resolver.default_resolver.nameservers = dns_srv
-    txt_record_list = []
-    try:
-        # result = dns.resolver.query(fqdn, 'TXT')[0].strings[0]
-        response = dns.resolver.query(fqdn, 'TXT')
-        for rrecord in response:
-            txt_record_list.append(rrecord.strings[0])
-    except Exception as err_:
-        logger.error('txt_get() error: {0}'.format(err_))
-    logger.debug('txt_get() ended with: {0}'.format(txt_record_list))
-    return txt_record_list
+def happy_eyeballs_connect(address_list, port, timeout=None, delay=0.25):
+    """ race tcp connects to a list of addresses (rfc8305) - returns the first connected socket """
+    # pylint: disable=R0912
+    deadline = time.monotonic() + timeout if timeout else None
+    pending_list = list(address_list)
+    attempt_dic = {}
+    error = None
+    next_attempt = time.monotonic()
+    with selectors.DefaultSelector() as selector:
+        while pending_list or attempt_dic:
+            now = time.monotonic()
+            if pending_list and (now >= next_attempt or not attempt_dic):
+                # start next attempt after stagger delay or once all running attempts failed
+                address = pending_list.pop(0)
+                family = socket.AF_INET6 if ':' in address else socket.AF_INET
+                try:
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                except OSError as err_:
+                    # address family not supported by this host
+                    error = err_
+                    continue
+                sock.setblocking(False)
+                try:
+                    errno = sock.connect_ex((address, port))
+                except OSError as err_:
+                    errno = err_.errno
+                if errno in (0, EINPROGRESS, EWOULDBLOCK):
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    attempt_dic[sock] = address
+                    next_attempt = now + delay
+                else:
+                    sock.close()
+                    error = OSError(errno, '{0} ({1})'.format(os.strerror(errno), address))
+                continue
+
+            if deadline and now >= deadline:
+                error = socket.timeout('connect to {0}:{1} timed out'.format(address_list, port))
+                break
+            wait = min(filter(None, [next_attempt - now if pending_list else None, deadline - now if deadline else None]), default=None)
+            for (key, _events) in selector.select(wait):
+                sock = key.fileobj
+                selector.unregister(sock)
+                address = attempt_dic.pop(sock)
+                errno = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if errno:
+                    sock.close()
+                    error = OSError(errno, '{0} ({1})'.format(os.strerror(errno), address))
+                    # next address gets tried immediately
+                    next_attempt = time.monotonic()
+                else:
+                    # winner - abort all other attempts
+                    for other in attempt_dic:
+                        selector.unregister(other)
+                        other.close()
+                    sock.setblocking(True)
+                    sock.settimeout(timeout)
+                    return sock
+
+        for sock in attempt_dic:
+            selector.unregister(sock)
+            sock.close()
+
+    if not error:
+        error = OSError('no address to connect to')
+    raise error
 
 
 def uts_now():
@@ -18,6 +18,8 @@ class Housekeeping(object):
         self.logger = logger
         self.dbstore = DBstore(debug, self.logger)
         self.debug = debug
+        self.nonce_max_age = 86400
+        self.nonce_chunk_size = 1000
 
     def __enter__(self):
         """ Makes ACMEHandler a Context Manager """
@@ -52,7 +54,11 @@ class Housekeeping(object):
         self.logger.debug('Housekeeping._config_load()')
         config_dic = load_config()
         if 'Housekeeping' in config_dic:
-            pass
+            try:
+                self.nonce_max_age = int(config_dic.get('Housekeeping', 'nonce_max_age', fallback=self.nonce_max_age))
+                self.nonce_chunk_size = int(config_dic.get('Housekeeping', 'nonce_chunk_size', fallback=self.nonce_chunk_size))
+            except Exception as err_:
+                self.logger.error('Housekeeping._config_load(): failed to parse nonce_max_age/nonce_chunk_size: {0}'.format(err_))
 
     def _convert_data(self, cert_list):
         """ convert data from uts to real date """
@@ -385,6 +391,21 @@ class Housekeeping(object):
         else:
             self.logger.critical('acme2certifier database version could not be verified in Housekeeping.dbversion_check()')
 
+    def nonces_cleanup(self, uts=None):
+        """ delete nonces older than nonce_max_age """
+        if not uts:
+            uts = uts_now()
+        self.logger.debug('Housekeeping.nonces_cleanup({0})'.format(uts))
+
+        try:
+            result = self.dbstore.nonces_expired_delete(uts - self.nonce_max_age, self.nonce_chunk_size)
+        except Exception as err_:
+            self.logger.critical('acme2certifier database error in Housekeeping.nonces_cleanup(): {0}'.format(err_))
+            result = 0
+
+        self.logger.debug('Housekeeping.nonces_cleanup() ended with: {0}'.format(result))
+        return result
+
     def orders_invalidate(self, uts=uts_now(), report_format='csv', report_name=None):
         """ orders cleanup based on expiry date"""
         self.logger.debug('Housekeeping.orders_invalidate({0})'.format(uts))
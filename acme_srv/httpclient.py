@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" pooled http client for challenge validation """
+from __future__ import print_function
+import functools
+import socket
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from acme_srv.dnsresolver import addresses_get
+from acme_srv.helper import happy_eyeballs_connect
+from acme_srv.version import __version__
+
+# process wide clients - one per dns-server/proxy combination
+HTTP_CLIENT = {'lock': threading.Lock(), 'clients': {}}
+
+
+def resolver_call(dns_server_list, host, port):
+    """ resolve hostname by using the configured dns servers """
+    return addresses_get(host, dns_server_list, port)
+
+
+class ResolverHTTPAdapter(HTTPAdapter):
+    """ transport adapter resolving hostnames by a client specific resolver and racing connects to all addresses instead of patching urllib3 globally """
+
+    def __init__(self, resolver=None, connect_delay=0.25, **kwargs):
+        self.resolver = resolver
+        self.connect_delay = connect_delay
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        if self.resolver:
+            resolver = self.resolver
+            connect_delay = self.connect_delay
+
+            def _new_conn(conn):
+                """ resolve hostname and connect - tls server name and host header remain unchanged """
+                # _dns_host is the hostname urllib3 itself would resolve (without trailing dot)
+                # pylint: disable=W0212
+                (address_list, _invalid) = resolver(conn._dns_host, conn.port)
+                if not address_list:
+                    raise NewConnectionError(conn, 'Failed to resolve {0}'.format(conn._dns_host))
+                timeout = conn.timeout if isinstance(conn.timeout, (int, float)) else None
+                try:
+                    sock = happy_eyeballs_connect(address_list, conn.port, timeout, connect_delay)
+                except socket.timeout as err_:
+                    raise ConnectTimeoutError(conn, 'Connection to {0} timed out. (connect timeout={1})'.format(conn.host, timeout)) from err_
+                except OSError as err_:
+                    raise NewConnectionError(conn, 'Failed to establish a new connection: {0}'.format(err_)) from err_
+                for option in conn.socket_options or []:
+                    sock.setsockopt(*option)
+                return sock
+
+            http_conn_cls = type('ResolverHTTPConnection', (HTTPConnection,), {'_new_conn': _new_conn})
+            https_conn_cls = type('ResolverHTTPSConnection', (HTTPSConnection,), {'_new_conn': _new_conn})
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': type('ResolverHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http_conn_cls}),
+                'https': type('ResolverHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https_conn_cls})}
+
+
+class ValidationHttpClient(object):
+    """ http client with connection pooling, timeouts and size limit; safe to be shared between threads """
+
+    def __init__(self, logger, dns_server_list=None, proxy_server=None, timeout=(5, 10), max_size=65536, pool_size=10):
+        self.logger = logger
+        self.timeout = timeout
+        self.max_size = max_size
+        if proxy_server:
+            # name resolution is up to the proxy
+            self.proxy_list = {'http': proxy_server, 'https': proxy_server}
+            resolver = None
+        else:
+            self.proxy_list = {}
+            resolver = functools.partial(resolver_call, dns_server_list)
+        # connection pools are thread-safe and shared; sessions are kept per thread
+        self.adapter = ResolverHTTPAdapter(resolver, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.local = threading.local()
+
+    def _session_get(self):
+        """ get session of calling thread """
+        if not hasattr(self.local, 'session'):
+            session = requests.Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            session.headers.update({'Accept-Encoding': 'gzip', 'User-Agent': 'acme2certifier/{0}'.format(__version__)})
+            session.proxies.update(self.proxy_list)
+            # environment settings must not redirect validation requests
+            session.trust_env = False
+            self.local.session = session
+        return self.local.session
+
+    def get(self, url, verify=True):
+        """ http get - returns body as text or None """
+        self.logger.debug('ValidationHttpClient.get({0})'.format(url))
+        result = None
+        try:
+            with self._session_get().get(url, verify=verify, timeout=self.timeout, stream=True) as req:
+                content = b''
+                for chunk in req.iter_content(chunk_size=4096):
+                    content += chunk
+                    if len(content) > self.max_size:
+                        raise ValueError('response exceeds {0} bytes'.format(self.max_size))
+                result = content.decode(req.encoding or 'utf-8', errors='replace')
+        except Exception as err_:
+            self.logger.error('ValidationHttpClient.get() error: {0}'.format(err_))
+        self.logger.debug('ValidationHttpClient.get() ended with: {0}'.format(result))
+        return result
+
+
+def http_client_get(logger, dns_server_list=None, proxy_server=None, timeout=(5, 10), max_size=65536):
+    """ get process wide http client """
+    key = (tuple(dns_server_list) if dns_server_list else None, proxy_server, tuple(timeout), max_size)
+    with HTTP_CLIENT['lock']:
+        if key not in HTTP_CLIENT['clients']:
+            HTTP_CLIENT['clients'][key] = ValidationHttpClient(logger, dns_server_list, proxy_server, timeout, max_size)
+    return HTTP_CLIENT['clients'][key]
+
+
+def validation_url_get(logger, url, dns_server_list=None, proxy_server=None, verify=True, timeout=(5, 10), max_size=65536):
+    """ http get by using a pooled client """
+    logger.debug('validation_url_get({0})'.format(url))
+    return http_client_get(logger, dns_server_list, proxy_server, timeout, max_size).get(url, verify=verify)
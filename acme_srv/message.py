@@ -3,7 +3,7 @@
 """ ca hanlder for Insta Certifier via REST-API class """
 from __future__ import print_function
 import json
-from acme_srv.helper import decode_message, load_config
+from acme_srv.helper import decode_message, jws_deserialize, load_config
 from acme_srv.error import Error
 from acme_srv.db_handler import DBstore
 from acme_srv.nonce import Nonce
@@ -83,8 +83,13 @@ class Message(object):
         else:
             skip_signature_check = False
 
+        # deserialize message once - the token is shared by decoding and signature verification
+        jwstoken = jws_deserialize(self.logger, content)
+        if not jwstoken:
+            jwstoken = content
+
         # decode message
-        (result, error_detail, protected, payload, _signature) = decode_message(self.logger, content)
+        (result, error_detail, protected, payload, _signature) = decode_message(self.logger, jwstoken)
         account_name = None
         if result:
             # decoding successful - check nonce for anti replay protection
@@ -105,7 +110,7 @@ class Message(object):
                 account_name = self._name_get(protected)
                 signature = Signature(self.debug, self.server_name, self.logger)
                 # we need the decoded protected header to grab a key to verify signature
-                (sig_check, error, error_detail) = signature.check(account_name, content, use_emb_key, protected)
+                (sig_check, error, error_detail) = signature.check(account_name, jwstoken, use_emb_key, protected)
                 if sig_check:
                     code = 200
                     message = None
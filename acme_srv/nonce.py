@@ -3,7 +3,146 @@
 """ Nonce class """
 from __future__ import print_function
 import uuid
+import base64
+import hashlib
+import hmac
+import itertools
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
 from acme_srv.db_handler import DBstore
+from acme_srv.helper import b64_url_encode, load_config
+
+
+# process wide nonce store used by the "memory" backend and replay filter of the "stateless" mode
+NONCE_STORE = {'lock': threading.Lock(), 'memory': None, 'replay_filter': None, 'hmac_key': None}
+
+# nonces pre-generated and stored in database but not yet handed out
+NONCE_POOL = {'lock': threading.Lock(), 'nonces': []}
+
+# stateless nonces: timestamp (8 bytes), counter (8 bytes), process salt (4 bytes), truncated hmac (16 bytes)
+STATELESS_NONCE_COUNTER = itertools.count()
+STATELESS_NONCE_SALT = os.urandom(4)
+STATELESS_NONCE_LENGTH = 36
+
+# socket of tools/nonce_server.py - located in a directory accessible by the server user only
+NONCE_SOCKET = '/run/acme2certifier/nonce.sock'
+
+
+class NonceMemoryStore(object):
+    """ in-process nonce store with ttl and size limit """
+
+    def __init__(self, ttl=3600, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # nonce -> expiry; insertion order equals expiry order as ttl is constant
+        self.nonce_dic = OrderedDict()
+
+    def _expire(self, now):
+        """ drop expired and surplus entries (caller must hold the lock) """
+        while self.nonce_dic:
+            (nonce, expires) = next(iter(self.nonce_dic.items()))
+            if expires > now and len(self.nonce_dic) <= self.max_entries:
+                break
+            self.nonce_dic.pop(nonce)
+
+    def add(self, nonce):
+        """ store nonce """
+        now = time.monotonic()
+        with self.lock:
+            self.nonce_dic[nonce] = now + self.ttl
+            self._expire(now)
+        return True
+
+    def consume(self, nonce):
+        """ check and delete nonce in one step """
+        now = time.monotonic()
+        with self.lock:
+            expires = self.nonce_dic.pop(nonce, None)
+        return bool(expires and expires > now)
+
+
+class NonceSocketStore(object):
+    """ client for a nonce store shared via local socket (see tools/nonce_server.py) """
+
+    def __init__(self, socket_path, timeout=2):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, command, nonce):
+        """ send a single command to nonce server """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall('{0} {1}\n'.format(command, nonce).encode('utf-8'))
+            response = sock.makefile('rb').readline()
+        return response.strip() == b'OK'
+
+    def add(self, nonce):
+        """ store nonce """
+        return self._request('ADD', nonce)
+
+    def consume(self, nonce):
+        """ check and delete nonce in one step """
+        return self._request('CONSUME', nonce)
+
+
+class NonceReplayFilter(object):
+    """ bounded set of consumed stateless nonces """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # nonce -> expiry in order of consumption
+        self.nonce_dic = OrderedDict()
+        # nonces expiring before this point in time got evicted from the filter and will be refused
+        self.floor = 0
+
+    def register(self, nonce, expires, now):
+        """ register consumed nonce - false if nonce has been seen before """
+        with self.lock:
+            while self.nonce_dic:
+                (oldest, oldest_expires) = next(iter(self.nonce_dic.items()))
+                if oldest_expires > now:
+                    break
+                self.nonce_dic.pop(oldest)
+            if expires <= self.floor or nonce in self.nonce_dic:
+                return False
+            self.nonce_dic[nonce] = expires
+            while len(self.nonce_dic) > self.max_entries:
+                (_evicted, evicted_expires) = self.nonce_dic.popitem(last=False)
+                self.floor = max(self.floor, evicted_expires)
+        return True
+
+
+def memory_store_get(ttl=3600, max_entries=100000):
+    """ get process wide in-memory nonce store """
+    with NONCE_STORE['lock']:
+        if not NONCE_STORE['memory']:
+            NONCE_STORE['memory'] = NonceMemoryStore(ttl, max_entries)
+    return NONCE_STORE['memory']
+
+
+def replay_filter_get(max_entries=100000):
+    """ get process wide replay filter for stateless nonces """
+    with NONCE_STORE['lock']:
+        if not NONCE_STORE['replay_filter']:
+            NONCE_STORE['replay_filter'] = NonceReplayFilter(max_entries)
+    return NONCE_STORE['replay_filter']
+
+
+def hmac_key_get(hmac_key=None):
+    """ get key to authenticate stateless nonces - random per process if not configured """
+    if hmac_key:
+        return hmac_key.encode('utf-8')
+    with NONCE_STORE['lock']:
+        if not NONCE_STORE['hmac_key']:
+            NONCE_STORE['hmac_key'] = os.urandom(32)
+    return NONCE_STORE['hmac_key']
 
 
 class Nonce(object):
@@ -13,6 +152,15 @@ class Nonce(object):
         self.debug = debug
         self.logger = logger
         self.dbstore = DBstore(self.debug, self.logger)
+        # None: nonces get stored in database
+        self.backend = None
+        # consumed nonces of the stateless mode
+        self.replay_filter = None
+        self.stateless = False
+        self.hmac_key = None
+        self.ttl = 3600
+        self.pregenerate = 0
+        self._config_load()
 
     def __enter__(self):
         """ Makes ACMEHandler a Context Manager """
@@ -21,21 +169,100 @@ class Nonce(object):
     def __exit__(self, *args):
         """ cose the connection at the end of the context """
 
+    def _config_load(self):
+        """" load config from file """
+        self.logger.debug('Nonce._config_load()')
+        config_dic = load_config()
+        if 'Nonce' in config_dic:
+            backend = config_dic.get('Nonce', 'backend', fallback='database')
+            try:
+                ttl = int(config_dic.get('Nonce', 'ttl', fallback=3600))
+                max_entries = int(config_dic.get('Nonce', 'max_entries', fallback=100000))
+            except Exception as err_:
+                self.logger.error('Nonce._config_load(): failed to parse ttl/max_entries: {0}'.format(err_))
+                ttl = 3600
+                max_entries = 100000
+            self.ttl = ttl
+            try:
+                self.pregenerate = int(config_dic.get('Nonce', 'pregenerate', fallback=0))
+            except Exception as err_:
+                self.logger.error('Nonce._config_load(): failed to parse pregenerate: {0}'.format(err_))
+            if config_dic.get('Nonce', 'mode', fallback='stateful') == 'stateless':
+                self.stateless = True
+                self.hmac_key = hmac_key_get(config_dic.get('Nonce', 'hmac_key', fallback=None))
+                self.replay_filter = replay_filter_get(max_entries)
+                if 'hmac_key' not in config_dic['Nonce']:
+                    self.logger.info('Nonce._config_load(): no hmac_key configured. Using random key')
+            elif backend == 'memory':
+                self.backend = memory_store_get(ttl, max_entries)
+            elif backend == 'socket':
+                self.backend = NonceSocketStore(config_dic.get('Nonce', 'socket', fallback=NONCE_SOCKET))
+            elif backend != 'database':
+                self.logger.error('Nonce._config_load(): unknown backend: {0}. Using database.'.format(backend))
+        self.logger.debug('Nonce._config_load() ended')
+
+    def _pool_get(self):
+        """ get nonce from pool - refill pool with a single database write if empty """
+        self.logger.debug('Nonce._pool_get()')
+        with NONCE_POOL['lock']:
+            if not NONCE_POOL['nonces']:
+                nonce_list = [self._new() for _cnt in range(self.pregenerate)]
+                try:
+                    self.dbstore.nonces_add(nonce_list)
+                    NONCE_POOL['nonces'] = nonce_list
+                except Exception as err_:
+                    self.logger.critical('acme2certifier database error in Nonce._pool_get(): {0}'.format(err_))
+            nonce = NONCE_POOL['nonces'].pop() if NONCE_POOL['nonces'] else None
+        self.logger.debug('Nonce._pool_get() ended with: {0}'.format(nonce))
+        return nonce
+
+    def _stateless_check(self, nonce):
+        """ verify hmac and freshness of a stateless nonce and register it in replay filter """
+        self.logger.debug('Nonce._stateless_check({0})'.format(nonce))
+        try:
+            nonce_raw = base64.urlsafe_b64decode(nonce + '=' * (-len(nonce) % 4))
+        except Exception:
+            nonce_raw = b''
+
+        result = False
+        if len(nonce_raw) == STATELESS_NONCE_LENGTH:
+            (payload, mac) = (nonce_raw[:20], nonce_raw[20:])
+            if hmac.compare_digest(mac, hmac.new(self.hmac_key, payload, hashlib.sha256).digest()[:16]):
+                issued = struct.unpack('>Q', payload[:8])[0]
+                now = time.time()
+                # allow some clock skew between worker hosts
+                if now - self.ttl <= issued <= now + 60:
+                    # key on decoded bytes - base64 decoding ignores foreign characters
+                    result = self.replay_filter.register(nonce_raw, issued + self.ttl, now)
+                else:
+                    self.logger.debug('Nonce._stateless_check(): nonce expired')
+            else:
+                self.logger.debug('Nonce._stateless_check(): hmac verification failed')
+
+        self.logger.debug('Nonce._stateless_check() ended with: {0}'.format(result))
+        return result
+
     def _check_and_delete(self, nonce):
         """ check if nonce exists and delete it """
         self.logger.debug('Nonce.nonce._check_and_delete({0})'.format(nonce))
 
-        try:
-            nonce_chk_result = self.dbstore.nonce_check(nonce)
-        except Exception as err_:
-            self.logger.critical('acme2certifier database error during nonce_check() in Nonce._check_and_delete(): {0}'.format(err_))
-            nonce_chk_result = False
-
-        if nonce_chk_result:
+        if self.stateless:
+            nonce_chk_result = self._stateless_check(nonce)
+        elif self.backend:
+            try:
+                nonce_chk_result = self.backend.consume(nonce)
+            except Exception as err_:
+                self.logger.critical('acme2certifier nonce backend error in Nonce._check_and_delete(): {0}'.format(err_))
+                nonce_chk_result = False
+        else:
             try:
-                self.dbstore.nonce_delete(nonce)
+                # check and delete in one statement - a nonce can be used only once even under concurrent replays
+                nonce_chk_result = self.dbstore.nonce_consume(nonce)
             except Exception as err_:
-                self.logger.critical('acme2certifier database error during nonce_delete() in Nonce._check_and_delete(): {0}'.format(err_))
+                self.logger.critical('acme2certifier database error during nonce_consume() in Nonce._check_and_delete(): {0}'.format(err_))
+                nonce_chk_result = False
+
+        if nonce_chk_result:
             code = 200
             message = None
             detail = None
@@ -51,6 +278,13 @@ class Nonce(object):
         self.logger.debug('Nonce.nonce__new()')
         return uuid.uuid4().hex
 
+    def _stateless_new(self):
+        """ generate a new hmac authenticated nonce which does not need to be stored """
+        self.logger.debug('Nonce._stateless_new()')
+        payload = struct.pack('>QQ', int(time.time()), next(STATELESS_NONCE_COUNTER)) + STATELESS_NONCE_SALT
+        mac = hmac.new(self.hmac_key, payload, hashlib.sha256).digest()[:16]
+        return b64_url_encode(self.logger, payload + mac).decode('utf-8')
+
     def check(self, protected_decoded):
         """ check nonce """
         self.logger.debug('Nonce.check_nonce()')
@@ -66,12 +300,26 @@ class Nonce(object):
     def generate_and_add(self):
         """ generate new nonce and store it """
         self.logger.debug('Nonce.nonce_generate_and_add()')
-        nonce = self._new()
-        self.logger.debug('got nonce: {0}'.format(nonce))
-        # self.logger.critical('foo')
-        try:
-            _id = self.dbstore.nonce_add(nonce)  # lgtm [py/unused-local-variable]
-        except Exception as err_:
-            self.logger.critical('acme2certifier database error in Nonce.generate_and_add(): {0}'.format(err_))
+        if self.stateless:
+            # nothing to store - the nonce authenticates itself
+            nonce = self._stateless_new()
+        else:
+            nonce = self._new()
+            self.logger.debug('got nonce: {0}'.format(nonce))
+            if self.backend:
+                try:
+                    self.backend.add(nonce)
+                except Exception as err_:
+                    self.logger.critical('acme2certifier nonce backend error in Nonce.generate_and_add(): {0}'.format(err_))
+            else:
+                # hand out pre-generated nonce - store the new one if the pool could not be refilled
+                pool_nonce = self._pool_get() if self.pregenerate > 1 else None
+                if pool_nonce:
+                    nonce = pool_nonce
+                else:
+                    try:
+                        _id = self.dbstore.nonce_add(nonce)  # lgtm [py/unused-local-variable]
+                    except Exception as err_:
+                        self.logger.critical('acme2certifier database error in Nonce.generate_and_add(): {0}'.format(err_))
         self.logger.debug('Nonce.generate_and_add() ended with:{0}'.format(nonce))
         return nonce
@@ -5,8 +5,10 @@ from __future__ import print_function
 import json
 from acme_srv.helper import b64_url_recode, generate_random_string, load_config, parse_url, uts_to_date_utc, uts_now
 from acme_srv.certificate import Certificate
+from acme_srv.challenge import Challenge
 from acme_srv.db_handler import DBstore
 from acme_srv.message import Message
+from acme_srv.pollcache import poll_cache_get
 
 
 class Order(object):
@@ -24,6 +26,9 @@ class Order(object):
         self.path_dic = {'authz_path': '/acme/authz/', 'order_path': '/acme/order/', 'cert_path': '/acme/cert/'}
         self.retry_after = 600
         self.tnauthlist_support = False
+        # create the challenges of all authorizations along with the order
+        self.challenge_precreate = False
+        self.poll_cache_ttl = 0
 
     def __enter__(self):
         """ Makes ACMEHandler a Context Manager """
@@ -72,6 +77,7 @@ class Order(object):
             if not error:
                 if oid:
                     error = None
+                    authz_list = []
                     for auth in payload['identifiers']:
                         # generate name
                         auth_name = generate_random_string(self.logger, 12)
@@ -81,10 +87,17 @@ class Order(object):
                         auth['order'] = oid
                         auth['status'] = 'pending'
                         auth['expires'] = uts_now() + self.authz_validity
-                        try:
-                            self.dbstore.authorization_add(auth)
-                        except Exception as err_:
-                            self.logger.critical('acme2certifier database error in Order._add() authz: {0}'.format(err_))
+                        authz_list.append(auth)
+                    try:
+                        # store all authorizations at once
+                        self.dbstore.authorizations_add_bulk(authz_list)
+                    except Exception as err_:
+                        self.logger.critical('acme2certifier database error in Order._add() authz: {0}'.format(err_))
+                        # order without authorizations gets rolled back together with the transaction scope
+                        error = 'urn:ietf:params:acme:error:serverInternal'
+                        authz_list = []
+                    if self.challenge_precreate and authz_list:
+                        self._challenges_add([(auth['name'], auth['type'] == 'TNAuthList') for auth in authz_list])
                 else:
                     error = 'urn:ietf:params:acme:error:malformed'
         else:
@@ -93,6 +106,13 @@ class Order(object):
         self.logger.debug('Order._add() ended')
         return(error, order_name, auth_dic, uts_to_date_utc(expires))
 
+    def _challenges_add(self, authz_list):
+        """ create the challenge sets of all authorizations of a new order at once """
+        self.logger.debug('Order._challenges_add({0})'.format(len(authz_list)))
+        with Challenge(self.debug, self.server_name, self.logger, uts_now() + self.authz_validity) as challenge:
+            challenge_dic = challenge.new_sets([(authz_name, generate_random_string(self.logger, 32), tnauth) for (authz_name, tnauth) in authz_list])
+        self.logger.debug('Order._challenges_add() ended with: {0} challenges'.format(sum(len(challenge_list) for challenge_list in challenge_dic.values())))
+
     def _config_load(self):
         """" load config from file """
         self.logger.debug('Order._config_load()')
@@ -100,6 +120,7 @@ class Order(object):
         if 'Order' in config_dic:
             self.tnauthlist_support = config_dic.getboolean('Order', 'tnauthlist_support', fallback=False)
             self.expiry_check_disable = config_dic.getboolean('Order', 'expiry_check_disable', fallback=False)
+            self.challenge_precreate = config_dic.getboolean('Order', 'challenge_precreate', fallback=False)
             if 'retry_after_timeout' in config_dic['Order']:
                 try:
                     self.retry_after = int(config_dic['Order']['retry_after_timeout'])
@@ -110,6 +131,11 @@ class Order(object):
                     self.validity = int(config_dic['Order']['validity'])
                 except Exception:
                     self.logger.warning('Order._config_load(): failed to parse validity: {0}'.format(config_dic['Order']['validity']))
+            if 'poll_cache_ttl' in config_dic['Order']:
+                try:
+                    self.poll_cache_ttl = int(config_dic['Order']['poll_cache_ttl'])
+                except Exception:
+                    self.logger.warning('Order._config_load(): failed to parse poll_cache_ttl: {0}'.format(config_dic['Order']['poll_cache_ttl']))
         if 'Authorization' in config_dic:
             if 'validity' in config_dic['Authorization']:
                 try:
@@ -167,8 +193,18 @@ class Order(object):
             result = None
         return result
 
-    def _process(self, order_name, protected, payload):
-        """ process order """
+    def _view(self, order_name):
+        """ list details of an order along with name and status of its authorizations """
+        self.logger.debug('Order._view({0})'.format(order_name))
+        try:
+            result = self.dbstore.order_view(order_name)
+        except Exception as err_:
+            self.logger.critical('acme2certifier database error in Order._view(): {0}'.format(err_))
+            result = None
+        return result
+
+    def _process(self, order_name, protected, payload, order_dic=None):
+        """ process order - order_dic can be handed over by the caller to avoid another lookup """
         self.logger.debug('Order._process({0})'.format(order_name))
         certificate_name = None
         message = None
@@ -179,7 +215,8 @@ class Order(object):
                 self.logger.debug('finalize request()')
 
                 # lookup order-status (must be ready to proceed)
-                order_dic = self._info(order_name)
+                if order_dic is None:
+                    order_dic = self._info(order_name)
                 if 'status' in order_dic and order_dic['status'] == 'ready':
                     # update order_status / set to processing
                     self._update({'name': order_name, 'status': 'processing'})
@@ -209,12 +246,13 @@ class Order(object):
             else:
                 self.logger.debug('polling request()')
                 code = 200
-                # this is a polling request; lookup certificate
-                try:
-                    cert_dic = self.dbstore.certificate_lookup('order__name', order_name)
-                except Exception as err_:
-                    self.logger.critical('acme2certifier database error in Order._process(): {0}'.format(err_))
-                    cert_dic = {}
+                cert_dic = {}
+                # this is a polling request; lookup certificate (only valid orders come with a certificate)
+                if order_dic is None or order_dic.get('status') == 'valid':
+                    try:
+                        cert_dic = self.dbstore.certificate_lookup('order__name', order_name)
+                    except Exception as err_:
+                        self.logger.critical('acme2certifier database error in Order._process(): {0}'.format(err_))
                 if cert_dic:
                     # we found a cert in the database
                     # pylint: disable=R1715
@@ -264,6 +302,18 @@ class Order(object):
         self.logger.debug('Order._csr_process() ended with order:{0} {1}:{2}:{3}'.format(order_name, code, message, detail))
         return(code, message, detail)
 
+    def _ready_set(self, order_name):
+        """ set order to ready if it is pending and all its authorizations are valid """
+        self.logger.debug('Order._ready_set({0})'.format(order_name))
+        try:
+            result = self.dbstore.order_ready_set(order_name)
+        except Exception as err_:
+            self.logger.critical('acme2certifier database error in Order._ready_set(): {0}'.format(err_))
+            result = False
+        if result:
+            poll_cache_get().invalidate('order', order_name)
+        return result
+
     def _update(self, data_dic):
         """ update order based on ordername """
         self.logger.debug('Order._update({0})'.format(data_dic))
@@ -271,13 +321,16 @@ class Order(object):
             self.dbstore.order_update(data_dic)
         except Exception as err_:
             self.logger.critical('acme2certifier database error in Order._update(): {0}'.format(err_))
+        if 'name' in data_dic:
+            poll_cache_get().invalidate('order', data_dic['name'])
 
     def _lookup(self, order_name):
         """ sohw order details based on ordername """
         self.logger.debug('Order._lookup({0})'.format(order_name))
         order_dic = {}
 
-        tmp_dic = self._info(order_name)
+        # order and authorizations get fetched by a single query
+        tmp_dic = self._view(order_name)
         if tmp_dic:
             if 'status' in tmp_dic:
                 order_dic['status'] = tmp_dic['status']
@@ -294,11 +347,7 @@ class Order(object):
                     order_dic['identifiers'] = json.loads(tmp_dic['identifiers'])
                 except Exception:
                     self.logger.error('Order.lookup(): error while parsing the identifier {0}'.format(tmp_dic['identifiers']))
-            try:
-                authz_list = self.dbstore.authorization_lookup('order__name', order_name, ['name', 'status__name'])
-            except Exception as err_:
-                self.logger.critical('acme2certifier database error in Order._lookup(): {0}'.format(err_))
-                authz_list = []
+            authz_list = tmp_dic.get('authorizations', [])
             if authz_list:
                 order_dic["authorizations"] = []
                 # collect status of different authorizations in list
@@ -312,14 +361,27 @@ class Order(object):
                         else:
                             validity_list.append(False)
 
-                # update orders status from pending to ready
+                # update orders status from pending to ready (condition gets rechecked by the database)
                 if validity_list and 'status' in order_dic:
                     if False not in validity_list and order_dic['status'] == 'pending':
-                        self._update({'name': order_name, 'status': 'ready'})
+                        if self._ready_set(order_name):
+                            order_dic['status'] = 'ready'
 
         self.logger.debug('Order._lookup() ended')
         return order_dic
 
+    def _lookup_cached(self, order_name):
+        """ order details for polling requests - served from cache if enabled """
+        self.logger.debug('Order._lookup_cached({0})'.format(order_name))
+        order_dic = None
+        if self.poll_cache_ttl:
+            order_dic = poll_cache_get().get('order', order_name, self.server_name)
+        if not order_dic:
+            order_dic = self._lookup(order_name)
+            if self.poll_cache_ttl and order_dic:
+                poll_cache_get().set('order', order_name, order_dic, self.poll_cache_ttl, self.server_name)
+        return order_dic
+
     def invalidate(self, timestamp=None):
         """ invalidate orders """
         self.logger.debug('Order.invalidate({0})'.format(timestamp))
@@ -345,6 +407,7 @@ class Order(object):
                     self.dbstore.order_update(data_dic)
                 except Exception as err_:
                     self.logger.critical('acme2certifier database error in Order._invalidate() upd: {0}'.format(err_))
+                poll_cache_get().invalidate('order', order['name'])
 
         self.logger.debug('Order.invalidate() ended: {0} orders identified'.format(len(output_list)))
         return (field_list, output_list)
@@ -353,31 +416,33 @@ class Order(object):
         """ new oder request """
         self.logger.debug('Order.new()')
 
-        response_dic = {}
-        # check message
-        (code, message, detail, _protected, payload, account_name) = self.message.check(content)
-        if code == 200:
-            (error, order_name, auth_dic, expires) = self._add(payload, account_name)
-            if not error:
-                code = 201
-                response_dic['header'] = {}
-                response_dic['header']['Location'] = '{0}{1}{2}'.format(self.server_name, self.path_dic['order_path'], order_name)
-                response_dic['data'] = {}
-                response_dic['data']['identifiers'] = []
-                response_dic['data']['authorizations'] = []
-                response_dic['data']['status'] = 'pending'
-                response_dic['data']['expires'] = expires
-                response_dic['data']['finalize'] = '{0}{1}{2}/finalize'.format(self.server_name, self.path_dic['order_path'], order_name)
-                for auth_name in auth_dic:
-                    response_dic['data']['authorizations'].append('{0}{1}{2}'.format(self.server_name, self.path_dic['authz_path'], auth_name))
-                    response_dic['data']['identifiers'].append(auth_dic[auth_name])
-            else:
-                code = 400
-                message = error
-                detail = 'could not process order'
-        # prepare/enrich response
-        status_dic = {'code': code, 'message': message, 'detail': detail}
-        response_dic = self.message.prepare_response(response_dic, status_dic)
+        # all database writes of this request get committed at once
+        with self.dbstore.transaction():
+            response_dic = {}
+            # check message
+            (code, message, detail, _protected, payload, account_name) = self.message.check(content)
+            if code == 200:
+                (error, order_name, auth_dic, expires) = self._add(payload, account_name)
+                if not error:
+                    code = 201
+                    response_dic['header'] = {}
+                    response_dic['header']['Location'] = '{0}{1}{2}'.format(self.server_name, self.path_dic['order_path'], order_name)
+                    response_dic['data'] = {}
+                    response_dic['data']['identifiers'] = []
+                    response_dic['data']['authorizations'] = []
+                    response_dic['data']['status'] = 'pending'
+                    response_dic['data']['expires'] = expires
+                    response_dic['data']['finalize'] = '{0}{1}{2}/finalize'.format(self.server_name, self.path_dic['order_path'], order_name)
+                    for auth_name in auth_dic:
+                        response_dic['data']['authorizations'].append('{0}{1}{2}'.format(self.server_name, self.path_dic['authz_path'], auth_name))
+                        response_dic['data']['identifiers'].append(auth_dic[auth_name])
+                else:
+                    code = 400
+                    message = error
+                    detail = 'could not process order'
+            # prepare/enrich response
+            status_dic = {'code': code, 'message': message, 'detail': detail}
+            response_dic = self.message.prepare_response(response_dic, status_dic)
 
         self.logger.debug('Order.new() returns: {0}'.format(json.dumps(response_dic)))
         return response_dic
@@ -398,9 +463,13 @@ class Order(object):
             if 'url' in protected:
                 order_name = self._name_get(protected['url'])
                 if order_name:
-                    order_dic = self._lookup(order_name)
+                    if 'finalize' in protected['url']:
+                        order_dic = self._lookup(order_name)
+                    else:
+                        # polling request
+                        order_dic = self._lookup_cached(order_name)
                     if order_dic:
-                        (code, message, detail, certificate_name) = self._process(order_name, protected, payload)
+                        (code, message, detail, certificate_name) = self._process(order_name, protected, payload, order_dic)
                     else:
                         code = 403
                         message = 'urn:ietf:params:acme:error:orderNotReady'
@@ -418,7 +487,12 @@ class Order(object):
                 # create response
                 response_dic['header'] = {}
                 response_dic['header']['Location'] = '{0}{1}{2}'.format(self.server_name, self.path_dic['order_path'], order_name)
-                response_dic['data'] = self._lookup(order_name)
+                if 'finalize' in protected['url']:
+                    # order status got changed by the finalize request
+                    response_dic['data'] = self._lookup(order_name)
+                else:
+                    # polling request - the order did not change since the lookup above
+                    response_dic['data'] = order_dic
                 if 'status' in response_dic['data'] and response_dic['data']['status'] == 'processing':
                     # set retry header as cert issuane is not completed.
                     response_dic['header']['Retry-After'] = '{0}'.format(self.retry_after)
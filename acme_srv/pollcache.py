@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" short-lived cache for responses to polling requests """
+from __future__ import print_function
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+# process wide cache shared by authorization, order and certificate polling
+POLL_CACHE = {'lock': threading.Lock(), 'cache': None}
+
+
+class PollCache(object):
+    """ cache responses keyed by object type and name - entries get dropped on status changes or once their ttl expired """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # (kind, name) -> (expires, variant, data)
+        self.cache = OrderedDict()
+        self.metrics_dic = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, kind, name, variant=None):
+        """ get a copy of a cached response - returns None if there is no valid entry """
+        key = (kind, name)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry and entry[0] <= time.monotonic():
+                del self.cache[key]
+            elif entry and entry[1] == variant:
+                self.metrics_dic['hits'] += 1
+                self.cache.move_to_end(key)
+                return copy.deepcopy(entry[2])
+            self.metrics_dic['misses'] += 1
+        return None
+
+    def set(self, kind, name, data, ttl, variant=None):
+        """ store a copy of a response """
+        if ttl > 0:
+            key = (kind, name)
+            with self.lock:
+                self.cache[key] = (time.monotonic() + ttl, variant, copy.deepcopy(data))
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+
+    def invalidate(self, kind, name):
+        """ drop entry after a status change """
+        with self.lock:
+            if self.cache.pop((kind, name), None):
+                self.metrics_dic['invalidations'] += 1
+
+    def stats(self):
+        """ hit ratio and number of entries """
+        with self.lock:
+            stats_dic = dict(self.metrics_dic)
+            stats_dic['entries'] = len(self.cache)
+        lookups = stats_dic['hits'] + stats_dic['misses']
+        stats_dic['hit_ratio'] = stats_dic['hits'] / lookups if lookups else 0.0
+        return stats_dic
+
+
+def poll_cache_get():
+    """ get process wide cache """
+    with POLL_CACHE['lock']:
+        if not POLL_CACHE['cache']:
+            POLL_CACHE['cache'] = PollCache()
+    return POLL_CACHE['cache']
+
+
+def poll_cache_clear():
+    """ drop all cached responses """
+    with POLL_CACHE['lock']:
+        POLL_CACHE['cache'] = None
+
+
+def poll_cache_stats():
+    """ metrics of the cache of this process """
+    return poll_cache_get().stats()
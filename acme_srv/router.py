@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" url router for the standalone servers """
+from __future__ import print_function
+
+# key marking a route within the prefix trie - cannot collide with a path segment
+ROUTE_KEY = None
+
+
+class Router(object):
+    """ url router built once at startup: dictionary for exact paths and trie for prefixes """
+
+    def __init__(self, logger=None, url_prefix=None, not_found=None):
+        self.logger = logger
+        self.not_found = not_found
+        self.exact_dic = {}
+        self.prefix_trie = {}
+        # prefix to be removed from incoming paths
+        if url_prefix:
+            self.url_prefix = '/' + url_prefix.strip('/') + '/'
+        else:
+            self.url_prefix = '/'
+
+    def add(self, path, callback, prefix=False):
+        """ register callback for an exact path or for a path prefix """
+        if self.logger:
+            self.logger.debug('Router.add({0}, prefix={1})'.format(path, prefix))
+        if prefix:
+            node = self.prefix_trie
+            for segment in path.strip('/').split('/'):
+                node = node.setdefault(segment, {})
+            node[ROUTE_KEY] = callback
+        else:
+            self.exact_dic[path] = callback
+
+    def path_strip(self, path):
+        """ remove url_prefix from path """
+        if path.startswith(self.url_prefix):
+            return path[len(self.url_prefix):]
+        if path.rstrip('/') == self.url_prefix.rstrip('/'):
+            # prefix without trailing slash is the root of the server
+            return ''
+        return path.lstrip('/')
+
+    def match(self, path):
+        """ lookup callback for a stripped path - longest registered prefix wins """
+        callback = self.exact_dic.get(path)
+        if callback is None:
+            node = self.prefix_trie
+            for segment in path.split('/'):
+                node = node.get(segment)
+                if node is None:
+                    break
+                callback = node.get(ROUTE_KEY, callback)
+        if callback is None:
+            callback = self.not_found
+        return callback
+
+    def dispatch(self, path):
+        """ lookup callback for a request path """
+        return self.match(self.path_strip(path))
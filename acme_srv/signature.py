@@ -2,10 +2,39 @@
 # -*- coding: utf-8 -*-
 """ Signature class """
 from __future__ import print_function
+import threading
+import time
+from collections import OrderedDict
+from jwcrypto import jwk
 from acme_srv.helper import signature_check, load_config
 from acme_srv.db_handler import DBstore
 
 
+# process wide lru cache of parsed account keys: account name -> {'jwk': jwk.JWK, 'expires': monotonic}
+JWK_CACHE = {'lock': threading.Lock(), 'keys': OrderedDict(), 'hits': 0, 'misses': 0}
+
+
+def jwk_cache_clear():
+    """ drop all cached account keys and reset counters """
+    with JWK_CACHE['lock']:
+        JWK_CACHE['keys'].clear()
+        JWK_CACHE['hits'] = 0
+        JWK_CACHE['misses'] = 0
+
+
+def jwk_cache_invalidate(aname):
+    """ drop cached key of an account (key-change, deactivation) """
+    with JWK_CACHE['lock']:
+        JWK_CACHE['keys'].pop(aname, None)
+
+
+def jwk_cache_stats():
+    """ get cache hit/miss counters """
+    with JWK_CACHE['lock']:
+        result = {'hits': JWK_CACHE['hits'], 'misses': JWK_CACHE['misses'], 'size': len(JWK_CACHE['keys'])}
+    return result
+
+
 class Signature(object):
     """ Signature handler """
 
@@ -14,13 +43,57 @@ class Signature(object):
         self.logger = logger
         self.dbstore = DBstore(self.debug, self.logger)
         self.server_name = srv_name
+        self.jwk_cache_size = 1000
+        # opt-in: other worker processes would accept a changed or deactivated key until the cache entry expires
+        self.jwk_cache_ttl = 0
         cfg = load_config()
+        if 'Signature' in cfg:
+            try:
+                self.jwk_cache_size = int(cfg['Signature'].get('jwk_cache_size', self.jwk_cache_size))
+                self.jwk_cache_ttl = int(cfg['Signature'].get('jwk_cache_ttl', self.jwk_cache_ttl))
+            except Exception as err_:
+                self.logger.error('Signature.__init__(): failed to parse jwk_cache_size/jwk_cache_ttl: {0}'.format(err_))
         if 'Directory' in cfg:
             if 'url_prefix' in cfg['Directory']:
                 self.revocation_path = cfg['Directory']['url_prefix'] + '/acme/revokecert'
             else:
                 self.revocation_path = '/acme/revokecert'
 
+    def _jwk_get(self, aname):
+        """ get parsed key of an account from cache or database """
+        self.logger.debug('Signature._jwk_get({0})'.format(aname))
+        now = time.monotonic()
+        with JWK_CACHE['lock']:
+            entry = JWK_CACHE['keys'].get(aname)
+            if entry and entry['expires'] > now:
+                JWK_CACHE['keys'].move_to_end(aname)
+                JWK_CACHE['hits'] += 1
+                pub_key = entry['jwk']
+            else:
+                JWK_CACHE['misses'] += 1
+                pub_key = None
+
+        if not pub_key:
+            pub_key = self._jwk_load(aname)
+            if pub_key:
+                try:
+                    jwkey = jwk.JWK(**pub_key)
+                except Exception as err_:
+                    # leave error handling to signature_check()
+                    self.logger.debug('Signature._jwk_get(): key parsing failed: {0}'.format(err_))
+                    jwkey = None
+                if jwkey:
+                    if self.jwk_cache_size > 0 and self.jwk_cache_ttl > 0:
+                        with JWK_CACHE['lock']:
+                            JWK_CACHE['keys'][aname] = {'jwk': jwkey, 'expires': now + self.jwk_cache_ttl}
+                            JWK_CACHE['keys'].move_to_end(aname)
+                            while len(JWK_CACHE['keys']) > self.jwk_cache_size:
+                                JWK_CACHE['keys'].popitem(last=False)
+                    pub_key = jwkey
+
+        self.logger.debug('Signature._jwk_get() ended')
+        return pub_key
+
     def _jwk_load(self, kid):
         """ get key for a specific account id """
         self.logger.debug('Signature._jwk_load({0})'.format(kid))
@@ -33,14 +106,14 @@ class Signature(object):
         return result
 
     def check(self, aname, content, use_emb_key=False, protected=None):
-        """ signature check """
+        """ signature check - content can be a serialized or an already deserialized jws """
         self.logger.debug('Signature.check({0})'.format(aname))
         result = False
         if content:
             error = None
             if aname:
                 self.logger.debug('check signature against account key')
-                pub_key = self._jwk_load(aname)
+                pub_key = self._jwk_get(aname)
                 if pub_key:
                     (result, error) = signature_check(self.logger, content, pub_key)
                 else:
@@ -61,7 +134,7 @@ class Signature(object):
         return(result, error, None)
 
     def eab_check(self, content, mac_key):
-        """ signature check """
+        """ signature check - content can be a serialized or an already deserialized jws """
         self.logger.debug('Signature.eab_check()')
         result = False
         error = None
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" tls-alpn-01 challenge validation (rfc8737) """
+from __future__ import print_function
+import ssl
+import threading
+import socks
+from cryptography import x509
+from cryptography.x509.oid import ExtensionOID
+from acme_srv.helper import happy_eyeballs_connect, proxystring_convert
+
+# protocol to be negotiated during the tls handshake
+ALPN_PROTOCOL = 'acme-tls/1'
+# id-pe-acmeIdentifier
+ACME_IDENTIFIER_OID = x509.ObjectIdentifier('1.3.6.1.5.5.7.1.31')
+
+# process wide ssl context - safe to be shared between threads
+TLS_CONTEXT = {'lock': threading.Lock(), 'context': None}
+
+
+def tls_context_get():
+    """ get ssl context offering acme-tls/1 only """
+    with TLS_CONTEXT['lock']:
+        if not TLS_CONTEXT['context']:
+            context = ssl.create_default_context()
+            # the validation certificate is self-signed
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            # reject insecure ssl versions - minimum_version is not available before python 3.7
+            context.options |= ssl.OP_NO_SSLv3 | ssl.OP_NO_TLSv1 | ssl.OP_NO_TLSv1_1
+            context.set_alpn_protocols([ALPN_PROTOCOL])
+            TLS_CONTEXT['context'] = context
+    return TLS_CONTEXT['context']
+
+
+def tls_alpn_cert_get(logger, hostname, port=443, proxy_server=None, address_list=None, timeout=5):
+    """ negotiate acme-tls/1 and get the server certificate in DER format """
+    logger.debug('tls_alpn_cert_get({0}:{1})'.format(hostname, port))
+
+    der_cert = None
+    sock = None
+    try:
+        if address_list and not proxy_server:
+            sock = happy_eyeballs_connect(address_list, port, timeout)
+        else:
+            sock = socks.socksocket()
+            if proxy_server:
+                (proxy_proto, proxy_addr, proxy_port) = proxystring_convert(logger, proxy_server)
+                if proxy_proto and proxy_addr and proxy_port:
+                    logger.debug('tls_alpn_cert_get() configure proxy')
+                    sock.setproxy(proxy_proto, proxy_addr, port=proxy_port)
+            sock.settimeout(timeout)
+            sock.connect((hostname, port))
+        # timeout applies to the handshake as well
+        sock.settimeout(timeout)
+        with tls_context_get().wrap_socket(sock, server_hostname=hostname) as sslsock:
+            protocol = sslsock.selected_alpn_protocol()
+            logger.debug('tls_alpn_cert_get() {0}:{1} version: {2} alpn: {3}'.format(hostname, port, sslsock.version(), protocol))
+            if protocol == ALPN_PROTOCOL:
+                der_cert = sslsock.getpeercert(True)
+            else:
+                logger.error('tls_alpn_cert_get() {0} not negotiated: {1}'.format(ALPN_PROTOCOL, protocol))
+    except Exception as err_:
+        logger.error('tls_alpn_cert_get() failed with: {0}'.format(err_))
+        der_cert = None
+    finally:
+        if sock:
+            sock.close()
+
+    logger.debug('tls_alpn_cert_get() ended with: {0}'.format(bool(der_cert)))
+    return der_cert
+
+
+def tls_alpn_cert_parse(logger, der_cert, fqdn):
+    """ get dns names and acmeIdentifier of a DER certificate - returns (san_list, acme_identifier) """
+    logger.debug('tls_alpn_cert_parse({0})'.format(fqdn))
+
+    san_list = []
+    acme_identifier = None
+    try:
+        cert = x509.load_der_x509_certificate(der_cert)
+        for extension in cert.extensions:
+            if extension.oid == ExtensionOID.SUBJECT_ALTERNATIVE_NAME:
+                # rfc8737 section 3: the dNSName being validated and no other entries
+                name_list = list(extension.value)
+                if len(name_list) == 1 and isinstance(name_list[0], x509.DNSName) and name_list[0].value.lower() == fqdn.lower():
+                    san_list.append('DNS:{0}'.format(name_list[0].value))
+                else:
+                    logger.error('tls_alpn_cert_parse() subjectAltName must contain {0} only: {1}'.format(fqdn, name_list))
+            elif extension.oid == ACME_IDENTIFIER_OID:
+                # rfc8737 section 3: the acmeIdentifier extension must be critical
+                if extension.critical:
+                    # DER encoded octet string containing the sha256 digest of the key authorization
+                    acme_identifier = extension.value.value
+                else:
+                    logger.error('tls_alpn_cert_parse() acmeIdentifier extension is not critical')
+    except Exception as err_:
+        logger.error('tls_alpn_cert_parse() failed with: {0}'.format(err_))
+
+    logger.debug('tls_alpn_cert_parse() ended with: {0}'.format(san_list))
+    return (san_list, acme_identifier)
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" ValidationQueue class """
+from __future__ import print_function
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# process wide validation queues
+VALIDATION_QUEUE = {'lock': threading.Lock(), 'queues': {}}
+
+
+class ValidationQueue(object):
+    """ bounded job queue processed by a pool of worker threads """
+
+    def __init__(self, logger, name='challenge', workers=4, max_size=1000):
+        self.logger = logger
+        self.name = name
+        self.workers = workers
+        self.job_queue = queue.Queue(maxsize=max_size)
+        self.lock = threading.Lock()
+        # keys of queued or running jobs - a job gets queued only once
+        self.pending_set = set()
+        self.thread_list = []
+        self.metrics_dic = {'enqueued': 0, 'rejected': 0, 'processed': 0, 'failed': 0, 'in_flight': 0, 'wait_time_total': 0.0, 'wait_time_max': 0.0, 'run_time_total': 0.0, 'run_time_max': 0.0}
+
+    def _worker(self):
+        """ process jobs until receiving None """
+        while True:
+            job = self.job_queue.get()
+            if job is None:
+                self.job_queue.task_done()
+                break
+            (key, func, args, enqueued) = job
+            started = time.monotonic()
+            with self.lock:
+                self.metrics_dic['in_flight'] += 1
+            failed = False
+            try:
+                func(*args)
+            except Exception as err_:
+                self.logger.error('ValidationQueue._worker(): {0} job {1} failed: {2}'.format(self.name, key, err_))
+                failed = True
+            finished = time.monotonic()
+            with self.lock:
+                self.pending_set.discard(key)
+                self.metrics_dic['in_flight'] -= 1
+                self.metrics_dic['processed'] += 1
+                if failed:
+                    self.metrics_dic['failed'] += 1
+                self.metrics_dic['wait_time_total'] += started - enqueued
+                self.metrics_dic['wait_time_max'] = max(self.metrics_dic['wait_time_max'], started - enqueued)
+                self.metrics_dic['run_time_total'] += finished - started
+                self.metrics_dic['run_time_max'] = max(self.metrics_dic['run_time_max'], finished - started)
+            self.job_queue.task_done()
+
+    def start(self):
+        """ start worker threads """
+        self.logger.debug('ValidationQueue.start({0}: {1})'.format(self.name, self.workers))
+        with self.lock:
+            if not self.thread_list:
+                for cnt in range(self.workers):
+                    thread = threading.Thread(target=self._worker, name='{0}-validation-{1}'.format(self.name, cnt), daemon=True)
+                    thread.start()
+                    self.thread_list.append(thread)
+
+    def stop(self, timeout=None):
+        """ let workers finish queued jobs and terminate """
+        self.logger.debug('ValidationQueue.stop({0})'.format(self.name))
+        with self.lock:
+            thread_list = self.thread_list
+            self.thread_list = []
+        for _thread in thread_list:
+            self.job_queue.put(None)
+        for thread in thread_list:
+            thread.join(timeout)
+
+    def submit(self, key, func, *args):
+        """ queue job - returns False if the queue is full or job is already queued """
+        self.logger.debug('ValidationQueue.submit({0}: {1})'.format(self.name, key))
+        with self.lock:
+            if key in self.pending_set:
+                self.logger.debug('ValidationQueue.submit(): {0} job {1} already queued'.format(self.name, key))
+                return False
+            try:
+                self.job_queue.put_nowait((key, func, args, time.monotonic()))
+            except queue.Full:
+                self.metrics_dic['rejected'] += 1
+                self.logger.warning('ValidationQueue.submit(): {0} queue full. Rejecting job {1}'.format(self.name, key))
+                return False
+            self.pending_set.add(key)
+            self.metrics_dic['enqueued'] += 1
+        return True
+
+    def pending(self, key):
+        """ check if job is queued or running """
+        with self.lock:
+            return key in self.pending_set
+
+    def stats(self):
+        """ queue depth and latency metrics """
+        with self.lock:
+            stats_dic = dict(self.metrics_dic)
+        stats_dic['depth'] = self.job_queue.qsize()
+        stats_dic['workers'] = self.workers
+        if stats_dic['processed']:
+            stats_dic['wait_time_avg'] = stats_dic['wait_time_total'] / stats_dic['processed']
+            stats_dic['run_time_avg'] = stats_dic['run_time_total'] / stats_dic['processed']
+        else:
+            stats_dic['wait_time_avg'] = 0.0
+            stats_dic['run_time_avg'] = 0.0
+        return stats_dic
+
+
+class SingleFlight(object):
+    """ run a function only once per key at a time - concurrent callers wait for and share the result """
+
+    def __init__(self, backoff=0, max_entries=10000):
+        # seconds a key is considered as recently finished
+        self.backoff = backoff
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # key -> {'event': threading.Event, 'result': result}
+        self.flight_dic = {}
+        # key -> finished timestamp
+        self.finished = OrderedDict()
+        self.metrics_dic = {'executed': 0, 'shared': 0, 'suppressed': 0}
+
+    def recent(self, key):
+        """ check if a call for key finished within the back-off period """
+        result = False
+        if self.backoff > 0:
+            with self.lock:
+                finished = self.finished.get(key)
+                if finished and finished + self.backoff > time.monotonic():
+                    self.metrics_dic['suppressed'] += 1
+                    result = True
+        return result
+
+    def run(self, key, func, *args, track=True):
+        """ call func or wait for the call already running for key - returns (result, executed)
+            track=False does not start a back-off period for key """
+        with self.lock:
+            flight = self.flight_dic.get(key)
+            if flight:
+                self.metrics_dic['shared'] += 1
+                leader = False
+            else:
+                flight = {'event': threading.Event(), 'result': None}
+                self.flight_dic[key] = flight
+                leader = True
+
+        if not leader:
+            flight['event'].wait()
+            return (flight['result'], False)
+
+        try:
+            flight['result'] = func(*args)
+        finally:
+            now = time.monotonic()
+            with self.lock:
+                del self.flight_dic[key]
+                self.metrics_dic['executed'] += 1
+                if self.backoff > 0 and track:
+                    self.finished[key] = now
+                    self.finished.move_to_end(key)
+                    # entries are ordered by finish time
+                    while self.finished and (len(self.finished) > self.max_entries or next(iter(self.finished.values())) + self.backoff <= now):
+                        self.finished.popitem(last=False)
+            flight['event'].set()
+        return (flight['result'], True)
+
+    def stats(self):
+        """ number of executed, shared and suppressed calls """
+        with self.lock:
+            stats_dic = dict(self.metrics_dic)
+            stats_dic['in_flight'] = len(self.flight_dic)
+        return stats_dic
+
+
+def validation_queue_get(logger, name='challenge', workers=4, max_size=1000):
+    """ get process wide validation queue - workers get started on first use """
+    with VALIDATION_QUEUE['lock']:
+        if name not in VALIDATION_QUEUE['queues']:
+            validation_queue = ValidationQueue(logger, name, workers, max_size)
+            validation_queue.start()
+            VALIDATION_QUEUE['queues'][name] = validation_queue
+    return VALIDATION_QUEUE['queues'][name]
+
+
+def validation_queue_stats():
+    """ metrics of all validation queues of this process """
+    with VALIDATION_QUEUE['lock']:
+        queue_dic = dict(VALIDATION_QUEUE['queues'])
+    return {name: validation_queue.stats() for (name, validation_queue) in queue_dic.items()}
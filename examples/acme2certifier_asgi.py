@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# pylint: disable=E0401
+""" asgi based acme server - serves the url map of acme2certifier_wsgi.py on an asyncio event loop """
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from acme2certifier_wsgi import CONFIG, LOGGER, application as wsgi_application
+
+
+def executor_config_load(config_dic):
+    """ load number of threads running the synchronous request handlers """
+    threads = 20
+    if 'Server' in config_dic:
+        try:
+            threads = int(config_dic.get('Server', 'executor_threads', fallback=threads))
+        except Exception as err_:
+            LOGGER.error('executor_config_load(): failed to parse executor_threads: {0}'.format(err_))
+    return threads
+
+
+# bounded pool for the synchronous handlers - pending requests wait on the event loop instead of occupying a thread
+EXECUTOR = ThreadPoolExecutor(max_workers=executor_config_load(CONFIG))
+
+
+def environ_build(scope, body):
+    """ build wsgi environment from asgi connection scope """
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_PROTOCOL': 'HTTP/{0}'.format(scope.get('http_version', '1.1')),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    (environ['SERVER_NAME'], environ['SERVER_PORT']) = scope.get('server') or ('localhost', 80)
+    environ['SERVER_PORT'] = str(environ['SERVER_PORT'])
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    else:
+        environ['REMOTE_ADDR'] = ''
+
+    for (name, value) in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = 'HTTP_{0}'.format(name)
+        if name in environ:
+            value = '{0},{1}'.format(environ[name], value)
+        environ[name] = value
+    return environ
+
+
+def wsgi_call(environ):
+    """ run synchronous handler and collect the response """
+    response_dic = {}
+
+    def _start_response(status, headers, _exc_info=None):
+        response_dic['status'] = int(status.split(' ', 1)[0])
+        response_dic['headers'] = [(name.lower().encode('latin1'), value.encode('latin1')) for (name, value) in headers]
+
+    result = wsgi_application(environ, _start_response)
+    try:
+        response_dic['body'] = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response_dic
+
+
+async def lifespan(receive, send):
+    """ handle asgi lifespan events """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            EXECUTOR.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ The main ASGI application """
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+    loop = asyncio.get_running_loop()
+    response_dic = await loop.run_in_executor(EXECUTOR, wsgi_call, environ_build(scope, body))
+
+    await send({'type': 'http.response.start', 'status': response_dic['status'], 'headers': response_dic['headers']})
+    await send({'type': 'http.response.body', 'body': response_dic['body']})
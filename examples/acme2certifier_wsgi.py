@@ -3,10 +3,16 @@
 # pylint: disable=E0401, R1705
 """ wsgi based acme server """
 from __future__ import print_function
-import re
+import functools
 import json
+import os
+import signal
+import socket
 import sys
-from wsgiref.simple_server import make_server, WSGIRequestHandler
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import make_server, WSGIRequestHandler, WSGIServer
 from acme_srv.account import Account
 from acme_srv.acmechallenge import Acmechallenge
 from acme_srv.authorization import Authorization
@@ -16,9 +22,15 @@ from acme_srv.directory import Directory
 from acme_srv.housekeeping import Housekeeping
 from acme_srv.nonce import Nonce
 from acme_srv.order import Order
+from acme_srv.router import Router
 from acme_srv.trigger import Trigger
-from acme_srv.helper import get_url, load_config, logger_setup, logger_info
+from acme_srv.helper import config_cache_clear, get_url, load_config, logger_setup, logger_info
 from acme_srv.version import __dbversion__, __version__
+try:
+    # database connections must not be shared with forked worker processes
+    from acme_srv.db_handler import connections_close
+except ImportError:
+    connections_close = None
 
 # load config to set debug mode
 CONFIG = load_config()
@@ -194,8 +206,8 @@ def cert(environ, start_response):
 
             # logging
             logger_info(LOGGER, environ['REMOTE_ADDR'], environ['PATH_INFO'], response_dic)
-            # send response
-            return [response_dic['data']]
+            # send response - wsgi requires the body as bytes
+            return [response_dic['data'].encode('utf-8')]
 
         else:
             start_response('405 {0}'.format(HTTP_CODE_DIC[405]), [('Content-Type', 'application/json')])
@@ -343,41 +355,45 @@ def not_found(_environ, start_response):
     return [json.dumps({'status': 404, 'message': HTTP_CODE_DIC[404], 'detail': 'Not Found'}).encode('utf-8')]
 
 
-# map urls to functions
+# map urls to functions: (path, callback, prefix match)
 URLS = [
-    (r'^$', directory),
-    (r'^acme/acct', acct),
-    (r'^acme/authz', authz),
-    (r'^acme/cert', cert),
-    (r'^acme/chall', chall),
-    (r'^acme/key-change', acct),
-    (r'^acme/newaccount$', newaccount),
-    (r'^acme/newnonce$', newnonce),
-    (r'^acme/neworders$', neworders),
-    (r'^acme/order', order),
-    (r'^acme/revokecert', revokecert),
-    (r'^directory?$', directory),
-    (r'^trigger', trigger)]
-
+    ('', directory, False),
+    ('acme/acct', acct, True),
+    ('acme/authz', authz, True),
+    ('acme/cert', cert, True),
+    ('acme/chall', chall, True),
+    ('acme/key-change', acct, True),
+    ('acme/newaccount', newaccount, False),
+    ('acme/newnonce', newnonce, False),
+    ('acme/neworders', neworders, False),
+    ('acme/order', order, True),
+    ('acme/revokecert', revokecert, True),
+    ('directory', directory, False),
+    ('trigger', trigger, True)]
+
+
+def router_build(config_dic):
+    """ build url router once at startup """
+    url_prefix = None
+    if 'Directory' in config_dic and 'url_prefix' in config_dic['Directory']:
+        url_prefix = config_dic['Directory']['url_prefix']
+    router = Router(LOGGER, url_prefix, not_found)
+    for (path, callback, prefix) in URLS:
+        router.add(path, callback, prefix)
+    # check if we need to activate the url pattern for challenge verification
+    if 'CAhandler' in config_dic and 'acme_url' in config_dic['CAhandler']:
+        router.add('.well-known/acme-challenge', acmechallenge_serve, True)
+    return router
 
-def application(environ, start_response):
-    ''' The main WSGI application if nothing matches call the not_found function.'''
 
-    # check if we need to activate the url pattern for challenge verification
-    if 'CAhandler' in CONFIG and 'acme_url' in CONFIG['CAhandler']:
-        URLS.append((r'^.well-known/acme-challenge/', acmechallenge_serve))
+ROUTER = router_build(CONFIG)
 
-    prefix = '/'
-    if 'Directory' in CONFIG and 'url_prefix' in CONFIG['Directory']:
-        prefix = CONFIG['Directory']['url_prefix'] + '/'
-    path = environ.get('PATH_INFO', '').lstrip(prefix)
 
-    for regex, callback in URLS:
-        match = re.search(regex, path)
-        if match is not None:
-            environ['myapp.url_args'] = match.groups()
-            return callback(environ, start_response)
-    return not_found(environ, start_response)
+def application(environ, start_response):
+    ''' The main WSGI application if nothing matches call the not_found function.'''
+    callback = ROUTER.dispatch(environ.get('PATH_INFO', ''))
+    environ['myapp.url_args'] = ()
+    return callback(environ, start_response)
 
 
 def get_handler_cls():
@@ -393,11 +409,143 @@ def get_handler_cls():
     return Acme2certiferhandler
 
 
+class Acme2certifierServer(WSGIServer):
+    """ wsgi server handling requests by a pool of threads """
+
+    # listen backlog - connections wait here while all threads are busy
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, threads=1, reuse_port=False):
+        self.reuse_port = reuse_port
+        self.executor = None
+        self.pending = None
+        if threads > 1:
+            self.executor = ThreadPoolExecutor(max_workers=threads)
+            # limit accepted connections waiting for a thread - further ones stay in the listen backlog
+            self.pending = threading.BoundedSemaphore(threads * 2)
+        WSGIServer.__init__(self, server_address, handler_class)
+
+    def server_bind(self):
+        """ allow several worker processes to bind to the same port """
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        WSGIServer.server_bind(self)
+
+    def process_request(self, request, client_address):
+        """ hand request over to thread pool """
+        if self.executor:
+            self.pending.acquire()
+            try:
+                self.executor.submit(self.process_request_thread, request, client_address)
+            except Exception:
+                self.pending.release()
+                raise
+        else:
+            WSGIServer.process_request(self, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        """ handle request within a pool thread """
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.pending.release()
+
+    def server_close(self):
+        """ wait for pending requests """
+        WSGIServer.server_close(self)
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
+
+def server_config_load(config_dic):
+    """ load server settings from config file """
+    server_dic = {'host': '0.0.0.0', 'port': 80, 'threads': 1, 'workers': 1}
+    if 'Server' in config_dic:
+        server_dic['host'] = config_dic.get('Server', 'host', fallback=server_dic['host'])
+        for option in ('port', 'threads', 'workers'):
+            try:
+                server_dic[option] = int(config_dic.get('Server', option, fallback=server_dic[option]))
+            except Exception as err_:
+                LOGGER.error('server_config_load(): failed to parse {0}: {1}'.format(option, err_))
+    if server_dic['workers'] > 1 and not (hasattr(os, 'fork') and hasattr(socket, 'SO_REUSEPORT')):
+        LOGGER.error('server_config_load(): worker processes are not supported on this platform. Using a single process.')
+        server_dic['workers'] = 1
+    return server_dic
+
+
+def server_run(server_dic, reuse_port=False):
+    """ serve requests until termination """
+    srv = make_server(server_dic['host'], server_dic['port'], application, server_class=functools.partial(Acme2certifierServer, threads=server_dic['threads'], reuse_port=reuse_port), handler_class=get_handler_cls())
+    try:
+        srv.serve_forever()
+    finally:
+        srv.server_close()
+
+
+def workers_run(server_dic):
+    """ pre-fork worker processes sharing the listening port via SO_REUSEPORT """
+    worker_list = []
+    state_dic = {'stopping': False}
+
+    def _worker_start():
+        pid = os.fork()
+        if pid == 0:
+            # worker process
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, lambda _signum, _frame: config_cache_clear())
+            try:
+                server_run(server_dic, reuse_port=True)
+            finally:
+                os._exit(0)  # pylint: disable=W0212
+        worker_list.append(pid)
+
+    def _signal_forward(signum, _frame):
+        if signum != signal.SIGHUP:
+            state_dic['stopping'] = True
+        for pid in worker_list:
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    # do not hand over open database connections to the workers
+    if connections_close:
+        connections_close()
+
+    for _cnt in range(server_dic['workers']):
+        _worker_start()
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, _signal_forward)
+
+    while worker_list:
+        try:
+            (pid, status) = os.wait()
+        except ChildProcessError:
+            break
+        worker_list.remove(pid)
+        if not state_dic['stopping']:
+            LOGGER.error('worker process {0} terminated with status {1}. Restarting.'.format(pid, status))
+            # avoid a busy loop if workers keep failing
+            time.sleep(1)
+            _worker_start()
+
+
 if __name__ == '__main__':
 
     LOGGER.info('starting acme2certifier version {0}'.format(__version__))
-    SRV = make_server('0.0.0.0', 80, application, handler_class=get_handler_cls())
-    SRV.serve_forever()
+    SERVER_DIC = server_config_load(CONFIG)
+    LOGGER.info('listening on {0}:{1} with {2} worker process(es) and {3} thread(s) each'.format(SERVER_DIC['host'], SERVER_DIC['port'], SERVER_DIC['workers'], SERVER_DIC['threads']))
+    if SERVER_DIC['workers'] > 1:
+        workers_run(SERVER_DIC)
+    else:
+        # force a reload of acme_srv.cfg on SIGHUP
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda _signum, _frame: config_cache_clear())
+        server_run(SERVER_DIC)
 
 # start_response('403 {0}'.format(HTTP_CODE_DIC[403]), [('Content-Type', 'application/json')])
 # return [json.dumps({'status':403, 'message':HTTP_CODE_DIC[403], 'detail': 'we are not there yet'})]
@@ -6,6 +6,8 @@ from __future__ import print_function
 import os
 import sys
 import json
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
 
 def initialize():  # nopep8
@@ -19,8 +21,9 @@ def initialize():  # nopep8
 
 initialize()
 from django.conf import settings  # nopep8
+from django.db import connection, transaction  # nopep8
+from django.db.models import Exists, OuterRef, Subquery  # nopep8
 from acme_srv.models import Account, Authorization, Cahandler, Certificate, Challenge, Housekeeping, Nonce, Order, Status  # nopep8
-from django.db import transaction  # nopep8
 import acme_srv.monkey_patches  # nopep8 lgtm [py/unused-import]
 
 
@@ -118,12 +121,53 @@ class DBstore(object):
         self.logger.debug('auth_id({0})'.format(obj.id))
         return obj.id
 
+    def authorizations_add_bulk(self, data_list):
+        """ add a list of authorizations by using bulk_create() - returns names of the added authorizations """
+        self.logger.debug('DBStore.authorizations_add_bulk({0})'.format(len(data_list)))
+
+        # resolve order and status instances once for the whole list
+        order_dic = Order.objects.in_bulk({data_dic['order'] for data_dic in data_list if 'order' in data_dic})
+        status_dic = Status.objects.in_bulk({data_dic['status'] for data_dic in data_list if 'status' in data_dic}, field_name='name')
+        authz_list = []
+        for data_dic in data_list:
+            data_dic = dict(data_dic)
+            if 'order' in data_dic:
+                data_dic['order'] = order_dic[data_dic['order']]
+            if 'status' in data_dic:
+                data_dic['status'] = status_dic[data_dic['status']]
+            authz_list.append(Authorization(**data_dic))
+
+        if settings.DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+            self.logger.debug('DBStore.authorizations_add_bulk(): patching transaction to transform all atomic blocks into immediate transactions')
+            with transaction.atomic(immediate=True):
+                Authorization.objects.bulk_create(authz_list)
+        else:
+            with transaction.atomic():
+                Authorization.objects.bulk_create(authz_list)
+
+        self.logger.debug('DBStore.authorizations_add_bulk() ended with: {0}'.format(len(authz_list)))
+        return [authz.name for authz in authz_list]
+
     def authorization_lookup(self, mkey, value, vlist=('type', 'value')):
         """ search account for a given id """
         self.logger.debug('authorization_lookup({0}:{1}:{2})'.format(mkey, value, vlist))
         authz_list = Authorization.objects.filter(**{mkey: value}).values(*vlist)[::1]
         return authz_list
 
+    def authorization_view(self, authz_name, vlist=('name', 'type', 'value', 'token', 'expires', 'status__name')):
+        """ get authorization along with its challenges by using a single query """
+        self.logger.debug('DBStore.authorization_view({0})'.format(authz_name))
+        row_list = Authorization.objects.filter(name=authz_name).values(*vlist, 'challenge__name', 'challenge__type', 'challenge__token', 'challenge__status__name').order_by('challenge__id')
+        result = None
+        for row in row_list:
+            if result is None:
+                result = {ele: row[ele] for ele in vlist}
+                result['challenges'] = []
+            if row['challenge__name']:
+                result['challenges'].append({'name': row['challenge__name'], 'type': row['challenge__type'], 'token': row['challenge__token'], 'status__name': row['challenge__status__name']})
+        self.logger.debug('DBStore.authorization_view() ended with: {0}'.format(bool(result)))
+        return result
+
     def authorizations_expired_search(self, mkey, value, vlist=('id', 'name', 'expires', 'identifiers', 'created_at', 'status__id', 'status__name', 'account__id', 'account__name', 'acccount__contact'), operant='LIKE'):
         """ search order table for a certain key/value pair """
         self.logger.debug('DBStore.authorizations_invalid_search(column:{0}, pattern:{1})'.format(mkey, value))
@@ -200,6 +244,28 @@ class DBstore(object):
         self.logger.debug('DBStore.challenge_add({0}:{1}:{2})'.format(value, mtype, obj.id))
         return obj.id
 
+    def challenges_add(self, data_list):
+        """ add a list of challenges by using bulk_create() - returns names of the added challenges """
+        self.logger.debug('DBStore.challenges_add({0})'.format(len(data_list)))
+
+        authz_dic = Authorization.objects.in_bulk({data_dic['authorization'] for data_dic in data_list}, field_name='name')
+        status_dic = {status.id: status for status in Status.objects.filter(id__in={data_dic.get('status', 2) for data_dic in data_list})}
+        challenge_list = []
+        for data_dic in data_list:
+            if data_dic['authorization'] in authz_dic:
+                challenge_list.append(Challenge(**dict(data_dic, authorization=authz_dic[data_dic['authorization']], status=status_dic[data_dic.get('status', 2)])))
+
+        if settings.DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+            self.logger.debug('DBStore.challenges_add(): patching transaction to transform all atomic blocks into immediate transactions')
+            with transaction.atomic(immediate=True):
+                Challenge.objects.bulk_create(challenge_list)
+        else:
+            with transaction.atomic():
+                Challenge.objects.bulk_create(challenge_list)
+
+        self.logger.debug('DBStore.challenges_add() ended with: {0}'.format(len(challenge_list)))
+        return [challenge.name for challenge in challenge_list]
+
     def certificate_add(self, data_dic):
         """ add csr/certificate to database """
         self.logger.debug('DBStore.certificate_add()')
@@ -349,6 +415,28 @@ class DBstore(object):
         obj.save()
         return obj.id
 
+    def nonces_add(self, nonce_list):
+        """ add a batch of nonces in a single statement """
+        self.logger.debug('DBStore.nonces_add({0})'.format(len(nonce_list)))
+        Nonce.objects.bulk_create([Nonce(nonce=nonce) for nonce in nonce_list])
+
+    def nonces_expired_delete(self, uts, chunk_size=1000):
+        """ delete nonces created before uts in chunks
+        return: number of deleted nonces """
+        self.logger.debug('DBStore.nonces_expired_delete({0})'.format(uts))
+        timestamp = datetime.fromtimestamp(int(uts), tz=timezone.utc)
+        if not settings.USE_TZ:
+            timestamp = timestamp.replace(tzinfo=None)
+        result = 0
+        while True:
+            id_list = list(Nonce.objects.filter(created_at__lt=timestamp).values_list('id', flat=True)[:chunk_size])
+            if not id_list:
+                break
+            (deleted, _deleted_dic) = Nonce.objects.filter(id__in=id_list).delete()
+            result += deleted
+        self.logger.debug('DBStore.nonces_expired_delete() ended with: {0}'.format(result))
+        return result
+
     def nonce_check(self, nonce):
         """ ceck if nonce is in datbase
         in: nonce
@@ -357,6 +445,14 @@ class DBstore(object):
         nonce_list = Nonce.objects.filter(nonce=nonce).values('nonce')[:1]
         return bool(nonce_list)
 
+    def nonce_consume(self, nonce):
+        """ check and delete nonce in a single statement
+        in: nonce
+        return: true in case nonce existed and got deleted by this call, otherwise false """
+        self.logger.debug('DBStore.nonce_consume({0})'.format(nonce))
+        (deleted, _deleted_dic) = Nonce.objects.filter(nonce=nonce).delete()
+        return deleted > 0
+
     def nonce_delete(self, nonce):
         """ delete nonce from datbase
         in: nonce """
@@ -401,6 +497,33 @@ class DBstore(object):
         obj, _created = Order.objects.update_or_create(name=data_dic['name'], defaults=data_dic)
         obj.save()
 
+    def order_ready_set(self, order_name):
+        """ set a pending order to ready if all its authorizations are valid - returns True if the status got changed """
+        self.logger.debug('DBStore.order_ready_set({0})'.format(order_name))
+        authz_list = Authorization.objects.filter(order=OuterRef('pk'))
+        result = Order.objects.filter(name=order_name, status__name='pending').filter(Exists(authz_list)).exclude(Exists(authz_list.exclude(status__name='valid'))).update(status=Subquery(Status.objects.filter(name='ready').values('id')[:1]))
+        self.logger.debug('DBStore.order_ready_set() ended with: {0}'.format(result))
+        return result > 0
+
+    def order_view(self, order_name, vlist=('notbefore', 'notafter', 'identifiers', 'expires', 'status__name')):
+        """ get order along with name and status of its authorizations by using a single query """
+        self.logger.debug('DBStore.order_view({0})'.format(order_name))
+        row_list = Order.objects.filter(name=order_name).values(*vlist, 'authorization__name', 'authorization__status__name').order_by('authorization__id')
+        result = None
+        for row in row_list:
+            if result is None:
+                result = {}
+                for ele in vlist:
+                    if ele == 'status__name':
+                        result['status'] = row['status__name']
+                    else:
+                        result[ele] = row[ele]
+                result['authorizations'] = []
+            if row['authorization__name']:
+                result['authorizations'].append({'name': row['authorization__name'], 'status__name': row['authorization__status__name']})
+        self.logger.debug('DBStore.order_view() ended with: {0}'.format(result))
+        return result
+
     def orders_invalid_search(self, mkey, value, vlist=('id', 'name', 'expires', 'identifiers', 'created_at', 'status__id', 'status__name', 'account__id', 'account__name', 'acccount__contact'), operant='LIKE'):
         """ search order table for a certain key/value pair """
         self.logger.debug('DBStore.orders_search(column:{0}, pattern:{1})'.format(mkey, value))
@@ -408,3 +531,31 @@ class DBstore(object):
         if operant == '<=':
             mkey = '{0}__lte'.format(mkey)
         return Order.objects.filter(**{mkey: value}, status__id__gt=1).values(*vlist)
+
+    @contextmanager
+    def transaction(self):
+        """ transaction scope - all statements get committed once at the end of the outermost scope """
+        self.logger.debug('DBStore.transaction()')
+        # nested scopes do not create savepoints - a failure rolls back the outermost scope
+        if settings.DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+            # immediate transactions avoid lock upgrade failures on sqlite
+            atomic = transaction.atomic(savepoint=False, immediate=True)
+        else:
+            atomic = transaction.atomic(savepoint=False)
+        outermost = not connection.in_atomic_block
+        failed_list = []
+
+        def _statement_failure_mark(execute, sql, params, many, context):
+            """ remember failed statements - even if the caller handles the error """
+            try:
+                return execute(sql, params, many, context)
+            except Exception:
+                failed_list.append(sql)
+                raise
+
+        with atomic, connection.execute_wrapper(_statement_failure_mark):
+            yield self
+            if outermost and failed_list:
+                # atomic blocks within handler methods are savepoints which roll back the failed statement only
+                self.logger.error('DBStore.transaction(): rollback due to failed statement')
+                transaction.set_rollback(True)
@@ -4,9 +4,13 @@
 from __future__ import print_function
 import sqlite3
 import json
+import hashlib
 import os
+import sys
+import threading
+from contextlib import contextmanager
 # pylint: disable=E0401
-from acme_srv.helper import datestr_to_date, load_config
+from acme_srv.helper import datestr_to_date, load_config, uts_to_date_utc
 from acme_srv.version import __dbversion__
 
 
@@ -16,11 +20,76 @@ def initialize():
     pass
 
 
+# per-thread pool of long-lived database connections (one per database file)
+DB_POOL = threading.local()
+
+# indexes for hot lookup columns (name, table, column)
+INDEX_LIST = [
+    ('nonce_nonce_idx', 'nonce', 'nonce'),
+    ('orders_expires_idx', 'orders', 'expires'),
+    ('authorization_order_id_idx', 'authorization', 'order_id'),
+    ('authorization_expires_idx', 'authorization', 'expires'),
+    ('challenge_authorization_id_idx', 'challenge', 'authorization_id'),
+    ('certificate_order_id_idx', 'certificate', 'order_id'),
+    ('certificate_expire_uts_idx', 'certificate', 'expire_uts'),
+    ('certificate_csr_hash_idx', 'certificate', 'csr_hash'),
+    ('certificate_cert_raw_hash_idx', 'certificate', 'cert_raw_hash'),
+]
+
+# large text columns which get looked up via a sha256 hash column
+HASH_COLUMN_LIST = ['csr', 'cert_raw']
+
+
 def dict_from_row(row):
     """ small helper to convert the output of a "select" command into a dictionary """
     return dict(zip(row.keys(), row))
 
 
+def connections_close():
+    """ close all database connections pooled by the calling thread """
+    for connection_dic in getattr(DB_POOL, 'connections', {}).values():
+        try:
+            connection_dic['dbs'].close()
+        except Exception:
+            pass
+    DB_POOL.connections = {}
+
+
+class PooledCursor(sqlite3.Cursor):
+    """ cursor rolling back failed statements - pooled connections must not keep half-done writes """
+    connection_dic = None
+
+    def _failed(self):
+        """ roll back - inside a transaction scope the whole scope gets rolled back at its end """
+        if self.connection_dic['depth']:
+            self.connection_dic['rollback_only'] = True
+        else:
+            self.connection.rollback()
+
+    def execute(self, *args, **kwargs):
+        """ execute statement """
+        try:
+            return super().execute(*args, **kwargs)
+        except Exception:
+            self._failed()
+            raise
+
+    def executemany(self, *args, **kwargs):
+        """ execute statement for a sequence of parameters """
+        try:
+            return super().executemany(*args, **kwargs)
+        except Exception:
+            self._failed()
+            raise
+
+
+def sha256_hex(value):
+    """ sha256 hash of a text column value (registered as sql-function) """
+    if value is None:
+        return None
+    return hashlib.sha256(str(value).encode('utf-8')).hexdigest()
+
+
 class DBstore(object):
     """ helper to do datebase operations """
 
@@ -31,24 +100,35 @@ class DBstore(object):
         self.logger = logger
         self.dbs = None
         self.cursor = None
+        self.pragma_dic = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000}
+        self.statement_cache_size = 256
+        cfg = load_config()
         if not self.db_name:
-            cfg = load_config()
             if 'DBhandler' in cfg and 'dbfile' in cfg['DBhandler']:
                 db_name = cfg['DBhandler']['dbfile']
             else:
                 db_name = os.path.dirname(__file__) + '/' + 'acme_srv.db'
+        if 'DBhandler' in cfg:
+            for pragma in self.pragma_dic:
+                if pragma in cfg['DBhandler']:
+                    self.pragma_dic[pragma] = cfg['DBhandler'][pragma]
+            if 'statement_cache_size' in cfg['DBhandler']:
+                try:
+                    self.statement_cache_size = int(cfg['DBhandler']['statement_cache_size'])
+                except Exception as err:
+                    self.logger.error('DBStore.__init__(): failed to parse statement_cache_size: {0}'.format(err))
 
         self.db_name = db_name
 
         if not os.path.exists(self.db_name):
             self._db_create()
 
-    def _account_search(self, column, string):
+    def _account_search(self, column, string, operant='='):
         """ search account table for a certain key/value pair """
         self.logger.debug('DBStore._account_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
         try:
-            pre_statement = 'SELECT * from account WHERE {0} LIKE ?'.format(column)
+            pre_statement = 'SELECT * from account WHERE {0} {1} ?'.format(column, operant)
             self.cursor.execute(pre_statement, [string])
             result = self.cursor.fetchone()
         except Exception as err:
@@ -57,7 +137,7 @@ class DBstore(object):
         self.logger.debug('DBStore._account_search() ended with: {0}'.format(bool(result)))
         return result
 
-    def _authorization_search(self, column, string):
+    def _authorization_search(self, column, string, operant='='):
         """ search account table for a certain key/value pair """
         self.logger.debug('DBStore._authorization_search(column:{0}, pattern:{1})'.format(column, string))
         if column == 'name':
@@ -75,7 +155,7 @@ class DBstore(object):
                         LEFT JOIN orders on orders.id = authorization.order_id
                         LEFT JOIN status on status.id = authorization.status_id
                         LEFT JOIN account on account.id = orders.account_id
-                        WHERE {0} LIKE ?'''.format(column)
+                        WHERE {0} {1} ?'''.format(column, operant)
         try:
             self.cursor.execute(pre_statement, [string])
             result = self.cursor.fetchall()
@@ -85,11 +165,11 @@ class DBstore(object):
         self.logger.debug('DBStore._authorization_search() ended')
         return result
 
-    def _cahandler_search(self, column, string):
+    def _cahandler_search(self, column, string, operant='='):
         """ search cahandler table for a certain key/value pair """
         self.logger.debug('DBStore._cahandler_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
-        pre_statement = '''SELECT cahandler.* from cahandler WHERE {0} LIKE ?'''.format(column)
+        pre_statement = '''SELECT cahandler.* from cahandler WHERE {0} {1} ?'''.format(column, operant)
         try:
             self.cursor.execute(pre_statement, [string])
             result = self.cursor.fetchone()
@@ -100,14 +180,21 @@ class DBstore(object):
         self.logger.debug('DBStore._cahandler_search() ended')
         return result
 
-    def _certificate_search(self, column, string):
+    def _certificate_search(self, column, string, operant='='):
         """ search certificate table for a certain key/value pair """
         self.logger.debug('DBStore._certificate_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
 
-        if column != 'order__name':
-            column = 'certificate.{0}'.format(column)
-            self.logger.debug('modified column to {0}'.format(column))
+        if column in HASH_COLUMN_LIST and operant == '=':
+            # lookup via fixed-width hash column instead of comparing the full blob
+            where_clause = 'certificate.{0}_hash = ? AND certificate.{0} = ?'.format(column)
+            param_list = [sha256_hex(string), string]
+        else:
+            if column != 'order__name':
+                column = 'certificate.{0}'.format(column)
+                self.logger.debug('modified column to {0}'.format(column))
+            where_clause = '{0} {1} ?'.format(column, operant)
+            param_list = [string]
 
         pre_statement = '''SELECT certificate.*,
                             orders.id as order__id,
@@ -117,14 +204,14 @@ class DBstore(object):
                             from certificate
                             INNER JOIN orders on orders.id = certificate.order_id
                             INNER JOIN account on account.id = orders.account_id
-                            WHERE {0} LIKE ?'''.format(column)
-        self.cursor.execute(pre_statement, [string])
+                            WHERE {0}'''.format(where_clause)
+        self.cursor.execute(pre_statement, param_list)
         result = self.cursor.fetchone()
         self._db_close()
         self.logger.debug('DBStore._certificate_search() ended')
         return result
 
-    def _challenge_search(self, column, string):
+    def _challenge_search(self, column, string, operant='='):
         """ search challenge table for a certain key/value pair """
         self.logger.debug('DBStore._challenge_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
@@ -145,7 +232,7 @@ class DBstore(object):
             INNER JOIN authorization on authorization.id = challenge.authorization_id
             INNER JOIN orders on orders.id = authorization.order_id
             INNER JOIN account on account.id = orders.account_id
-            WHERE challenge.{0} LIKE ?'''.format(column)
+            WHERE challenge.{0} {1} ?'''.format(column, operant)
         try:
             self.cursor.execute(pre_statement, [string])
             result = self.cursor.fetchone()
@@ -155,11 +242,30 @@ class DBstore(object):
         self.logger.debug('DBStore._challenge_search() ended')
         return result
 
+    def _connection_get(self):
+        """ get pooled connection of the current thread - (re)connect if needed """
+        if not hasattr(DB_POOL, 'connections'):
+            DB_POOL.connections = {}
+        connection_dic = DB_POOL.connections.get(self.db_name)
+        file_id = self._db_file_id()
+        if connection_dic and (not file_id or connection_dic['file_id'] != file_id):
+            # database file got deleted or replaced
+            try:
+                connection_dic['dbs'].close()
+            except Exception:
+                pass
+            connection_dic = None
+        if not connection_dic:
+            dbs = self._db_connect()
+            connection_dic = {'dbs': dbs, 'file_id': self._db_file_id(), 'depth': 0, 'rollback_only': False}
+            DB_POOL.connections[self.db_name] = connection_dic
+        return connection_dic
+
     def _db_close(self):
-        """ commit and close """
+        """ commit unless we are inside a transaction scope - connection stays open in pool """
         # self.logger.debug('DBStore._db_close()')
-        self.dbs.commit()
-        self.dbs.close()
+        if not self._connection_get()['depth']:
+            self.dbs.commit()
         # self.logger.debug('DBStore._db_close() ended')
 
     def _db_create(self):
@@ -201,7 +307,7 @@ class DBstore(object):
         ''')
         self.logger.debug('create certificate')
         self.cursor.execute('''
-            CREATE TABLE "certificate" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "name" varchar(15) NOT NULL UNIQUE, "cert" text, "cert_raw" text, "error" text, "order_id" integer NOT NULL REFERENCES "order" ("id"), "csr" text NOT NULL, "poll_identifier" text, "created_at" TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL, "issue_uts" integer DEFAULT 0, "expire_uts" integer DEFAULT 0)
+            CREATE TABLE "certificate" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "name" varchar(15) NOT NULL UNIQUE, "cert" text, "cert_raw" text, "error" text, "order_id" integer NOT NULL REFERENCES "order" ("id"), "csr" text NOT NULL, "poll_identifier" text, "created_at" TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL, "issue_uts" integer DEFAULT 0, "expire_uts" integer DEFAULT 0, "csr_hash" varchar(64), "cert_raw_hash" varchar(64))
         ''')
         self.cursor.execute('''
             CREATE TABLE "housekeeping" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "name" varchar(15) NOT NULL UNIQUE, "value" text, "modified_at" TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)
@@ -222,18 +328,56 @@ class DBstore(object):
         self.cursor.execute('''
             CREATE TABLE "cahandler" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "name" varchar(15) NOT NULL UNIQUE, "value1" text, "value2" text, "created_at" TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)
         ''')
+        self._db_indexes_create()
         self._db_close()
         self.logger.debug('DBStore._db_create() ended')
 
+    def _db_connect(self):
+        """ open a new database connection and apply pragmas """
+        self.logger.debug('DBStore._db_connect({0})'.format(self.db_name))
+        # prepared statements get cached per connection and survive as long as the pooled connection
+        dbs = sqlite3.connect(self.db_name, timeout=int(self.pragma_dic['busy_timeout']) / 1000, cached_statements=self.statement_cache_size)
+        dbs.row_factory = sqlite3.Row
+        if sys.version_info >= (3, 8):
+            # deterministic flag is available since python 3.8
+            dbs.create_function('sha256_hex', 1, sha256_hex, deterministic=True)
+        else:
+            dbs.create_function('sha256_hex', 1, sha256_hex)
+        dbs.execute('PRAGMA busy_timeout = {0}'.format(int(self.pragma_dic['busy_timeout'])))
+        dbs.execute('PRAGMA journal_mode = {0}'.format(self.pragma_dic['journal_mode']))
+        dbs.execute('PRAGMA synchronous = {0}'.format(self.pragma_dic['synchronous']))
+        return dbs
+
+    def _db_file_id(self):
+        """ identify database file to detect replaced or deleted files """
+        try:
+            stat = os.stat(self.db_name)
+            result = (stat.st_dev, stat.st_ino)
+        except OSError:
+            result = None
+        return result
+
+    def _db_indexes_create(self):
+        """ create indexes for hot lookup columns (requires an open cursor) """
+        self.logger.debug('DBStore._db_indexes_create()')
+        for (index_name, table, column) in INDEX_LIST:
+            self.cursor.execute('CREATE INDEX IF NOT EXISTS "{0}" ON "{1}" ("{2}")'.format(index_name, table, column))
+        self.logger.debug('DBStore._db_indexes_create() ended')
+
     def _db_open(self):
-        """ opens db and sets cursor """
+        """ get connection from pool and set cursor """
         # self.logger.debug('DBStore._db_open()')
-        self.dbs = sqlite3.connect(self.db_name)
-        self.dbs.row_factory = sqlite3.Row
-        self.cursor = self.dbs.cursor()
+        connection_dic = self._connection_get()
+        self.dbs = connection_dic['dbs']
+        if not connection_dic['depth'] and self.dbs.in_transaction:
+            # leftover of a call which failed before committing
+            self.logger.debug('DBStore._db_open(): rollback uncommitted statements')
+            self.dbs.rollback()
+        self.cursor = self.dbs.cursor(PooledCursor)
+        self.cursor.connection_dic = connection_dic
         # self.logger.debug('DBStore._db_open() ended')
 
-    def _order_search(self, column, string):
+    def _order_search(self, column, string, operant='='):
         """ search order table for a certain key/value pair """
         self.logger.debug('DBStore._order_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
@@ -248,7 +392,7 @@ class DBstore(object):
                     from orders
                     INNER JOIN status on status.id = orders.status_id
                     INNER JOIN account on account.id = orders.account_id
-                    WHERE orders.{0} LIKE ?'''.format(column)
+                    WHERE orders.{0} {1} ?'''.format(column, operant)
         try:
             self.cursor.execute(pre_statement, [string])
             result = self.cursor.fetchone()
@@ -258,11 +402,11 @@ class DBstore(object):
         self.logger.debug('DBStore._order_search() ended')
         return result
 
-    def _status_search(self, column, string):
+    def _status_search(self, column, string, operant='='):
         """ search status table for a certain key/value pair """
         self.logger.debug('DBStore._status_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
-        pre_statement = 'SELECT * from status WHERE status.{0} LIKE ?'.format(column)
+        pre_statement = 'SELECT * from status WHERE status.{0} {1} ?'.format(column, operant)
         self.cursor.execute(pre_statement, [string])
         result = self.cursor.fetchone()
         self._db_close()
@@ -301,7 +445,7 @@ class DBstore(object):
         """ add account in database """
         self.logger.debug('DBStore.account_delete({0})'.format(aname))
         self._db_open()
-        pre_statement = 'DELETE FROM account WHERE name LIKE ?'
+        pre_statement = 'DELETE FROM account WHERE name = ?'
         self.cursor.execute(pre_statement, [aname])
         result = bool(self.cursor.rowcount)
         self._db_close()
@@ -424,6 +568,15 @@ class DBstore(object):
         self.logger.debug('DBStore.authorization_add() ended with: {0}'.format(rid))
         return rid
 
+    def authorizations_add_bulk(self, data_list):
+        """ add a list of authorizations by using a single statement batch - returns names of the added authorizations """
+        self.logger.debug('DBStore.authorizations_add_bulk({0})'.format(len(data_list)))
+        self._db_open()
+        self.cursor.executemany('''INSERT INTO authorization(name, order_id, type, value) VALUES(:name, :order, :type, :value)''', data_list)
+        self._db_close()
+        self.logger.debug('DBStore.authorizations_add_bulk() ended with: {0}'.format(len(data_list)))
+        return [data_dic['name'] for data_dic in data_list]
+
     def authorization_lookup(self, column, string, vlist=('type', 'value')):
         """ search account for a given id """
         self.logger.debug('DBStore.authorization_lookup(column:{0}, pattern:{1})'.format(column, string))
@@ -443,7 +596,35 @@ class DBstore(object):
         self.logger.debug('DBStore.authorization_lookup() ended')
         return authz_list
 
-    def authorizations_expired_search(self, column, string, vlist=('id', 'name', 'expires', 'value', 'created_at', 'token', 'status__id', 'status__name', 'order__id', 'order__name'), operant='LIKE'):
+    def authorization_view(self, authz_name, vlist=('name', 'type', 'value', 'token', 'expires', 'status__name')):
+        """ get authorization along with its challenges by using a single query """
+        self.logger.debug('DBStore.authorization_view({0})'.format(authz_name))
+        self._db_open()
+        self.cursor.execute('''SELECT
+                                authorization.*,
+                                status.name as status__name,
+                                challenge.name as challenge__name,
+                                challenge.type as challenge__type,
+                                challenge.token as challenge__token,
+                                chall_status.name as challenge__status__name
+                            FROM authorization
+                            LEFT JOIN status on status.id = authorization.status_id
+                            LEFT JOIN challenge on challenge.authorization_id = authorization.id
+                            LEFT JOIN status as chall_status on chall_status.id = challenge.status_id
+                            WHERE authorization.name = ?
+                            ORDER BY challenge.id''', [authz_name])
+        rows = self.cursor.fetchall()
+        self._db_close()
+
+        result = None
+        if rows:
+            lookup = dict_from_row(rows[0])
+            result = {ele: lookup[ele] for ele in vlist}
+            result['challenges'] = [{'name': row['challenge__name'], 'type': row['challenge__type'], 'token': row['challenge__token'], 'status__name': row['challenge__status__name']} for row in rows if row['challenge__name']]
+        self.logger.debug('DBStore.authorization_view() ended with: {0}'.format(bool(result)))
+        return result
+
+    def authorizations_expired_search(self, column, string, vlist=('id', 'name', 'expires', 'value', 'created_at', 'token', 'status__id', 'status__name', 'order__id', 'order__name'), operant='='):
         """ search order table for a certain key/value pair """
         self.logger.debug('DBStore.authorizations_expired_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
@@ -456,7 +637,7 @@ class DBstore(object):
                                 FROM authorization
                             LEFT JOIN status on status.id = authorization.status_id
                             LEFT JOIN orders on orders.id = authorization.order_id
-                            WHERE status__name NOT LIKE 'expired' AND authorization.{0} {1} ?'''.format(column, operant)
+                            WHERE status__name != 'expired' AND authorization.{0} {1} ?'''.format(column, operant)
 
         self.cursor.execute(pre_statement, [string])
         rows = self.cursor.fetchall()
@@ -591,7 +772,7 @@ class DBstore(object):
                     data_dic['expire_uts'] = 0
                 if 'issue_uts' not in data_dic:
                     data_dic['issue_uts'] = 0
-                self.cursor.execute('''UPDATE Certificate SET cert = :cert, cert_raw = :cert_raw, issue_uts = :issue_uts, expire_uts = :expire_uts WHERE name = :name''', data_dic)
+                self.cursor.execute('''UPDATE Certificate SET cert = :cert, cert_raw = :cert_raw, cert_raw_hash = sha256_hex(:cert_raw), issue_uts = :issue_uts, expire_uts = :expire_uts WHERE name = :name''', data_dic)
             self._db_close()
             rid = dict_from_row(exists)['id']
         else:
@@ -607,9 +788,9 @@ class DBstore(object):
             if 'csr' not in data_dic:
                 data_dic['csr'] = ''
             if 'error' in data_dic:
-                self.cursor.execute('''INSERT INTO Certificate(name, error, order_id, csr) VALUES(:name, :error, :order, :csr)''', data_dic)
+                self.cursor.execute('''INSERT INTO Certificate(name, error, order_id, csr, csr_hash) VALUES(:name, :error, :order, :csr, sha256_hex(:csr))''', data_dic)
             else:
-                self.cursor.execute('''INSERT INTO Certificate(name, csr, order_id) VALUES(:name, :csr, :order)''', data_dic)
+                self.cursor.execute('''INSERT INTO Certificate(name, csr, csr_hash, order_id) VALUES(:name, :csr, sha256_hex(:csr), :order)''', data_dic)
             self._db_close()
             rid = self.cursor.lastrowid
         self.logger.debug('DBStore.certificate_add() ended with: {0}'.format(rid))
@@ -690,7 +871,7 @@ class DBstore(object):
         self.logger.debug('DBStore.certificate_lookup() ended with: {0}'.format(result))
         return result
 
-    def certificates_search(self, column, string, vlist=('name', 'csr', 'cert', 'order__name'), operant='LIKE'):
+    def certificates_search(self, column, string, vlist=('name', 'csr', 'cert', 'order__name'), operant='='):
         """ search certificate table for a certain key/value pair """
         self.logger.debug('DBStore.certificates_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
@@ -699,6 +880,14 @@ class DBstore(object):
             column = 'orders.status_id'
             self.logger.debug('modified column to {0}'.format(column))
 
+        if column in HASH_COLUMN_LIST and operant == '=':
+            # lookup via fixed-width hash column instead of comparing the full blob
+            where_clause = 'certificate.{0}_hash = ? AND certificate.{0} = ?'.format(column)
+            param_list = [sha256_hex(string), string]
+        else:
+            where_clause = '{0} {1} ?'.format(column, operant)
+            param_list = [string]
+
         pre_statement = '''SELECT certificate.*,
                             orders.id as order__id,
                             orders.name as order__name,
@@ -707,8 +896,8 @@ class DBstore(object):
                             from certificate
                             INNER JOIN orders on orders.id = certificate.order_id
                             INNER JOIN account on account.id = orders.account_id
-                            WHERE {0} {1} ?'''.format(column, operant)
-        self.cursor.execute(pre_statement, [string])
+                            WHERE {0}'''.format(where_clause)
+        self.cursor.execute(pre_statement, param_list)
         rows = self.cursor.fetchall()
 
         cert_list = []
@@ -726,7 +915,7 @@ class DBstore(object):
         self.logger.debug('DBStore.certificates_search() ended')
         return cert_list
 
-    def challenges_search(self, column, string, vlist=('name', 'type', 'status__name', 'token')):
+    def challenges_search(self, column, string, vlist=('name', 'type', 'status__name', 'token'), operant='='):
         """ search challenge table for a certain key/value pair """
         self.logger.debug('DBStore._challenge_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
@@ -748,7 +937,7 @@ class DBstore(object):
             INNER JOIN authorization on authorization.id = challenge.authorization_id
             INNER JOIN orders on orders.id = authorization.order_id
             INNER JOIN account on account.id = orders.account_id
-            WHERE {0} LIKE ?'''.format(column)
+            WHERE {0} {1} ?'''.format(column, operant)
         self.cursor.execute(pre_statement, [string])
         rows = self.cursor.fetchall()
 
@@ -785,6 +974,29 @@ class DBstore(object):
         self.logger.debug('DBStore.challenge_add() ended')
         return rid
 
+    def challenges_add(self, data_list):
+        """ add a list of challenges by using a single statement batch - returns names of the added challenges """
+        self.logger.debug('DBStore.challenges_add({0})'.format(len(data_list)))
+        self._db_open()
+        # resolve authorization names at once (chunked to stay below the sqlite variable limit)
+        authz_name_list = list({data_dic['authorization'] for data_dic in data_list})
+        authz_id_dic = {}
+        for cnt in range(0, len(authz_name_list), 500):
+            chunk = authz_name_list[cnt:cnt + 500]
+            self.cursor.execute('SELECT id, name FROM authorization WHERE name IN ({0})'.format(', '.join('?' * len(chunk))), chunk)
+            for row in self.cursor.fetchall():
+                authz_id_dic[row['name']] = row['id']
+
+        insert_list = []
+        for data_dic in data_list:
+            if data_dic['authorization'] in authz_id_dic:
+                insert_list.append(dict(data_dic, authorization=authz_id_dic[data_dic['authorization']], status=data_dic.get('status', 2)))
+        if insert_list:
+            self.cursor.executemany('''INSERT INTO challenge(name, token, authorization_id, expires, type, status_id) VALUES(:name, :token, :authorization, :expires, :type, :status)''', insert_list)
+        self._db_close()
+        self.logger.debug('DBStore.challenges_add() ended with: {0}'.format(len(insert_list)))
+        return [data_dic['name'] for data_dic in insert_list]
+
     def challenge_lookup(self, column, string, vlist=('type', 'token', 'status__name')):
         """ search account for a given id """
         self.logger.debug('DBStore.challenge_lookup({0}:{1})'.format(column, string))
@@ -851,8 +1063,15 @@ class DBstore(object):
             self.logger.info('alter certificate table - add expire_uts')
             self.cursor.execute('''ALTER TABLE certificate ADD COLUMN expire_uts integer DEFAULT 0''')
 
+        for column in HASH_COLUMN_LIST:
+            if '{0}_hash'.format(column) not in certificate_column_list:
+                self.logger.info('alter certificate table - add {0}_hash'.format(column))
+                self.cursor.execute('''ALTER TABLE certificate ADD COLUMN {0}_hash varchar(64)'''.format(column))
+            # fill hash column for existing entries
+            self.cursor.execute('''UPDATE certificate SET {0}_hash = sha256_hex({0}) WHERE {0}_hash IS NULL AND {0} IS NOT NULL'''.format(column))
+
         # add additional values to status table
-        pre_statement = 'SELECT * from status WHERE status.{0} LIKE ?'.format('name')
+        pre_statement = 'SELECT * from status WHERE status.{0} = ?'.format('name')
         self.cursor.execute(pre_statement, ['deactivated'])
         if not self.cursor.fetchone():
             self.logger.info('adding additional status')
@@ -904,6 +1123,10 @@ class DBstore(object):
                 CREATE TABLE "cahandler" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "name" varchar(15) NOT NULL UNIQUE, "value1" text, "value2" text, "created_at" TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL)
             ''')
 
+        # indexes for hot lookup columns
+        self.logger.info('create indexes')
+        self._db_indexes_create()
+
         # version update
         self.logger.info('update dbversion to {0}'.format(__dbversion__))
         self.cursor.execute('''INSERT OR IGNORE INTO housekeeping (name, value) VALUES ("dbversion", "{0}")'''.format(__dbversion__))
@@ -916,7 +1139,7 @@ class DBstore(object):
         """ get db version from housekeeping table """
         self.logger.debug('DBStore.dbversion_get()')
         self._db_open()
-        pre_statement = 'SELECT value from housekeeping WHERE housekeeping.{0} LIKE ?'.format('name')
+        pre_statement = 'SELECT value from housekeeping WHERE housekeeping.{0} = ?'.format('name')
         self.cursor.execute(pre_statement, ['dbversion'])
         query = list(self.cursor.fetchone())
         if query:
@@ -952,7 +1175,7 @@ class DBstore(object):
         """ get parameter from housekeeping table """
         self.logger.debug('DBStore.hkparameter_get()')
         self._db_open()
-        pre_statement = 'SELECT value from housekeeping WHERE housekeeping.{0} LIKE ?'.format('name')
+        pre_statement = 'SELECT value from housekeeping WHERE housekeeping.{0} = ?'.format('name')
         self.cursor.execute(pre_statement, [parameter])
         try:
             query = list(self.cursor.fetchone())
@@ -990,6 +1213,32 @@ class DBstore(object):
         self.logger.debug('DBStore.nonce_add() ended')
         return rid
 
+    def nonces_add(self, nonce_list):
+        """ add a batch of nonces in a single statement """
+        self.logger.debug('DBStore.nonces_add({0})'.format(len(nonce_list)))
+        self._db_open()
+        self.cursor.executemany('''INSERT INTO nonce(nonce) VALUES(?)''', [(nonce,) for nonce in nonce_list])
+        self._db_close()
+        self.logger.debug('DBStore.nonces_add() ended')
+
+    def nonces_expired_delete(self, uts, chunk_size=1000):
+        """ delete nonces created before uts in chunks to keep write locks short
+        return: number of deleted nonces """
+        self.logger.debug('DBStore.nonces_expired_delete({0})'.format(uts))
+        # created_at is stored as utc timestamp string
+        timestamp = uts_to_date_utc(uts, '%Y-%m-%d %H:%M:%S')
+        result = 0
+        while True:
+            self._db_open()
+            self.cursor.execute('''DELETE FROM nonce WHERE id IN (SELECT id FROM nonce WHERE created_at < ? LIMIT ?)''', [timestamp, chunk_size])
+            deleted = self.cursor.rowcount
+            self._db_close()
+            result += deleted
+            if deleted < chunk_size:
+                break
+        self.logger.debug('DBStore.nonces_expired_delete() ended with: {0}'.format(result))
+        return result
+
     def nonce_check(self, nonce):
         """ ceck if nonce is in datbase
         in: nonce
@@ -1002,6 +1251,18 @@ class DBstore(object):
         self.logger.debug('DBStore.nonce_check() ended')
         return result
 
+    def nonce_consume(self, nonce):
+        """ check and delete nonce in a single statement
+        in: nonce
+        return: true in case nonce existed and got deleted by this call, otherwise false """
+        self.logger.debug('DBStore.nonce_consume({0})'.format(nonce))
+        self._db_open()
+        self.cursor.execute('''DELETE FROM nonce WHERE nonce=:nonce''', {'nonce': nonce})
+        result = self.cursor.rowcount > 0
+        self._db_close()
+        self.logger.debug('DBStore.nonce_consume() ended with: {0}'.format(result))
+        return result
+
     def nonce_delete(self, nonce):
         """ delete nonce from datbase
         in: nonce """
@@ -1068,7 +1329,59 @@ class DBstore(object):
         self._db_close()
         self.logger.debug('DBStore.order_update() ended')
 
-    def orders_invalid_search(self, column, string, vlist=('id', 'name', 'expires', 'identifiers', 'created_at', 'status__id', 'status__name', 'account__id', 'account__name', 'account__contact'), operant='LIKE'):
+    def order_ready_set(self, order_name):
+        """ set a pending order to ready if all its authorizations are valid - returns True if the status got changed """
+        self.logger.debug('DBStore.order_ready_set({0})'.format(order_name))
+        self._db_open()
+        self.cursor.execute('''UPDATE orders SET status_id = (SELECT id FROM status WHERE name = 'ready')
+                                WHERE name = ? AND status_id = (SELECT id FROM status WHERE name = 'pending')
+                                AND EXISTS (SELECT 1 FROM authorization WHERE authorization.order_id = orders.id)
+                                AND NOT EXISTS (
+                                    SELECT 1 FROM authorization
+                                    LEFT JOIN status on status.id = authorization.status_id
+                                    WHERE authorization.order_id = orders.id AND (status.name IS NULL OR status.name != 'valid'))''', [order_name])
+        result = self.cursor.rowcount > 0
+        self._db_close()
+        self.logger.debug('DBStore.order_ready_set() ended with: {0}'.format(result))
+        return result
+
+    def order_view(self, order_name, vlist=('notbefore', 'notafter', 'identifiers', 'expires', 'status__name')):
+        """ get order along with name and status of its authorizations by using a single query """
+        self.logger.debug('DBStore.order_view({0})'.format(order_name))
+        self._db_open()
+        self.cursor.execute('''SELECT
+                                orders.*,
+                                status.name as status__name,
+                                authorization.name as authorization__name,
+                                authz_status.name as authorization__status__name
+                            FROM orders
+                            INNER JOIN status on status.id = orders.status_id
+                            LEFT JOIN authorization on authorization.order_id = orders.id
+                            LEFT JOIN status as authz_status on authz_status.id = authorization.status_id
+                            WHERE orders.name = ?
+                            ORDER BY authorization.id''', [order_name])
+        rows = self.cursor.fetchall()
+        self._db_close()
+
+        result = None
+        if rows:
+            lookup = dict_from_row(rows[0])
+            # small hack (not sure db returnsblank and not 0)
+            if lookup['notafter'] == '':
+                lookup['notafter'] = 0
+            if lookup['notbefore'] == '':
+                lookup['notbefore'] = 0
+            result = {}
+            for ele in vlist:
+                if ele == 'status__name':
+                    result['status'] = lookup['status__name']
+                else:
+                    result[ele] = lookup[ele]
+            result['authorizations'] = [{'name': row['authorization__name'], 'status__name': row['authorization__status__name']} for row in rows if row['authorization__name']]
+        self.logger.debug('DBStore.order_view() ended with: {0}'.format(result))
+        return result
+
+    def orders_invalid_search(self, column, string, vlist=('id', 'name', 'expires', 'identifiers', 'created_at', 'status__id', 'status__name', 'account__id', 'account__name', 'account__contact'), operant='='):
         """ search order table for a certain key/value pair """
         self.logger.debug('DBStore.orders_search(column:{0}, pattern:{1})'.format(column, string))
         self._db_open()
@@ -1100,3 +1413,30 @@ class DBstore(object):
         self._db_close()
         self.logger.debug('DBStore.orders_search() ended')
         return order_list
+
+    @contextmanager
+    def transaction(self):
+        """ transaction scope - all statements get committed once at the end of the outermost scope """
+        self.logger.debug('DBStore.transaction()')
+        connection_dic = self._connection_get()
+        if not connection_dic['depth']:
+            connection_dic['rollback_only'] = False
+        connection_dic['depth'] += 1
+        try:
+            yield self
+        except BaseException:
+            connection_dic['depth'] -= 1
+            if not connection_dic['depth']:
+                self.logger.debug('DBStore.transaction(): rollback')
+                connection_dic['dbs'].rollback()
+            raise
+        else:
+            connection_dic['depth'] -= 1
+            if not connection_dic['depth']:
+                if connection_dic['rollback_only']:
+                    # a statement failed within the scope - even if the caller handled the error
+                    self.logger.error('DBStore.transaction(): rollback due to failed statement')
+                    connection_dic['dbs'].rollback()
+                else:
+                    connection_dic['dbs'].commit()
+        self.logger.debug('DBStore.transaction() ended')
@@ -7,7 +7,7 @@ from django.db import models
 # Create your models here.
 class Nonce(models.Model):
     """ nonce table """
-    nonce = models.CharField(max_length=50)
+    nonce = models.CharField(max_length=50, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __unicode__(self):
@@ -43,7 +43,7 @@ class Order(models.Model):
     notafter = models.IntegerField(default=0)
     identifiers = models.CharField(max_length=1048)
     status = models.ForeignKey(Status, default=2, on_delete=models.CASCADE)
-    expires = models.IntegerField(default=0)
+    expires = models.IntegerField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __unicode__(self):
@@ -57,7 +57,7 @@ class Authorization(models.Model):
     type = models.CharField(max_length=5)
     value = models.CharField(max_length=64)
     token = models.CharField(max_length=64, blank=True)
-    expires = models.IntegerField(default=0)
+    expires = models.IntegerField(default=0, db_index=True)
     status = models.ForeignKey(Status, default=1, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -90,7 +90,7 @@ class Certificate(models.Model):
     cert_raw = models.TextField(blank=True, null=True)
     error = models.TextField(blank=True, null=True)
     poll_identifier = models.TextField(blank=True, null=True)
-    expire_uts = models.IntegerField(default=0)
+    expire_uts = models.IntegerField(default=0, db_index=True)
     issue_uts = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
@@ -1391,6 +1391,46 @@ class TestACMEHandler(unittest.TestCase):
         mock_date.return_value = 'created_at'
         self.assertEqual({'status': 'valid', 'key': ['jwk'], 'contact': ['contact'], 'createdAt': 'created_at', 'eab_kid': 'eab_kid'}, self.account._info(account_obj))
 
+    @patch('acme_srv.account.Account._add')
+    @patch('acme_srv.account.Account._contact_check')
+    @patch('acme_srv.account.Account._tos_check')
+    @patch('acme_srv.message.Message.check')
+    def test_147_account_new(self, mock_mcheck, mock_tos, mock_contact, mock_aad):
+        """ Account.new() - database operations run in a single transaction """
+        mock_mcheck.return_value = (200, None, None, 'protected', {'contact' : 'foo@bar.com'}, None)
+        mock_tos.return_value = (200, None, None)
+        mock_contact.return_value = (200, None, None)
+        mock_aad.return_value = (400, 'urn:ietf:params:acme:error:malformed', 'incomplete JSON Web Key')
+        self.account.dbstore.transaction = MagicMock()
+        self.account.new({'foo' : 'bar'})
+        self.assertEqual(1, self.account.dbstore.transaction.call_count)
+        self.assertTrue(self.account.dbstore.transaction.return_value.__exit__.called)
+
+
+    @patch('acme_srv.account.jwk_cache_invalidate')
+    @patch('acme_srv.account.Account._key_change_validate')
+    @patch('acme_srv.message.Message.check')
+    def test_148_account__key_change(self, mock_mcheck, moch_kchval, mock_invalidate):
+        """ Account.key_change() - cached key gets invalidated """
+        protected = {'url': 'url/key-change'}
+        mock_mcheck.return_value = (200, 'message1', 'detail1', {'jwk': {'h1': 'h1a'}}, 'payload', 'aname')
+        moch_kchval.return_value = (200, 'message2', 'detail2')
+        self.account.dbstore = MagicMock()
+        self.account.dbstore.account_update.return_value = True
+        self.assertEqual((200, None, None), self.account._key_change('aname', {}, protected))
+        mock_invalidate.assert_called_with('aname')
+
+    @patch('acme_srv.account.jwk_cache_invalidate')
+    def test_149_account__delete(self, mock_invalidate):
+        """ test Account._delete() cached key gets invalidated """
+        self.account.dbstore = MagicMock()
+        self.account.dbstore.account_delete.return_value = True
+        self.assertEqual((200, None, None), self.account._delete('foo'))
+        mock_invalidate.assert_called_with('foo')
+        mock_invalidate.reset_mock()
+        self.account.dbstore.account_delete.return_value = False
+        self.account._delete('foo')
+        self.assertFalse(mock_invalidate.called)
 
 if __name__ == '__main__':
     unittest.main()
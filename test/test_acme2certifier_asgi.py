@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for the asgi front-end acme2certifier_asgi.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+import asyncio
+import configparser
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+sys.path.insert(2, 'examples')
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for the asgi front-end """
+    acme = None
+
+    @classmethod
+    def setUpClass(cls):
+        """ import front-end once - modules imported with the mocked db_handler get dropped afterwards """
+        models_mock = MagicMock()
+        modules = {'acme_srv.db_handler': models_mock}
+        cls.modules_patch = patch.dict('sys.modules', modules)
+        cls.modules_patch.start()
+        import acme2certifier_asgi
+        cls.asgi = acme2certifier_asgi
+
+    @classmethod
+    def tearDownClass(cls):
+        """ restore sys.modules """
+        cls.modules_patch.stop()
+
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.scope = {'type': 'http', 'method': 'POST', 'path': '/acme/newnonce', 'root_path': '', 'query_string': b'foo=bar', 'http_version': '1.1', 'scheme': 'https', 'server': ('acme.local', 443), 'client': ('192.168.0.1', 1234), 'headers': [(b'content-type', b'application/jose+json'), (b'content-length', b'7'), (b'x-foo', b'bar1'), (b'x-foo', b'bar2')]}
+
+    def _app_run(self, scope, message_list):
+        """ run asgi application with a list of received messages - returns list of sent messages """
+        receive_list = list(message_list)
+        send_list = []
+
+        async def _receive():
+            return receive_list.pop(0)
+
+        async def _send(message):
+            send_list.append(message)
+
+        asyncio.run(self.asgi.application(scope, _receive, _send))
+        return send_list
+
+    def test_001_executor_config_load(self):
+        """ default number of threads """
+        self.assertEqual(20, self.asgi.executor_config_load(configparser.ConfigParser()))
+
+    def test_002_executor_config_load(self):
+        """ number of threads from config file """
+        parser = configparser.ConfigParser()
+        parser['Server'] = {'executor_threads': 5}
+        self.assertEqual(5, self.asgi.executor_config_load(parser))
+
+    def test_003_executor_config_load(self):
+        """ unparseable number of threads """
+        parser = configparser.ConfigParser()
+        parser['Server'] = {'executor_threads': 'foo'}
+        with self.assertLogs(self.asgi.LOGGER, level='INFO') as lcm:
+            self.assertEqual(20, self.asgi.executor_config_load(parser))
+        self.assertIn("ERROR:{0}:executor_config_load(): failed to parse executor_threads: invalid literal for int() with base 10: 'foo'".format(self.asgi.LOGGER.name), lcm.output)
+
+    def test_004_environ_build(self):
+        """ wsgi environment from connection scope """
+        environ = self.asgi.environ_build(self.scope, b'payload')
+        self.assertEqual('POST', environ['REQUEST_METHOD'])
+        self.assertEqual('/acme/newnonce', environ['PATH_INFO'])
+        self.assertEqual('foo=bar', environ['QUERY_STRING'])
+        self.assertEqual('HTTP/1.1', environ['SERVER_PROTOCOL'])
+        self.assertEqual('https', environ['wsgi.url_scheme'])
+        self.assertEqual(('acme.local', '443'), (environ['SERVER_NAME'], environ['SERVER_PORT']))
+        self.assertEqual('192.168.0.1', environ['REMOTE_ADDR'])
+        self.assertEqual('application/jose+json', environ['CONTENT_TYPE'])
+        self.assertEqual('7', environ['CONTENT_LENGTH'])
+        self.assertEqual('bar1,bar2', environ['HTTP_X_FOO'])
+        self.assertNotIn('HTTP_CONTENT_LENGTH', environ)
+        self.assertEqual(b'payload', environ['wsgi.input'].read())
+
+    def test_005_environ_build(self):
+        """ minimal connection scope """
+        environ = self.asgi.environ_build({'method': 'GET', 'path': '/directory'}, b'')
+        self.assertEqual(('localhost', '80'), (environ['SERVER_NAME'], environ['SERVER_PORT']))
+        self.assertEqual('', environ['REMOTE_ADDR'])
+        self.assertEqual('', environ['QUERY_STRING'])
+        self.assertEqual('0', environ['CONTENT_LENGTH'])
+        self.assertEqual('http', environ['wsgi.url_scheme'])
+
+    @patch('acme2certifier_asgi.wsgi_application')
+    def test_006_wsgi_call(self, mock_app):
+        """ response of the synchronous handler """
+        result = MagicMock()
+        result.__iter__.return_value = iter([b'foo', b'bar'])
+
+        def _app(_environ, start_response):
+            start_response('201 Created', [('Content-Type', 'application/json'), ('Replay-Nonce', 'nonce')])
+            return result
+        mock_app.side_effect = _app
+        self.assertEqual({'status': 201, 'headers': [(b'content-type', b'application/json'), (b'replay-nonce', b'nonce')], 'body': b'foobar'}, self.asgi.wsgi_call({}))
+        self.assertTrue(result.close.called)
+
+    @patch('acme2certifier_wsgi.Certificate')
+    def test_007_wsgi_call(self, mock_cert):
+        """ certificate download returns the certificate as bytes """
+        mock_cert.return_value.__enter__.return_value.new_get.return_value = {'code': 200, 'data': 'certificate', 'header': {'Content-Type': 'application/pem-certificate-chain'}}
+        environ = self.asgi.environ_build({'method': 'GET', 'path': '/acme/cert/foo', 'server': ('acme.local', 80)}, b'')
+        response_dic = self.asgi.wsgi_call(environ)
+        self.assertEqual(200, response_dic['status'])
+        self.assertEqual(b'certificate', response_dic['body'])
+        self.assertIn((b'content-type', b'application/pem-certificate-chain'), response_dic['headers'])
+
+    def test_008_lifespan(self):
+        """ startup and shutdown """
+        with patch.object(self.asgi, 'EXECUTOR') as mock_executor:
+            send_list = self._app_run({'type': 'lifespan'}, [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual([{'type': 'lifespan.startup.complete'}, {'type': 'lifespan.shutdown.complete'}], send_list)
+        mock_executor.shutdown.assert_called_with(wait=True)
+
+    @patch('acme2certifier_asgi.wsgi_application')
+    def test_009_application(self, mock_app):
+        """ request round trip - body received in chunks """
+        def _app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [environ['PATH_INFO'].encode('utf-8'), environ['wsgi.input'].read()]
+        mock_app.side_effect = _app
+        send_list = self._app_run(self.scope, [{'type': 'http.request', 'body': b'foo', 'more_body': True}, {'type': 'http.request', 'body': b'bar'}])
+        self.assertEqual([{'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')]}, {'type': 'http.response.body', 'body': b'/acme/newnoncefoobar'}], send_list)
+
+    @patch('acme2certifier_asgi.wsgi_application')
+    def test_010_application(self, mock_app):
+        """ client disconnects before sending the body """
+        send_list = self._app_run(self.scope, [{'type': 'http.request', 'body': b'foo', 'more_body': True}, {'type': 'http.disconnect'}])
+        self.assertFalse(send_list)
+        self.assertFalse(mock_app.called)
+
+    def test_011_application(self):
+        """ unsupported scope type """
+        self.assertFalse(self._app_run({'type': 'websocket'}, []))
+
+    def test_012_application(self):
+        """ request round trip through the url router """
+        send_list = self._app_run({'type': 'http', 'method': 'GET', 'path': '/foo/bar', 'server': ('acme.local', 80)}, [{'type': 'http.request', 'body': b''}])
+        self.assertEqual(404, send_list[0]['status'])
+        self.assertIsInstance(send_list[1]['body'], bytes)
+
+if __name__ == '__main__':
+    unittest.main()
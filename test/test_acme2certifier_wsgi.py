@@ -0,0 +1,228 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for the standalone server acme2certifier_wsgi.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+import signal
+import configparser
+import threading
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for the standalone server """
+    acme = None
+
+    @classmethod
+    def setUpClass(cls):
+        """ import server once - modules imported with the mocked db_handler get dropped afterwards """
+        models_mock = MagicMock()
+        modules = {'acme_srv.db_handler': models_mock}
+        cls.modules_patch = patch.dict('sys.modules', modules)
+        cls.modules_patch.start()
+        from examples import acme2certifier_wsgi
+        cls.wsgi = acme2certifier_wsgi
+
+    @classmethod
+    def tearDownClass(cls):
+        """ restore sys.modules """
+        cls.modules_patch.stop()
+
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.server_list = []
+
+    def tearDown(self):
+        """ close servers """
+        for server in self.server_list:
+            server.server_close()
+
+    def _server_get(self, threads=1, reuse_port=False):
+        """ server listening on a random local port """
+        server = self.wsgi.Acme2certifierServer(('127.0.0.1', 0), self.wsgi.get_handler_cls(), threads=threads, reuse_port=reuse_port)
+        self.server_list.append(server)
+        return server
+
+    def test_001_server_config_load(self):
+        """ default settings """
+        self.assertEqual({'host': '0.0.0.0', 'port': 80, 'threads': 1, 'workers': 1}, self.wsgi.server_config_load(configparser.ConfigParser()))
+
+    def test_002_server_config_load(self):
+        """ settings from config file """
+        parser = configparser.ConfigParser()
+        parser['Server'] = {'host': '127.0.0.1', 'port': 8080, 'threads': 8, 'workers': 2}
+        self.assertEqual({'host': '127.0.0.1', 'port': 8080, 'threads': 8, 'workers': 2}, self.wsgi.server_config_load(parser))
+
+    def test_003_server_config_load(self):
+        """ unparseable settings keep their defaults """
+        parser = configparser.ConfigParser()
+        parser['Server'] = {'port': 'foo', 'threads': 4}
+        with self.assertLogs(self.wsgi.LOGGER, level='INFO') as lcm:
+            self.assertEqual({'host': '0.0.0.0', 'port': 80, 'threads': 4, 'workers': 1}, self.wsgi.server_config_load(parser))
+        self.assertIn("ERROR:{0}:server_config_load(): failed to parse port: invalid literal for int() with base 10: 'foo'".format(self.wsgi.LOGGER.name), lcm.output)
+
+    @patch('examples.acme2certifier_wsgi.os')
+    def test_004_server_config_load(self, mock_os):
+        """ worker processes not supported on this platform """
+        del mock_os.fork
+        parser = configparser.ConfigParser()
+        parser['Server'] = {'workers': 4}
+        with self.assertLogs(self.wsgi.LOGGER, level='INFO') as lcm:
+            self.assertEqual(1, self.wsgi.server_config_load(parser)['workers'])
+        self.assertIn('ERROR:{0}:server_config_load(): worker processes are not supported on this platform. Using a single process.'.format(self.wsgi.LOGGER.name), lcm.output)
+
+    def test_005_server(self):
+        """ single thread does not create a pool """
+        server = self._server_get()
+        self.assertIsNone(server.executor)
+        self.assertIsNone(server.pending)
+        self.assertEqual(128, server.request_queue_size)
+
+    @patch('examples.acme2certifier_wsgi.WSGIServer.process_request')
+    def test_006_process_request(self, mock_process):
+        """ request gets handled sequentially without pool """
+        server = self._server_get()
+        server.process_request('request', 'client_address')
+        mock_process.assert_called_with(server, 'request', 'client_address')
+
+    def test_007_process_request(self):
+        """ request gets handed over to the pool """
+        server = self._server_get(threads=2)
+        server.executor = MagicMock()
+        server.process_request('request', 'client_address')
+        server.executor.submit.assert_called_with(server.process_request_thread, 'request', 'client_address')
+
+    def test_008_process_request(self):
+        """ number of pending requests is limited to twice the number of threads """
+        server = self._server_get(threads=2)
+        server.executor = MagicMock()
+        for _cnt in range(4):
+            server.process_request('request', 'client_address')
+        self.assertFalse(server.pending.acquire(blocking=False))
+        server.shutdown_request = MagicMock()
+        server.finish_request = MagicMock()
+        server.process_request_thread('request', 'client_address')
+        self.assertTrue(server.pending.acquire(blocking=False))
+
+    def test_009_process_request(self):
+        """ slot gets released if the pool refuses the request """
+        server = self._server_get(threads=2)
+        server.executor = MagicMock()
+        server.executor.submit.side_effect = RuntimeError('exc_submit')
+        for _cnt in range(5):
+            with self.assertRaises(RuntimeError):
+                server.process_request('request', 'client_address')
+        self.assertTrue(server.pending.acquire(blocking=False))
+
+    def test_010_process_request_thread(self):
+        """ failing request gets handled and the connection gets closed """
+        server = self._server_get(threads=2)
+        server.pending.acquire()
+        server.finish_request = MagicMock(side_effect=Exception('exc_finish'))
+        server.handle_error = MagicMock()
+        server.shutdown_request = MagicMock()
+        server.process_request_thread('request', 'client_address')
+        server.handle_error.assert_called_with('request', 'client_address')
+        server.shutdown_request.assert_called_with('request')
+
+    def test_011_process_request(self):
+        """ requests get processed by the pool """
+        server = self._server_get(threads=2)
+        event = threading.Event()
+        server.finish_request = MagicMock(side_effect=lambda _request, _address: event.set())
+        server.shutdown_request = MagicMock()
+        server.process_request('request', 'client_address')
+        self.assertTrue(event.wait(5))
+
+    @patch('examples.acme2certifier_wsgi.socket')
+    @patch('examples.acme2certifier_wsgi.WSGIServer.server_bind')
+    def test_012_server_bind(self, mock_bind, mock_socket):
+        """ SO_REUSEPORT gets set for worker processes """
+        server = self._server_get()
+        server.socket = MagicMock()
+        server.reuse_port = True
+        server.server_bind()
+        server.socket.setsockopt.assert_called_with(mock_socket.SOL_SOCKET, mock_socket.SO_REUSEPORT, 1)
+        self.assertTrue(mock_bind.called)
+
+    def test_013_server_close(self):
+        """ pool gets shut down """
+        server = self._server_get(threads=2)
+        executor = server.executor
+        server.server_close()
+        self.server_list.remove(server)
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+
+    @patch('examples.acme2certifier_wsgi.make_server')
+    def test_014_server_run(self, mock_make):
+        """ server gets closed after serve_forever() returns """
+        mock_make.return_value.serve_forever.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.wsgi.server_run({'host': '127.0.0.1', 'port': 80, 'threads': 4})
+        self.assertTrue(mock_make.return_value.server_close.called)
+        self.assertEqual(('127.0.0.1', 80, self.wsgi.application), mock_make.call_args[0])
+
+    @patch('examples.acme2certifier_wsgi.time.sleep')
+    @patch('examples.acme2certifier_wsgi.signal.signal')
+    @patch('examples.acme2certifier_wsgi.os')
+    def test_015_workers_run(self, mock_os, mock_signal, mock_sleep):
+        """ workers get forked and restarted after an unexpected exit """
+        mock_os.fork.side_effect = [101, 102, 103]
+        mock_os.wait.side_effect = [(101, 9), ChildProcessError()]
+        with self.assertLogs(self.wsgi.LOGGER, level='INFO') as lcm:
+            self.wsgi.workers_run({'workers': 2})
+        self.assertEqual(3, mock_os.fork.call_count)
+        self.assertIn('ERROR:{0}:worker process 101 terminated with status 9. Restarting.'.format(self.wsgi.LOGGER.name), lcm.output)
+        self.assertTrue(mock_sleep.called)
+        self.assertEqual([signal.SIGTERM, signal.SIGINT, signal.SIGHUP], [call[0][0] for call in mock_signal.call_args_list])
+
+    @patch('examples.acme2certifier_wsgi.signal.signal')
+    @patch('examples.acme2certifier_wsgi.os')
+    def test_016_workers_run(self, mock_os, mock_signal):
+        """ signals get forwarded to the workers - no restart during shutdown """
+        handler_dic = {}
+        mock_signal.side_effect = lambda signum, handler: handler_dic.update({signum: handler})
+        mock_os.fork.side_effect = [101, 102]
+
+        def _wait():
+            if not mock_os.kill.called:
+                handler_dic[signal.SIGHUP](signal.SIGHUP, None)
+                handler_dic[signal.SIGTERM](signal.SIGTERM, None)
+            return (mock_os.wait.call_count + 100, 0)
+        mock_os.wait.side_effect = _wait
+        self.wsgi.workers_run({'workers': 2})
+        self.assertEqual(2, mock_os.fork.call_count)
+        self.assertEqual([(101, signal.SIGHUP), (102, signal.SIGHUP), (101, signal.SIGTERM), (102, signal.SIGTERM)], [call[0] for call in mock_os.kill.call_args_list])
+
+    @patch('examples.acme2certifier_wsgi.server_run')
+    @patch('examples.acme2certifier_wsgi.signal.signal')
+    @patch('examples.acme2certifier_wsgi.os')
+    def test_017_workers_run(self, mock_os, mock_signal, mock_run):
+        """ forked worker serves requests with SO_REUSEPORT and exits """
+        mock_os.fork.return_value = 0
+        mock_os._exit.side_effect = SystemExit
+        with self.assertRaises(SystemExit):
+            self.wsgi.workers_run({'workers': 2})
+        mock_run.assert_called_with({'workers': 2}, reuse_port=True)
+        mock_os._exit.assert_called_with(0)
+        self.assertEqual([(signal.SIGTERM, signal.SIG_DFL), (signal.SIGINT, signal.SIG_DFL)], [call[0] for call in mock_signal.call_args_list[:2]])
+        self.assertEqual(signal.SIGHUP, mock_signal.call_args_list[2][0][0])
+
+    @patch('examples.acme2certifier_wsgi.signal.signal')
+    @patch('examples.acme2certifier_wsgi.os')
+    def test_018_workers_run(self, mock_os, _mock_signal):
+        """ pooled database connections get closed before forking """
+        mock_os.fork.return_value = 101
+        mock_os.wait.side_effect = ChildProcessError()
+        with patch.object(self.wsgi, 'connections_close') as mock_close:
+            self.wsgi.workers_run({'workers': 1})
+        self.assertTrue(mock_close.called)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -38,9 +38,10 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'randowm_string'
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.return_value = [{'type' : 'identifier_type', 'value' : 'identifier_value', 'status__name' : 'foo'}]
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'identifier_type', 'value' : 'identifier_value', 'status__name' : 'foo', 'token': '', 'expires': 0, 'challenges': []}
         self.assertEqual({'status': 'foo', 'expires': '2018-12-02T05:00:00Z', 'identifier': {'type': 'identifier_type', 'value': 'identifier_value'}, 'challenges': [{'key2': 'value2', 'key1': 'value1'}]}, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
+        self.authorization.dbstore.authorization_update.assert_called_with({'name': 'foo', 'token': 'randowm_string', 'expires': 1543726800})
 
     @patch('acme_srv.message.Message.check')
     def test_002_authorization_new_post(self, mock_mcheck):
@@ -77,8 +78,8 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'randowm_string'
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.return_value = []
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = None
         self.assertEqual({}, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
 
     @patch('acme_srv.nonce.Nonce.generate_and_add')
@@ -148,8 +149,9 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'randowm_string'
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
+        self.authorization.dbstore = MagicMock()
         self.authorization.dbstore.authorization_update.side_effect = Exception('exc_authz_update')
-        self.authorization.dbstore.authorization_lookup.return_value = [{'name': 'foo'}]
+        self.authorization.dbstore.authorization_view.return_value = {'name': 'foo'}
         with self.assertLogs('test_a2c', level='INFO') as lcm:
             self.authorization._authz_info('http://tester.local/acme/authz/foo')
         self.assertIn('ERROR:test_a2c:acme2certifier database error in Authorization._authz_info(foo) update: exc_authz_update', lcm.output)
@@ -162,8 +164,8 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'randowm_string'
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.return_value = [{'type' : 'identifier_type', 'value1' : 'identifier_value', 'status__name' : 'foo'}]
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'identifier_type', 'value1' : 'identifier_value', 'status__name' : 'foo'}
         result = {'expires': '2018-12-02T05:00:00Z', 'status': 'foo', 'challenges': [{'key1': 'value1', 'key2': 'value2'}]}
         self.assertEqual(result, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
 
@@ -175,8 +177,8 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'randowm_string'
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.return_value = [{'type' : 'TNAuthList', 'value' : 'identifier_value', 'status__name' : 'foo'}]
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'TNAuthList', 'value' : 'identifier_value', 'status__name' : 'foo'}
         result = {'expires': '2018-12-02T05:00:00Z', 'status': 'foo', 'challenges': [{'key1': 'value1', 'key2': 'value2'}], 'identifier': {'type': 'TNAuthList', 'value': 'identifier_value'}}
         self.assertEqual(result, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
 
@@ -188,8 +190,8 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'randowm_string'
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.return_value = [{'type' : 'type', 'value' : '*.bar.local', 'status__name' : 'foo'}]
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'type', 'value' : '*.bar.local', 'status__name' : 'foo'}
         result = {'expires': '2018-12-02T05:00:00Z', 'status': 'foo', 'challenges': [{'key1': 'value1', 'key2': 'value2'}], 'identifier': {'type': 'type', 'value': 'bar.local'}, 'wildcard': True}
         self.assertEqual(result, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
 
@@ -201,39 +203,36 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'randowm_string'
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.side_effect = Exception('exc_acc_lookup')
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.side_effect = Exception('exc_acc_lookup')
         with self.assertLogs('test_a2c', level='INFO') as lcm:
             self.assertEqual({}, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
-        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Authorization._authz_info(foo) lookup1: exc_acc_lookup', lcm.output)
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Authorization._authz_info(foo) lookup: exc_acc_lookup', lcm.output)
 
     @patch('acme_srv.challenge.Challenge.new_set')
     @patch('acme_srv.authorization.uts_now')
     @patch('acme_srv.authorization.generate_random_string')
     def test_019_authorization__authz_info(self, mock_name, mock_uts, mock_challengeset):
-        """ test Authorization.auth_info() - dbstore.authorization lookup raises an exception """
-        mock_name.return_value = 'randowm_string'
+        """ test Authorization.auth_info() - polling request does not write """
         mock_uts.return_value = 1543640400
         mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.side_effect = Exception('exc_authz_update')
-        with self.assertLogs('test_a2c', level='INFO') as lcm:
-            self.authorization._authz_info('http://tester.local/acme/authz/foo')
-        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Authorization._authz_info(foo) lookup1: exc_authz_update', lcm.output)
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'dns', 'value' : 'bar.local', 'status__name' : 'pending', 'token': 'token', 'expires': 1543640400, 'challenges': []}
+        result = {'expires': '2018-12-01T05:00:00Z', 'status': 'pending', 'challenges': [{'key1': 'value1', 'key2': 'value2'}], 'identifier': {'type': 'dns', 'value': 'bar.local'}}
+        self.assertEqual(result, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
+        self.assertFalse(self.authorization.dbstore.authorization_update.called)
+        self.assertFalse(mock_name.called)
+        mock_challengeset.assert_called_with('foo', 'token', None, 'bar.local')
 
     @patch('acme_srv.challenge.Challenge.new_set')
-    @patch('acme_srv.authorization.uts_now')
-    @patch('acme_srv.authorization.generate_random_string')
-    def test_020_authorization__authz_info(self, mock_name, mock_uts, mock_challengeset):
-        """ test Authorization.auth_info() - dbstore.authorization lookup raises an exception """
-        mock_name.return_value = 'randowm_string'
-        mock_uts.return_value = 1543640400
-        mock_challengeset.return_value = [{'key1' : 'value1', 'key2' : 'value2'}]
-        self.authorization.dbstore.authorization_update.return_value = 'foo'
-        self.authorization.dbstore.authorization_lookup.side_effect = [[{'type' : 'identifier_type', 'value1' : 'identifier_value', 'status__name' : 'foo'}], Exception('exc_authz_lookup')]
-        with self.assertLogs('test_a2c', level='INFO') as lcm:
-            self.authorization._authz_info('http://tester.local/acme/authz/foo')
-        self.assertIn('ERROR:test_a2c:acme2certifier database error in Authorization._authz_info(foo) lookup2: exc_authz_lookup', lcm.output)
+    def test_020_authorization__authz_info(self, mock_challengeset):
+        """ test Authorization.auth_info() - challenges come along with the authorization """
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'dns', 'value' : 'bar.local', 'status__name' : 'valid', 'token': 'token', 'expires': 1543640400, 'challenges': [{'name': 'chall1', 'type': 'http-01', 'token': 'ctoken', 'status__name': 'valid'}]}
+        result = {'expires': '2018-12-01T05:00:00Z', 'status': 'valid', 'challenges': [{'type': 'http-01', 'token': 'ctoken', 'url': 'http://tester.local/acme/chall/chall1', 'status': 'valid'}], 'identifier': {'type': 'dns', 'value': 'bar.local'}}
+        self.assertEqual(result, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
+        self.assertFalse(self.authorization.dbstore.challenges_search.called)
+        self.assertFalse(mock_challengeset.called)
 
     @patch('acme_srv.authorization.Authorization._config_load')
     def test_021__enter__(self, mock_cfg):
@@ -323,5 +322,63 @@ class TestACMEHandler(unittest.TestCase):
 
 
 
+    @patch('acme_srv.challenge.Challenge.new_set')
+    def test_030_authorization__authz_info(self, mock_challengeset):
+        """ test Authorization.auth_info() - polling request served from cache """
+        from acme_srv.pollcache import poll_cache_clear
+        poll_cache_clear()
+        self.authorization.poll_cache_ttl = 10
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'dns', 'value' : 'bar.local', 'status__name' : 'pending', 'token': 'token', 'expires': 1543640400, 'challenges': []}
+        mock_challengeset.return_value = [{'key1' : 'value1'}]
+        result = {'expires': '2018-12-01T05:00:00Z', 'status': 'pending', 'challenges': [{'key1': 'value1'}], 'identifier': {'type': 'dns', 'value': 'bar.local'}}
+        self.assertEqual(result, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
+        self.assertEqual(result, self.authorization._authz_info('http://tester.local/acme/authz/foo'))
+        self.assertEqual(1, self.authorization.dbstore.authorization_view.call_count)
+        poll_cache_clear()
+
+    @patch('acme_srv.challenge.Challenge.new_set')
+    def test_031_authorization__authz_info(self, mock_challengeset):
+        """ test Authorization.auth_info() - cache disabled """
+        from acme_srv.pollcache import poll_cache_clear
+        poll_cache_clear()
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorization_view.return_value = {'type' : 'dns', 'value' : 'bar.local', 'status__name' : 'pending', 'token': 'token', 'expires': 1543640400, 'challenges': []}
+        mock_challengeset.return_value = [{'key1' : 'value1'}]
+        self.authorization._authz_info('http://tester.local/acme/authz/foo')
+        self.authorization._authz_info('http://tester.local/acme/authz/foo')
+        self.assertEqual(2, self.authorization.dbstore.authorization_view.call_count)
+
+    def test_032_authorization_invalidate(self):
+        """ test Authorization.invalidate() - cached response gets dropped """
+        from acme_srv.pollcache import poll_cache_get, poll_cache_clear
+        poll_cache_clear()
+        poll_cache_get().set('authz', 'name', {'status': 'valid'}, 10, 'http://tester.local')
+        self.authorization.dbstore = MagicMock()
+        self.authorization.dbstore.authorizations_expired_search.return_value = [{'name': 'name', 'status__name': 'valid', 'expires': 10}]
+        self.authorization.invalidate(20)
+        self.assertIsNone(poll_cache_get().get('authz', 'name', 'http://tester.local'))
+        poll_cache_clear()
+
+    @patch('acme_srv.authorization.load_config')
+    def test_033_config_load(self, mock_load_cfg):
+        """ test _config_load poll_cache_ttl """
+        parser = configparser.ConfigParser()
+        parser['Authorization'] = {'poll_cache_ttl': 5}
+        mock_load_cfg.return_value = parser
+        self.authorization._config_load()
+        self.assertEqual(5, self.authorization.poll_cache_ttl)
+
+    @patch('acme_srv.authorization.load_config')
+    def test_034_config_load(self, mock_load_cfg):
+        """ test _config_load poll_cache_ttl not parseable """
+        parser = configparser.ConfigParser()
+        parser['Authorization'] = {'poll_cache_ttl': 'foo'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.authorization._config_load()
+        self.assertEqual(0, self.authorization.poll_cache_ttl)
+        self.assertIn('WARNING:test_a2c:Authorization._config_load(): failed to parse poll_cache_ttl: foo', lcm.output)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1710,5 +1710,41 @@ class TestACMEHandler(unittest.TestCase):
             self.certificate.certlist_search('type', 'value')
         self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Certificate.certlist_search(): exc_certlist_search', lcm.output)
 
+    @patch('acme_srv.certificate.Certificate._info')
+    def test_181_new_get(self, mock_info):
+        """ test Certificate.new_get() - issued certificate served from cache """
+        from acme_srv.pollcache import poll_cache_clear
+        poll_cache_clear()
+        self.certificate.poll_cache_ttl = 10
+        mock_info.return_value = {'order__status_id': 5, 'cert': 'foo-bar'}
+        result = {'code': 200, 'data': 'foo-bar', 'header': {'Content-Type': 'application/pem-certificate-chain'}}
+        self.assertEqual(result, self.certificate.new_get('url'))
+        self.assertEqual(result, self.certificate.new_get('url'))
+        self.assertEqual(1, mock_info.call_count)
+        poll_cache_clear()
+
+    @patch('acme_srv.certificate.Certificate._info')
+    def test_182_new_get(self, mock_info):
+        """ test Certificate.new_get() - certificate not issued yet does not get cached """
+        from acme_srv.pollcache import poll_cache_clear
+        poll_cache_clear()
+        self.certificate.poll_cache_ttl = 10
+        mock_info.return_value = {'order__status_id': 4}
+        self.certificate.new_get('url')
+        self.certificate.new_get('url')
+        self.assertEqual(2, mock_info.call_count)
+        poll_cache_clear()
+
+    @patch('acme_srv.certificate.ca_handler_load')
+    @patch('acme_srv.certificate.load_config')
+    def test_183_config_load(self, mock_load_cfg, mock_handler):
+        """ test _config_load poll_cache_ttl """
+        parser = configparser.ConfigParser()
+        parser['Certificate'] = {'poll_cache_ttl': 5}
+        mock_load_cfg.return_value = parser
+        mock_handler.return_value = None
+        self.certificate._config_load()
+        self.assertEqual(5, self.certificate.poll_cache_ttl)
+
 if __name__ == '__main__':
     unittest.main()
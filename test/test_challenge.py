@@ -5,6 +5,8 @@
 import unittest
 import sys
 import configparser
+import threading
+import time
 from unittest.mock import patch, MagicMock
 
 sys.path.insert(0, '.')
@@ -44,23 +46,30 @@ class TestACMEHandler(unittest.TestCase):
         # self.order.dbstore.challenge_new.return_value = 1
         self.assertEqual({'url': 'http://tester.local/acme/chall/foo', 'token': 'token', 'type': 'tkauth-01', 'tkauth-type': 'atc', 'status': 'pending'}, self.challenge._new('authz_name', 'tkauth-01', 'token'))
 
-    @patch('acme_srv.challenge.Challenge._new')
-    def test_003_challenge_new_set(self, mock_challenge):
+    @patch('acme_srv.challenge.Challenge.new_sets')
+    def test_003_challenge_new_set(self, mock_sets):
         """ test generation of a challenge set """
-        mock_challenge.return_value = {'foo' : 'bar'}
+        mock_sets.return_value = {'authz_name': [{'foo': 'bar'}, {'foo': 'bar'}, {'foo': 'bar'}]}
         self.assertEqual([{'foo': 'bar'}, {'foo': 'bar'}, {'foo': 'bar'}], self.challenge.new_set('authz_name', 'token'))
+        mock_sets.assert_called_with([('authz_name', 'token', False)])
 
-    @patch('acme_srv.challenge.Challenge._new')
-    def test_004_challenge_new_set(self, mock_challenge):
+    @patch('acme_srv.challenge.Challenge.new_sets')
+    def test_004_challenge_new_set(self, mock_sets):
         """ test generation of a challenge set with tnauth true """
-        mock_challenge.return_value = {'foo' : 'bar'}
+        mock_sets.return_value = {'authz_name': [{'foo': 'bar'}]}
         self.assertEqual([{'foo': 'bar'}], self.challenge.new_set('authz_name', 'token', True))
+        mock_sets.assert_called_with([('authz_name', 'token', True)])
 
-    @patch('acme_srv.challenge.Challenge._new')
-    def test_005_challenge_new_set(self, mock_challenge):
+    @patch('acme_srv.challenge.generate_random_string')
+    def test_005_challenge_new_set(self, mock_random):
         """ test generation of a challenge set with empty challenge """
-        mock_challenge.side_effect = [{'foo1' : 'bar1'}, {}, {'foo3' : 'bar3'}]
-        self.assertEqual([{'foo1': 'bar1'}, {'foo3': 'bar3'}], self.challenge.new_set('authz_name', 'token', False))
+        mock_random.side_effect = ['foo1', 'foo2', 'foo3']
+        self.challenge.dbstore = MagicMock()
+        self.challenge.dbstore.challenges_add.return_value = ['foo1', 'foo3']
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            challenge_list = self.challenge.new_set('authz_name', 'token', False)
+        self.assertEqual(['http-01', 'tls-alpn-01'], [challenge['type'] for challenge in challenge_list])
+        self.assertIn('ERROR:test_a2c:ERROR: Empty challenge returned for dns-01', lcm.output)
 
     def test_006_challenge__info(self):
         """ test challenge.info() """
@@ -240,7 +249,7 @@ class TestACMEHandler(unittest.TestCase):
         self.assertEqual((200, None, None), self.challenge._validate_tnauthlist_payload(payload, challenge_dic))
 
     @patch('acme_srv.challenge.fqdn_resolve')
-    @patch('acme_srv.challenge.url_get')
+    @patch('acme_srv.challenge.validation_url_get')
     def test_027_challenge__validate_http_challenge(self, mock_url, mock_resolve):
         """ test Chalölenge.validate_http_challenge() with a wrong challenge """
         mock_url.return_value = 'foo'
@@ -248,7 +257,7 @@ class TestACMEHandler(unittest.TestCase):
         self.assertEqual((False, False), self.challenge._validate_http_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
     @patch('acme_srv.challenge.fqdn_resolve')
-    @patch('acme_srv.challenge.url_get')
+    @patch('acme_srv.challenge.validation_url_get')
     def test_028_challenge__validate_http_challenge(self, mock_url, mock_resolve):
         """ test Chalölenge.validate_http_challenge() with a correct challenge """
         mock_url.return_value = 'token.jwk_thumbprint'
@@ -257,7 +266,7 @@ class TestACMEHandler(unittest.TestCase):
 
     @patch('acme_srv.challenge.proxy_check')
     @patch('acme_srv.challenge.fqdn_resolve')
-    @patch('acme_srv.challenge.url_get')
+    @patch('acme_srv.challenge.validation_url_get')
     def test_029_challenge__validate_http_challenge(self, mock_url, mock_resolve, mock_proxy):
         """ test Chalölenge.validate_http_challenge() with a correct challenge """
         mock_url.return_value = 'token.jwk_thumbprint'
@@ -267,7 +276,7 @@ class TestACMEHandler(unittest.TestCase):
         self.assertEqual((True, False), self.challenge._validate_http_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
     @patch('acme_srv.challenge.fqdn_resolve')
-    @patch('acme_srv.challenge.url_get')
+    @patch('acme_srv.challenge.validation_url_get')
     def test_030_challenge__validate_http_challenge(self, mock_url, mock_resolve):
         """ test Chalölenge.validate_http_challenge() without response """
         mock_url.return_value = None
@@ -275,7 +284,7 @@ class TestACMEHandler(unittest.TestCase):
         self.assertEqual((False, False), self.challenge._validate_http_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
     @patch('acme_srv.challenge.fqdn_resolve')
-    @patch('acme_srv.challenge.url_get')
+    @patch('acme_srv.challenge.validation_url_get')
     def test_031_challenge__validate_http_challenge(self, mock_url, mock_resolve):
         """ test Challenge.validate_http_challenge() failed with NX-domain error """
         mock_url.return_value = None
@@ -283,7 +292,7 @@ class TestACMEHandler(unittest.TestCase):
         self.assertEqual((False, True), self.challenge._validate_http_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
     @patch('acme_srv.challenge.fqdn_resolve')
-    @patch('acme_srv.challenge.url_get')
+    @patch('acme_srv.challenge.validation_url_get')
     def test_032_challenge__validate_http_challenge(self, mock_url, mock_resolve):
         """ test Chalölenge.validate_http_challenge() failed with NX-domain error - non existing case but to be tested"""
         mock_url.return_value = 'foo'
@@ -576,16 +585,18 @@ class TestACMEHandler(unittest.TestCase):
         mock_resolve.return_value = (None, True)
         self.assertEqual((False, True), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
-    @patch('acme_srv.challenge.servercert_get')
+    @patch('acme_srv.challenge.addresses_get')
+    @patch('acme_srv.challenge.tls_alpn_cert_get')
     @patch('acme_srv.challenge.fqdn_resolve')
-    def test_067_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv):
+    def test_067_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_addr):
         """ test validate_alpn_challenge no certificate returned """
+        mock_addr.return_value = (['1.2.3.4'], False)
         mock_resolve.return_value = ('foo', False)
         mock_srv.return_value = None
         self.assertEqual((False, False), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
     @patch('acme_srv.challenge.proxy_check')
-    @patch('acme_srv.challenge.servercert_get')
+    @patch('acme_srv.challenge.tls_alpn_cert_get')
     @patch('acme_srv.challenge.fqdn_resolve')
     def test_068_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_proxy):
         """ test validate_alpn_challenge no certificate returned """
@@ -595,48 +606,51 @@ class TestACMEHandler(unittest.TestCase):
         mock_proxy.return_value = 'proxy'
         self.assertEqual((False, False), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
+    @patch('acme_srv.challenge.addresses_get')
     @patch('acme_srv.challenge.fqdn_in_san_check')
-    @patch('acme_srv.challenge.cert_san_get')
-    @patch('acme_srv.challenge.servercert_get')
+    @patch('acme_srv.challenge.tls_alpn_cert_parse')
+    @patch('acme_srv.challenge.tls_alpn_cert_get')
     @patch('acme_srv.challenge.fqdn_resolve')
-    def test_069_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_sanget, mock_sanchk):
+    def test_069_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_sanget, mock_sanchk, mock_addr):
         """ test validate_alpn_challenge sancheck returned false """
+        mock_addr.return_value = (['1.2.3.4'], False)
         mock_resolve.return_value = ('foo', False)
-        mock_sanget.return_value = ['foo', 'bar']
+        mock_sanget.return_value = (['foo', 'bar'], bytes.fromhex('0420' + '00' * 32))
         mock_sanchk.return_value = False
-        mock_srv.return_value = 'cert'
+        mock_srv.return_value = b'cert'
         self.assertEqual((False, False), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
+        mock_sanget.assert_called_with(self.logger, b'cert', 'fqdn')
 
-    @patch('acme_srv.challenge.cert_extensions_get')
-    @patch('acme_srv.challenge.b64_encode')
+    @patch('acme_srv.challenge.addresses_get')
+    @patch('acme_srv.challenge.sha256_hash_hex')
     @patch('acme_srv.challenge.fqdn_in_san_check')
-    @patch('acme_srv.challenge.cert_san_get')
-    @patch('acme_srv.challenge.servercert_get')
+    @patch('acme_srv.challenge.tls_alpn_cert_parse')
+    @patch('acme_srv.challenge.tls_alpn_cert_get')
     @patch('acme_srv.challenge.fqdn_resolve')
-    def test_070_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_sanget, mock_sanchk, mock_encode, mock_ext):
+    def test_070_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_sanget, mock_sanchk, mock_hash, mock_addr):
         """ test validate_alpn_challenge extension check failed """
+        mock_addr.return_value = (['1.2.3.4'], False)
         mock_resolve.return_value = ('foo', False)
-        mock_sanget.return_value = ['foo', 'bar']
+        mock_sanget.return_value = (['foo', 'bar'], bytes.fromhex('0420' + '00' * 32))
         mock_sanchk.return_value = True
-        mock_srv.return_value = 'cert'
-        mock_encode.return_value = 'foo'
-        mock_ext.return_value = ['foobar', 'bar', 'foo1']
+        mock_srv.return_value = b'cert'
+        mock_hash.return_value = '11' * 32
         self.assertEqual((False, False), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
-    @patch('acme_srv.challenge.cert_extensions_get')
-    @patch('acme_srv.challenge.b64_encode')
+    @patch('acme_srv.challenge.addresses_get')
+    @patch('acme_srv.challenge.sha256_hash_hex')
     @patch('acme_srv.challenge.fqdn_in_san_check')
-    @patch('acme_srv.challenge.cert_san_get')
-    @patch('acme_srv.challenge.servercert_get')
+    @patch('acme_srv.challenge.tls_alpn_cert_parse')
+    @patch('acme_srv.challenge.tls_alpn_cert_get')
     @patch('acme_srv.challenge.fqdn_resolve')
-    def test_071_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_sanget, mock_sanchk, mock_encode, mock_ext):
+    def test_071_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_sanget, mock_sanchk, mock_hash, mock_addr):
         """ test validate_alpn_challenge extension sucessful """
+        mock_addr.return_value = (['1.2.3.4'], False)
         mock_resolve.return_value = ('foo', False)
-        mock_sanget.return_value = ['foo', 'bar']
+        mock_sanget.return_value = (['foo', 'bar'], bytes.fromhex('0420' + '00' * 32))
         mock_sanchk.return_value = True
-        mock_srv.return_value = 'cert'
-        mock_encode.return_value = 'foo'
-        mock_ext.return_value = ['foobar', 'bar', 'foo']
+        mock_srv.return_value = b'cert'
+        mock_hash.return_value = '00' * 32
         self.assertEqual((True, False), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
 
     @patch('acme_srv.challenge.Challenge._validate')
@@ -829,7 +843,7 @@ class TestACMEHandler(unittest.TestCase):
         challenge_name = 'challenge_name'
         payload = 'payload'
         mock_update.return_value = True
-        mock_aupdate.return_value = True
+        mock_aupdate.return_value = ('authz_name', 'order_name')
         self.challenge.challenge_validation_disable = True
         self.assertTrue(self.challenge._validate(challenge_name, payload))
         self.assertTrue(mock_update.called)
@@ -843,7 +857,7 @@ class TestACMEHandler(unittest.TestCase):
         challenge_name = 'challenge_name'
         payload = 'payload'
         mock_update.return_value = True
-        mock_aupdate.return_value = True
+        mock_aupdate.return_value = ('authz_name', 'order_name')
         mock_check.return_value = (False, False)
         self.assertFalse(self.challenge._validate(challenge_name, payload))
         self.assertFalse(mock_update.called)
@@ -857,7 +871,7 @@ class TestACMEHandler(unittest.TestCase):
         challenge_name = 'challenge_name'
         payload = 'payload'
         mock_update.return_value = True
-        mock_aupdate.return_value = True
+        mock_aupdate.return_value = ('authz_name', 'order_name')
         mock_check.return_value = (False, True)
         self.assertFalse(self.challenge._validate(challenge_name, payload))
         self.assertTrue(mock_update.called)
@@ -871,7 +885,7 @@ class TestACMEHandler(unittest.TestCase):
         challenge_name = 'challenge_name'
         payload = 'payload'
         mock_update.return_value = True
-        mock_aupdate.return_value = True
+        mock_aupdate.return_value = ('authz_name', 'order_name')
         mock_check.return_value = (True, False)
         self.assertTrue(self.challenge._validate(challenge_name, payload))
         self.assertTrue(mock_update.called)
@@ -885,7 +899,7 @@ class TestACMEHandler(unittest.TestCase):
         challenge_name = 'challenge_name'
         payload = 'payload'
         mock_update.return_value = True
-        mock_aupdate.return_value = True
+        mock_aupdate.return_value = ('authz_name', 'order_name')
         mock_check.return_value = (True, True)
         self.assertTrue(self.challenge._validate(challenge_name, payload))
         self.assertTrue(mock_update.called)
@@ -899,7 +913,7 @@ class TestACMEHandler(unittest.TestCase):
         challenge_name = 'challenge_name'
         payload = {'keyAuthorization': 'keyAuthorization'}
         mock_update.return_value = True
-        mock_aupdate.return_value = True
+        mock_aupdate.return_value = ('authz_name', 'order_name')
         mock_check.return_value = (True, False)
         self.assertTrue(self.challenge._validate(challenge_name, payload))
         self.assertTrue(mock_update.called)
@@ -938,6 +952,276 @@ class TestACMEHandler(unittest.TestCase):
         self.assertFalse(mock_set.called)
         self.assertFalse(mock_val.called)
 
+    @patch('acme_srv.challenge.load_config')
+    def test_099_config_load(self, mock_load_cfg):
+        """ test _config_load validation_workers and validation_queue_size """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'validation_workers': 4, 'validation_queue_size': 10}
+        mock_load_cfg.return_value = parser
+        self.challenge._config_load()
+        self.assertEqual(4, self.challenge.validation_workers)
+        self.assertEqual(10, self.challenge.validation_queue_size)
+
+    @patch('acme_srv.challenge.load_config')
+    def test_100_config_load(self, mock_load_cfg):
+        """ test _config_load validation_workers not parseable """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'validation_workers': 'foo'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.challenge._config_load()
+        self.assertIn("ERROR:test_a2c:Challenge._config_load(): failed to parse validation_workers/validation_queue_size: invalid literal for int() with base 10: 'foo'", lcm.output)
+        self.assertEqual(0, self.challenge.validation_workers)
+
+    @patch('acme_srv.challenge.validation_queue_get')
+    @patch('acme_srv.challenge.Challenge._validate')
+    def test_101_validate_start(self, mock_validate, mock_queue_get):
+        """ _validate_start() - no workers configured validate within request """
+        self.challenge._validate_start('name', 'payload')
+        mock_validate.assert_called_with('name', 'payload')
+        self.assertFalse(mock_queue_get.called)
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.validation_queue_get')
+    @patch('acme_srv.challenge.Challenge._validate')
+    def test_102_validate_start(self, mock_validate, mock_queue_get, mock_update):
+        """ _validate_start() - challenge gets queued """
+        self.challenge.validation_workers = 2
+        mock_queue_get.return_value.pending.return_value = False
+        mock_queue_get.return_value.submit.return_value = True
+        self.challenge._validate_start('name', 'payload')
+        mock_update.assert_called_with({'name': 'name', 'status': 'processing'})
+        from acme_srv.challenge import VALIDATION_FLIGHT
+        mock_queue_get.return_value.submit.assert_called_with('name', VALIDATION_FLIGHT['flight'].run, 'name', self.challenge._validate_job, 'name', 'payload')
+        self.assertFalse(mock_validate.called)
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.validation_queue_get')
+    @patch('acme_srv.challenge.Challenge.validate_finish')
+    def test_103_validate_start(self, mock_finish, mock_queue_get, mock_update):
+        """ _validate_start() - validation already in progress """
+        self.challenge.validation_workers = 2
+        mock_queue_get.return_value.pending.return_value = True
+        self.challenge._validate_start('name', 'payload')
+        self.assertFalse(mock_update.called)
+        self.assertFalse(mock_queue_get.return_value.submit.called)
+        self.assertFalse(mock_finish.called)
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.validation_queue_get')
+    @patch('acme_srv.challenge.Challenge.validate_finish')
+    def test_104_validate_start(self, mock_finish, mock_queue_get, mock_update):
+        """ _validate_start() - queue full validate within request """
+        self.challenge.validation_workers = 2
+        mock_queue_get.return_value.pending.return_value = False
+        mock_queue_get.return_value.submit.return_value = False
+        self.challenge._validate_start('name', 'payload')
+        self.assertTrue(mock_update.called)
+        mock_finish.assert_called_with('name', 'payload')
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.Challenge._info')
+    @patch('acme_srv.challenge.Challenge._validate')
+    def test_105_validate_finish(self, mock_validate, mock_info, mock_update):
+        """ validate_finish() - challenge validated """
+        mock_validate.return_value = True
+        mock_info.return_value = {'status': 'valid'}
+        self.assertTrue(self.challenge.validate_finish('name', 'payload'))
+        self.assertFalse(mock_update.called)
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.Challenge._info')
+    @patch('acme_srv.challenge.Challenge._validate')
+    def test_106_validate_finish(self, mock_validate, mock_info, mock_update):
+        """ validate_finish() - validation not conclusive status gets reset """
+        mock_validate.return_value = False
+        mock_info.return_value = {'status': 'processing'}
+        self.assertFalse(self.challenge.validate_finish('name', 'payload'))
+        mock_update.assert_called_with({'name': 'name', 'status': 'pending'})
+
+    @patch('acme_srv.challenge.Challenge.validate_finish')
+    @patch('acme_srv.challenge.Challenge._config_load')
+    def test_107_validate_job(self, mock_load, mock_finish):
+        """ _validate_job() runs validation with a new challenge object """
+        mock_finish.return_value = True
+        self.assertTrue(self.challenge._validate_job('name', 'payload'))
+        self.assertTrue(mock_load.called)
+        mock_finish.assert_called_with('name', 'payload', False)
+
+    @patch('acme_srv.message.Message.prepare_response')
+    @patch('acme_srv.challenge.Challenge._validate_start')
+    @patch('acme_srv.challenge.Challenge._info')
+    @patch('acme_srv.challenge.Challenge._name_get')
+    @patch('acme_srv.message.Message.check')
+    def test_108_parse(self, mock_mcheck, mock_cname, mock_info, mock_start, mock_prep):
+        """ parse() returns current challenge status after handing over validation """
+        mock_mcheck.return_value = (200, None, None, {'url': 'url'}, 'payload', 'account_name')
+        mock_cname.return_value = 'challenge_name'
+        mock_info.side_effect = [{'status': 'pending'}, {'status': 'processing'}]
+        mock_prep.side_effect = lambda response_dic, _status_dic: response_dic
+        response_dic = self.challenge.parse('content')
+        mock_start.assert_called_with('challenge_name', 'payload')
+        self.assertEqual({'status': 'processing', 'url': 'url'}, response_dic['data'])
+
+    @patch('acme_srv.challenge.load_config')
+    def test_109_config_load(self, mock_load_cfg):
+        """ test _config_load order_validation """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'order_validation': True, 'order_validation_concurrency': 5, 'validation_concurrency_max': 20}
+        mock_load_cfg.return_value = parser
+        self.challenge._config_load()
+        self.assertTrue(self.challenge.order_validation)
+        self.assertEqual(5, self.challenge.order_validation_concurrency)
+        self.assertEqual(20, self.challenge.validation_concurrency_max)
+
+    @patch('acme_srv.challenge.load_config')
+    def test_110_config_load(self, mock_load_cfg):
+        """ test _config_load order_validation_concurrency not parseable """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'order_validation_concurrency': 'foo'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.challenge._config_load()
+        self.assertIn("ERROR:test_a2c:Challenge._config_load(): failed to parse order_validation_concurrency/validation_concurrency_max: invalid literal for int() with base 10: 'foo'", lcm.output)
+        self.assertFalse(self.challenge.order_validation)
+        self.assertEqual(10, self.challenge.order_validation_concurrency)
+
+    def test_111_order_challenges_get(self):
+        """ _order_challenges_get() - pending challenges of same type of pending authorizations """
+        self.challenge.dbstore = MagicMock()
+        self.challenge.dbstore.challenge_lookup.return_value = {'type': 'http-01', 'authorization__order__name': 'order'}
+        self.challenge.dbstore.challenges_search.return_value = [
+            {'name': 'chall1', 'type': 'http-01', 'status__name': 'pending', 'authorization__name': 'authz1'},
+            {'name': 'chall2', 'type': 'dns-01', 'status__name': 'pending', 'authorization__name': 'authz1'},
+            {'name': 'chall3', 'type': 'http-01', 'status__name': 'pending', 'authorization__name': 'authz2'},
+            {'name': 'chall4', 'type': 'dns-01', 'status__name': 'pending', 'authorization__name': 'authz2'},
+            {'name': 'chall5', 'type': 'http-01', 'status__name': 'pending', 'authorization__name': 'authz3'},
+            {'name': 'chall6', 'type': 'dns-01', 'status__name': 'valid', 'authorization__name': 'authz3'},
+            {'name': 'chall7', 'type': 'http-01', 'status__name': 'processing', 'authorization__name': 'authz4'}]
+        self.assertEqual(['chall1', 'chall3'], self.challenge._order_challenges_get('chall1'))
+        self.challenge.dbstore.challenges_search.assert_called_with('authorization__order__name', 'order', ('name', 'type', 'status__name', 'authorization__name'))
+
+    def test_112_order_challenges_get(self):
+        """ _order_challenges_get() - tkauth challenges get validated alone """
+        self.challenge.dbstore = MagicMock()
+        self.challenge.dbstore.challenge_lookup.return_value = {'type': 'tkauth-01', 'authorization__order__name': 'order'}
+        self.assertEqual(['chall1'], self.challenge._order_challenges_get('chall1'))
+        self.assertFalse(self.challenge.dbstore.challenges_search.called)
+
+    def test_113_order_challenges_get(self):
+        """ _order_challenges_get() - database error """
+        self.challenge.dbstore = MagicMock()
+        self.challenge.dbstore.challenge_lookup.return_value = {'type': 'http-01', 'authorization__order__name': 'order'}
+        self.challenge.dbstore.challenges_search.side_effect = Exception('exc_chall_search')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(['chall1'], self.challenge._order_challenges_get('chall1'))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Challenge._order_challenges_get() search: exc_chall_search', lcm.output)
+
+    @patch('acme_srv.challenge.Challenge._validate_job')
+    @patch('acme_srv.challenge.Challenge._order_challenges_get')
+    def test_114_order_validate(self, mock_get, mock_job):
+        """ _order_validate() - all challenges get validated, payload only for the triggering one """
+        mock_get.return_value = ['chall1', 'chall2', 'chall3']
+        mock_job.side_effect = lambda name, _payload, _speculative: name == 'chall1'
+        self.assertTrue(self.challenge._order_validate('chall1', {'foo': 'bar'}))
+        self.assertEqual(3, mock_job.call_count)
+        self.assertIn((('chall1', {'foo': 'bar'}, False),), mock_job.call_args_list)
+        self.assertIn((('chall2', {}, True),), mock_job.call_args_list)
+
+    @patch('acme_srv.challenge.Challenge._validate_job')
+    @patch('acme_srv.challenge.Challenge._order_challenges_get')
+    def test_115_order_validate(self, mock_get, mock_job):
+        """ _order_validate() - validations run concurrently within the per order limit """
+        import threading
+        import time
+        mock_get.return_value = ['chall{0}'.format(cnt) for cnt in range(8)]
+        counter_dic = {'lock': threading.Lock(), 'active': 0, 'max': 0}
+        def _job(_name, _payload, _speculative):
+            with counter_dic['lock']:
+                counter_dic['active'] += 1
+                counter_dic['max'] = max(counter_dic['max'], counter_dic['active'])
+            time.sleep(0.05)
+            with counter_dic['lock']:
+                counter_dic['active'] -= 1
+            return True
+        mock_job.side_effect = _job
+        self.challenge.order_validation_concurrency = 4
+        self.assertTrue(self.challenge._order_validate('chall0', {}))
+        self.assertEqual(8, mock_job.call_count)
+        self.assertEqual(4, counter_dic['max'])
+
+    @patch('acme_srv.challenge.Challenge._validate_job')
+    def test_116_order_validate_job(self, mock_job):
+        """ _order_validate_job() - exception gets logged """
+        mock_job.side_effect = Exception('exc_job')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(self.challenge._order_validate_job('chall1', {}))
+        self.assertIn('ERROR:test_a2c:Challenge._order_validate_job() failed for chall1: exc_job', lcm.output)
+
+    @patch('acme_srv.challenge.Challenge._validate')
+    @patch('acme_srv.challenge.Challenge._order_validate')
+    def test_117_validate_start(self, mock_order_validate, mock_validate):
+        """ _validate_start() - order validation within request """
+        self.challenge.order_validation = True
+        self.challenge._validate_start('name', 'payload')
+        mock_order_validate.assert_called_with('name', 'payload')
+        self.assertFalse(mock_validate.called)
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.validation_queue_get')
+    @patch('acme_srv.challenge.Challenge._order_validate')
+    def test_118_validate_start(self, mock_order_validate, mock_queue_get, mock_update):
+        """ _validate_start() - order validation gets queued """
+        self.challenge.validation_workers = 2
+        self.challenge.order_validation = True
+        mock_queue_get.return_value.pending.return_value = False
+        mock_queue_get.return_value.submit.return_value = True
+        self.challenge._validate_start('name', 'payload')
+        from acme_srv.challenge import VALIDATION_FLIGHT
+        mock_queue_get.return_value.submit.assert_called_with('name', VALIDATION_FLIGHT['flight'].run, 'name', self.challenge._order_validate, 'name', 'payload')
+        self.assertFalse(mock_order_validate.called)
+
+    def test_119_validation_semaphore_get(self):
+        """ process wide semaphore gets created once """
+        from acme_srv.challenge import validation_semaphore_get, VALIDATION_SEMAPHORE
+        VALIDATION_SEMAPHORE['semaphore'] = None
+        semaphore = validation_semaphore_get(2)
+        self.assertIs(semaphore, validation_semaphore_get(5))
+        VALIDATION_SEMAPHORE['semaphore'] = None
+
+    @patch('acme_srv.challenge.load_config')
+    def test_120_config_load(self, mock_load_cfg):
+        """ test _config_load http timeouts and size limit """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'http_connect_timeout': 2, 'http_read_timeout': 3.5, 'http_max_size': 1024}
+        mock_load_cfg.return_value = parser
+        self.challenge._config_load()
+        self.assertEqual((2.0, 3.5), self.challenge.http_timeout)
+        self.assertEqual(1024, self.challenge.http_max_size)
+
+    @patch('acme_srv.challenge.load_config')
+    def test_121_config_load(self, mock_load_cfg):
+        """ test _config_load http_max_size not parseable """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'http_max_size': 'foo'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.challenge._config_load()
+        self.assertIn("ERROR:test_a2c:Challenge._config_load(): failed to parse http_connect_timeout/http_read_timeout/http_max_size: invalid literal for int() with base 10: 'foo'", lcm.output)
+        self.assertEqual((5, 10), self.challenge.http_timeout)
+        self.assertEqual(65536, self.challenge.http_max_size)
+
+    @patch('acme_srv.challenge.fqdn_resolve')
+    @patch('acme_srv.challenge.validation_url_get')
+    def test_122_challenge__validate_http_challenge(self, mock_url, mock_resolve):
+        """ test Challenge.validate_http_challenge() passes timeouts and size limit to http client """
+        mock_url.return_value = 'token.jwk_thumbprint'
+        mock_resolve.return_value = ('foo', False)
+        self.challenge.http_timeout = (1, 2)
+        self.challenge.http_max_size = 100
+        self.assertEqual((True, False), self.challenge._validate_http_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
+        mock_url.assert_called_with(self.logger, 'http://fqdn/.well-known/acme-challenge/token', dns_server_list=None, proxy_server=None, verify=False, timeout=(1, 2), max_size=100)
+
     #@patch('acme_srv.challenge.Challenge.new_set')
     #@patch('acme_srv.challenge.Challenge._existing_challenge_validate')
     #@patch('acme_srv.challenge.Challenge._challengelist_search')
@@ -950,5 +1234,267 @@ class TestACMEHandler(unittest.TestCase):
     #    self.assertFalse(mock_set.called)
     #    self.assertTrue(mock_val.called)
 
+    @patch('acme_srv.challenge.addresses_get')
+    @patch('acme_srv.challenge.tls_alpn_cert_get')
+    @patch('acme_srv.challenge.fqdn_resolve')
+    def test_123_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_addr):
+        """ test validate_alpn_challenge connects to resolved addresses """
+        mock_resolve.return_value = ('1.2.3.4', False)
+        mock_addr.return_value = (['::1', '1.2.3.4'], False)
+        mock_srv.return_value = None
+        self.challenge.dns_server_list = ['10.0.0.1']
+        self.assertEqual((False, False), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
+        mock_addr.assert_called_with('fqdn', ['10.0.0.1'], 443)
+        mock_srv.assert_called_with(self.logger, 'fqdn', 443, None, ['::1', '1.2.3.4'], 5)
+
+    @patch('acme_srv.challenge.addresses_get')
+    @patch('acme_srv.challenge.proxy_check')
+    @patch('acme_srv.challenge.tls_alpn_cert_get')
+    @patch('acme_srv.challenge.fqdn_resolve')
+    def test_124_challenge__validate_alpn_challenge(self, mock_resolve, mock_srv, mock_proxy, mock_addr):
+        """ test validate_alpn_challenge name resolution is up to the proxy """
+        mock_resolve.return_value = ('1.2.3.4', False)
+        mock_srv.return_value = None
+        self.challenge.proxy_server_list = 'proxy_list'
+        mock_proxy.return_value = 'proxy'
+        self.assertEqual((False, False), self.challenge._validate_alpn_challenge('cert_name', 'fqdn', 'token', 'jwk_thumbprint'))
+        self.assertFalse(mock_addr.called)
+        mock_srv.assert_called_with(self.logger, 'fqdn', 443, 'proxy', None, 5)
+
+    @patch('acme_srv.challenge.load_config')
+    def test_125_config_load(self, mock_load_cfg):
+        """ test _config_load tls_alpn_timeout """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'tls_alpn_timeout': 2.5}
+        mock_load_cfg.return_value = parser
+        self.challenge._config_load()
+        self.assertEqual(2.5, self.challenge.tls_alpn_timeout)
+
+    @patch('acme_srv.challenge.load_config')
+    def test_126_config_load(self, mock_load_cfg):
+        """ test _config_load tls_alpn_timeout not parseable """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'tls_alpn_timeout': 'foo'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.challenge._config_load()
+        self.assertIn("ERROR:test_a2c:Challenge._config_load(): failed to parse tls_alpn_timeout: could not convert string to float: 'foo'", lcm.output)
+        self.assertEqual(5, self.challenge.tls_alpn_timeout)
+
+    @patch('acme_srv.challenge.load_config')
+    def test_127_config_load(self, mock_load_cfg):
+        """ test _config_load validation_retry_backoff """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'validation_retry_backoff': 1.5}
+        mock_load_cfg.return_value = parser
+        self.challenge._config_load()
+        self.assertEqual(1.5, self.challenge.validation_retry_backoff)
+
+    @patch('acme_srv.challenge.load_config')
+    def test_128_config_load(self, mock_load_cfg):
+        """ test _config_load validation_retry_backoff not parseable """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'validation_retry_backoff': 'foo'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.challenge._config_load()
+        self.assertIn("ERROR:test_a2c:Challenge._config_load(): failed to parse validation_retry_backoff: could not convert string to float: 'foo'", lcm.output)
+        self.assertEqual(0, self.challenge.validation_retry_backoff)
+
+    def test_129_validation_flight_get(self):
+        """ process wide single-flight guard follows the configured back-off """
+        from acme_srv.challenge import validation_flight_get, VALIDATION_FLIGHT
+        VALIDATION_FLIGHT['flight'] = None
+        flight = validation_flight_get(2)
+        self.assertIs(flight, validation_flight_get(5))
+        self.assertEqual(5, flight.backoff)
+        VALIDATION_FLIGHT['flight'] = None
+
+    @patch('acme_srv.challenge.Challenge._validate')
+    def test_130_validate_start(self, mock_validate):
+        """ _validate_start() - concurrent requests for the same challenge share one validation """
+        from acme_srv.challenge import VALIDATION_FLIGHT
+        VALIDATION_FLIGHT['flight'] = None
+        started = threading.Event()
+        release = threading.Event()
+
+        def _validate(*_args):
+            started.set()
+            release.wait(5)
+            return True
+        mock_validate.side_effect = _validate
+        thread_list = [threading.Thread(target=self.challenge._validate_start, args=('name', 'payload'))]
+        thread_list[0].start()
+        started.wait(5)
+        for _cnt in range(3):
+            thread = threading.Thread(target=self.challenge._validate_start, args=('name', 'payload'))
+            thread.start()
+            thread_list.append(thread)
+        while VALIDATION_FLIGHT['flight'].stats()['shared'] < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in thread_list:
+            thread.join(5)
+        self.assertEqual(1, mock_validate.call_count)
+        VALIDATION_FLIGHT['flight'] = None
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.validation_queue_get')
+    @patch('acme_srv.challenge.Challenge._validate')
+    def test_131_validate_start(self, mock_validate, mock_queue_get, mock_update):
+        """ _validate_start() - challenge does not get validated again within the back-off period """
+        from acme_srv.challenge import VALIDATION_FLIGHT
+        VALIDATION_FLIGHT['flight'] = None
+        self.challenge.validation_retry_backoff = 60
+        self.challenge._validate_start('name', 'payload')
+        self.challenge._validate_start('name', 'payload')
+        self.assertEqual(1, mock_validate.call_count)
+        self.challenge.validation_workers = 2
+        mock_queue_get.return_value.pending.return_value = False
+        self.challenge._validate_start('name', 'payload')
+        self.assertFalse(mock_queue_get.called)
+        self.assertFalse(mock_update.called)
+        self.challenge._validate_start('name1', 'payload')
+        self.assertEqual(2, mock_validate.call_count + mock_queue_get.return_value.submit.call_count)
+        VALIDATION_FLIGHT['flight'] = None
+
+    @patch('acme_srv.challenge.generate_random_string')
+    def test_132_new_sets(self, mock_random):
+        """ challenge sets of several authorizations get created by a single database call """
+        mock_random.side_effect = ['c1', 'c2', 'c3', 'c4', 'c5', 'c6', 'c7']
+        self.challenge.dbstore = MagicMock()
+        self.challenge.dbstore.challenges_add.return_value = ['c1', 'c2', 'c3', 'c4', 'c5', 'c6', 'c7']
+        self.challenge.expiry = 1000
+        result = self.challenge.new_sets([('authz1', 'token1', False), ('authz2', 'token2', False), ('authz3', 'token3', True)])
+        self.assertEqual(1, self.challenge.dbstore.challenges_add.call_count)
+        data_list = self.challenge.dbstore.challenges_add.call_args[0][0]
+        self.assertEqual(7, len(data_list))
+        self.assertEqual({'name': 'c7', 'expires': 1000, 'type': 'tkauth-01', 'token': 'token3', 'authorization': 'authz3', 'status': 2}, data_list[6])
+        self.assertEqual(['http-01', 'dns-01', 'tls-alpn-01'], [challenge['type'] for challenge in result['authz2']])
+        self.assertEqual({'type': 'http-01', 'url': 'http://tester.local/acme/chall/c1', 'token': 'token1', 'status': 'pending'}, result['authz1'][0])
+        self.assertEqual([{'type': 'tkauth-01', 'url': 'http://tester.local/acme/chall/c7', 'token': 'token3', 'status': 'pending', 'tkauth-type': 'atc'}], result['authz3'])
+
+    def test_133_new_sets(self):
+        """ new_sets() - dbstore.challenges_add() raises an exception """
+        self.challenge.dbstore = MagicMock()
+        self.challenge.dbstore.challenges_add.side_effect = Exception('exc_chall_add')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual({'authz1': []}, self.challenge.new_sets([('authz1', 'token1', False)]))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Challenge.new_sets(): exc_chall_add', lcm.output)
+
+    def test_134_challenge__update_authz(self):
+        """ test Challenge._update_authz() returns names of authorization and order """
+        self.challenge.dbstore = MagicMock()
+        self.challenge.dbstore.challenge_lookup.return_value = {'authorization': 'authz_name', 'authorization__order__name': 'order_name'}
+        self.assertEqual(('authz_name', 'order_name'), self.challenge._update_authz('name', {'status': 'valid'}))
+        self.challenge.dbstore.challenge_lookup.assert_called_with('name', 'name', ['authorization__name', 'authorization__order__name'])
+
+    @patch('acme_srv.challenge.Challenge._update_authz')
+    @patch('acme_srv.challenge.Challenge._update')
+    def test_135__validate(self, mock_update, mock_aupdate):
+        """ test validate - cached authorization and order responses get dropped """
+        from acme_srv.pollcache import poll_cache_get, poll_cache_clear
+        poll_cache_clear()
+        poll_cache_get().set('authz', 'authz_name', {'status': 'pending'}, 10)
+        poll_cache_get().set('order', 'order_name', {'status': 'pending'}, 10)
+        self.challenge.dbstore = MagicMock()
+        mock_aupdate.return_value = ('authz_name', 'order_name')
+        self.challenge.challenge_validation_disable = True
+        self.assertTrue(self.challenge._validate('challenge_name', 'payload'))
+        self.assertIsNone(poll_cache_get().get('authz', 'authz_name'))
+        self.assertIsNone(poll_cache_get().get('order', 'order_name'))
+        self.assertTrue(mock_update.called)
+        poll_cache_clear()
+
+    def test_136_challengeset_get(self):
+        """ test Challenge.challengeset_get() - challenges handed over by caller """
+        self.challenge.dbstore = MagicMock()
+        challenge_list = [{'name': 'chall1', 'type': 'http-01', 'token': 'token', 'status__name': 'pending'}]
+        self.assertEqual([{'type': 'http-01', 'token': 'token', 'url': 'http://tester.local/acme/chall/chall1', 'status': 'pending'}], self.challenge.challengeset_get('authz_name', 'pending', 'token', False, 'value', challenge_list))
+        self.assertFalse(self.challenge.dbstore.challenges_search.called)
+
+    @patch('acme_srv.challenge.Challenge._update_authz')
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.Challenge._check')
+    def test_137__validate(self, mock_check, mock_update, mock_aupdate):
+        """ test validate - failed speculative validation leaves challenge and authorization untouched """
+        self.challenge.dbstore = MagicMock()
+        mock_check.return_value = (False, True)
+        self.assertFalse(self.challenge._validate('name', {}, True))
+        self.assertFalse(mock_update.called)
+        self.assertFalse(mock_aupdate.called)
+
+    @patch('acme_srv.challenge.Challenge._update_authz')
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.Challenge._check')
+    def test_138__validate(self, mock_check, mock_update, mock_aupdate):
+        """ test validate - successful speculative validation gets stored """
+        self.challenge.dbstore = MagicMock()
+        mock_check.return_value = (True, False)
+        mock_aupdate.return_value = ('authz_name', 'order_name')
+        self.assertTrue(self.challenge._validate('name', {}, True))
+        mock_aupdate.assert_called_with('name', {'status': 'valid'})
+        self.assertTrue(mock_update.called)
+
+    @patch('acme_srv.challenge.Challenge._validate_job')
+    @patch('acme_srv.challenge.Challenge._order_challenges_get')
+    def test_139_order_validate(self, mock_get, mock_job):
+        """ _order_validate() - speculative validations run within their single-flight entry without back-off """
+        from acme_srv.challenge import validation_flight_get, VALIDATION_FLIGHT
+        VALIDATION_FLIGHT['flight'] = None
+        self.challenge.validation_retry_backoff = 60
+        flight = validation_flight_get(60)
+        in_flight_list = []
+        def _job(name, _payload, _speculative):
+            with flight.lock:
+                in_flight_list.append((name, ('speculative', name) in flight.flight_dic))
+            return True
+        mock_job.side_effect = _job
+        mock_get.return_value = ['chall1', 'chall2']
+        self.assertTrue(self.challenge._order_validate('chall1', {}))
+        self.assertIn(('chall2', True), in_flight_list)
+        self.assertFalse(flight.recent('chall2'))
+        VALIDATION_FLIGHT['flight'] = None
+
+    @patch('acme_srv.challenge.Challenge._validate')
+    @patch('acme_srv.challenge.Challenge._validate_job')
+    @patch('acme_srv.challenge.Challenge._order_challenges_get')
+    def test_140_order_validate(self, mock_get, mock_job, mock_validate):
+        """ _order_validate() - validation triggered by the client during a speculative validation of the same challenge runs with its payload """
+        from acme_srv.challenge import VALIDATION_FLIGHT
+        VALIDATION_FLIGHT['flight'] = None
+        self.challenge.validation_retry_backoff = 0
+        self.challenge.validation_workers = 0
+        self.challenge.order_validation = False
+        started = threading.Event()
+        release = threading.Event()
+        def _job(_name, _payload, speculative):
+            if speculative:
+                started.set()
+                release.wait(5)
+            return False
+        mock_job.side_effect = _job
+        mock_get.return_value = ['chall1', 'chall2']
+        thread = threading.Thread(target=self.challenge._order_validate, args=('chall1', {}))
+        thread.start()
+        self.assertTrue(started.wait(5))
+        self.challenge._validate_start('chall2', {'keyAuthorization': 'keyauth'})
+        mock_validate.assert_called_with('chall2', {'keyAuthorization': 'keyauth'})
+        release.set()
+        thread.join(5)
+        VALIDATION_FLIGHT['flight'] = None
+
+    @patch('acme_srv.challenge.Challenge._update')
+    @patch('acme_srv.challenge.Challenge._info')
+    @patch('acme_srv.challenge.Challenge._validate')
+    def test_141_validate_finish(self, mock_validate, mock_info, mock_update):
+        """ validate_finish() - speculative validation leaves status of a running client validation alone """
+        mock_validate.return_value = False
+        mock_info.return_value = {'status': 'processing'}
+        self.assertFalse(self.challenge.validate_finish('name', {}, True))
+        mock_validate.assert_called_with('name', {}, True)
+        self.assertFalse(mock_info.called)
+        self.assertFalse(mock_update.called)
+
 if __name__ == '__main__':
     unittest.main()
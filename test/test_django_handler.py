@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for the transaction scope of django_handler.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for the django database handler """
+    acme = None
+
+    @classmethod
+    def setUpClass(cls):
+        """ import handler once - modules imported with the mocked django modules get dropped afterwards """
+        modules = {'django': MagicMock(), 'django.conf': MagicMock(), 'django.db': MagicMock(), 'django.db.models': MagicMock(), 'acme_srv.models': MagicMock(), 'acme_srv.monkey_patches': MagicMock()}
+        cls.modules_patch = patch.dict('sys.modules', modules)
+        cls.modules_patch.start()
+        from examples.db_handler import django_handler
+        cls.handler = django_handler
+
+    @classmethod
+    def tearDownClass(cls):
+        """ restore sys.modules """
+        cls.modules_patch.stop()
+
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.logger = logging.getLogger('test_a2c')
+        self.dbstore = self.handler.DBstore(False, self.logger)
+        self.wrapper_list = []
+        self.connection = MagicMock()
+        self.connection.in_atomic_block = False
+        self.connection.execute_wrapper.side_effect = self._execute_wrapper
+        self.transaction = MagicMock()
+        self.transaction.atomic.side_effect = self._atomic
+        # number of open atomic blocks whenever a rollback gets requested
+        self.depth_list = [0]
+        self.rollback_list = []
+        self.transaction.set_rollback.side_effect = lambda rollback: self.rollback_list.append(self.depth_list[0])
+        self.patch_list = [patch.object(self.handler, 'connection', self.connection), patch.object(self.handler, 'transaction', self.transaction)]
+        for mpatch in self.patch_list:
+            mpatch.start()
+
+    def tearDown(self):
+        """ cleanup """
+        for mpatch in self.patch_list:
+            mpatch.stop()
+
+    def _atomic(self, *_args, **_kwargs):
+        """ atomic block - nested scopes are within an atomic block """
+        def _enter():
+            self.connection.in_atomic_block = True
+            self.depth_list[0] += 1
+
+        def _exit(*_args):
+            self.depth_list[0] -= 1
+            return False
+        atomic = MagicMock()
+        atomic.__enter__.side_effect = _enter
+        atomic.__exit__.side_effect = _exit
+        return atomic
+
+    def _execute_wrapper(self, wrapper):
+        """ collect execute wrappers of the transaction scopes """
+        self.wrapper_list.append(wrapper)
+        return MagicMock()
+
+    def _execute(self, sql, error=None):
+        """ run statement through the execute wrappers like django does """
+        def _execute(_sql, _params, _many, _context):
+            if error:
+                raise error
+            return True
+        execute = _execute
+        for wrapper in self.wrapper_list:
+            execute = (lambda wrapper, execute: lambda sql, params, many, context: wrapper(execute, sql, params, many, context))(wrapper, execute)
+        return execute(sql, None, False, {})
+
+    def test_001_transaction(self):
+        """ successful statements get committed """
+        with self.dbstore.transaction():
+            self.assertTrue(self._execute('UPDATE authorization'))
+        self.assertFalse(self.transaction.set_rollback.called)
+
+    def test_002_transaction(self):
+        """ failed statement inside a nested handler call rolls back the whole scope even if the caller handled the error """
+        self.handler.settings.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3'}}
+        self.handler.Authorization.objects.update_or_create.side_effect = lambda **kwargs: self._execute('UPDATE authorization', Exception('exc_update'))
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            with self.dbstore.transaction():
+                self._execute('UPDATE challenge')
+                try:
+                    self.dbstore.authorization_update({'name': 'authz_name'})
+                except Exception:
+                    pass
+        self.transaction.set_rollback.assert_called_once_with(True)
+        # outermost atomic block gets marked - handler atomic blocks are savepoints rolling back the failed statement only
+        self.assertEqual([1], self.rollback_list)
+        self.assertIn('ERROR:test_a2c:DBStore.transaction(): rollback due to failed statement', lcm.output)
+        self.transaction.atomic.assert_any_call(immediate=True)
+
+    def test_003_transaction(self):
+        """ nested scopes leave the rollback to the outermost scope """
+        with self.dbstore.transaction():
+            with self.dbstore.transaction():
+                with self.assertRaises(Exception):
+                    self._execute('UPDATE authorization', Exception('exc_update'))
+            self.assertFalse(self.transaction.set_rollback.called)
+        self.transaction.set_rollback.assert_called_once_with(True)
+
+if __name__ == '__main__':
+    unittest.main()
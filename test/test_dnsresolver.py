@@ -0,0 +1,330 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for dnsresolver.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+import configparser
+import socket
+import threading
+from unittest.mock import patch, MagicMock
+import dns.message
+import dns.resolver
+import dns.rrset
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+def answer_get(record_list, ttl=60):
+    """ build dns answer """
+    answer = MagicMock()
+    answer.__iter__.return_value = record_list
+    answer.rrset.ttl = ttl
+    return answer
+
+def record_get(rrtype, **kwargs):
+    """ dns answer per record type """
+    if rrtype not in kwargs:
+        raise dns.resolver.NoAnswer
+    if isinstance(kwargs[rrtype], Exception):
+        raise kwargs[rrtype]
+    return answer_get(kwargs[rrtype])
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for CachingResolver """
+    acme = None
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.logger = logging.getLogger('test_a2c')
+        from acme_srv.dnsresolver import CachingResolver, resolver_get, resolver_cache_clear, resolver_stats, resolver_config_load, fqdn_resolve, txt_get, addresses_get
+        self.resolver_class = CachingResolver
+        self.resolver_get = resolver_get
+        self.resolver_cache_clear = resolver_cache_clear
+        self.resolver_stats = resolver_stats
+        self.resolver_config_load = resolver_config_load
+        self.fqdn_resolve = fqdn_resolve
+        self.txt_get = txt_get
+        self.addresses_get = addresses_get
+        self.resolver_cache_clear()
+
+    def tearDown(self):
+        """ cleanup """
+        self.resolver_cache_clear()
+
+    def test_001_query(self):
+        """ positive answer gets cached """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.return_value = answer_get(['1.2.3.4'])
+        self.assertEqual((['1.2.3.4'], False), resolver.query('foo.bar.local', 'A'))
+        self.assertEqual((['1.2.3.4'], False), resolver.query('FOO.bar.local', 'A'))
+        self.assertEqual(1, resolver.resolver.resolve.call_count)
+        stats_dic = resolver.stats()
+        self.assertEqual(1, stats_dic['hits'])
+        self.assertEqual(1, stats_dic['misses'])
+        self.assertEqual(0.5, stats_dic['hit_ratio'])
+        self.assertEqual(1, stats_dic['upstream_queries'])
+
+    def test_002_query(self):
+        """ negative answer gets cached """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = dns.resolver.NXDOMAIN
+        self.assertEqual(([], True), resolver.query('foo.bar.local', 'A'))
+        self.assertEqual(([], True), resolver.query('foo.bar.local', 'A'))
+        self.assertEqual(1, resolver.resolver.resolve.call_count)
+
+    def test_003_query(self):
+        """ negative caching disabled """
+        resolver = self.resolver_class(['10.0.0.1'], negative_ttl=0)
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = dns.resolver.NoAnswer
+        self.assertEqual(([], True), resolver.query('foo.bar.local', 'A'))
+        self.assertEqual(([], True), resolver.query('foo.bar.local', 'A'))
+        self.assertEqual(2, resolver.resolver.resolve.call_count)
+
+    def test_004_query(self):
+        """ timeouts do not get cached """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = [dns.resolver.LifetimeTimeout(timeout=1, errors={}), answer_get(['1.2.3.4'])]
+        with self.assertRaises(dns.resolver.LifetimeTimeout):
+            resolver.query('foo.bar.local', 'A')
+        self.assertEqual((['1.2.3.4'], False), resolver.query('foo.bar.local', 'A'))
+        self.assertEqual(1, resolver.stats()['upstream_errors'])
+
+    @patch('acme_srv.dnsresolver.time.monotonic')
+    def test_005_query(self, mock_time):
+        """ cache entry expires according to record ttl """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.return_value = answer_get(['1.2.3.4'], ttl=10)
+        mock_time.return_value = 100
+        resolver.query('foo.bar.local', 'A')
+        mock_time.return_value = 109
+        resolver.query('foo.bar.local', 'A')
+        self.assertEqual(1, resolver.resolver.resolve.call_count)
+        mock_time.return_value = 111
+        resolver.query('foo.bar.local', 'A')
+        self.assertEqual(2, resolver.resolver.resolve.call_count)
+
+    @patch('acme_srv.dnsresolver.time.monotonic')
+    def test_006_query(self, mock_time):
+        """ record ttl gets limited by max_ttl """
+        resolver = self.resolver_class(['10.0.0.1'], max_ttl=5)
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.return_value = answer_get(['1.2.3.4'], ttl=3600)
+        mock_time.return_value = 100
+        resolver.query('foo.bar.local', 'A')
+        mock_time.return_value = 106
+        resolver.query('foo.bar.local', 'A')
+        self.assertEqual(2, resolver.resolver.resolve.call_count)
+
+    def test_007_query(self):
+        """ cache size gets limited """
+        resolver = self.resolver_class(['10.0.0.1'], max_entries=2)
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.return_value = answer_get(['1.2.3.4'])
+        for host in ['a.local', 'b.local', 'c.local']:
+            resolver.query(host, 'A')
+        self.assertEqual([('b.local', 'A'), ('c.local', 'A')], list(resolver.cache.keys()))
+
+    def test_008_fqdn_resolve(self):
+        """ fqdn_resolve - fallback to AAAA """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = lambda fqdn, rrtype: record_get(rrtype, AAAA=['::1'])
+        self.assertEqual(('::1', False), resolver.fqdn_resolve('foo.bar.local'))
+
+    def test_009_fqdn_resolve(self):
+        """ fqdn_resolve - name does not exist """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = dns.resolver.NXDOMAIN
+        self.assertEqual((None, True), resolver.fqdn_resolve('foo.bar.local'))
+
+    def test_010_fqdn_resolve(self):
+        """ fqdn_resolve - server error """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = dns.resolver.NoNameservers
+        self.assertEqual((None, False), resolver.fqdn_resolve('foo.bar.local'))
+
+    def test_011_fqdn_resolve(self):
+        """ fqdn_resolve - hostname without domain """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        self.assertEqual((None, False), resolver.fqdn_resolve('foo'))
+        self.assertFalse(resolver.resolver.resolve.called)
+
+    def test_012_txt_get(self):
+        """ txt records do not get cached by default """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        rdata = MagicMock()
+        rdata.strings = [b'foo']
+        resolver.resolver.resolve.return_value = answer_get([rdata])
+        self.assertEqual([b'foo'], resolver.txt_get('_acme-challenge.foo.bar.local'))
+        self.assertEqual([b'foo'], resolver.txt_get('_acme-challenge.foo.bar.local'))
+        self.assertEqual(2, resolver.resolver.resolve.call_count)
+        self.assertFalse(resolver.cache)
+
+    def test_013_txt_get(self):
+        """ txt records get short-cached if configured """
+        resolver = self.resolver_class(['10.0.0.1'], txt_ttl=5)
+        resolver.resolver = MagicMock()
+        rdata = MagicMock()
+        rdata.strings = [b'foo']
+        resolver.resolver.resolve.return_value = answer_get([rdata])
+        resolver.txt_get('_acme-challenge.foo.bar.local')
+        resolver.txt_get('_acme-challenge.foo.bar.local')
+        self.assertEqual(1, resolver.resolver.resolve.call_count)
+
+    def test_014_init(self):
+        """ resolver configuration """
+        resolver = self.resolver_class(['10.0.0.1', '10.0.0.2'], timeout=2)
+        self.assertEqual(['10.0.0.1', '10.0.0.2'], resolver.resolver.nameservers)
+        self.assertEqual(2, resolver.resolver.lifetime)
+
+    @patch('acme_srv.dnsresolver.load_config')
+    def test_015_resolver_config_load(self, mock_load_cfg):
+        """ load configuration """
+        parser = configparser.ConfigParser()
+        parser['Challenge'] = {'dns_timeout': 2.5, 'dns_cache_max_ttl': 60, 'dns_cache_negative_ttl': 'foo', 'dns_txt_cache_ttl': 5}
+        mock_load_cfg.return_value = parser
+        self.assertEqual({'timeout': 2.5, 'max_ttl': 60, 'negative_ttl': 30, 'max_entries': 10000, 'txt_ttl': 5}, self.resolver_config_load())
+
+    @patch('acme_srv.dnsresolver.load_config')
+    def test_016_resolver_get(self, mock_load_cfg):
+        """ process wide resolver per dns server list """
+        mock_load_cfg.return_value = configparser.ConfigParser()
+        resolver = self.resolver_get(['10.0.0.1'])
+        self.assertIs(resolver, self.resolver_get(['10.0.0.1']))
+        self.assertIsNot(resolver, self.resolver_get(['10.0.0.2']))
+        self.assertEqual(2, len(self.resolver_stats()))
+
+    @patch('acme_srv.dnsresolver.resolver_get')
+    def test_017_fqdn_resolve(self, mock_get):
+        """ module level fqdn_resolve() """
+        mock_get.return_value.fqdn_resolve.return_value = ('1.2.3.4', False)
+        self.assertEqual(('1.2.3.4', False), self.fqdn_resolve('foo.bar.local', ['10.0.0.1']))
+        mock_get.assert_called_with(['10.0.0.1'])
+
+    @patch('acme_srv.dnsresolver.resolver_get')
+    def test_018_txt_get(self, mock_get):
+        """ module level txt_get() - error """
+        mock_get.return_value.txt_get.side_effect = Exception('exc_txt')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual([], self.txt_get(self.logger, 'foo.bar.local', ['10.0.0.1']))
+        self.assertIn('ERROR:test_a2c:txt_get() error: exc_txt', lcm.output)
+
+    def test_019_addresses_get(self):
+        """ A and AAAA records get interleaved starting with ipv6 """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = lambda fqdn, rrtype: record_get(rrtype, A=['1.1.1.1', '2.2.2.2'], AAAA=['::1'])
+        self.assertEqual((['::1', '1.1.1.1', '2.2.2.2'], False), resolver.addresses_get('foo.bar.local'))
+        self.assertEqual(2, resolver.resolver.resolve.call_count)
+
+    def test_020_addresses_get(self):
+        """ slow AAAA lookup does not delay ipv4 addresses """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        event = threading.Event()
+        self.addCleanup(event.set)
+
+        def _resolve(_fqdn, rrtype):
+            if rrtype == 'AAAA':
+                event.wait(5)
+            return record_get(rrtype, A=['1.1.1.1'], AAAA=['::1'])
+        resolver.resolver.resolve.side_effect = _resolve
+        self.assertEqual((['1.1.1.1'], False), resolver.addresses_get('foo.bar.local', resolution_delay=0.01))
+
+    def test_021_addresses_get(self):
+        """ invalid only if both lookups return a negative answer """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = lambda fqdn, rrtype: record_get(rrtype, A=dns.resolver.NXDOMAIN(), AAAA=dns.resolver.NoNameservers())
+        self.assertEqual(([], False), resolver.addresses_get('foo.bar.local'))
+        resolver.resolver.resolve.side_effect = lambda fqdn, rrtype: record_get(rrtype)
+        self.assertEqual(([], True), resolver.addresses_get('foo1.bar.local'))
+
+    def test_022_addresses_get(self):
+        """ ip addresses do not get resolved """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        self.assertEqual((['2001:db8::1'], False), resolver.addresses_get('2001:db8::1'))
+        self.assertFalse(resolver.resolver.resolve.called)
+
+    def test_023_fqdn_resolve(self):
+        """ fqdn_resolve - A record preferred """
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = lambda fqdn, rrtype: record_get(rrtype, A=['1.1.1.1'], AAAA=['::1'])
+        self.assertEqual(('1.1.1.1', False), resolver.fqdn_resolve('foo.bar.local'))
+
+    @patch('acme_srv.dnsresolver.resolver_get')
+    def test_024_addresses_get(self, mock_get):
+        """ module level addresses_get() - own dns servers """
+        mock_get.return_value.addresses_get.return_value = (['1.2.3.4'], False)
+        self.assertEqual((['1.2.3.4'], False), self.addresses_get('foo.bar.local', ['10.0.0.1']))
+        mock_get.assert_called_with(['10.0.0.1'])
+
+    @patch('acme_srv.dnsresolver.socket.getaddrinfo')
+    def test_025_addresses_get(self, mock_gai):
+        """ module level addresses_get() - system resolver """
+        mock_gai.return_value = [(2, 1, 6, '', ('1.1.1.1', 80)), (10, 1, 6, '', ('::1', 80, 0, 0)), (2, 1, 6, '', ('1.1.1.1', 80))]
+        self.assertEqual((['::1', '1.1.1.1'], False), self.addresses_get('foo.bar.local', None, 80))
+        mock_gai.side_effect = socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        self.assertEqual(([], True), self.addresses_get('foo.bar.local'))
+        mock_gai.side_effect = socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+        self.assertEqual(([], False), self.addresses_get('foo.bar.local'))
+
+    def _negative_response_get(self, soa=None):
+        """ dns response with an soa record in the authority section """
+        query = dns.message.make_query('foo.bar.local', 'A')
+        response = dns.message.make_response(query)
+        if soa:
+            response.authority.append(dns.rrset.from_text('bar.local.', soa[0], 'IN', 'SOA', 'ns.bar.local. admin.bar.local. 1 3600 600 86400 {0}'.format(soa[1])))
+        return response
+
+    def test_026_negative_ttl_get(self):
+        """ nxdomain - soa minimum smaller than the soa ttl """
+        resolver = self.resolver_class(['10.0.0.1'])
+        response = self._negative_response_get((20, 10))
+        err = dns.resolver.NXDOMAIN(qnames=[response.question[0].name], responses={response.question[0].name: response})
+        self.assertEqual(10, resolver._negative_ttl_get(err))
+
+    def test_027_negative_ttl_get(self):
+        """ noanswer - soa ttl smaller than the soa minimum """
+        resolver = self.resolver_class(['10.0.0.1'])
+        err = dns.resolver.NoAnswer(response=self._negative_response_get((5, 10)))
+        self.assertEqual(5, resolver._negative_ttl_get(err))
+
+    def test_028_negative_ttl_get(self):
+        """ soa minimum capped by the configured value """
+        resolver = self.resolver_class(['10.0.0.1'], negative_ttl=30)
+        err = dns.resolver.NoAnswer(response=self._negative_response_get((3600, 3600)))
+        self.assertEqual(30, resolver._negative_ttl_get(err))
+
+    def test_029_negative_ttl_get(self):
+        """ no soa record or no response - configured value """
+        resolver = self.resolver_class(['10.0.0.1'], negative_ttl=30)
+        err = dns.resolver.NoAnswer(response=self._negative_response_get())
+        self.assertEqual(30, resolver._negative_ttl_get(err))
+        self.assertEqual(30, resolver._negative_ttl_get(dns.resolver.NXDOMAIN()))
+
+    @patch('acme_srv.dnsresolver.time.monotonic')
+    def test_030_query(self, mock_time):
+        """ negative answer expires after the soa minimum """
+        mock_time.return_value = 100
+        resolver = self.resolver_class(['10.0.0.1'])
+        resolver.resolver = MagicMock()
+        resolver.resolver.resolve.side_effect = dns.resolver.NoAnswer(response=self._negative_response_get((60, 5)))
+        self.assertEqual(([], True), resolver.query('foo.bar.local', 'A'))
+        self.assertEqual(105, resolver.cache[('foo.bar.local', 'A')][0])
+
+if __name__ == '__main__':
+    unittest.main()
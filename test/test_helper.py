@@ -5,8 +5,10 @@
 import unittest
 import configparser
 import sys
+import os
 import datetime
 import socket
+import time
 from unittest.mock import patch, MagicMock, Mock
 import dns.resolver
 
@@ -29,9 +31,8 @@ class TestACMEHandler(unittest.TestCase):
         patch.dict('sys.modules', modules).start()
         import logging
         logging.basicConfig(level=logging.CRITICAL)
-        from acme_srv.helper import b64decode_pad, b64_decode, b64_encode, b64_url_encode, b64_url_recode, ca_handler_get, convert_string_to_byte, convert_byte_to_string, decode_message, decode_deserialize, get_url, generate_random_string, signature_check, validate_email, uts_to_date_utc, date_to_uts_utc, load_config, cert_serial_get, cert_san_get, cert_dates_get, build_pem_file, date_to_datestr, datestr_to_date, dkeys_lower, csr_cn_get, cert_pubkey_get, csr_pubkey_get, url_get, url_get_with_own_dns,  dns_server_list_load, csr_san_get, csr_extensions_get, fqdn_resolve, fqdn_in_san_check, sha256_hash, sha256_hash_hex, cert_der2pem, cert_pem2der, cert_extensions_get, csr_dn_get, logger_setup, logger_info, print_debug, jwk_thumbprint_get, allowed_gai_family, patched_create_connection, validate_csr, servercert_get, txt_get, proxystring_convert, proxy_check, handle_exception, ca_handler_load, eab_handler_load
+        from acme_srv.helper import b64decode_pad, b64_decode, b64_encode, b64_url_encode, b64_url_recode, ca_handler_get, convert_string_to_byte, convert_byte_to_string, decode_message, decode_deserialize, get_url, generate_random_string, signature_check, validate_email, uts_to_date_utc, date_to_uts_utc, load_config, cert_serial_get, cert_san_get, cert_dates_get, build_pem_file, date_to_datestr, datestr_to_date, dkeys_lower, csr_cn_get, cert_pubkey_get, csr_pubkey_get, csr_san_get, csr_extensions_get, fqdn_in_san_check, sha256_hash, sha256_hash_hex, cert_der2pem, cert_pem2der, cert_extensions_get, csr_dn_get, logger_setup, logger_info, print_debug, jwk_thumbprint_get, validate_csr, servercert_get, proxystring_convert, proxy_check, handle_exception, ca_handler_load, eab_handler_load, config_cache_clear, config_reload_count_get, jws_deserialize, address_list_sort, happy_eyeballs_connect
         self.logger = logging.getLogger('test_a2c')
-        self.allowed_gai_family = allowed_gai_family
         self.b64_decode = b64_decode
         self.b64_encode = b64_encode
         self.b64_url_encode = b64_url_encode
@@ -60,9 +61,7 @@ class TestACMEHandler(unittest.TestCase):
         self.decode_deserialize = decode_deserialize
         self.decode_message = decode_message
         self.dkeys_lower = dkeys_lower
-        self.dns_server_list_load = dns_server_list_load
         self.eab_handler_load = eab_handler_load
-        self.fqdn_resolve = fqdn_resolve
         self.fqdn_in_san_check = fqdn_in_san_check
         self.generate_random_string = generate_random_string
         self.get_url = get_url
@@ -70,14 +69,13 @@ class TestACMEHandler(unittest.TestCase):
         self.load_config = load_config
         self.logger_setup = logger_setup
         self.logger_info = logger_info
-        self.patched_create_connection = patched_create_connection
         self.print_debug = print_debug
         self.proxy_check = proxy_check
         self.servercert_get = servercert_get
         self.signature_check = signature_check
-        self.txt_get = txt_get
-        self.url_get = url_get
-        self.url_get_with_own_dns = url_get_with_own_dns
+        self.jws_deserialize = jws_deserialize
+        self.address_list_sort = address_list_sort
+        self.happy_eyeballs_connect = happy_eyeballs_connect
         self.uts_to_date_utc = uts_to_date_utc
         self.validate_email = validate_email
         self.validate_csr = validate_csr
@@ -85,6 +83,13 @@ class TestACMEHandler(unittest.TestCase):
         self.sha256_hash_hex = sha256_hash_hex
         self.proxystring_convert = proxystring_convert
         self.handle_exception = handle_exception
+        self.config_cache_clear = config_cache_clear
+        self.config_reload_count_get = config_reload_count_get
+        self.config_cache_clear()
+
+    def tearDown(self):
+        """ drop cached configurations """
+        self.config_cache_clear()
 
     def test_001_helper_b64decode_pad(self):
         """ test b64decode_pad() method with a regular base64 encoded string """
@@ -714,89 +719,6 @@ Otme28/kpJxmW3iOMkqN9BE+qAkggFDeNoxPtXRyP2PrRgbaj94e1uznsyni7CYw
         data_dic = {'HTTP_HOST': 'http_host'}
         self.assertEqual('http://http_host', self.get_url(data_dic, True))
 
-    @patch('acme_srv.helper.requests.get')
-    def test_091_helper_url_get(self, mock_request):
-        """ successful url get without dns servers """
-        mock_request.return_value.text = 'foo'
-        self.assertEqual('foo', self.url_get(self.logger, 'url'))
-
-    @patch('acme_srv.helper.requests.get')
-    def test_092_helper_url_get(self, mock_request):
-        """ successful url get without dns servers """
-        mock_request.return_value.text = 'foo'
-        self.assertEqual('foo', self.url_get(self.logger, 'url', 'dns', 'proxy'))
-
-    @patch('acme_srv.helper.requests.get')
-    def test_093_helper_url_get(self, mock_request):
-        """ unsuccessful url get without dns servers """
-        # this is stupid but triggrs an expeption
-        mock_request.return_value = {'foo': 'foo'}
-        self.assertEqual(None, self.url_get(self.logger, 'url'))
-
-    @patch('acme_srv.helper.url_get_with_own_dns')
-    def test_094_helper_url_get(self, mock_request):
-        """ successful url get with dns servers """
-        mock_request.return_value = 'foo'
-        self.assertEqual('foo', self.url_get(self.logger, 'url', 'dns'))
-
-    @patch('acme_srv.helper.requests.get', side_effect=Mock(side_effect=Exception('foo')))
-    def test_095_helper_url_get(self, mock_request):
-        """ unsuccessful url_get """
-        # mock_request.return_value.text = 'foo'
-        with self.assertLogs('test_a2c', level='INFO') as lcm:
-            self.assertFalse(self.url_get(self.logger, 'url'))
-        self.assertIn('ERROR:test_a2c:url_get error: foo', lcm.output)
-
-    @patch('acme_srv.helper.requests.get')
-    def test_096_helper_url_get(self, mock_request):
-        """ unsuccessful url_get fallback to v4"""
-        object = Mock()
-        object.text = 'foo'
-        mock_request.side_effect=[Exception('foo'), object]
-        self.assertEqual('foo', self.url_get(self.logger, 'url'))
-
-    @patch('acme_srv.helper.requests.get')
-    def test_097_helper_url_get_with_own_dns(self, mock_request):
-        """ successful url_get_with_own_dns get with dns servers """
-        mock_request.return_value.text = 'foo'
-        self.assertEqual('foo', self.url_get_with_own_dns(self.logger, 'url'))
-
-    @patch('acme_srv.helper.requests.get')
-    def test_098_helper_url_get_with_own_dns(self, mock_request):
-        """ successful url_get_with_own_dns get with dns servers """
-        mock_request.return_value = {'foo': 'foo'}
-        self.assertEqual(None, self.url_get_with_own_dns(self.logger, 'url'))
-
-    @patch('acme_srv.helper.load_config')
-    def test_099_helper_dns_server_list_load(self, mock_load_config):
-        """ successful dns_server_list_load with empty config file """
-        mock_load_config.return_value = {}
-        self.assertEqual(['9.9.9.9', '8.8.8.8'], self.dns_server_list_load())
-
-    @patch('acme_srv.helper.load_config')
-    def test_100_helper_dns_server_list_load(self, mock_load_config):
-        """ successful dns_server_list_load with empty Challenge section """
-        mock_load_config.return_value = {'Challenge': {}}
-        self.assertEqual(['9.9.9.9', '8.8.8.8'], self.dns_server_list_load())
-
-    @patch('acme_srv.helper.load_config')
-    def test_101_helper_dns_server_list_load(self, mock_load_config):
-        """ successful dns_server_list_load with wrong Challenge section """
-        mock_load_config.return_value = {'Challenge': {'foo': 'bar'}}
-        self.assertEqual(['9.9.9.9', '8.8.8.8'], self.dns_server_list_load())
-
-    @patch('acme_srv.helper.load_config')
-    def test_102_helper_dns_server_list_load(self, mock_load_config):
-        """ successful dns_server_list_load with wrong json format """
-        mock_load_config.return_value = {'Challenge': {'dns_server_list': 'bar'}}
-        self.assertEqual(['9.9.9.9', '8.8.8.8'], self.dns_server_list_load())
-
-    @patch('acme_srv.helper.load_config')
-    def test_103_helper_dns_server_list_load(self, mock_load_config):
-        """ successful dns_server_list_load with wrong json format """
-        mock_load_config.return_value = {'Challenge': {'dns_server_list': '["foo", "bar"]'}}
-        self.assertEqual(['foo', 'bar'], self.dns_server_list_load())
-
     def test_104_helper_csr_san_get(self):
         """ get sans but no csr """
         csr = None
@@ -898,77 +820,6 @@ Otme28/kpJxmW3iOMkqN9BE+qAkggFDeNoxPtXRyP2PrRgbaj94e1uznsyni7CYw
         file_name = 'foo\\foo.py'
         self.assertEqual('foo.foo', self.ca_handler_get(self.logger, file_name))
 
-    @patch('dns.resolver.Resolver')
-    def test_125_helper_fqdn_resolve(self, mock_resolve):
-        """ successful dns-query returning covering github """
-        mock_resolve.return_value.query.return_value = ['foo']
-        self.assertEqual((None, False), self.fqdn_resolve('foo', dnssrv='10.0.0.1'))
-
-    @patch('dns.resolver.Resolver')
-    def test_126_helper_fqdn_resolve(self, mock_resolve):
-        """ successful dns-query returning covering github """
-        mock_resolve.return_value.query.return_value = ['foo']
-        self.assertEqual(('foo', False), self.fqdn_resolve('foo.bar.local', dnssrv='10.0.0.1'))
-
-
-    @patch('dns.resolver.Resolver')
-    def test_127_helper_fqdn_resolve(self, mock_resolve):
-        """ successful dns-query returning covering github """
-        mock_resolve.return_value.query.return_value = ['foo']
-        self.assertEqual((None, False), self.fqdn_resolve('foo'))
-
-    @patch('dns.resolver.Resolver')
-    def test_128_helper_fqdn_resolve(self, mock_resolve):
-        """ successful dns-query returning one value """
-        mock_resolve.return_value.query.return_value = ['foo']
-        self.assertEqual(('foo', False), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver')
-    def test_129_helper_fqdn_resolve(self, mock_resolve):
-        """ successful dns-query returning two values """
-        mock_resolve.return_value.query.return_value = ['bar', 'foo']
-        self.assertEqual(('bar', False), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=Mock(side_effect=dns.resolver.NXDOMAIN))
-    def test_130_helper_fqdn_resolve(self, mock_resolve):
-        """ catch NXDOMAIN """
-        self.assertEqual((None, True), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=Mock(side_effect=dns.resolver.NoAnswer))
-    def test_131_helper_fqdn_resolve(self, mock_resolve):
-        """ catch NoAnswer """
-        self.assertEqual((None, True), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=Mock(side_effect=dns.resolver.NoNameservers))
-    def test_132_helper_fqdn_resolve(self, mock_resolve):
-        """ catch other dns related execption """
-        self.assertEqual((None, False), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=Mock(side_effect=Exception('foo')))
-    def test_133_helper_fqdn_resolve(self, mock_resolve):
-        """ catch other execption """
-        self.assertEqual((None, False), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=[Mock(side_effect=dns.resolver.NXDOMAIN), ['foo']])
-    def test_134_helper_fqdn_resolve(self, mock_resolve):
-        """ catch NXDOMAIN on v4 and fine in v6 """
-        self.assertEqual(('foo', False), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=[Mock(side_effect=dns.resolver.NoAnswer), ['foo']])
-    def test_135_helper_fqdn_resolve(self, mock_resolve):
-        """ catch NoAnswer on v4 and fine in v6 """
-        self.assertEqual(('foo', False), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=[Mock(side_effect=dns.resolver.NoNameservers), ['foo']])
-    def test_136_helper_fqdn_resolve(self, mock_resolve):
-        """ catch other dns related execption on v4 and fine in v6 """
-        self.assertEqual(('foo', False), self.fqdn_resolve('foo.bar.local'))
-
-    @patch('dns.resolver.Resolver.query', side_effect=[Mock(side_effect=Exception('foo')), ['foo']])
-    def test_137_helper_fqdn_resolve(self, mock_resolve):
-        """ catch other execption when resolving v4 but fine in v6"""
-        self.assertEqual(('foo', False), self.fqdn_resolve('foo.bar.local'))
-
     def test_138_helper_signature_check(self):
         """ sucessful validation symmetric key"""
         mkey = '{"k": "ZndUSkZvVldvMEFiRzQ5VWNCdERtNkNBNnBTcTl4czNKVEVxdUZiaEdpZXZNUVJBVmRuSFREcDJYX2s3X0NxTA", "kty": "oct"}'
@@ -1254,11 +1105,6 @@ klGUNHG98CtsmlhrivhSTJWqSIOfyKGF
             self.assertFalse(self.jwk_thumbprint_get(self.logger, pub_key))
         self.assertIn('ERROR:test_a2c:jwk_thumbprint_get(): error: exc_jwk_jwk', lcm.output)
 
-    @patch('socket.AF_INET')
-    def test_178_allowed_gai_family(self, mock_sock):
-        """ test allowed_gai_family """
-        self.assertTrue(self.allowed_gai_family())
-
     def test_179_validate_csr(self):
         """ patched_create_connection """
         self.assertTrue(self.validate_csr(self.logger, 'oder_dic', 'csr'))
@@ -1301,42 +1147,6 @@ klGUNHG98CtsmlhrivhSTJWqSIOfyKGF
         self.assertFalse(mock_cert.called)
         self.assertIn('ERROR:test_a2c:servercert_get() failed with: exc_warp_sock', lcm.output)
 
-    @patch('dns.resolver.Resolver')
-    @patch('dns.resolver.query')
-    def test_183_txt_get(self, mock_resolve, mock_res):
-        """ successful dns-query returning one txt record """
-        resp_obj = Mock()
-        resp_obj.strings = ['foo', 'bar']
-        mock_resolve.return_value = [resp_obj]
-        self.assertEqual(['foo'], self.txt_get(self.logger, 'foo', '10.0.0.1'))
-        self.assertTrue(mock_res.called)
-
-    @patch('dns.resolver.query')
-    def test_184_txt_get(self, mock_resolve):
-        """ successful dns-query returning one txt record """
-        resp_obj = Mock()
-        resp_obj.strings = ['foo', 'bar']
-        mock_resolve.return_value = [resp_obj]
-        self.assertEqual(['foo'], self.txt_get(self.logger, 'foo'))
-
-    @patch('dns.resolver.query')
-    def test_185_txt_get(self, mock_resolve):
-        """ successful dns-query returning one txt record """
-        resp_obj1 = Mock()
-        resp_obj1.strings = ['foo1', 'bar1']
-        resp_obj2 = Mock()
-        resp_obj2.strings = ['foo2', 'bar2']
-        mock_resolve.return_value = [resp_obj1, resp_obj2]
-        self.assertEqual(['foo1', 'foo2'], self.txt_get(self.logger, 'foo'))
-
-    @patch('dns.resolver.query')
-    def test_186_txt_get(self, mock_resolve):
-        """ successful dns-query returning one txt record """
-        mock_resolve.side_effect = Exception('mock_resolve')
-        with self.assertLogs('test_a2c', level='INFO') as lcm:
-            self.assertFalse(self.txt_get(self.logger, 'foo'))
-        self.assertIn('ERROR:test_a2c:txt_get() error: mock_resolve', lcm.output)
-
     def test_187_proxystring_convert(self):
         """ convert proxy_string http """
         self.assertEqual((3, 'proxy', 8080), self.proxystring_convert(self.logger, 'http://proxy:8080'))
@@ -1563,5 +1373,127 @@ klGUNHG98CtsmlhrivhSTJWqSIOfyKGF
             self.assertFalse(self.eab_handler_load(self.logger, config_dic))
         self.assertIn('CRITICAL:test_a2c:Helper.eab_handler_load(): loading default EABhandler failed with err: exc_mock_imp', lcm.output)
 
+    def test_220_load_config(self):
+        """ load config - second call gets served from cache """
+        cfg_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'acme_test_220.cfg')
+        with open(cfg_file, 'w') as fso:
+            fso.write('[Foo]\nfoo = bar\n')
+        reload_count = self.config_reload_count_get()
+        config1 = self.load_config(self.logger, None, cfg_file)
+        config2 = self.load_config(self.logger, None, cfg_file)
+        os.remove(cfg_file)
+        self.assertEqual('bar', config1['Foo']['foo'])
+        self.assertIs(config1, config2)
+        self.assertEqual(reload_count + 1, self.config_reload_count_get())
+
+    def test_221_load_config(self):
+        """ load config - reload after file modification """
+        cfg_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'acme_test_221.cfg')
+        with open(cfg_file, 'w') as fso:
+            fso.write('[Foo]\nfoo = bar\n')
+        reload_count = self.config_reload_count_get()
+        config1 = self.load_config(self.logger, None, cfg_file)
+        with open(cfg_file, 'w') as fso:
+            fso.write('[Foo]\nfoo = foobar\n')
+        config2 = self.load_config(self.logger, None, cfg_file)
+        os.remove(cfg_file)
+        self.assertEqual('bar', config1['Foo']['foo'])
+        self.assertEqual('foobar', config2['Foo']['foo'])
+        self.assertEqual(reload_count + 2, self.config_reload_count_get())
+
+    def test_222_load_config(self):
+        """ load config - reload after cache clear """
+        cfg_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'acme_test_222.cfg')
+        with open(cfg_file, 'w') as fso:
+            fso.write('[Foo]\nfoo = bar\n')
+        config1 = self.load_config(self.logger, None, cfg_file)
+        self.config_cache_clear()
+        config2 = self.load_config(self.logger, None, cfg_file)
+        os.remove(cfg_file)
+        self.assertIsNot(config1, config2)
+        self.assertEqual('bar', config2['Foo']['foo'])
+
+    def test_223_jws_deserialize(self):
+        """ jws_deserialize - valid message """
+        from jwcrypto import jws
+        data_dic = '{"protected": "eyJub25jZSI6ICIyNmU2YTQ2ZWZhZGQ0NzdkOTA4ZDdjMjAxNGU0OWIzNCIsICJ1cmwiOiAiaHR0cDovL2xhcHRvcC5uY2xtLXNhbWJhLmxvY2FsL2FjbWUvYXV0aHovUEcxODlGRnpmYW8xIiwgImtpZCI6ICJodHRwOi8vbGFwdG9wLm5jbG0tc2FtYmEubG9jYWwvYWNtZS9hY2N0L3l1WjFHVUpiNzZaayIsICJhbGciOiAiUlMyNTYifQ", "payload": "", "signature": "ZW5jb2RlZF9zaWduYXR1cmU="}'
+        self.assertIsInstance(self.jws_deserialize(self.logger, data_dic), jws.JWS)
+
+    def test_224_jws_deserialize(self):
+        """ jws_deserialize - invalid message """
+        self.assertFalse(self.jws_deserialize(self.logger, '{"foo": "bar"}'))
+
+    def test_225_helper_decode_message(self):
+        """ decode already deserialized message """
+        data_dic = '{"protected": "eyJub25jZSI6ICIyNmU2YTQ2ZWZhZGQ0NzdkOTA4ZDdjMjAxNGU0OWIzNCIsICJ1cmwiOiAiaHR0cDovL2xhcHRvcC5uY2xtLXNhbWJhLmxvY2FsL2FjbWUvYXV0aHovUEcxODlGRnpmYW8xIiwgImtpZCI6ICJodHRwOi8vbGFwdG9wLm5jbG0tc2FtYmEubG9jYWwvYWNtZS9hY2N0L3l1WjFHVUpiNzZaayIsICJhbGciOiAiUlMyNTYifQ", "payload": "", "signature": "ZW5jb2RlZF9zaWduYXR1cmU="}'
+        e_result = (True, None, {u'nonce': u'26e6a46efadd477d908d7c2014e49b34', u'url': u'http://laptop.nclm-samba.local/acme/authz/PG189FFzfao1', u'alg': u'RS256', u'kid': u'http://laptop.nclm-samba.local/acme/acct/yuZ1GUJb76Zk'}, {}, b'encoded_signature')
+        self.assertEqual(e_result, self.decode_message(self.logger, self.jws_deserialize(self.logger, data_dic)))
+
+    def test_226_helper_signature_check(self):
+        """ successful validation of already deserialized message """
+        mkey = {
+            'alg' : 'RS256',
+            'e' : 'AQAB',
+            'kty' : 'RSA',
+            'n' : '2CFMV4MK6Uo_2GQWa0KVWlzffgSDiLwur4ujSZkCRzbA3w5p1ABJgr7l_P84HpRv8R8rGL67hqmDJuT52mGD6fMVAhHPX5pSdtyZlQQuzpXonzNmHbG1DbMSiXrxg5jWVXchCxHx82wAt9Kf13O5ATxD0WOBB5FffpqQHh8zTf29jTL4vBd8N57ce17ZgNWl_EcoByjigqNFJcO0rrvrf6xyNaO9nbun4PAMJTLbfVa6CiEqjnjYMX80VYLH4fCqsAZgxIoli_D2j9P5Kq6KZZUL_bZ2QQV4UuwWZvh6tcA393YQLeMARnhWI6dqlZVdcU74NXi9NhSxcMkM8nZZ8Q',
+        }
+        message = '{"protected": "eyJub25jZSI6ICI3N2M3MmViMDE5NDc0YzBjOWIzODk5MmU4ZjRkMDIzYSIsICJ1cmwiOiAiaHR0cDovL2xhcHRvcC5uY2xtLXNhbWJhLmxvY2FsL2FjbWUvYWNjdC8xIiwgImFsZyI6ICJSUzI1NiIsICJraWQiOiAiaHR0cDovL2xhcHRvcC5uY2xtLXNhbWJhLmxvY2FsL2FjbWUvYWNjdC8xIn0","payload": "eyJzdGF0dXMiOiJkZWFjdGl2YXRlZCJ9","signature": "QYbMYZ1Dk8dHKqOwWBQHvWdnGD7donGZObb2Ry_Y5PsHpcTrj8Y2CM57SNVAR9V0ePg4vhK3-IbwYAKbhZV8jF7E-ylZaYm4PSQcumKLI55qvDiEvDiZ0gmjf_GAcsC40TwBa11lzR1u0dQYxOlQ_y9ak6705c5bM_V4_ttQeslJXCfVIQoV-sZS0Z6tJfy5dPVDR7JYG77bZbD3K-HCCaVbT7ilqcf00rA16lvw13zZnIgbcZsbW-eJ2BM_QxE24PGqc_vMfAxIiUG0VY7DqrKumLs91lHHTEie8I-CapH6AetsBhGtRcB6EL_Rn6qGQZK9YBpvoXANv_qF2-zQkQ"}'
+        self.assertEqual((True, None), self.signature_check(self.logger, self.jws_deserialize(self.logger, message), mkey))
+
+    def test_227_helper_signature_check(self):
+        """ decode_message() and signature_check() share one deserialized token """
+        mkey = {
+            'alg' : 'RS256',
+            'e' : 'AQAB',
+            'kty' : 'RSA',
+            'n' : '2CFMV4MK6Uo_2GQWa0KVWlzffgSDiLwur4ujSZkCRzbA3w5p1ABJgr7l_P84HpRv8R8rGL67hqmDJuT52mGD6fMVAhHPX5pSdtyZlQQuzpXonzNmHbG1DbMSiXrxg5jWVXchCxHx82wAt9Kf13O5ATxD0WOBB5FffpqQHh8zTf29jTL4vBd8N57ce17ZgNWl_EcoByjigqNFJcO0rrvrf6xyNaO9nbun4PAMJTLbfVa6CiEqjnjYMX80VYLH4fCqsAZgxIoli_D2j9P5Kq6KZZUL_bZ2QQV4UuwWZvh6tcA393YQLeMARnhWI6dqlZVdcU74NXi9NhSxcMkM8nZZ8Q',
+        }
+        message = '{"protected": "eyJub25jZSI6ICI3N2M3MmViMDE5NDc0YzBjOWIzODk5MmU4ZjRkMDIzYSIsICJ1cmwiOiAiaHR0cDovL2xhcHRvcC5uY2xtLXNhbWJhLmxvY2FsL2FjbWUvYWNjdC8xIiwgImFsZyI6ICJSUzI1NiIsICJraWQiOiAiaHR0cDovL2xhcHRvcC5uY2xtLXNhbWJhLmxvY2FsL2FjbWUvYWNjdC8xIn0","payload": "eyJzdGF0dXMiOiJkZWFjdGl2YXRlZCJ9","signature": "QYbMYZ1Dk8dHKqOwWBQHvWdnGD7donGZObb2Ry_Y5PsHpcTrj8Y2CM57SNVAR9V0ePg4vhK3-IbwYAKbhZV8jF7E-ylZaYm4PSQcumKLI55qvDiEvDiZ0gmjf_GAcsC40TwBa11lzR1u0dQYxOlQ_y9ak6705c5bM_V4_ttQeslJXCfVIQoV-sZS0Z6tJfy5dPVDR7JYG77bZbD3K-HCCaVbT7ilqcf00rA16lvw13zZnIgbcZsbW-eJ2BM_QxE24PGqc_vMfAxIiUG0VY7DqrKumLs91lHHTEie8I-CapH6AetsBhGtRcB6EL_Rn6qGQZK9YBpvoXANv_qF2-zQkQ"}'
+        jwstoken = self.jws_deserialize(self.logger, message)
+        with patch('jwcrypto.jws.JWS.deserialize') as mock_deserialize:
+            result = self.decode_message(self.logger, jwstoken)
+            self.assertEqual((True, None), self.signature_check(self.logger, jwstoken, mkey))
+        self.assertTrue(result[0])
+        self.assertFalse(mock_deserialize.called)
+
+    def test_228_address_list_sort(self):
+        """ addresses get interleaved starting with ipv6 """
+        self.assertEqual(['::1', '1.1.1.1', '::2', '2.2.2.2', '3.3.3.3'], self.address_list_sort(['1.1.1.1', '2.2.2.2', '3.3.3.3', '::1', '::2']))
+        self.assertEqual([], self.address_list_sort([]))
+
+    def test_229_happy_eyeballs_connect(self):
+        """ connect to listening socket """
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+        sock = self.happy_eyeballs_connect(['127.0.0.1'], server.getsockname()[1], 5)
+        self.assertEqual(server.getsockname(), sock.getpeername())
+        self.assertEqual(5, sock.gettimeout())
+        sock.close()
+
+    def test_230_happy_eyeballs_connect(self):
+        """ refused addresses do not wait for the stagger delay """
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+        started = time.monotonic()
+        sock = self.happy_eyeballs_connect(['::1', '127.0.0.2', '127.0.0.1'], server.getsockname()[1], 10, 5)
+        self.assertEqual(server.getsockname(), sock.getpeername())
+        self.assertLess(time.monotonic() - started, 2)
+        sock.close()
+
+    def test_231_happy_eyeballs_connect(self):
+        """ all connects refused """
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        port = server.getsockname()[1]
+        server.close()
+        with self.assertRaises(OSError):
+            self.happy_eyeballs_connect(['127.0.0.1'], port, 5)
+        with self.assertRaises(OSError):
+            self.happy_eyeballs_connect([], port, 5)
+
 if __name__ == '__main__':
     unittest.main()
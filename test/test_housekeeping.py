@@ -835,5 +835,43 @@ class TestACMEHandler(unittest.TestCase):
         self.assertFalse(mock_cdump.called)
         self.assertTrue(mock_jdump.called)
 
+    @patch('acme_srv.housekeeping.load_config')
+    def test_087_config_load(self, mock_load_cfg):
+        """ test _config_load nonce cleanup parameters """
+        parser = configparser.ConfigParser()
+        parser['Housekeeping'] = {'nonce_max_age': 3600, 'nonce_chunk_size': 500}
+        mock_load_cfg.return_value = parser
+        self.housekeeping._config_load()
+        self.assertEqual(3600, self.housekeeping.nonce_max_age)
+        self.assertEqual(500, self.housekeeping.nonce_chunk_size)
+
+    @patch('acme_srv.housekeeping.load_config')
+    def test_088_config_load(self, mock_load_cfg):
+        """ test _config_load invalid nonce cleanup parameters """
+        parser = configparser.ConfigParser()
+        parser['Housekeeping'] = {'nonce_max_age': 'aa'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.housekeeping._config_load()
+        self.assertEqual(86400, self.housekeeping.nonce_max_age)
+        self.assertIn("ERROR:test_a2c:Housekeeping._config_load(): failed to parse nonce_max_age/nonce_chunk_size: invalid literal for int() with base 10: 'aa'", lcm.output)
+
+    def test_089_nonces_cleanup(self):
+        """ test nonces_cleanup() """
+        self.housekeeping.dbstore = MagicMock()
+        self.housekeeping.dbstore.nonces_expired_delete.return_value = 10
+        self.housekeeping.nonce_max_age = 100
+        self.housekeeping.nonce_chunk_size = 5
+        self.assertEqual(10, self.housekeeping.nonces_cleanup(1000))
+        self.housekeeping.dbstore.nonces_expired_delete.assert_called_with(900, 5)
+
+    def test_090_nonces_cleanup(self):
+        """ test nonces_cleanup() database error """
+        self.housekeeping.dbstore = MagicMock()
+        self.housekeeping.dbstore.nonces_expired_delete.side_effect = Exception('exc_nonce_delete')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(0, self.housekeeping.nonces_cleanup(1000))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Housekeeping.nonces_cleanup(): exc_nonce_delete', lcm.output)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for httpclient.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+import threading
+import http.server
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+class FakeHandler(http.server.BaseHTTPRequestHandler):
+    """ return host header or a large body """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """ get request """
+        if self.path.startswith('/large'):
+            body = b'x' * 100000
+        else:
+            body = 'host={0}'.format(self.headers['Host']).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """ keep output clean """
+
+class FakeServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """ local http server """
+    daemon_threads = True
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for ValidationHttpClient """
+    acme = None
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.logger = logging.getLogger('test_a2c')
+        from acme_srv.httpclient import ValidationHttpClient, HTTP_CLIENT, http_client_get, validation_url_get
+        self.client_class = ValidationHttpClient
+        self.http_client_dic = HTTP_CLIENT
+        self.http_client_get = http_client_get
+        self.validation_url_get = validation_url_get
+        self.http_client_dic['clients'] = {}
+
+    def _server_start(self):
+        """ start local http server """
+        server = FakeServer(('127.0.0.1', 0), FakeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.server_address[1]
+
+    def test_001_get(self):
+        """ successful get request """
+        port = self._server_start()
+        client = self.client_class(self.logger)
+        self.assertEqual('host=127.0.0.1:{0}'.format(port), client.get('http://127.0.0.1:{0}/token'.format(port)))
+
+    def test_002_get(self):
+        """ get request - body larger than max_size """
+        port = self._server_start()
+        client = self.client_class(self.logger, max_size=1024)
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(client.get('http://127.0.0.1:{0}/large'.format(port)))
+        self.assertIn('ERROR:test_a2c:ValidationHttpClient.get() error: response exceeds 1024 bytes', lcm.output)
+
+    @patch('acme_srv.httpclient.addresses_get')
+    def test_003_get(self, mock_resolve):
+        """ get request - hostname gets resolved by own resolver, host header stays unchanged """
+        port = self._server_start()
+        mock_resolve.return_value = (['127.0.0.1'], False)
+        client = self.client_class(self.logger, dns_server_list=['10.0.0.1'])
+        self.assertEqual('host=fqdn.example:{0}'.format(port), client.get('http://fqdn.example:{0}/token'.format(port)))
+        mock_resolve.assert_called_with('fqdn.example', ['10.0.0.1'], port)
+
+    @patch('acme_srv.httpclient.addresses_get')
+    def test_004_get(self, mock_resolve):
+        """ get request - concurrent requests share pooled connections """
+        port = self._server_start()
+        mock_resolve.return_value = (['127.0.0.1'], False)
+        client = self.client_class(self.logger, dns_server_list=['10.0.0.1'], pool_size=4)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            result_list = list(executor.map(lambda cnt: client.get('http://fqdn.example:{0}/{1}'.format(port, cnt)), range(40)))
+        self.assertEqual({'host=fqdn.example:{0}'.format(port)}, set(result_list))
+        # connections get reused - name resolution happens once per connection only
+        self.assertLessEqual(mock_resolve.call_count, 4)
+
+    def test_005_get(self):
+        """ get request - connection refused """
+        server = FakeServer(('127.0.0.1', 0), FakeHandler)
+        port = server.server_address[1]
+        server.server_close()
+        client = self.client_class(self.logger, timeout=(1, 1))
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(client.get('http://127.0.0.1:{0}/token'.format(port)))
+        self.assertTrue(lcm.output[0].startswith('ERROR:test_a2c:ValidationHttpClient.get() error:'))
+
+    def test_006_init(self):
+        """ proxy configured - no own resolver """
+        client = self.client_class(self.logger, dns_server_list=['10.0.0.1'], proxy_server='http://proxy:8080')
+        self.assertEqual({'http': 'http://proxy:8080', 'https': 'http://proxy:8080'}, client.proxy_list)
+        self.assertFalse(client.adapter.resolver)
+
+    def test_007_session_get(self):
+        """ sessions are kept per thread and share the adapter """
+        client = self.client_class(self.logger)
+        session1 = client._session_get()
+        self.assertIs(session1, client._session_get())
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            session2 = executor.submit(client._session_get).result()
+        self.assertIsNot(session1, session2)
+        self.assertIs(session1.get_adapter('http://foo'), session2.get_adapter('http://foo'))
+
+    def test_008_http_client_get(self):
+        """ process wide clients per dns-server/proxy combination """
+        client1 = self.http_client_get(self.logger, ['10.0.0.1'], None)
+        self.assertIs(client1, self.http_client_get(self.logger, ['10.0.0.1'], None))
+        self.assertIsNot(client1, self.http_client_get(self.logger, None, 'http://proxy:8080'))
+
+    @patch('acme_srv.httpclient.http_client_get')
+    def test_009_validation_url_get(self, mock_client_get):
+        """ validation_url_get() """
+        mock_client_get.return_value.get.return_value = 'foo'
+        self.assertEqual('foo', self.validation_url_get(self.logger, 'url', ['10.0.0.1'], 'proxy', False, (1, 2), 100))
+        mock_client_get.assert_called_with(self.logger, ['10.0.0.1'], 'proxy', (1, 2), 100)
+        mock_client_get.return_value.get.assert_called_with('url', verify=False)
+
+    @patch('acme_srv.httpclient.addresses_get')
+    def test_010_get(self, mock_resolve):
+        """ get request - unreachable addresses get skipped """
+        port = self._server_start()
+        mock_resolve.return_value = (['::1', '127.0.0.2', '127.0.0.1'], False)
+        client = self.client_class(self.logger, timeout=(5, 5))
+        self.assertEqual('host=fqdn.example:{0}'.format(port), client.get('http://fqdn.example:{0}/token'.format(port)))
+        mock_resolve.assert_called_with('fqdn.example', None, port)
+
+    @patch('acme_srv.httpclient.addresses_get')
+    def test_011_get(self, mock_resolve):
+        """ get request - name does not resolve """
+        mock_resolve.return_value = ([], True)
+        client = self.client_class(self.logger, timeout=(1, 1))
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(client.get('http://fqdn.invalid/token'))
+        self.assertTrue(lcm.output[0].startswith('ERROR:test_a2c:ValidationHttpClient.get() error:'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -300,5 +300,32 @@ class TestACMEHandler(unittest.TestCase):
         self.assertFalse(self.message.disable_dic['signature_check_disable'])
         self.assertEqual({'acct_path': 'url_prefix/acme/acct/', 'revocation_path': 'url_prefix/acme/revokecert'}, self.message.path_dic)
 
+
+    @patch('acme_srv.signature.Signature.check')
+    @patch('acme_srv.message.Message._name_get')
+    @patch('acme_srv.nonce.Nonce.check')
+    @patch('acme_srv.message.decode_message')
+    @patch('acme_srv.message.jws_deserialize')
+    def test_032_message_check(self, mock_deserialize, mock_decode, mock_nonce_check, mock_name_get, mock_sig):
+        """ message check - deserialized token gets passed to decode_message() and signature check """
+        jwstoken = MagicMock()
+        mock_deserialize.return_value = jwstoken
+        mock_decode.return_value = (True, None, 'protected', 'payload', 'signature')
+        mock_nonce_check.return_value = (200, None, None)
+        mock_name_get.return_value = 'account_name'
+        mock_sig.return_value = (True, None, None)
+        self.assertEqual((200, None, None, 'protected', 'payload', 'account_name'), self.message.check('message'))
+        self.assertEqual(jwstoken, mock_decode.call_args[0][1])
+        self.assertEqual(jwstoken, mock_sig.call_args[0][1])
+
+    @patch('acme_srv.message.decode_message')
+    @patch('acme_srv.message.jws_deserialize')
+    def test_033_message_check(self, mock_deserialize, mock_decode):
+        """ message check - deserialization failed raw message gets passed to decode_message() """
+        mock_deserialize.return_value = None
+        mock_decode.return_value = (False, 'detail', None, None, None)
+        self.assertEqual((400, 'urn:ietf:params:acme:error:malformed', 'detail', None, None, None), self.message.check('message'))
+        self.assertEqual('message', mock_decode.call_args[0][1])
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,6 +4,7 @@
 # pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
 import unittest
 import sys
+import configparser
 from unittest.mock import patch, MagicMock
 
 sys.path.insert(0, '.')
@@ -57,23 +58,231 @@ class TestACMEHandler(unittest.TestCase):
         self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Nonce.generate_and_add(): exc_nonce_add', lcm.output)
 
     def test_007_nonce__check_and_delete(self):
-        """ test Nonce._add() if dbstore.nonce_add raises an exception """
-        self.nonce.dbstore.nonce_check.return_value = True
-        self.nonce.dbstore.nonce_delete.side_effect = Exception('exc_nonce_delete')
-        with self.assertLogs('test_a2c', level='INFO') as lcm:
-            self.nonce._check_and_delete('nonce')
-        self.assertIn('CRITICAL:test_a2c:acme2certifier database error during nonce_delete() in Nonce._check_and_delete(): exc_nonce_delete', lcm.output)
+        """ test Nonce._check_and_delete() uses dbstore.nonce_consume() """
+        self.nonce.dbstore = MagicMock()
+        self.nonce.dbstore.nonce_consume.return_value = False
+        self.assertEqual((400, 'urn:ietf:params:acme:error:badNonce', 'nonce'), self.nonce._check_and_delete('nonce'))
+        self.nonce.dbstore.nonce_consume.assert_called_with('nonce')
+        self.assertFalse(self.nonce.dbstore.nonce_check.called)
+        self.assertFalse(self.nonce.dbstore.nonce_delete.called)
 
     def test_008_nonce__check_and_delete(self):
-        """ test Nonce._add() if dbstore.nonce_add raises an exception """
-        self.nonce.dbstore.nonce_check.side_effect = Exception('exc_nonce_check')
+        """ test Nonce._check_and_delete() if dbstore.nonce_consume raises an exception """
+        self.nonce.dbstore.nonce_consume.side_effect = Exception('exc_nonce_consume')
         with self.assertLogs('test_a2c', level='INFO') as lcm:
-            self.nonce._check_and_delete('nonce')
-        self.assertIn('CRITICAL:test_a2c:acme2certifier database error during nonce_check() in Nonce._check_and_delete(): exc_nonce_check', lcm.output)
+            self.assertEqual((400, 'urn:ietf:params:acme:error:badNonce', 'nonce'), self.nonce._check_and_delete('nonce'))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error during nonce_consume() in Nonce._check_and_delete(): exc_nonce_consume', lcm.output)
 
     def test_009__enter_(self):
         """ test enter """
         self.nonce.__enter__()
 
+    def test_010_memory_store(self):
+        """ test NonceMemoryStore.consume() burns the nonce """
+        from acme_srv.nonce import NonceMemoryStore
+        store = NonceMemoryStore()
+        store.add('nonce1')
+        self.assertTrue(store.consume('nonce1'))
+        self.assertFalse(store.consume('nonce1'))
+        self.assertFalse(store.consume('nonce2'))
+
+    def test_011_memory_store(self):
+        """ test NonceMemoryStore expired nonce """
+        from acme_srv.nonce import NonceMemoryStore
+        store = NonceMemoryStore(ttl=-1)
+        store.add('nonce1')
+        self.assertFalse(store.consume('nonce1'))
+        self.assertFalse(store.nonce_dic)
+
+    def test_012_memory_store(self):
+        """ test NonceMemoryStore max_entries """
+        from acme_srv.nonce import NonceMemoryStore
+        store = NonceMemoryStore(max_entries=2)
+        store.add('nonce1')
+        store.add('nonce2')
+        store.add('nonce3')
+        self.assertEqual(['nonce2', 'nonce3'], list(store.nonce_dic.keys()))
+        self.assertFalse(store.consume('nonce1'))
+        self.assertTrue(store.consume('nonce3'))
+
+    @patch('acme_srv.nonce.socket.socket')
+    def test_013_socket_store(self, mock_socket):
+        """ test NonceSocketStore.consume() """
+        from acme_srv.nonce import NonceSocketStore
+        sock = mock_socket.return_value.__enter__.return_value
+        sock.makefile.return_value.readline.return_value = b'OK\n'
+        self.assertTrue(NonceSocketStore('/tmp/sock').consume('nonce1'))
+        sock.connect.assert_called_with('/tmp/sock')
+        sock.sendall.assert_called_with(b'CONSUME nonce1\n')
+        sock.makefile.return_value.readline.return_value = b'NOK\n'
+        self.assertFalse(NonceSocketStore('/tmp/sock').add('nonce1'))
+        sock.sendall.assert_called_with(b'ADD nonce1\n')
+
+    @patch('acme_srv.nonce.load_config')
+    def test_014_config_load(self, mock_load_cfg):
+        """ test Nonce._config_load() backends """
+        from acme_srv.nonce import NonceMemoryStore, NonceSocketStore
+        parser = configparser.ConfigParser()
+        parser['Nonce'] = {'backend': 'memory'}
+        mock_load_cfg.return_value = parser
+        self.nonce._config_load()
+        self.assertIsInstance(self.nonce.backend, NonceMemoryStore)
+        parser['Nonce'] = {'backend': 'socket', 'socket': '/tmp/sock'}
+        self.nonce._config_load()
+        self.assertIsInstance(self.nonce.backend, NonceSocketStore)
+        self.assertEqual('/tmp/sock', self.nonce.backend.socket_path)
+        parser['Nonce'] = {'backend': 'socket'}
+        self.nonce._config_load()
+        self.assertEqual('/run/acme2certifier/nonce.sock', self.nonce.backend.socket_path)
+
+    @patch('acme_srv.nonce.load_config')
+    def test_015_config_load(self, mock_load_cfg):
+        """ test Nonce._config_load() unknown backend and invalid ttl """
+        parser = configparser.ConfigParser()
+        parser['Nonce'] = {'backend': 'foo', 'ttl': 'aa'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.nonce._config_load()
+        self.assertFalse(self.nonce.backend)
+        self.assertIn("ERROR:test_a2c:Nonce._config_load(): failed to parse ttl/max_entries: invalid literal for int() with base 10: 'aa'", lcm.output)
+        self.assertIn('ERROR:test_a2c:Nonce._config_load(): unknown backend: foo. Using database.', lcm.output)
+
+    def test_016_nonce_memory_backend(self):
+        """ test Nonce with memory backend """
+        from acme_srv.nonce import NonceMemoryStore
+        self.nonce.backend = NonceMemoryStore()
+        self.nonce.dbstore = MagicMock()
+        nonce = self.nonce.generate_and_add()
+        self.assertEqual((200, None, None), self.nonce.check({'nonce': nonce}))
+        self.assertEqual((400, 'urn:ietf:params:acme:error:badNonce', nonce), self.nonce.check({'nonce': nonce}))
+        self.assertFalse(self.nonce.dbstore.nonce_add.called)
+
+    def test_017_nonce__check_and_delete(self):
+        """ test Nonce._check_and_delete() backend raises an exception """
+        self.nonce.backend = MagicMock()
+        self.nonce.backend.consume.side_effect = Exception('exc_consume')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual((400, 'urn:ietf:params:acme:error:badNonce', 'nonce'), self.nonce._check_and_delete('nonce'))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier nonce backend error in Nonce._check_and_delete(): exc_consume', lcm.output)
+
+    def test_018_nonce_generate_and_add(self):
+        """ test Nonce.generate_and_add() backend raises an exception """
+        self.nonce.backend = MagicMock()
+        self.nonce.backend.add.side_effect = Exception('exc_add')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertTrue(self.nonce.generate_and_add())
+        self.assertIn('CRITICAL:test_a2c:acme2certifier nonce backend error in Nonce.generate_and_add(): exc_add', lcm.output)
+
+    def test_019_stateless(self):
+        """ test stateless nonce can be used once and does not touch the database """
+        from acme_srv.nonce import NonceReplayFilter
+        self.nonce.dbstore = MagicMock()
+        self.nonce.stateless = True
+        self.nonce.hmac_key = b'key'
+        self.nonce.replay_filter = NonceReplayFilter()
+        nonce = self.nonce.generate_and_add()
+        self.assertEqual((200, None, None), self.nonce.check({'nonce': nonce}))
+        self.assertEqual((400, 'urn:ietf:params:acme:error:badNonce', nonce), self.nonce.check({'nonce': nonce}))
+        self.assertEqual((400, 'urn:ietf:params:acme:error:badNonce', nonce + '!'), self.nonce.check({'nonce': nonce + '!'}))
+        self.assertFalse(self.nonce.dbstore.nonce_add.called)
+        self.assertFalse(self.nonce.dbstore.nonce_consume.called)
+
+    def test_020_stateless(self):
+        """ test stateless nonce with wrong key, manipulated content and garbage """
+        from acme_srv.nonce import NonceReplayFilter
+        self.nonce.stateless = True
+        self.nonce.hmac_key = b'key'
+        self.nonce.replay_filter = NonceReplayFilter()
+        nonce = self.nonce.generate_and_add()
+        self.nonce.hmac_key = b'key2'
+        self.assertFalse(self.nonce._stateless_check(nonce))
+        self.nonce.hmac_key = b'key'
+        self.assertFalse(self.nonce._stateless_check(('B' if nonce[0] == 'A' else 'A') + nonce[1:]))
+        self.assertFalse(self.nonce._stateless_check('foo'))
+        self.assertFalse(self.nonce._stateless_check(None))
+        self.assertTrue(self.nonce._stateless_check(nonce))
+
+    @patch('acme_srv.nonce.time.time')
+    def test_021_stateless(self, mock_time):
+        """ test stateless nonce freshness window """
+        from acme_srv.nonce import NonceReplayFilter
+        self.nonce.stateless = True
+        self.nonce.hmac_key = b'key'
+        self.nonce.ttl = 100
+        self.nonce.replay_filter = NonceReplayFilter()
+        mock_time.return_value = 1000
+        nonce = self.nonce.generate_and_add()
+        mock_time.return_value = 1101
+        self.assertFalse(self.nonce._stateless_check(nonce))
+        mock_time.return_value = 1100
+        self.assertTrue(self.nonce._stateless_check(nonce))
+
+    def test_022_replay_filter(self):
+        """ test NonceReplayFilter refuses evicted nonces """
+        from acme_srv.nonce import NonceReplayFilter
+        replay_filter = NonceReplayFilter(max_entries=2)
+        self.assertTrue(replay_filter.register(b'nonce1', 110, 0))
+        self.assertTrue(replay_filter.register(b'nonce2', 100, 0))
+        self.assertTrue(replay_filter.register(b'nonce3', 120, 0))
+        self.assertEqual(110, replay_filter.floor)
+        # nonce1 got evicted - no replay possible
+        self.assertFalse(replay_filter.register(b'nonce1', 110, 0))
+        self.assertFalse(replay_filter.register(b'nonce4', 105, 0))
+        self.assertTrue(replay_filter.register(b'nonce5', 111, 0))
+
+    @patch('acme_srv.nonce.load_config')
+    def test_023_config_load(self, mock_load_cfg):
+        """ test Nonce._config_load() stateless mode """
+        from acme_srv.nonce import NonceReplayFilter
+        parser = configparser.ConfigParser()
+        parser['Nonce'] = {'mode': 'stateless', 'hmac_key': 'key', 'ttl': 300}
+        mock_load_cfg.return_value = parser
+        self.nonce._config_load()
+        self.assertTrue(self.nonce.stateless)
+        self.assertEqual(b'key', self.nonce.hmac_key)
+        self.assertEqual(300, self.nonce.ttl)
+        self.assertIsInstance(self.nonce.replay_filter, NonceReplayFilter)
+        self.assertFalse(self.nonce.backend)
+
+    def test_024_pool_get(self):
+        """ test Nonce._pool_get() refills pool with one database write """
+        from acme_srv.nonce import NONCE_POOL
+        NONCE_POOL['nonces'] = []
+        self.nonce.dbstore = MagicMock()
+        stored_list = []
+        self.nonce.dbstore.nonces_add.side_effect = lambda nonce_list: stored_list.append(list(nonce_list))
+        self.nonce.pregenerate = 5
+        nonce_list = [self.nonce.generate_and_add() for _cnt in range(6)]
+        self.assertEqual(6, len(set(nonce_list)))
+        self.assertEqual([5, 5], [len(ele) for ele in stored_list])
+        self.assertFalse(self.nonce.dbstore.nonce_add.called)
+        self.assertTrue(set(nonce_list[:5]) == set(stored_list[0]))
+        self.assertEqual(4, len(NONCE_POOL['nonces']))
+        NONCE_POOL['nonces'] = []
+
+    def test_025_pool_get(self):
+        """ test Nonce._pool_get() database error """
+        from acme_srv.nonce import NONCE_POOL
+        NONCE_POOL['nonces'] = []
+        self.nonce.dbstore = MagicMock()
+        self.nonce.dbstore.nonces_add.side_effect = Exception('exc_nonces_add')
+        self.nonce.pregenerate = 5
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(self.nonce._pool_get())
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Nonce._pool_get(): exc_nonces_add', lcm.output)
+        self.assertFalse(NONCE_POOL['nonces'])
+
+    def test_026_generate_and_add(self):
+        """ test Nonce.generate_and_add() stores the new nonce if the pool cannot be refilled """
+        from acme_srv.nonce import NONCE_POOL
+        NONCE_POOL['nonces'] = []
+        self.nonce.dbstore = MagicMock()
+        self.nonce.dbstore.nonces_add.side_effect = Exception('exc_nonces_add')
+        self.nonce.pregenerate = 5
+        with self.assertLogs('test_a2c', level='INFO'):
+            nonce = self.nonce.generate_and_add()
+        self.nonce.dbstore.nonce_add.assert_called_with(nonce)
+        self.assertFalse(NONCE_POOL['nonces'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -65,7 +65,7 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.return_value = 'aaaaa'
         mock_uts.return_value = 1543640400
         self.order.dbstore.order_add.return_value = 1
-        self.order.dbstore.authorization_add.return_value = True
+        self.order.dbstore.authorizations_add_bulk.return_value = True
         message = {'identifiers' : [{"type": "dns", "value": "example.com"}]}
         e_result = (None, 'aaaaa', {'aaaaa': {'type': 'dns', 'value': 'example.com'}}, '2018-12-02T05:00:00Z')
         self.assertEqual(e_result, self.order._add(message, 1))
@@ -77,7 +77,7 @@ class TestACMEHandler(unittest.TestCase):
         mock_name.side_effect = ['order', 'identifier1', 'identifier2']
         mock_uts.return_value = 1543640400
         self.order.dbstore.order_add.return_value = 1
-        self.order.dbstore.authorization_add.return_value = True
+        self.order.dbstore.authorizations_add_bulk.return_value = True
         message = {'identifiers' : [{"type": "dns", "value": "example1.com"}, {"type": "dns", "value": "example2.com"}]}
         e_result = (None, 'order', {'identifier1': {'type': 'dns', 'value': 'example1.com'}, 'identifier2': {'type': 'dns', 'value': 'example2.com'}}, '2018-12-02T05:00:00Z')
         self.assertEqual(e_result, self.order._add(message, 1))
@@ -134,136 +134,122 @@ class TestACMEHandler(unittest.TestCase):
         message = '{"foo" : "bar"}'
         self.assertEqual({'header': {'Location': 'http://tester.local/acme/order/foo_order', 'Replay-Nonce': 'new_nonce'}, 'code': 201, 'data': {'status': 'pending', 'identifiers': [], 'authorizations': [], 'finalize': 'http://tester.local/acme/order/foo_order/finalize', 'expires': 'expires'}}, self.order.new(message))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_010_order__lookup(self, mock_oinfo):
         """ test order lookup with empty hash """
         mock_oinfo.return_value = {}
         self.assertEqual({}, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_011_order__lookup(self, mock_oinfo):
         """ test order lookup with wrong hash and wrong authorization hash"""
-        self.order.dbstore.authorization_lookup.return_value = [{'identifier_key' : 'identifier_value'}]
-        mock_oinfo.return_value = {'status_key' : 'status_value'}
+        mock_oinfo.return_value = {'status_key' : 'status_value', 'authorizations': [{'identifier_key' : 'identifier_value'}]}
         self.assertEqual({'authorizations': []}, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_012_order__lookup(self, mock_oinfo):
         """ test order lookup with wrong hash and correct authorization hash"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}]
-        mock_oinfo.return_value = {'status_key' : 'status_value'}
+        mock_oinfo.return_value = {'status_key' : 'status_value', 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}]}
         self.assertEqual({'authorizations': ['http://tester.local/acme/authz/name']}, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_013_order__lookup(self, mock_oinfo):
         """ test order lookup with wrong hash and authorization hash having multiple entries"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]
-        mock_oinfo.return_value = {'status_key' : 'status_value'}
+        mock_oinfo.return_value = {'status_key' : 'status_value', 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]}
         self.assertEqual({'authorizations': ['http://tester.local/acme/authz/name', 'http://tester.local/acme/authz/name2']}, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_014_order__lookup(self, mock_oinfo):
         """ test order lookup status in dict and authorization dict having multiple entries"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]
-        mock_oinfo.return_value = {'status' : 'status_value'}
+        mock_oinfo.return_value = {'status' : 'status_value', 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]}
         e_result = {'status': 'status_value', 'authorizations': ['http://tester.local/acme/authz/name', 'http://tester.local/acme/authz/name2']}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_015_order__lookup(self, mock_oinfo):
         """ test order lookup status, expires in dict and authorization dict having multiple entries"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]}
         e_result = {'status': 'status_value', 'authorizations': ['http://tester.local/acme/authz/name', 'http://tester.local/acme/authz/name2'], 'expires': '2018-12-01T05:00:00Z'}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_016_order__lookup(self, mock_oinfo):
         """ test order lookup status, expires, notbefore (0) in dict and authorization dict having multiple entries"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 0}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 0, 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]}
         e_result = {'status': 'status_value', 'authorizations': ['http://tester.local/acme/authz/name', 'http://tester.local/acme/authz/name2'], 'expires': '2018-12-01T05:00:00Z'}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_017_order__lookup(self, mock_oinfo):
         """ test order lookup status, expires, notbefore and notafter (0) in dict and authorization dict having multiple entries"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 0, 'notafter' : 0}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 0, 'notafter' : 0, 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]}
         e_result = {'status': 'status_value', 'authorizations': ['http://tester.local/acme/authz/name', 'http://tester.local/acme/authz/name2'], 'expires': '2018-12-01T05:00:00Z'}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_018_order__lookup(self, mock_oinfo):
         """ test order lookup status, expires, notbefore and notafter (valid) in dict and authorization dict having multiple entries"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]}
         e_result = {'status': 'status_value', 'authorizations': ['http://tester.local/acme/authz/name', 'http://tester.local/acme/authz/name2'], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z',}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_019_order__lookup(self, mock_oinfo):
         """ test order lookup status, expires, notbefore and notafter (valid), identifier, in dict and authorization dict having multiple entries"""
-        self.order.dbstore.authorization_lookup.return_value = [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifier': '"{"foo" : "bar"}"'}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifier': '"{"foo" : "bar"}"', 'authorizations': [{'name' : 'name', 'identifier_key' : 'identifier_value'}, {'name' : 'name2', 'identifier_key' : 'identifier_value2'}]}
         e_result = {'status': 'status_value', 'authorizations': ['http://tester.local/acme/authz/name', 'http://tester.local/acme/authz/name2'], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z',}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_020_order__lookup(self, mock_oinfo):
         """ test order lookup status, expires, notbefore and notafter (valid), identifier, in dict and worng authorization"""
-        self.order.dbstore.authorization_lookup.return_value = 'foo'
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifier': '"{"foo" : "bar"}"'}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifier': '"{"foo" : "bar"}"', 'authorizations': 'foo'}
         e_result = {'status': 'status_value', 'authorizations': [], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z',}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_021_order__lookup(self, mock_oinfo):
         """ test order lookup correct identifier for oder info"""
-        self.order.dbstore.authorization_lookup.return_value = 'foo'
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}'}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}', 'authorizations': 'foo'}
         e_result = {'status': 'status_value', 'authorizations': [], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z', 'identifiers': {'foo': 'bar'}}
         self.assertEqual(e_result, self.order._lookup('foo'))
 
-    @patch('acme_srv.order.Order._info')
+    @patch('acme_srv.order.Order._view')
     def test_022_order__lookup(self, mock_oinfo):
         """ test order lookup incorrect identifier for oder info"""
-        self.order.dbstore.authorization_lookup.return_value = 'foo'
-        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': 'wrongvalue'}
+        mock_oinfo.return_value = {'status' : 'status_value', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': 'wrongvalue', 'authorizations': 'foo'}
         e_result = {'status': 'status_value', 'authorizations': [], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z'}
         with self.assertLogs('test_a2c', level='INFO') as lcm:
             self.assertEqual(e_result, self.order._lookup('foo'))
         self.assertIn('ERROR:test_a2c:Order.lookup(): error while parsing the identifier wrongvalue', lcm.output)
 
-    @patch('acme_srv.order.Order._update')
-    @patch('acme_srv.order.Order._info')
-    def test_023_order__lookup(self, mock_oinfo, mock_update):
+    @patch('acme_srv.order.Order._ready_set')
+    @patch('acme_srv.order.Order._view')
+    def test_023_order__lookup(self, mock_oinfo, mock_ready):
         """ test order lookup correct identifier for oder info status - pending order-update """
-        self.order.dbstore.authorization_lookup.return_value = [{'name': 'name', 'status__name': 'valid'}]
-        mock_oinfo.return_value = {'status' : 'pending', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}'}
-        e_result = {'status': 'pending', 'authorizations': ['http://tester.local/acme/authz/name'], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z', 'identifiers': {'foo': 'bar'}}
+        mock_oinfo.return_value = {'status' : 'pending', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}', 'authorizations': [{'name': 'name', 'status__name': 'valid'}]}
+        mock_ready.return_value = True
+        e_result = {'status': 'ready', 'authorizations': ['http://tester.local/acme/authz/name'], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z', 'identifiers': {'foo': 'bar'}}
         self.assertEqual(e_result, self.order._lookup('foo'))
-        self.assertTrue(mock_update.called)
+        self.assertTrue(mock_ready.called)
 
-    @patch('acme_srv.order.Order._update')
-    @patch('acme_srv.order.Order._info')
-    def test_024_order__lookup(self, mock_oinfo, mock_update):
+    @patch('acme_srv.order.Order._ready_set')
+    @patch('acme_srv.order.Order._view')
+    def test_024_order__lookup(self, mock_oinfo, mock_ready):
         """ test order lookup correct identifier for oder info status - pending order-update """
-        self.order.dbstore.authorization_lookup.return_value = [{'name': 'name', 'status__name': 'valid'}]
-        mock_oinfo.return_value = {'status' : 'notpending', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}'}
+        mock_oinfo.return_value = {'status' : 'notpending', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}', 'authorizations': [{'name': 'name', 'status__name': 'valid'}]}
         e_result = {'status': 'notpending', 'authorizations': ['http://tester.local/acme/authz/name'], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z', 'identifiers': {'foo': 'bar'}}
         self.assertEqual(e_result, self.order._lookup('foo'))
-        self.assertFalse(mock_update.called)
+        self.assertFalse(mock_ready.called)
 
-    @patch('acme_srv.order.Order._update')
-    @patch('acme_srv.order.Order._info')
-    def test_025_order__lookup(self, mock_oinfo, mock_update):
+    @patch('acme_srv.order.Order._ready_set')
+    @patch('acme_srv.order.Order._view')
+    def test_025_order__lookup(self, mock_oinfo, mock_ready):
         """ test order lookup correct identifier for oder info status - invalid statusname """
-        self.order.dbstore.authorization_lookup.return_value = [{'name': 'name', 'status__name': 'invalid'}]
-        mock_oinfo.return_value = {'status' : 'pending', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}'}
+        mock_oinfo.return_value = {'status' : 'pending', 'expires' : 1543640400, 'notbefore' : 1543640400, 'notafter' : 1543640400, 'identifiers': '{"foo": "bar"}', 'authorizations': [{'name': 'name', 'status__name': 'invalid'}]}
         e_result = {'status': 'pending', 'authorizations': ['http://tester.local/acme/authz/name'], 'expires': '2018-12-01T05:00:00Z', 'notAfter': '2018-12-01T05:00:00Z', 'notBefore': '2018-12-01T05:00:00Z', 'identifiers': {'foo': 'bar'}}
         self.assertEqual(e_result, self.order._lookup('foo'))
-        self.assertFalse(mock_update.called)
+        self.assertFalse(mock_ready.called)
 
     @patch('acme_srv.order.Order._info')
     def test_026_order__csr_process(self, mock_oinfo):
@@ -685,8 +671,8 @@ class TestACMEHandler(unittest.TestCase):
 
     @patch('acme_srv.order.Order._identifiers_check')
     def test_079_order__add(self, mock_idchk):
-        """ test Order._add - dbstore.authorization_add() raises an exception  """
-        self.order.dbstore.authorization_add.side_effect = Exception('exc_order_add')
+        """ test Order._add - dbstore.authorizations_add_bulk() raises an exception  """
+        self.order.dbstore.authorizations_add_bulk.side_effect = Exception('exc_order_add')
         self.order.dbstore.order_add.return_value = 'oid'
         mock_idchk.return_value = False
         with self.assertLogs('test_a2c', level='INFO') as lcm:
@@ -723,14 +709,13 @@ class TestACMEHandler(unittest.TestCase):
             self.order._update({'url': 'url'})
         self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Order._update(): exc_order_upd', lcm.output)
 
-    @patch('acme_srv.order.Order._info')
-    def test_084_order__lookup(self, mock_info):
-        """ test Order._lookup - dbstore.authorization_lookup() raises an exception  """
-        self.order.dbstore.authorization_lookup.side_effect = Exception('exc_authz_lookup')
-        mock_info.return_value = {'status': 'valid'}
+    def test_084_order__lookup(self):
+        """ test Order._lookup - dbstore.order_view() raises an exception  """
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_view.side_effect = Exception('exc_order_view')
         with self.assertLogs('test_a2c', level='INFO') as lcm:
-            self.order._lookup('oname')
-        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Order._lookup(): exc_authz_lookup', lcm.output)
+            self.assertEqual({}, self.order._lookup('oname'))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Order._view(): exc_order_view', lcm.output)
 
     def test_085_order_invalidate(self):
         """ test Order.invalidate - dbstore.order_update() raises an exception  """
@@ -954,5 +939,210 @@ class TestACMEHandler(unittest.TestCase):
         self.assertFalse(self.order.tnauthlist_support)
         self.assertEqual({'authz_path': 'url_prefix/acme/authz/', 'cert_path': 'url_prefix/acme/cert/', 'order_path': 'url_prefix/acme/order/'}, self.order.path_dic)
 
+    @patch('acme_srv.nonce.Nonce.generate_and_add')
+    @patch('acme_srv.order.Order._add')
+    @patch('acme_srv.message.Message.check')
+    def test_104_order_new(self, mock_mcheck, mock_orderadd, mock_nnonce):
+        """ test order new - database operations run in a single transaction """
+        mock_mcheck.return_value = (200, None, None, 'protected', {"status" : "foo"}, 'account_name')
+        mock_orderadd.return_value = (None, 'foo_order', {'foo_auth': {u'type': u'dns', u'value': u'acme_srv.nclm-samba.local'}}, 'expires')
+        mock_nnonce.return_value = 'new_nonce'
+        self.order.dbstore.transaction = MagicMock()
+        self.order.new('{"foo" : "bar"}')
+        self.assertEqual(1, self.order.dbstore.transaction.call_count)
+        self.assertTrue(self.order.dbstore.transaction.return_value.__enter__.called)
+        self.assertTrue(self.order.dbstore.transaction.return_value.__exit__.called)
+
+    @patch('acme_srv.order.Order._challenges_add')
+    @patch('acme_srv.order.uts_now')
+    @patch('acme_srv.order.generate_random_string')
+    def test_105_order__add(self, mock_name, mock_uts, mock_chall_add):
+        """ test Oder.add() challenges get created along with the order """
+        mock_name.side_effect = ['order', 'identifier1', 'identifier2']
+        mock_uts.return_value = 1543640400
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_add.return_value = 1
+        self.order.challenge_precreate = True
+        self.order.tnauthlist_support = True
+        message = {'identifiers' : [{"type": "dns", "value": "example1.com"}, {"type": "TNAuthList", "value": "tnauth"}]}
+        self.order._add(message, 1)
+        mock_chall_add.assert_called_with([('identifier1', False), ('identifier2', True)])
+
+    @patch('acme_srv.order.Order._challenges_add')
+    @patch('acme_srv.order.uts_now')
+    @patch('acme_srv.order.generate_random_string')
+    def test_106_order__add(self, mock_name, mock_uts, mock_chall_add):
+        """ test Oder.add() challenges get created on demand """
+        mock_name.side_effect = ['order', 'identifier1']
+        mock_uts.return_value = 1543640400
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_add.return_value = 1
+        message = {'identifiers' : [{"type": "dns", "value": "example1.com"}]}
+        self.order._add(message, 1)
+        self.assertFalse(mock_chall_add.called)
+
+    @patch('acme_srv.challenge.Challenge.new_sets')
+    @patch('acme_srv.order.uts_now')
+    @patch('acme_srv.order.generate_random_string')
+    def test_107_order__challenges_add(self, mock_name, mock_uts, mock_sets):
+        """ test Order._challenges_add() """
+        mock_name.side_effect = ['token1', 'token2']
+        mock_uts.return_value = 1000
+        mock_sets.return_value = {'authz1': [{'foo': 'bar'}], 'authz2': []}
+        self.order._challenges_add([('authz1', False), ('authz2', True)])
+        mock_sets.assert_called_with([('authz1', 'token1', False), ('authz2', 'token2', True)])
+
+    @patch('acme_srv.order.load_config')
+    def test_108_config_load(self, mock_load_cfg):
+        """ test _config_load challenge_precreate """
+        parser = configparser.ConfigParser()
+        parser['Order'] = {'challenge_precreate': True}
+        mock_load_cfg.return_value = parser
+        self.order._config_load()
+        self.assertTrue(self.order.challenge_precreate)
+
+    @patch('acme_srv.order.uts_now')
+    @patch('acme_srv.order.generate_random_string')
+    def test_109_order__add(self, mock_name, mock_uts):
+        """ test Oder.add() all authorizations get stored by a single database call """
+        mock_name.side_effect = ['order', 'identifier1', 'identifier2']
+        mock_uts.return_value = 1000
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_add.return_value = 1
+        self.order.authz_validity = 10
+        message = {'identifiers' : [{"type": "dns", "value": "example1.com"}, {"type": "dns", "value": "example2.com"}]}
+        self.order._add(message, 1)
+        self.assertEqual(1, self.order.dbstore.authorizations_add_bulk.call_count)
+        self.assertFalse(self.order.dbstore.authorization_add.called)
+        self.order.dbstore.authorizations_add_bulk.assert_called_with([{'type': 'dns', 'value': 'example1.com', 'name': 'identifier1', 'order': 1, 'status': 'pending', 'expires': 1010}, {'type': 'dns', 'value': 'example2.com', 'name': 'identifier2', 'order': 1, 'status': 'pending', 'expires': 1010}])
+
+    @patch('acme_srv.order.Order._challenges_add')
+    @patch('acme_srv.order.uts_now')
+    @patch('acme_srv.order.generate_random_string')
+    def test_110_order__add(self, mock_name, mock_uts, mock_chall_add):
+        """ test Oder.add() no challenges get created if the authorizations could not be stored """
+        mock_name.side_effect = ['order', 'identifier1']
+        mock_uts.return_value = 1000
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_add.return_value = 1
+        self.order.dbstore.authorizations_add_bulk.side_effect = Exception('exc_authz_add')
+        self.order.challenge_precreate = True
+        message = {'identifiers' : [{"type": "dns", "value": "example1.com"}]}
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(('urn:ietf:params:acme:error:serverInternal', 'order', {'identifier1': {'type': 'dns', 'value': 'example1.com'}}, '1970-01-02T00:16:40Z'), self.order._add(message, 1))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Order._add() authz: exc_authz_add', lcm.output)
+        self.assertFalse(mock_chall_add.called)
+
+    def test_111_order__view(self):
+        """ test Order._view() """
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_view.return_value = {'status': 'pending', 'authorizations': []}
+        self.assertEqual({'status': 'pending', 'authorizations': []}, self.order._view('oname'))
+        self.order.dbstore.order_view.assert_called_with('oname')
+
+    def test_112_order__ready_set(self):
+        """ test Order._ready_set() """
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_ready_set.return_value = True
+        self.assertTrue(self.order._ready_set('oname'))
+        self.order.dbstore.order_ready_set.assert_called_with('oname')
+
+    def test_113_order__ready_set(self):
+        """ test Order._ready_set() - dbstore.order_ready_set() raises an exception """
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.order_ready_set.side_effect = Exception('exc_ready_set')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(self.order._ready_set('oname'))
+        self.assertIn('CRITICAL:test_a2c:acme2certifier database error in Order._ready_set(): exc_ready_set', lcm.output)
+
+    @patch('acme_srv.order.Order._ready_set')
+    @patch('acme_srv.order.Order._view')
+    def test_114_order__lookup(self, mock_view, mock_ready):
+        """ test order lookup - order already changed by a parallel request """
+        mock_view.return_value = {'status': 'pending', 'authorizations': [{'name': 'name', 'status__name': 'valid'}]}
+        mock_ready.return_value = False
+        self.assertEqual({'status': 'pending', 'authorizations': ['http://tester.local/acme/authz/name']}, self.order._lookup('foo'))
+        self.assertTrue(mock_ready.called)
+
+    @patch('acme_srv.order.Order._info')
+    def test_115_order__process(self, mock_info):
+        """ test Order._process() polling request - no certificate lookup for orders not being valid """
+        self.order.dbstore = MagicMock()
+        self.assertEqual((200, None, None, None), self.order._process('oname', {'url': 'url'}, 'payload', {'status': 'processing'}))
+        self.assertFalse(self.order.dbstore.certificate_lookup.called)
+        self.assertFalse(mock_info.called)
+
+    def test_116_order__process(self):
+        """ test Order._process() polling request - certificate lookup for valid orders """
+        self.order.dbstore = MagicMock()
+        self.order.dbstore.certificate_lookup.return_value = {'name': 'certname'}
+        self.assertEqual((200, None, None, 'certname'), self.order._process('oname', {'url': 'url'}, 'payload', {'status': 'valid'}))
+
+    @patch('acme_srv.order.Order._info')
+    def test_117_order__process(self, mock_info):
+        """ test Order._process() finalize request - order handed over by caller """
+        self.assertEqual((403, 'urn:ietf:params:acme:error:orderNotReady', 'Order is not ready', None), self.order._process('oname', {'url': 'url/finalize'}, 'payload', {'status': 'pending'}))
+        self.assertFalse(mock_info.called)
+
+    @patch('acme_srv.nonce.Nonce.generate_and_add')
+    @patch('acme_srv.order.Order._process')
+    @patch('acme_srv.order.Order._lookup')
+    @patch('acme_srv.order.Order._name_get')
+    @patch('acme_srv.message.Message.check')
+    def test_118_order_parse(self, mock_mcheck, mock_oname, mock_lookup, mock_process, mock_nnonce):
+        """ Order.parse() polling request - order gets looked up only once """
+        mock_mcheck.return_value = (200, None, None, {'url' : 'bar_url'}, {}, 'account_name')
+        mock_oname.return_value = 'foo'
+        mock_lookup.return_value = {'foo': 'bar', 'status': 'pending'}
+        mock_process.return_value = (200, None, None, None)
+        mock_nnonce.return_value = 'nonce'
+        message = '{"foo" : "bar"}'
+        self.assertEqual({'code': 200, 'data': {'finalize': 'http://tester.local/acme/order/foo/finalize', 'foo': 'bar', 'status': 'pending'}, 'header': {'Location': 'http://tester.local/acme/order/foo', 'Replay-Nonce': 'nonce'}}, self.order.parse(message))
+        self.assertEqual(1, mock_lookup.call_count)
+        self.assertEqual('pending', mock_process.call_args[0][3]['status'])
+
+    @patch('acme_srv.order.Order._lookup')
+    def test_119_order__lookup_cached(self, mock_lookup):
+        """ test Order._lookup_cached() - second request served from cache """
+        from acme_srv.pollcache import poll_cache_clear
+        poll_cache_clear()
+        self.order.poll_cache_ttl = 10
+        mock_lookup.return_value = {'status': 'pending'}
+        self.assertEqual({'status': 'pending'}, self.order._lookup_cached('oname'))
+        self.assertEqual({'status': 'pending'}, self.order._lookup_cached('oname'))
+        self.assertEqual(1, mock_lookup.call_count)
+        poll_cache_clear()
+
+    @patch('acme_srv.order.Order._lookup')
+    def test_120_order__lookup_cached(self, mock_lookup):
+        """ test Order._lookup_cached() - cache disabled """
+        mock_lookup.return_value = {'status': 'pending'}
+        self.order._lookup_cached('oname')
+        self.order._lookup_cached('oname')
+        self.assertEqual(2, mock_lookup.call_count)
+
+    @patch('acme_srv.order.Order._lookup')
+    def test_121_order__update(self, mock_lookup):
+        """ test Order._update() - status change drops cached response """
+        from acme_srv.pollcache import poll_cache_clear
+        poll_cache_clear()
+        self.order.poll_cache_ttl = 10
+        self.order.dbstore = MagicMock()
+        mock_lookup.return_value = {'status': 'ready'}
+        self.order._lookup_cached('oname')
+        self.order._update({'name': 'oname', 'status': 'processing'})
+        self.order._lookup_cached('oname')
+        self.assertEqual(2, mock_lookup.call_count)
+        poll_cache_clear()
+
+    @patch('acme_srv.order.load_config')
+    def test_122_config_load(self, mock_load_cfg):
+        """ test _config_load poll_cache_ttl """
+        parser = configparser.ConfigParser()
+        parser['Order'] = {'poll_cache_ttl': 5}
+        mock_load_cfg.return_value = parser
+        self.order._config_load()
+        self.assertEqual(5, self.order.poll_cache_ttl)
+
 if __name__ == '__main__':
     unittest.main()
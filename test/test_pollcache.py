@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for pollcache.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for PollCache """
+    acme = None
+    def setUp(self):
+        """ setup unittest """
+        from acme_srv.pollcache import PollCache, poll_cache_get, poll_cache_clear, poll_cache_stats
+        self.poll_cache = PollCache()
+        self.poll_cache_class = PollCache
+        self.poll_cache_get = poll_cache_get
+        self.poll_cache_clear = poll_cache_clear
+        self.poll_cache_stats = poll_cache_stats
+
+    def tearDown(self):
+        """ drop process wide cache """
+        self.poll_cache_clear()
+
+    def test_001_get(self):
+        """ cache miss """
+        self.assertIsNone(self.poll_cache.get('authz', 'name'))
+
+    def test_002_set_get(self):
+        """ cached entries are copies """
+        data_dic = {'status': 'pending', 'challenges': [{'type': 'http-01'}]}
+        self.poll_cache.set('authz', 'name', data_dic, 10)
+        data_dic['challenges'][0]['type'] = 'dns-01'
+        result = self.poll_cache.get('authz', 'name')
+        self.assertEqual({'status': 'pending', 'challenges': [{'type': 'http-01'}]}, result)
+        result['status'] = 'valid'
+        self.assertEqual('pending', self.poll_cache.get('authz', 'name')['status'])
+
+    @patch('acme_srv.pollcache.time.monotonic')
+    def test_003_get(self, mock_time):
+        """ expired entry """
+        mock_time.return_value = 100
+        self.poll_cache.set('order', 'name', {'status': 'pending'}, 2)
+        mock_time.return_value = 101
+        self.assertEqual({'status': 'pending'}, self.poll_cache.get('order', 'name'))
+        mock_time.return_value = 102
+        self.assertIsNone(self.poll_cache.get('order', 'name'))
+        self.assertEqual(0, self.poll_cache.stats()['entries'])
+
+    def test_004_get(self):
+        """ entries are separated by kind and variant """
+        self.poll_cache.set('order', 'name', {'status': 'pending'}, 10, 'http://srv1')
+        self.assertIsNone(self.poll_cache.get('authz', 'name', 'http://srv1'))
+        self.assertIsNone(self.poll_cache.get('order', 'name', 'http://srv2'))
+        self.assertEqual({'status': 'pending'}, self.poll_cache.get('order', 'name', 'http://srv1'))
+
+    def test_005_set(self):
+        """ ttl 0 disables caching """
+        self.poll_cache.set('cert', 'name', {'code': 200}, 0)
+        self.assertIsNone(self.poll_cache.get('cert', 'name'))
+
+    def test_006_set(self):
+        """ least recently used entries get evicted """
+        poll_cache = self.poll_cache_class(max_entries=2)
+        poll_cache.set('authz', 'name1', {'foo': 1}, 10)
+        poll_cache.set('authz', 'name2', {'foo': 2}, 10)
+        poll_cache.get('authz', 'name1')
+        poll_cache.set('authz', 'name3', {'foo': 3}, 10)
+        self.assertIsNone(poll_cache.get('authz', 'name2'))
+        self.assertEqual({'foo': 1}, poll_cache.get('authz', 'name1'))
+
+    def test_007_invalidate(self):
+        """ status change drops entry """
+        self.poll_cache.set('authz', 'name', {'status': 'pending'}, 10)
+        self.poll_cache.invalidate('authz', 'name')
+        self.poll_cache.invalidate('authz', 'unknown')
+        self.assertIsNone(self.poll_cache.get('authz', 'name'))
+        self.assertEqual(1, self.poll_cache.stats()['invalidations'])
+
+    def test_008_stats(self):
+        """ hit ratio """
+        self.poll_cache.set('authz', 'name', {'status': 'pending'}, 10)
+        self.poll_cache.get('authz', 'name')
+        self.poll_cache.get('authz', 'name')
+        self.poll_cache.get('authz', 'unknown')
+        self.poll_cache.get('authz', 'unknown')
+        self.assertEqual({'hits': 2, 'misses': 2, 'invalidations': 0, 'entries': 1, 'hit_ratio': 0.5}, self.poll_cache.stats())
+
+    def test_009_poll_cache_get(self):
+        """ process wide cache """
+        poll_cache = self.poll_cache_get()
+        self.assertIs(poll_cache, self.poll_cache_get())
+        poll_cache.set('authz', 'name', {'status': 'pending'}, 10)
+        self.assertEqual(1, self.poll_cache_stats()['entries'])
+        self.poll_cache_clear()
+        self.assertIsNot(poll_cache, self.poll_cache_get())
+        self.assertEqual(0, self.poll_cache_stats()['entries'])
+
+if __name__ == '__main__':
+    unittest.main()
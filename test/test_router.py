@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for router.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for Router """
+    acme = None
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.logger = logging.getLogger('test_a2c')
+        from acme_srv.router import Router
+        self.router_class = Router
+        self.router = Router(self.logger, None, 'not_found')
+        self.router.add('', 'directory')
+        self.router.add('directory', 'directory')
+        self.router.add('acme/newaccount', 'newaccount')
+        self.router.add('acme/acct', 'acct', True)
+        self.router.add('acme/order', 'order', True)
+        self.router.add('.well-known/acme-challenge', 'acmechallenge', True)
+
+    def test_001_match(self):
+        """ match exact path """
+        self.assertEqual('newaccount', self.router.match('acme/newaccount'))
+
+    def test_002_match(self):
+        """ match root path """
+        self.assertEqual('directory', self.router.match(''))
+
+    def test_003_match(self):
+        """ match prefix """
+        self.assertEqual('acct', self.router.match('acme/acct/foo'))
+
+    def test_004_match(self):
+        """ match prefix without suffix """
+        self.assertEqual('order', self.router.match('acme/order'))
+
+    def test_005_match(self):
+        """ exact path with suffix does not match """
+        self.assertEqual('not_found', self.router.match('acme/newaccount/foo'))
+
+    def test_006_match(self):
+        """ prefix must match complete segments """
+        self.assertEqual('not_found', self.router.match('acme/orderfoo'))
+
+    def test_007_match(self):
+        """ unknown path """
+        self.assertEqual('not_found', self.router.match('acme/foo'))
+
+    def test_008_match(self):
+        """ longest prefix wins """
+        self.router.add('acme/acct/foo', 'foo', True)
+        self.assertEqual('foo', self.router.match('acme/acct/foo/bar'))
+        self.assertEqual('acct', self.router.match('acme/acct/bar'))
+
+    def test_009_match(self):
+        """ challenge validation path """
+        self.assertEqual('acmechallenge', self.router.match('.well-known/acme-challenge/token'))
+
+    def test_010_path_strip(self):
+        """ path_strip without url_prefix """
+        self.assertEqual('acme/acct/foo', self.router.path_strip('/acme/acct/foo'))
+
+    def test_011_path_strip(self):
+        """ path_strip with url_prefix """
+        router = self.router_class(self.logger, '/foo')
+        self.assertEqual('acme/acct/foo', router.path_strip('/foo/acme/acct/foo'))
+
+    def test_012_path_strip(self):
+        """ path_strip removes the url_prefix only and not characters of it """
+        router = self.router_class(self.logger, '/foo')
+        self.assertEqual('order/foo', router.path_strip('/order/foo'))
+
+    def test_013_path_strip(self):
+        """ path_strip with url_prefix having a trailing slash """
+        router = self.router_class(self.logger, '/foo/')
+        self.assertEqual('directory', router.path_strip('/foo/directory'))
+
+    def test_014_dispatch(self):
+        """ dispatch with url_prefix """
+        router = self.router_class(self.logger, '/foo', 'not_found')
+        router.add('acme/order', 'order', True)
+        self.assertEqual('order', router.dispatch('/foo/acme/order/bar'))
+        self.assertEqual('order', router.dispatch('/acme/order/bar'))
+        self.assertEqual('not_found', router.dispatch('/foo/acme/acct/bar'))
+
+    def test_015_dispatch(self):
+        """ dispatch without logger """
+        router = self.router_class()
+        router.add('directory', 'directory')
+        self.assertEqual('directory', router.dispatch('/directory'))
+        self.assertIsNone(router.dispatch('/foo'))
+
+    def test_016_path_strip(self):
+        """ path_strip with request for the url_prefix without trailing slash """
+        router = self.router_class(self.logger, '/foo')
+        self.assertEqual('', router.path_strip('/foo'))
+        self.assertEqual('', router.path_strip('/foo/'))
+        self.assertEqual('foobar', router.path_strip('/foobar'))
+
+    def test_017_dispatch(self):
+        """ dispatch url_prefix without trailing slash to the root """
+        router = self.router_class(self.logger, '/foo/', 'not_found')
+        router.add('', 'directory')
+        self.assertEqual('directory', router.dispatch('/foo'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,7 +27,8 @@ class TestACMEHandler(unittest.TestCase):
         import logging
         logging.basicConfig(level=logging.CRITICAL)
         self.logger = logging.getLogger('test_a2c')
-        from acme_srv.signature import Signature
+        from acme_srv.signature import Signature, jwk_cache_clear
+        jwk_cache_clear()
         self.signature = Signature(False, 'http://tester.local', self.logger)
 
     def test_001_signature__jwk_load(self):
@@ -148,6 +149,135 @@ class TestACMEHandler(unittest.TestCase):
         self.signature.__init__()
         self.assertEqual('/acme/revokecert', self.signature.revocation_path )
 
+    def _pub_key_get(self):
+        """ public key in jwk_load() format """
+        from jwcrypto import jwk
+        pub_key = jwk.JWK.generate(kty='EC', crv='P-256').export_public(as_dict=True)
+        pub_key['alg'] = 'ES256'
+        return pub_key
+
+    def test_018__jwk_get(self):
+        """ test Signature._jwk_get() cache miss and hit """
+        from jwcrypto import jwk
+        from acme_srv.signature import jwk_cache_stats
+        self.signature.jwk_cache_ttl = 60
+        self.signature.dbstore = MagicMock()
+        self.signature.dbstore.jwk_load.side_effect = lambda aname: self._pub_key_get()
+        jwkey = self.signature._jwk_get('aname')
+        self.assertIsInstance(jwkey, jwk.JWK)
+        self.assertIs(jwkey, self.signature._jwk_get('aname'))
+        self.assertEqual(1, self.signature.dbstore.jwk_load.call_count)
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1}, jwk_cache_stats())
+
+    def test_019__jwk_get(self):
+        """ test Signature._jwk_get() after invalidation """
+        from acme_srv.signature import jwk_cache_invalidate
+        self.signature.jwk_cache_ttl = 60
+        self.signature.dbstore = MagicMock()
+        self.signature.dbstore.jwk_load.side_effect = lambda aname: self._pub_key_get()
+        jwkey = self.signature._jwk_get('aname')
+        jwk_cache_invalidate('aname')
+        self.assertNotEqual(jwkey.thumbprint(), self.signature._jwk_get('aname').thumbprint())
+        self.assertEqual(2, self.signature.dbstore.jwk_load.call_count)
+
+    def test_020__jwk_get(self):
+        """ test Signature._jwk_get() expired entry and size limit """
+        from acme_srv.signature import JWK_CACHE
+        self.signature.dbstore = MagicMock()
+        self.signature.dbstore.jwk_load.side_effect = lambda aname: self._pub_key_get()
+        self.signature.jwk_cache_ttl = -1
+        self.signature._jwk_get('aname')
+        self.signature._jwk_get('aname')
+        self.assertEqual(2, self.signature.dbstore.jwk_load.call_count)
+        self.signature.jwk_cache_ttl = 60
+        self.signature.jwk_cache_size = 2
+        for aname in ('aname1', 'aname2', 'aname3'):
+            self.signature._jwk_get(aname)
+        self.assertEqual(['aname2', 'aname3'], list(JWK_CACHE['keys'].keys()))
+        self.assertEqual(['expires', 'jwk'], sorted(JWK_CACHE['keys']['aname3'].keys()))
+
+    def test_021__jwk_get(self):
+        """ test Signature._jwk_get() unparseable key does not get cached """
+        from acme_srv.signature import JWK_CACHE
+        self.signature.dbstore = MagicMock()
+        self.signature.dbstore.jwk_load.return_value = {'foo': 'bar'}
+        self.assertEqual({'foo': 'bar'}, self.signature._jwk_get('aname'))
+        self.assertFalse(JWK_CACHE['keys'])
+
+    def test_022_signature_check(self):
+        """ test Signature.check() with cached key """
+        from jwcrypto import jwk, jws
+        from jwcrypto.common import json_encode
+        key = jwk.JWK.generate(kty='EC', crv='P-256')
+        pub_key = key.export_public(as_dict=True)
+        self.signature.jwk_cache_ttl = 60
+        self.signature.dbstore = MagicMock()
+        self.signature.dbstore.jwk_load.return_value = pub_key
+        jwstoken = jws.JWS('{"foo": "bar"}'.encode('utf-8'))
+        jwstoken.add_signature(key, None, json_encode({'alg': 'ES256'}))
+        content = jwstoken.serialize()
+        self.assertEqual((True, None, None), self.signature.check('aname', content))
+        self.assertEqual((True, None, None), self.signature.check('aname', content))
+        self.assertEqual(1, self.signature.dbstore.jwk_load.call_count)
+
+    @patch('acme_srv.signature.load_config')
+    def test_023__init(self, mock_load_cfg):
+        """ test __init__() jwk cache parameters """
+        parser = configparser.ConfigParser()
+        parser['Signature'] = {'jwk_cache_size': 10, 'jwk_cache_ttl': 20}
+        mock_load_cfg.return_value = parser
+        self.signature.__init__(False, None, self.logger)
+        self.assertEqual(10, self.signature.jwk_cache_size)
+        self.assertEqual(20, self.signature.jwk_cache_ttl)
+
+    @patch('acme_srv.signature.load_config')
+    def test_024__init(self, mock_load_cfg):
+        """ test __init__() invalid jwk cache parameters """
+        parser = configparser.ConfigParser()
+        parser['Signature'] = {'jwk_cache_size': 'aa'}
+        mock_load_cfg.return_value = parser
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.signature.__init__(False, None, self.logger)
+        self.assertEqual(1000, self.signature.jwk_cache_size)
+        self.assertIn("ERROR:test_a2c:Signature.__init__(): failed to parse jwk_cache_size/jwk_cache_ttl: invalid literal for int() with base 10: 'aa'", lcm.output)
+
+    @patch('acme_srv.signature.load_config')
+    def test_025__init(self, mock_load_cfg):
+        """ test __init__() jwk cache disabled by default """
+        parser = configparser.ConfigParser()
+        parser['Signature'] = {'jwk_cache_size': 10}
+        mock_load_cfg.return_value = parser
+        self.signature.__init__(False, None, self.logger)
+        self.assertEqual(0, self.signature.jwk_cache_ttl)
+
+    @patch('acme_srv.signature.load_config')
+    def test_026__init(self, mock_load_cfg):
+        """ test __init__() number of worker processes does not change the configured ttl """
+        parser = configparser.ConfigParser()
+        parser['Server'] = {'workers': 4}
+        parser['Signature'] = {'jwk_cache_ttl': 5}
+        mock_load_cfg.return_value = parser
+        self.signature.__init__(False, None, self.logger)
+        self.assertEqual(5, self.signature.jwk_cache_ttl)
+
+    @patch('acme_srv.signature.load_config')
+    def test_027__init(self, mock_load_cfg):
+        """ test __init__() jwk cache disabled by default for a single worker process """
+        parser = configparser.ConfigParser()
+        parser['Server'] = {'workers': 1}
+        mock_load_cfg.return_value = parser
+        self.signature.__init__(False, None, self.logger)
+        self.assertEqual(0, self.signature.jwk_cache_ttl)
+
+    def test_028__jwk_get(self):
+        """ test Signature._jwk_get() ttl 0 disables caching """
+        from acme_srv.signature import JWK_CACHE
+        self.signature.dbstore = MagicMock()
+        self.signature.dbstore.jwk_load.side_effect = lambda aname: self._pub_key_get()
+        self.signature.jwk_cache_ttl = 0
+        self.signature._jwk_get('aname')
+        self.assertFalse(JWK_CACHE['keys'])
+
 
 if __name__ == '__main__':
     unittest.main()
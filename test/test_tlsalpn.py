@@ -0,0 +1,220 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for tlsalpn.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+import os
+import ssl
+import socket
+import tempfile
+import threading
+import datetime
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+ACME_IDENTIFIER = bytes.fromhex('0420' + '00' * 32)
+
+def validation_cert_get(dns_name='foo.bar.local', san_list=None, critical=True):
+    """ create self-signed tls-alpn-01 validation certificate - returns (key_pem, cert_pem, cert_der) """
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, dns_name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key()).serial_number(x509.random_serial_number()).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+    if san_list is None:
+        san_list = [x509.DNSName(dns_name)]
+    cert = cert.add_extension(x509.SubjectAlternativeName(san_list), critical=False)
+    cert = cert.add_extension(x509.UnrecognizedExtension(x509.ObjectIdentifier('1.3.6.1.5.5.7.1.31'), ACME_IDENTIFIER), critical=critical)
+    cert = cert.sign(key, hashes.SHA256())
+    key_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return (key_pem, cert.public_bytes(serialization.Encoding.PEM), cert.public_bytes(serialization.Encoding.DER))
+
+class FakeServer(object):
+    """ local tls server - handshake optional """
+
+    def __init__(self, cert_file, key_file, alpn_list=None, handshake=True):
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(cert_file, key_file)
+        if alpn_list:
+            self.context.set_alpn_protocols(alpn_list)
+        self.handshake = handshake
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(32)
+        self.port = self.sock.getsockname()[1]
+        self.conn_list = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        """ accept connections """
+        while True:
+            try:
+                (conn, _addr) = self.sock.accept()
+            except OSError:
+                break
+            self.conn_list.append(conn)
+            if self.handshake:
+                threading.Thread(target=self._handshake, args=(conn,), daemon=True).start()
+
+    def _handshake(self, conn):
+        """ tls handshake """
+        try:
+            with self.context.wrap_socket(conn, server_side=True) as sslsock:
+                sslsock.recv(1)
+        except Exception:
+            pass
+
+    def close(self):
+        """ stop server """
+        self.sock.close()
+        for conn in self.conn_list:
+            conn.close()
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for tls-alpn-01 validation """
+    acme = None
+
+    @classmethod
+    def setUpClass(cls):
+        """ create validation certificate once """
+        (key_pem, cert_pem, cls.cert_der) = validation_cert_get()
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.key_file = os.path.join(cls.tmp_dir.name, 'key.pem')
+        cls.cert_file = os.path.join(cls.tmp_dir.name, 'cert.pem')
+        with open(cls.key_file, 'wb') as fso:
+            fso.write(key_pem)
+        with open(cls.cert_file, 'wb') as fso:
+            fso.write(cert_pem)
+
+    @classmethod
+    def tearDownClass(cls):
+        """ cleanup """
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.logger = logging.getLogger('test_a2c')
+        from acme_srv.tlsalpn import tls_alpn_cert_get, tls_alpn_cert_parse, tls_context_get, TLS_CONTEXT
+        self.tls_alpn_cert_get = tls_alpn_cert_get
+        self.tls_alpn_cert_parse = tls_alpn_cert_parse
+        self.tls_context_get = tls_context_get
+        self.tls_context_dic = TLS_CONTEXT
+
+    def _server_start(self, alpn_list=None, handshake=True):
+        """ start local tls server """
+        server = FakeServer(self.cert_file, self.key_file, alpn_list, handshake)
+        self.addCleanup(server.close)
+        return server.port
+
+    def test_001_tls_alpn_cert_get(self):
+        """ acme-tls/1 negotiated - certificate gets returned in DER format """
+        port = self._server_start(['acme-tls/1'])
+        self.assertEqual(self.cert_der, self.tls_alpn_cert_get(self.logger, 'foo.bar.local', port, None, ['127.0.0.1'], 5))
+
+    def test_002_tls_alpn_cert_get(self):
+        """ server does not support acme-tls/1 """
+        port = self._server_start()
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(self.tls_alpn_cert_get(self.logger, 'foo.bar.local', port, None, ['127.0.0.1'], 5))
+        self.assertIn('ERROR:test_a2c:tls_alpn_cert_get() acme-tls/1 not negotiated: None', lcm.output)
+
+    def test_003_tls_alpn_cert_get(self):
+        """ handshake timeout """
+        port = self._server_start(handshake=False)
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(self.tls_alpn_cert_get(self.logger, 'foo.bar.local', port, None, ['127.0.0.1'], 0.2))
+        self.assertTrue(lcm.output[-1].endswith('The handshake operation timed out'))
+
+    def test_004_tls_alpn_cert_get(self):
+        """ connect without address list """
+        port = self._server_start(['acme-tls/1'])
+        self.assertEqual(self.cert_der, self.tls_alpn_cert_get(self.logger, '127.0.0.1', port, timeout=5))
+
+    @patch('acme_srv.tlsalpn.proxystring_convert')
+    @patch('acme_srv.tlsalpn.happy_eyeballs_connect')
+    @patch('acme_srv.tlsalpn.socks.socksocket')
+    def test_005_tls_alpn_cert_get(self, mock_sock, mock_connect, mock_convert):
+        """ connect via proxy """
+        mock_convert.return_value = ('proxy_proto', 'proxy_addr', 'proxy_port')
+        mock_sock.return_value.connect.side_effect = Exception('exc_connect')
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertFalse(self.tls_alpn_cert_get(self.logger, 'foo.bar.local', 443, 'proxy', ['127.0.0.1'], 5))
+        self.assertIn('ERROR:test_a2c:tls_alpn_cert_get() failed with: exc_connect', lcm.output)
+        mock_sock.return_value.setproxy.assert_called_with('proxy_proto', 'proxy_addr', port='proxy_port')
+        mock_sock.return_value.settimeout.assert_called_with(5)
+        self.assertTrue(mock_sock.return_value.close.called)
+        self.assertFalse(mock_connect.called)
+
+    def test_006_tls_alpn_cert_get(self):
+        """ concurrent handshakes """
+        port = self._server_start(['acme-tls/1'])
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            result_list = list(executor.map(lambda _cnt: self.tls_alpn_cert_get(self.logger, 'foo.bar.local', port, None, ['127.0.0.1'], 5), range(30)))
+        self.assertEqual({self.cert_der}, set(result_list))
+
+    def test_007_tls_alpn_cert_parse(self):
+        """ dns names and acmeIdentifier """
+        self.assertEqual((['DNS:foo.bar.local'], ACME_IDENTIFIER), self.tls_alpn_cert_parse(self.logger, self.cert_der, 'FOO.bar.local'))
+
+    def test_008_tls_alpn_cert_parse(self):
+        """ invalid certificate """
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(([], None), self.tls_alpn_cert_parse(self.logger, b'foo', 'foo.bar.local'))
+        self.assertTrue(lcm.output[0].startswith('ERROR:test_a2c:tls_alpn_cert_parse() failed with:'))
+
+    def test_009_tls_context_get(self):
+        """ process wide context offering acme-tls/1 """
+        self.tls_context_dic['context'] = None
+        context = self.tls_context_get()
+        self.assertIs(context, self.tls_context_get())
+        self.assertEqual(ssl.CERT_NONE, context.verify_mode)
+        self.assertFalse(context.check_hostname)
+        self.assertTrue(context.options & ssl.OP_NO_TLSv1)
+        self.assertTrue(context.options & ssl.OP_NO_TLSv1_1)
+
+    def test_010_tls_alpn_cert_parse(self):
+        """ acmeIdentifier extension not critical """
+        (_key_pem, _cert_pem, cert_der) = validation_cert_get(critical=False)
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual((['DNS:foo.bar.local'], None), self.tls_alpn_cert_parse(self.logger, cert_der, 'foo.bar.local'))
+        self.assertIn('ERROR:test_a2c:tls_alpn_cert_parse() acmeIdentifier extension is not critical', lcm.output)
+
+    def test_011_tls_alpn_cert_parse(self):
+        """ dns name does not match the identifier """
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(([], ACME_IDENTIFIER), self.tls_alpn_cert_parse(self.logger, self.cert_der, 'bar.bar.local'))
+        self.assertTrue(lcm.output[0].startswith('ERROR:test_a2c:tls_alpn_cert_parse() subjectAltName must contain bar.bar.local only:'))
+
+    def test_012_tls_alpn_cert_parse(self):
+        """ additional dns name """
+        (_key_pem, _cert_pem, cert_der) = validation_cert_get(san_list=[x509.DNSName('foo.bar.local'), x509.DNSName('bar.bar.local')])
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(([], ACME_IDENTIFIER), self.tls_alpn_cert_parse(self.logger, cert_der, 'foo.bar.local'))
+        self.assertTrue(lcm.output[0].startswith('ERROR:test_a2c:tls_alpn_cert_parse() subjectAltName must contain foo.bar.local only:'))
+
+    def test_013_tls_alpn_cert_parse(self):
+        """ additional entry of another type """
+        (_key_pem, _cert_pem, cert_der) = validation_cert_get(san_list=[x509.DNSName('foo.bar.local'), x509.IPAddress(ipaddress.ip_address('127.0.0.1'))])
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(([], ACME_IDENTIFIER), self.tls_alpn_cert_parse(self.logger, cert_der, 'foo.bar.local'))
+        self.assertTrue(lcm.output[0].startswith('ERROR:test_a2c:tls_alpn_cert_parse() subjectAltName must contain foo.bar.local only:'))
+
+    def test_014_tls_alpn_cert_parse(self):
+        """ no dns name """
+        (_key_pem, _cert_pem, cert_der) = validation_cert_get(san_list=[x509.IPAddress(ipaddress.ip_address('127.0.0.1'))])
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.assertEqual(([], ACME_IDENTIFIER), self.tls_alpn_cert_parse(self.logger, cert_der, 'foo.bar.local'))
+        self.assertTrue(lcm.output[0].startswith('ERROR:test_a2c:tls_alpn_cert_parse() subjectAltName must contain foo.bar.local only:'))
+
+if __name__ == '__main__':
+    unittest.main()
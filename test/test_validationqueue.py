@@ -0,0 +1,204 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+""" unittests for validationqueue.py """
+# pylint: disable=C0302, C0415, R0904, R0913, R0914, R0915, W0212
+import unittest
+import sys
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, '.')
+sys.path.insert(1, '..')
+
+class TestACMEHandler(unittest.TestCase):
+    """ test class for ValidationQueue """
+    acme = None
+    def setUp(self):
+        """ setup unittest """
+        import logging
+        logging.basicConfig(level=logging.CRITICAL)
+        self.logger = logging.getLogger('test_a2c')
+        from acme_srv.validationqueue import ValidationQueue, VALIDATION_QUEUE, validation_queue_get, validation_queue_stats, SingleFlight
+        self.validation_queue_class = ValidationQueue
+        self.validation_queue_dic = VALIDATION_QUEUE
+        self.validation_queue_get = validation_queue_get
+        self.validation_queue_stats = validation_queue_stats
+        self.single_flight_class = SingleFlight
+
+    def tearDown(self):
+        """ stop queues started by a test """
+        for validation_queue in self.validation_queue_dic['queues'].values():
+            validation_queue.stop(5)
+        self.validation_queue_dic['queues'] = {}
+
+    def test_001_submit(self):
+        """ submit job and wait for completion """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 2, 10)
+        validation_queue.start()
+        func = MagicMock()
+        self.assertTrue(validation_queue.submit('key', func, 'arg1', 'arg2'))
+        validation_queue.job_queue.join()
+        func.assert_called_with('arg1', 'arg2')
+        self.assertFalse(validation_queue.pending('key'))
+        validation_queue.stop(5)
+
+    def test_002_submit(self):
+        """ job with same key gets queued only once """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 1, 10)
+        func = MagicMock()
+        self.assertTrue(validation_queue.submit('key', func))
+        self.assertFalse(validation_queue.submit('key', func))
+        self.assertTrue(validation_queue.pending('key'))
+        self.assertEqual(1, validation_queue.stats()['depth'])
+
+    def test_003_submit(self):
+        """ job gets rejected if queue is full """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 1, 1)
+        func = MagicMock()
+        self.assertTrue(validation_queue.submit('key1', func))
+        self.assertFalse(validation_queue.submit('key2', func))
+        self.assertFalse(validation_queue.pending('key2'))
+        self.assertEqual(1, validation_queue.stats()['rejected'])
+
+    def test_004_worker(self):
+        """ failing job gets counted and does not stop the worker """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 1, 10)
+        validation_queue.start()
+        func = MagicMock(side_effect=[Exception('exc_job'), None])
+        validation_queue.submit('key1', func)
+        validation_queue.submit('key2', func)
+        validation_queue.job_queue.join()
+        stats_dic = validation_queue.stats()
+        self.assertEqual(2, stats_dic['processed'])
+        self.assertEqual(1, stats_dic['failed'])
+        self.assertEqual(0, stats_dic['in_flight'])
+        validation_queue.stop(5)
+
+    def test_005_stats(self):
+        """ stats of an unused queue """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 3, 10)
+        stats_dic = validation_queue.stats()
+        self.assertEqual(0, stats_dic['depth'])
+        self.assertEqual(3, stats_dic['workers'])
+        self.assertEqual(0.0, stats_dic['wait_time_avg'])
+        self.assertEqual(0.0, stats_dic['run_time_avg'])
+
+    def test_006_stats(self):
+        """ latency metrics get collected """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 1, 10)
+        validation_queue.start()
+        validation_queue.submit('key', lambda: None)
+        validation_queue.job_queue.join()
+        stats_dic = validation_queue.stats()
+        self.assertEqual(1, stats_dic['enqueued'])
+        self.assertEqual(1, stats_dic['processed'])
+        self.assertGreaterEqual(stats_dic['wait_time_max'], 0.0)
+        self.assertGreaterEqual(stats_dic['run_time_max'], 0.0)
+        validation_queue.stop(5)
+
+    def test_007_worker(self):
+        """ jobs run in parallel """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 3, 10)
+        validation_queue.start()
+        barrier = threading.Barrier(3, timeout=5)
+        result_list = []
+        func = lambda: result_list.append(barrier.wait())
+        for cnt in range(3):
+            validation_queue.submit(cnt, func)
+        validation_queue.job_queue.join()
+        self.assertEqual([0, 1, 2], sorted(result_list))
+        self.assertEqual(0, validation_queue.stats()['failed'])
+        validation_queue.stop(5)
+
+    def test_008_stop(self):
+        """ stop terminates worker threads """
+        validation_queue = self.validation_queue_class(self.logger, 'test', 2, 10)
+        validation_queue.start()
+        thread_list = list(validation_queue.thread_list)
+        validation_queue.stop(5)
+        self.assertFalse([thread for thread in thread_list if thread.is_alive()])
+
+    def test_009_validation_queue_get(self):
+        """ process wide queue gets created once """
+        validation_queue1 = self.validation_queue_get(self.logger, 'test', 1, 10)
+        validation_queue2 = self.validation_queue_get(self.logger, 'test', 2, 20)
+        self.assertIs(validation_queue1, validation_queue2)
+        self.assertEqual(1, len(validation_queue1.thread_list))
+
+    def test_010_validation_queue_stats(self):
+        """ stats of all queues """
+        self.validation_queue_get(self.logger, 'test', 1, 10)
+        self.assertEqual(['test'], list(self.validation_queue_stats().keys()))
+
+    def test_011_run(self):
+        """ single-flight - function result gets returned """
+        flight = self.single_flight_class()
+        self.assertEqual(('foo', True), flight.run('key', lambda arg: arg, 'foo'))
+        self.assertEqual({'executed': 1, 'shared': 0, 'suppressed': 0, 'in_flight': 0}, flight.stats())
+        self.assertFalse(flight.finished)
+
+    def test_012_run(self):
+        """ single-flight - concurrent callers share one execution """
+        flight = self.single_flight_class()
+        started = threading.Event()
+        release = threading.Event()
+        func = MagicMock(side_effect=lambda: (started.set(), release.wait(5), 'foo')[2])
+        result_list = []
+        thread_list = [threading.Thread(target=lambda: result_list.append(flight.run('key', func))) for _cnt in range(4)]
+        thread_list[0].start()
+        started.wait(5)
+        for thread in thread_list[1:]:
+            thread.start()
+        while flight.stats()['shared'] < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in thread_list:
+            thread.join(5)
+        self.assertEqual(1, func.call_count)
+        self.assertEqual([('foo', False)] * 3 + [('foo', True)], sorted(result_list))
+
+    def test_013_run(self):
+        """ single-flight - exception gets raised to the caller and the key gets released """
+        flight = self.single_flight_class()
+        with self.assertRaises(ValueError):
+            flight.run('key', MagicMock(side_effect=ValueError('exc_run')))
+        self.assertEqual(('foo', True), flight.run('key', lambda: 'foo'))
+
+    @patch('acme_srv.validationqueue.time.monotonic')
+    def test_014_recent(self, mock_time):
+        """ single-flight - back-off period after a finished call """
+        flight = self.single_flight_class(backoff=2)
+        mock_time.return_value = 100
+        self.assertFalse(flight.recent('key'))
+        flight.run('key', lambda: None)
+        mock_time.return_value = 101.5
+        self.assertTrue(flight.recent('key'))
+        self.assertFalse(flight.recent('key1'))
+        mock_time.return_value = 102
+        self.assertFalse(flight.recent('key'))
+        self.assertEqual(1, flight.stats()['suppressed'])
+
+    @patch('acme_srv.validationqueue.time.monotonic')
+    def test_015_run(self, mock_time):
+        """ single-flight - expired and surplus entries get dropped """
+        flight = self.single_flight_class(backoff=2, max_entries=2)
+        mock_time.return_value = 100
+        flight.run('key1', lambda: None)
+        flight.run('key2', lambda: None)
+        flight.run('key3', lambda: None)
+        self.assertEqual(['key2', 'key3'], list(flight.finished.keys()))
+        mock_time.return_value = 103
+        flight.run('key4', lambda: None)
+        self.assertEqual(['key4'], list(flight.finished.keys()))
+
+    def test_016_run(self):
+        """ single-flight - untracked calls do not start a back-off period """
+        flight = self.single_flight_class(backoff=60)
+        self.assertEqual(('foo', True), flight.run('key1', lambda: 'foo', track=False))
+        self.assertFalse(flight.recent('key1'))
+        flight.run('key1', lambda: 'foo')
+        self.assertTrue(flight.recent('key1'))
+
+if __name__ == '__main__':
+    unittest.main()
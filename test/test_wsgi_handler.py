@@ -18,9 +18,12 @@ def dict_from_row(row):
 
 def _cleanup(dir_path):
     """ cleanup function """
-    # remove old db
-    if os.path.exists(dir_path + '/acme_test.db'):
-         os.remove(dir_path + '/acme_test.db')
+    # close pooled connections and remove old db
+    from examples.db_handler.wsgi_handler import connections_close
+    connections_close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(dir_path + '/acme_test.db' + suffix):
+            os.remove(dir_path + '/acme_test.db' + suffix)
 
 class TestACMEHandler(unittest.TestCase):
     """ test class for cgi_handler """
@@ -1196,6 +1199,402 @@ class TestACMEHandler(unittest.TestCase):
         self.assertEqual(('name1', True), self.dbstore.hkparameter_add(data_dic))
         self.assertEqual('value1', self.dbstore.hkparameter_get('name1'))
 
+    def test_124_db_open(self):
+        """ test DBstore._db_open() reuses the connection of the current thread """
+        from examples.db_handler.wsgi_handler import DBstore
+        dbstore = DBstore(False, self.logger, self.dir_path + '/acme_test.db')
+        self.dbstore._db_open()
+        dbs1 = self.dbstore.dbs
+        self.dbstore._db_close()
+        dbstore._db_open()
+        dbs2 = dbstore.dbs
+        dbstore._db_close()
+        self.assertIs(dbs1, dbs2)
+
+    def test_125_db_open(self):
+        """ test DBstore._db_open() different threads use different connections """
+        import threading
+        self.dbstore._db_open()
+        dbs1 = self.dbstore.dbs
+        result_dic = {}
+        def _open():
+            self.dbstore._db_open()
+            result_dic['dbs'] = self.dbstore.dbs
+        thread = threading.Thread(target=_open)
+        thread.start()
+        thread.join()
+        self.assertIsNot(dbs1, result_dic['dbs'])
+
+    def test_126_db_open(self):
+        """ test DBstore._db_open() reconnect after database file got replaced """
+        self.dbstore._db_open()
+        dbs1 = self.dbstore.dbs
+        _cleanup(self.dir_path)
+        self.dbstore._db_create()
+        self.dbstore._db_open()
+        self.assertIsNot(dbs1, self.dbstore.dbs)
+        self.assertEqual(1, self.dbstore.nonce_add('aaa'))
+
+    def test_127_db_connect(self):
+        """ test DBstore._db_connect() pragmas """
+        dbs = self.dbstore._db_connect()
+        self.assertEqual('wal', dbs.execute('PRAGMA journal_mode').fetchone()[0])
+        self.assertEqual(1, dbs.execute('PRAGMA synchronous').fetchone()[0])
+        self.assertEqual(5000, dbs.execute('PRAGMA busy_timeout').fetchone()[0])
+        dbs.close()
+
+    @patch('examples.db_handler.wsgi_handler.load_config')
+    def test_128_init(self, mock_load_cfg):
+        """ test DBstore.__init__() pragmas from config """
+        from examples.db_handler.wsgi_handler import DBstore
+        mock_load_cfg.return_value = {'DBhandler': {'synchronous': 'FULL', 'busy_timeout': '1000'}}
+        dbstore = DBstore(False, self.logger, self.dir_path + '/acme_test.db')
+        self.assertEqual({'journal_mode': 'WAL', 'synchronous': 'FULL', 'busy_timeout': '1000'}, dbstore.pragma_dic)
+
+    def test_129_transaction(self):
+        """ test DBstore.transaction() commit at the end of the scope """
+        with self.dbstore.transaction():
+            self.dbstore.nonce_add('aaa')
+            self.dbstore.nonce_add('bbb')
+            self.assertTrue(self.dbstore.dbs.in_transaction)
+        self.assertFalse(self.dbstore.dbs.in_transaction)
+        self.assertTrue(self.dbstore.nonce_check('aaa'))
+        self.assertTrue(self.dbstore.nonce_check('bbb'))
+
+    def test_130_transaction(self):
+        """ test DBstore.transaction() rollback in case of an exception """
+        with self.assertRaises(Exception):
+            with self.dbstore.transaction():
+                self.dbstore.nonce_add('aaa')
+                with self.dbstore.transaction():
+                    self.dbstore.nonce_add('bbb')
+                raise Exception('exc_transaction')
+        self.assertFalse(self.dbstore.nonce_check('aaa'))
+        self.assertFalse(self.dbstore.nonce_check('bbb'))
+
+    def test_131_db_create(self):
+        """ test DBstore._db_create() indexes for hot lookup columns """
+        from examples.db_handler.wsgi_handler import INDEX_LIST
+        self.dbstore._db_open()
+        self.dbstore.cursor.execute("SELECT name from sqlite_master WHERE type='index'")
+        index_list = [row[0] for row in self.dbstore.cursor.fetchall()]
+        for (index_name, _table, _column) in INDEX_LIST:
+            self.assertIn(index_name, index_list)
+
+    def test_132_certificate_add(self):
+        """ test DBstore.certificate_add() maintains hash columns """
+        from examples.db_handler.wsgi_handler import sha256_hex
+        self.dbstore.account_add({'alg' : 'alg1', 'jwk' : 'jwk1', 'contact' : 'contact1', 'name' : 'name1'})
+        self.dbstore.order_add({'name' : 'order1', 'identifiers' : 'identifiers', 'account' : 'name1', 'status' : 1, 'expires' : '25'})
+        self.dbstore.certificate_add({'name' : 'cert1', 'csr' : 'csr1', 'order' : 'order1'})
+        self.dbstore.certificate_add({'name' : 'cert1', 'cert' : 'cert1', 'cert_raw' : 'cert_raw1'})
+        self.dbstore._db_open()
+        self.dbstore.cursor.execute('SELECT csr_hash, cert_raw_hash from certificate WHERE name = ?', ['cert1'])
+        self.assertEqual((sha256_hex('csr1'), sha256_hex('cert_raw1')), tuple(self.dbstore.cursor.fetchone()))
+        self.assertEqual('cert1', self.dbstore.certificate_lookup('cert_raw', 'cert_raw1')['name'])
+        self.assertEqual('cert1', self.dbstore.certificates_search('csr', 'csr1')[0]['name'])
+        self.assertFalse(self.dbstore.certificate_lookup('cert_raw', 'CERT_RAW1'))
+
+    def test_133_db_update(self):
+        """ test DBstore.db_update() adds and fills hash columns on an existing database """
+        from examples.db_handler.wsgi_handler import sha256_hex
+        self.dbstore.account_add({'alg' : 'alg1', 'jwk' : 'jwk1', 'contact' : 'contact1', 'name' : 'name1'})
+        self.dbstore.order_add({'name' : 'order1', 'identifiers' : 'identifiers', 'account' : 'name1', 'status' : 1, 'expires' : '25'})
+        self.dbstore.certificate_add({'name' : 'cert1', 'csr' : 'csr1', 'order' : 'order1'})
+        self.dbstore._db_open()
+        self.dbstore.cursor.execute('DROP INDEX certificate_csr_hash_idx')
+        self.dbstore.cursor.execute('DROP INDEX certificate_cert_raw_hash_idx')
+        self.dbstore.cursor.execute('ALTER TABLE certificate DROP COLUMN csr_hash')
+        self.dbstore.cursor.execute('ALTER TABLE certificate DROP COLUMN cert_raw_hash')
+        self.dbstore._db_close()
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            self.dbstore.db_update()
+        self.assertIn('INFO:test_a2c:alter certificate table - add csr_hash', lcm.output)
+        self.assertIn('INFO:test_a2c:alter certificate table - add cert_raw_hash', lcm.output)
+        self.assertEqual('cert1', self.dbstore.certificates_search('csr', 'csr1')[0]['name'])
+        self.dbstore._db_open()
+        self.dbstore.cursor.execute('SELECT csr_hash, cert_raw_hash from certificate WHERE name = ?', ['cert1'])
+        self.assertEqual((sha256_hex('csr1'), None), tuple(self.dbstore.cursor.fetchone()))
+
+    def test_134_certificate_search(self):
+        """ test DBstore._certificate_search() uses the hash index """
+        self.dbstore._db_open()
+        self.dbstore.cursor.execute('EXPLAIN QUERY PLAN SELECT * from certificate WHERE certificate.csr_hash = ? AND certificate.csr = ?', ['foo', 'foo'])
+        self.assertTrue(any('certificate_csr_hash_idx' in row[-1] for row in self.dbstore.cursor.fetchall()))
+
+    def test_135_query_plan(self):
+        """ test hot lookups use an index (no full table scan) """
+        self.dbstore.account_add({'alg' : 'alg1', 'jwk' : '{"key": "val"}', 'contact' : 'contact1', 'name' : 'name1'})
+        self.dbstore.order_add({'name' : 'order1', 'identifiers' : 'identifiers', 'account' : 'name1', 'status' : 1, 'expires' : '25'})
+        self.dbstore.authorization_add({'name' : 'authz1', 'type' : 'type1', 'value': 'value1', 'order' : 1})
+        self.dbstore.challenge_add('value1', 'type1', {'name' : 'challenge1', 'token' : 'token1', 'authorization': 'authz1', 'expires' : 25, 'type' : 'http-01'})
+        self.dbstore.certificate_add({'name' : 'cert1', 'csr' : 'csr1', 'order' : 'order1'})
+        self.dbstore._db_open()
+        statement_list = []
+        self.dbstore.dbs.set_trace_callback(statement_list.append)
+        self.dbstore.account_lookup('name', 'name1')
+        self.dbstore.account_lookup('jwk', '{"key": "val"}')
+        self.dbstore.nonce_check('nonce1')
+        self.dbstore.order_lookup('name', 'order1')
+        self.dbstore.orders_invalid_search('expires', 10, operant='<=')
+        self.dbstore.authorization_lookup('name', 'authz1')
+        self.dbstore.authorizations_expired_search('expires', 10, operant='<=')
+        self.dbstore.challenge_lookup('name', 'challenge1')
+        self.dbstore.challenges_search('authorization__name', 'authz1')
+        self.dbstore.certificate_lookup('name', 'cert1')
+        self.dbstore.certificate_lookup('order__name', 'order1')
+        self.dbstore.certificate_lookup('cert_raw', 'cert_raw1')
+        self.dbstore.certificates_search('csr', 'csr1')
+        self.dbstore.certificates_search('expire_uts', 10, operant='<=')
+        self.dbstore.hkparameter_get('dbversion')
+        self.dbstore.dbs.set_trace_callback(None)
+        select_list = [statement for statement in statement_list if statement.lstrip().upper().startswith('SELECT')]
+        self.assertEqual(15, len(select_list))
+        for statement in select_list:
+            for row in self.dbstore.dbs.execute('EXPLAIN QUERY PLAN ' + statement):
+                self.assertFalse(row[-1].startswith('SCAN'), '{0}: {1}'.format(row[-1], statement))
+
+    def test_136_account_lookup(self):
+        """ test DBstore._account_search() exact match by default and pattern search as opt-in """
+        self.dbstore.account_add({'alg' : 'alg1', 'jwk' : 'jwk1', 'contact' : 'contact1', 'name' : 'name1'})
+        self.assertFalse(self.dbstore._account_search('name', 'NAME1'))
+        self.assertFalse(self.dbstore._account_search('name', 'name%'))
+        self.assertEqual('name1', self.dbstore._account_search('name', 'name%', operant='LIKE')['name'])
+
+    @patch('examples.db_handler.wsgi_handler.load_config')
+    def test_137_init(self, mock_load_cfg):
+        """ test DBstore.__init__() statement_cache_size from config """
+        from examples.db_handler.wsgi_handler import DBstore
+        mock_load_cfg.return_value = {'DBhandler': {'statement_cache_size': '10'}}
+        dbstore = DBstore(False, self.logger, self.dir_path + '/acme_test.db')
+        self.assertEqual(10, dbstore.statement_cache_size)
+
+    @patch('examples.db_handler.wsgi_handler.load_config')
+    def test_138_init(self, mock_load_cfg):
+        """ test DBstore.__init__() invalid statement_cache_size """
+        from examples.db_handler.wsgi_handler import DBstore
+        mock_load_cfg.return_value = {'DBhandler': {'statement_cache_size': 'aa'}}
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            dbstore = DBstore(False, self.logger, self.dir_path + '/acme_test.db')
+        self.assertEqual(256, dbstore.statement_cache_size)
+        self.assertIn("ERROR:test_a2c:DBStore.__init__(): failed to parse statement_cache_size: invalid literal for int() with base 10: 'aa'", lcm.output)
+
+    def test_139_nonce_consume(self):
+        """ test DBstore.nonce_consume() """
+        self.dbstore.nonce_add('aaa')
+        self.assertTrue(self.dbstore.nonce_consume('aaa'))
+        self.assertFalse(self.dbstore.nonce_check('aaa'))
+        self.assertFalse(self.dbstore.nonce_consume('aaa'))
+
+    def test_140_nonce_consume(self):
+        """ test DBstore.nonce_consume() same nonce from many threads succeeds exactly once """
+        import threading
+        from examples.db_handler.wsgi_handler import DBstore
+        self.dbstore.nonce_add('aaa')
+        barrier = threading.Barrier(10)
+        result_list = []
+        def _consume():
+            # one DBstore object per thread as in a request handler
+            dbstore = DBstore(False, self.logger, self.dir_path + '/acme_test.db')
+            barrier.wait()
+            result_list.append(dbstore.nonce_consume('aaa'))
+        thread_list = [threading.Thread(target=_consume) for _cnt in range(10)]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+        self.assertEqual(10, len(result_list))
+        self.assertEqual(1, result_list.count(True))
+
+    def test_141_nonces_add(self):
+        """ test DBstore.nonces_add() """
+        self.dbstore.nonces_add(['aaa', 'bbb', 'ccc'])
+        self.assertTrue(self.dbstore.nonce_check('aaa'))
+        self.assertTrue(self.dbstore.nonce_check('ccc'))
+
+    def test_142_nonces_expired_delete(self):
+        """ test DBstore.nonces_expired_delete() in chunks """
+        self.dbstore.nonces_add(['aaa', 'bbb', 'ccc', 'ddd', 'eee'])
+        self.dbstore._db_open()
+        self.dbstore.cursor.execute("UPDATE nonce SET created_at = '2020-01-01 00:00:00' WHERE nonce != 'eee'")
+        self.dbstore._db_close()
+        # 1577923200 = 2020-01-02 00:00:00
+        self.assertEqual(4, self.dbstore.nonces_expired_delete(1577923200, chunk_size=2))
+        self.assertFalse(self.dbstore.nonce_check('aaa'))
+        self.assertTrue(self.dbstore.nonce_check('eee'))
+        self.assertEqual(0, self.dbstore.nonces_expired_delete(1577923200, chunk_size=2))
+
+    def test_143_challenges_add(self):
+        """ test DBstore.challenges_add() - single batch for several authorizations """
+        data_dic = {'alg' : 'alg1', 'jwk' : '{"key11": "val11", "key12": "val12"}', 'contact' : 'contact1', 'name' : 'name1'}
+        self.dbstore.account_add(data_dic)
+        data_dic = {'name' : 'name', 'identifiers' : 'identifiers', 'account' : 'name1', 'status' : 1, 'expires' : '25'}
+        self.dbstore.order_add(data_dic)
+        self.dbstore.authorization_add({'name' : 'authz1', 'type' : 'dns', 'value': 'value1', 'order' : 1})
+        self.dbstore.authorization_add({'name' : 'authz2', 'type' : 'dns', 'value': 'value2', 'order' : 1})
+        data_list = [
+            {'name' : 'challenge1', 'token' : 'token1', 'authorization': 'authz1', 'expires' : 25, 'type' : 'http-01'},
+            {'name' : 'challenge2', 'token' : 'token1', 'authorization': 'authz1', 'expires' : 25, 'type' : 'dns-01'},
+            {'name' : 'challenge3', 'token' : 'token2', 'authorization': 'authz2', 'expires' : 25, 'type' : 'http-01'}]
+        self.assertEqual(['challenge1', 'challenge2', 'challenge3'], self.dbstore.challenges_add(data_list))
+        self.assertEqual({'type': 'dns-01', 'token': 'token1', 'status': 'pending'}, self.dbstore.challenge_lookup('name', 'challenge2'))
+        self.assertEqual({'authorization': 'authz2'}, self.dbstore.challenge_lookup('name', 'challenge3', ('authorization__name',)))
+
+    def test_144_challenges_add(self):
+        """ test DBstore.challenges_add() - challenges of unknown authorizations get skipped """
+        self.dbstore.authorization_add({'name' : 'authz1', 'type' : 'dns', 'value': 'value1', 'order' : 1})
+        data_list = [
+            {'name' : 'challenge1', 'token' : 'token1', 'authorization': 'authz1', 'expires' : 25, 'type' : 'http-01'},
+            {'name' : 'challenge2', 'token' : 'token2', 'authorization': 'unknown', 'expires' : 25, 'type' : 'http-01'}]
+        self.assertEqual(['challenge1'], self.dbstore.challenges_add(data_list))
+        self.assertFalse(self.dbstore.challenge_lookup('name', 'challenge2'))
+
+    def test_145_challenges_add(self):
+        """ test DBstore.challenges_add() - empty list """
+        self.assertEqual([], self.dbstore.challenges_add([]))
+
+    def test_146_authorizations_add_bulk(self):
+        """ test DBstore.authorizations_add_bulk() """
+        data_dic = {'alg' : 'alg1', 'jwk' : '{"key11": "val11", "key12": "val12"}', 'contact' : 'contact1', 'name' : 'name1'}
+        self.dbstore.account_add(data_dic)
+        data_dic = {'name' : 'name', 'identifiers' : 'identifiers', 'account' : 'name1', 'status' : 1, 'expires' : '25'}
+        self.dbstore.order_add(data_dic)
+        data_list = [{'name' : 'authz1', 'type' : 'dns', 'value': 'value1', 'order' : 1, 'status': 'pending', 'expires': 25}, {'name' : 'authz2', 'type' : 'dns', 'value': 'value2', 'order' : 1, 'status': 'pending', 'expires': 25}]
+        self.assertEqual(['authz1', 'authz2'], self.dbstore.authorizations_add_bulk(data_list))
+        self.assertEqual([{'name': 'authz1', 'value': 'value1'}, {'name': 'authz2', 'value': 'value2'}], self.dbstore.authorization_lookup('order__name', 'name', ('name', 'value')))
+
+    def test_147_authorizations_add_bulk(self):
+        """ test DBstore.authorizations_add_bulk() - duplicate name rolls back the batch """
+        self.dbstore.authorization_add({'name' : 'authz2', 'type' : 'dns', 'value': 'value2', 'order' : 1})
+        data_list = [{'name' : 'authz1', 'type' : 'dns', 'value': 'value1', 'order' : 1}, {'name' : 'authz2', 'type' : 'dns', 'value': 'value2', 'order' : 1}]
+        with self.assertRaises(Exception):
+            with self.dbstore.transaction():
+                self.dbstore.authorizations_add_bulk(data_list)
+        self.assertFalse(self.dbstore.authorization_lookup('name', 'authz1'))
+
+    def _order_create(self, authz_list):
+        """ helper creating an order with authorizations in a given state """
+        data_dic = {'alg' : 'alg1', 'jwk' : '{"key11": "val11", "key12": "val12"}', 'contact' : 'contact1', 'name' : 'name1'}
+        self.dbstore.account_add(data_dic)
+        data_dic = {'name' : 'order1', 'identifiers' : 'identifiers', 'account' : 'name1', 'status' : 2, 'expires' : 25}
+        self.dbstore.order_add(data_dic)
+        for (name, status) in authz_list:
+            self.dbstore.authorization_add({'name' : name, 'type' : 'dns', 'value': name, 'order' : 1})
+            self.dbstore.authorization_update({'name': name, 'status': status})
+
+    def test_148_order_view(self):
+        """ test DBstore.order_view() - order and authorizations """
+        self._order_create([('authz1', 'valid'), ('authz2', 'pending')])
+        e_result = {'notbefore': 0, 'notafter': 0, 'identifiers': 'identifiers', 'expires': 25, 'status': 'pending', 'authorizations': [{'name': 'authz1', 'status__name': 'valid'}, {'name': 'authz2', 'status__name': 'pending'}]}
+        self.assertEqual(e_result, self.dbstore.order_view('order1'))
+
+    def test_149_order_view(self):
+        """ test DBstore.order_view() - order without authorizations """
+        self._order_create([])
+        self.assertEqual([], self.dbstore.order_view('order1')['authorizations'])
+
+    def test_150_order_view(self):
+        """ test DBstore.order_view() - unknown order """
+        self.assertFalse(self.dbstore.order_view('unknown'))
+
+    def test_151_order_ready_set(self):
+        """ test DBstore.order_ready_set() - all authorizations valid """
+        self._order_create([('authz1', 'valid'), ('authz2', 'valid')])
+        self.assertTrue(self.dbstore.order_ready_set('order1'))
+        self.assertEqual('ready', self.dbstore.order_lookup('name', 'order1')['status'])
+        # order is not pending anymore
+        self.assertFalse(self.dbstore.order_ready_set('order1'))
+
+    def test_152_order_ready_set(self):
+        """ test DBstore.order_ready_set() - one authorization not valid """
+        self._order_create([('authz1', 'valid'), ('authz2', 'pending')])
+        self.assertFalse(self.dbstore.order_ready_set('order1'))
+        self.assertEqual('pending', self.dbstore.order_lookup('name', 'order1')['status'])
+
+    def test_153_order_ready_set(self):
+        """ test DBstore.order_ready_set() - order without authorizations """
+        self._order_create([])
+        self.assertFalse(self.dbstore.order_ready_set('order1'))
+
+    def test_154_authorization_view(self):
+        """ test DBstore.authorization_view() - authorization and challenges """
+        self._order_create([('authz1', 'pending')])
+        self.dbstore.challenges_add([
+            {'name' : 'challenge1', 'token' : 'token1', 'authorization': 'authz1', 'expires' : 25, 'type' : 'http-01'},
+            {'name' : 'challenge2', 'token' : 'token1', 'authorization': 'authz1', 'expires' : 25, 'type' : 'dns-01'}])
+        self.dbstore.challenge_update({'name': 'challenge2', 'status': 'valid'})
+        e_result = {'name': 'authz1', 'type': 'dns', 'value': 'authz1', 'token': None, 'expires': None, 'status__name': 'pending', 'challenges': [
+            {'name': 'challenge1', 'type': 'http-01', 'token': 'token1', 'status__name': 'pending'},
+            {'name': 'challenge2', 'type': 'dns-01', 'token': 'token1', 'status__name': 'valid'}]}
+        self.assertEqual(e_result, self.dbstore.authorization_view('authz1'))
+
+    def test_155_authorization_view(self):
+        """ test DBstore.authorization_view() - authorization without challenges """
+        self._order_create([('authz1', 'pending')])
+        self.assertEqual([], self.dbstore.authorization_view('authz1')['challenges'])
+
+    def test_156_authorization_view(self):
+        """ test DBstore.authorization_view() - unknown authorization """
+        self.assertFalse(self.dbstore.authorization_view('unknown'))
+
+    def test_157_db_close(self):
+        """ test failed statement does not get committed by the next call on the pooled connection """
+        self._order_create([])
+        data_list = [{'name': 'authz1', 'order': 1, 'type': 'dns', 'value': 'foo'}, {'name': 'authz1', 'order': 1, 'type': 'dns', 'value': 'bar'}]
+        with self.assertRaises(Exception):
+            self.dbstore.authorizations_add_bulk(data_list)
+        self.assertFalse(self.dbstore.dbs.in_transaction)
+        self.assertEqual(1, self.dbstore.nonce_add('aaa'))
+        self.assertFalse(self.dbstore.authorization_lookup('name', 'authz1'))
+
+    def test_158_db_open(self):
+        """ test leftovers of a failed call get rolled back """
+        self.dbstore._db_open()
+        self.dbstore.cursor.execute('''INSERT INTO nonce(nonce) VALUES('aaa')''')
+        self.assertEqual(1, self.dbstore.nonce_add('bbb'))
+        self.assertFalse(self.dbstore.nonce_check('aaa'))
+        self.assertTrue(self.dbstore.nonce_check('bbb'))
+
+    def test_159_transaction(self):
+        """ test DBstore.transaction() scope gets rolled back if a handled statement failed """
+        data_dic = {'alg' : 'alg1', 'jwk' : '{"key11": "val11", "key12": "val12"}', 'contact' : 'contact1', 'name' : 'name1'}
+        self.dbstore.account_add(data_dic)
+        with self.assertLogs('test_a2c', level='INFO') as lcm:
+            with self.dbstore.transaction():
+                oid = self.dbstore.order_add({'name' : 'order1', 'identifiers' : 'identifiers', 'account' : 'name1', 'status' : 2, 'expires' : 25})
+                data_list = [{'name': 'authz1', 'order': oid, 'type': 'dns', 'value': 'foo'}, {'name': 'authz1', 'order': oid, 'type': 'dns', 'value': 'bar'}]
+                try:
+                    self.dbstore.authorizations_add_bulk(data_list)
+                except Exception:
+                    pass
+        self.assertIn('ERROR:test_a2c:DBStore.transaction(): rollback due to failed statement', lcm.output)
+        self.assertFalse(self.dbstore.dbs.in_transaction)
+        self.assertFalse(self.dbstore.order_lookup('name', 'order1'))
+        self.assertFalse(self.dbstore.authorization_lookup('name', 'authz1'))
+
+    def test_160_transaction(self):
+        """ test DBstore.transaction() next scope commits again after a rollback """
+        with self.dbstore.transaction():
+            try:
+                self.dbstore.authorizations_add_bulk([{'name': 'authz1', 'order': 1, 'type': 'dns'}])
+            except Exception:
+                pass
+        with self.dbstore.transaction():
+            self.dbstore.nonce_add('aaa')
+        self.assertTrue(self.dbstore.nonce_check('aaa'))
+
+    @patch('examples.db_handler.wsgi_handler.sys')
+    @patch('examples.db_handler.wsgi_handler.sqlite3.connect')
+    def test_161_db_connect(self, mock_connect, mock_sys):
+        """ test DBstore._db_connect() python versions without deterministic functions """
+        from examples.db_handler.wsgi_handler import sha256_hex
+        mock_sys.version_info = (3, 7, 0)
+        self.dbstore._db_connect()
+        mock_connect.return_value.create_function.assert_called_with('sha256_hex', 1, sha256_hex)
+        mock_sys.version_info = (3, 8, 0)
+        self.dbstore._db_connect()
+        mock_connect.return_value.create_function.assert_called_with('sha256_hex', 1, sha256_hex, deterministic=True)
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+""" nonce server for the "socket" nonce backend - share nonces between several worker processes """
+# pylint: disable=E0401, C0413
+import os
+import sys
+import socketserver
+sys.path.insert(0, '..')
+sys.path.insert(1, '.')
+from acme_srv.helper import load_config, logger_setup  # nopep8
+from acme_srv.nonce import NonceMemoryStore, NONCE_SOCKET  # nopep8
+
+
+class NonceRequestHandler(socketserver.StreamRequestHandler):
+    """ line based protocol: "ADD <nonce>" or "CONSUME <nonce>" answered by "OK" or "NOK" """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                (command, nonce) = line.decode('utf-8').split()
+            except ValueError:
+                command = nonce = None
+            if command == 'ADD':
+                result = self.server.store.add(nonce)
+            elif command == 'CONSUME':
+                result = self.server.store.consume(nonce)
+            else:
+                result = False
+            self.wfile.write(b'OK\n' if result else b'NOK\n')
+
+
+class NonceServer(socketserver.ThreadingUnixStreamServer):
+    """ nonce store shared by several worker processes via unix socket """
+    daemon_threads = True
+
+    def __init__(self, socket_path, store):
+        socket_dir = os.path.dirname(os.path.abspath(socket_path))
+        if not os.path.isdir(socket_dir):
+            os.makedirs(socket_dir, mode=0o700)
+        if os.stat(socket_dir).st_mode & 0o002:
+            # other users could pre-create or replace the socket
+            raise PermissionError('socket directory {0} must not be world-writable'.format(socket_dir))
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.store = store
+        socketserver.ThreadingUnixStreamServer.__init__(self, socket_path, NonceRequestHandler)
+
+    def server_bind(self):
+        """ create socket accessible by the server user only """
+        umask = os.umask(0o177)
+        try:
+            socketserver.ThreadingUnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+        os.chmod(self.server_address, 0o600)
+
+
+if __name__ == '__main__':
+
+    DEBUG = False
+
+    # initialize logger
+    LOGGER = logger_setup(DEBUG)
+
+    CONFIG_DIC = load_config()
+    SOCKET_PATH = CONFIG_DIC.get('Nonce', 'socket', fallback=NONCE_SOCKET)
+    TTL = int(CONFIG_DIC.get('Nonce', 'ttl', fallback=3600))
+    MAX_ENTRIES = int(CONFIG_DIC.get('Nonce', 'max_entries', fallback=100000))
+
+    SERVER = NonceServer(SOCKET_PATH, NonceMemoryStore(TTL, MAX_ENTRIES))
+    LOGGER.info('nonce server listening on {0}'.format(SOCKET_PATH))
+    try:
+        SERVER.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        SERVER.server_close()
+        os.remove(SOCKET_PATH)
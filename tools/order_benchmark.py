@@ -0,0 +1,57 @@
+#!/usr/bin/python
+""" micro-benchmark comparing the database cost of newOrder requests with per-identifier and bulk authorization inserts """
+# pylint: disable=E0401, C0413
+import logging
+import os
+import sys
+import tempfile
+import timeit
+sys.path.insert(0, '..')
+sys.path.insert(1, '.')
+from examples.db_handler.wsgi_handler import DBstore, connections_close  # nopep8
+
+IDENTIFIER_LIST = (1, 10, 100, 500)
+
+
+def dbstore_get(db_name):
+    """ create database with a single account """
+    dbstore = DBstore(False, logging.getLogger('order_benchmark'), db_name)
+    dbstore.account_add({'alg': 'alg', 'jwk': '{"key": "val"}', 'contact': 'contact', 'name': 'account'})
+    return dbstore
+
+
+def authz_list_get(order_id, identifiers, cnt):
+    """ authorization list as created by Order._add() """
+    return [{'name': 'a{0}_{1}'.format(cnt, idx), 'type': 'dns', 'value': 'host{0}.example.com'.format(idx), 'order': order_id, 'status': 'pending', 'expires': 86400} for idx in range(identifiers)]
+
+
+def order_new(dbstore, identifiers, cnt, bulk):
+    """ database part of Order.new() """
+    with dbstore.transaction():
+        order_id = dbstore.order_add({'name': 'o{0}'.format(cnt), 'identifiers': '[]', 'account': 'account', 'status': 2, 'expires': 86400})
+        authz_list = authz_list_get(order_id, identifiers, cnt)
+        if bulk:
+            dbstore.authorizations_add_bulk(authz_list)
+        else:
+            for authz in authz_list:
+                dbstore.authorization_add(authz)
+
+
+def order_bench(identifiers, count, bulk):
+    """ average latency of newOrder requests for a given number of identifiers """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dbstore = dbstore_get(os.path.join(tmp_dir, 'acme_bench.db'))
+        counter = iter(range(count))
+        result = timeit.timeit(lambda: order_new(dbstore, identifiers, next(counter), bulk), number=count)
+        connections_close()
+    return result / count
+
+
+if __name__ == '__main__':
+
+    COUNT = 50
+    print('{0:>12} {1:>18} {2:>18} {3:>18}'.format('identifiers', 'loop (ms/order)', 'bulk (ms/order)', 'bulk (us/authz)'))
+    for IDENTIFIERS in IDENTIFIER_LIST:
+        LOOP = order_bench(IDENTIFIERS, COUNT, False) * 1000
+        BULK = order_bench(IDENTIFIERS, COUNT, True) * 1000
+        print('{0:>12} {1:>18.2f} {2:>18.2f} {3:>18.2f}'.format(IDENTIFIERS, LOOP, BULK, BULK / IDENTIFIERS * 1000))
@@ -0,0 +1,53 @@
+#!/usr/bin/python
+""" micro-benchmark comparing url dispatch of the former regex list with acme_srv.router """
+# pylint: disable=E0401, C0413
+import re
+import sys
+import timeit
+sys.path.insert(0, '..')
+sys.path.insert(1, '.')
+from acme_srv.router import Router  # nopep8
+
+PATH_LIST = ['/directory', '/acme/newnonce', '/acme/acct/abcdef', '/acme/order/abcdef', '/acme/chall/abcdef', '/trigger', '/foo/bar']
+
+REGEX_LIST = [r'^$', r'^acme/acct', r'^acme/authz', r'^acme/cert', r'^acme/chall', r'^acme/key-change', r'^acme/newaccount$', r'^acme/newnonce$', r'^acme/neworders$', r'^acme/order', r'^acme/revokecert', r'^directory?$', r'^trigger']
+
+ROUTE_LIST = [('', False), ('acme/acct', True), ('acme/authz', True), ('acme/cert', True), ('acme/chall', True), ('acme/key-change', True), ('acme/newaccount', False), ('acme/newnonce', False), ('acme/neworders', False), ('acme/order', True), ('acme/revokecert', True), ('directory', False), ('trigger', True)]
+
+
+def regex_dispatch(url_list, path):
+    """ former dispatch: regex search over a list which got extended on every request """
+    url_list.append((r'^.well-known/acme-challenge/', 'acmechallenge'))
+    path = path.lstrip('/')
+    for regex, callback in url_list:
+        if re.search(regex, path) is not None:
+            return callback
+    return 'not_found'
+
+
+def regex_bench(requests, count):
+    """ dispatch cost after a given number of requests served """
+    url_list = [(regex, regex) for regex in REGEX_LIST]
+    for _cnt in range(requests):
+        url_list.append((r'^.well-known/acme-challenge/', 'acmechallenge'))
+    return timeit.timeit(lambda: [regex_dispatch(url_list, path) for path in PATH_LIST], number=count)
+
+
+def router_bench(_requests, count):
+    """ dispatch cost of the router - independent from number of requests served """
+    router = Router(url_prefix=None, not_found='not_found')
+    for (path, prefix) in ROUTE_LIST:
+        router.add(path, path, prefix)
+    router.add('.well-known/acme-challenge', 'acmechallenge', True)
+    return timeit.timeit(lambda: [router.dispatch(path) for path in PATH_LIST], number=count)
+
+
+if __name__ == '__main__':
+
+    COUNT = 200
+    print('{0:>10} {1:>18} {2:>18}'.format('uptime', 'regex (us/req)', 'router (us/req)'))
+    for REQUESTS in (0, 1000, 10000, 100000):
+        # regex dispatch appends one entry per call - measure before growth dominates
+        REGEX = regex_bench(REQUESTS, COUNT) / (COUNT * len(PATH_LIST)) * 1000000
+        ROUTER = router_bench(REQUESTS, COUNT) / (COUNT * len(PATH_LIST)) * 1000000
+        print('{0:>10} {1:>18.2f} {2:>18.2f}'.format(REQUESTS, REGEX, ROUTER))